@@ -5,10 +5,11 @@ Main entry point for the WTF Downloader application.
 """
 
 import os
+import json
 import asyncio
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from .platform_detector import detect_platform
-from .batch_downloader import download_batch, download_single_video
+from .batch_downloader import download_batch, download_single_video, stream_batch
 
 def create_downloader_app():
     """Create and configure the WTF Downloader Flask app."""
@@ -54,15 +55,27 @@ def create_downloader_app():
     
     @app.route('/download/batch', methods=['POST'])
     def download_batch_videos():
-        """Download multiple videos."""
+        """Download multiple videos concurrently.
+
+        With ``"stream": true`` the response is NDJSON, one result per line in
+        completion order (each carries ``index``); otherwise one JSON body with
+        results in request order once the slowest download finishes."""
         data = request.get_json()
         urls = data.get('urls', [])
+        timeout = data.get('timeout')
         
         if not urls:
             return jsonify({"error": "At least one URL is required"}), 400
         
+        kwargs = {"timeout": float(timeout)} if timeout else {}
+        if data.get('stream'):
+            def _ndjson():
+                for result in stream_batch(urls, **kwargs):
+                    yield json.dumps(result) + "\n"
+            return Response(_ndjson(), mimetype='application/x-ndjson')
+        
         # Run the async batch download function
-        results = asyncio.run(download_batch(urls))
+        results = asyncio.run(download_batch(urls, **kwargs))
         return jsonify({"downloads": results})
     
     return app
\ No newline at end of file
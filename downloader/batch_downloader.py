@@ -2,46 +2,124 @@
 Batch Downloader Module
 
 Handles downloading multiple videos concurrently.
+
+The platform downloaders are blocking (yt-dlp), so each one runs on a shared,
+bounded thread pool and the event loop only awaits it. Per-platform semaphores
+cap how many downloads hit one site at once, every URL has a timeout, and a
+timed-out or cancelled download is told to stop via its cancel event. A batch
+therefore takes about as long as its slowest URL, not the sum of all of them.
 """
 
 import os
 import asyncio
-from typing import List, Tuple, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional
 from .platform_detector import detect_platform
 from .tiktok_downloader import download_tiktok_video
 from .insta_downloader import download_instagram_video
 from .twitter_downloader import download_twitter_video
 from .youtube_downloader import download_youtube_video
 
-async def download_single_video(url: str, output_dir: str = "./storage/raw/") -> Dict[str, Any]:
+# Threads shared by every batch in the process (bounds total concurrent downloads)
+MAX_WORKERS = int(os.environ.get("DOWNLOADER_MAX_WORKERS", "4"))
+
+# Per-URL timeout in seconds
+DEFAULT_TIMEOUT = float(os.environ.get("DOWNLOADER_TIMEOUT_SECONDS", "300"))
+
+# Concurrent downloads per platform within one batch. Instagram stays serial:
+# parallel requests from one IP are what trigger its temporary blocks.
+PLATFORM_CONCURRENCY = {
+    "tiktok": 3,
+    "instagram": 1,
+    "twitter": 3,
+    "youtube": 2,
+}
+
+_DOWNLOADERS: Dict[str, Callable[..., Any]] = {
+    "tiktok": download_tiktok_video,
+    "instagram": download_instagram_video,
+    "twitter": download_twitter_video,
+    "youtube": download_youtube_video,
+}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the shared download thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                                           thread_name_prefix="downloader")
+        return _executor
+
+
+def _platform_semaphores() -> Dict[str, asyncio.Semaphore]:
+    """Fresh per-platform semaphores for one batch (bound to its event loop)."""
+    return {platform: asyncio.Semaphore(limit)
+            for platform, limit in PLATFORM_CONCURRENCY.items()}
+
+
+async def download_single_video(url: str, output_dir: str = "./storage/raw/",
+                                timeout: Optional[float] = DEFAULT_TIMEOUT,
+                                semaphore: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
     """
     Download a single video based on its platform.
-    
+
+    The blocking download runs on the shared thread pool. If it exceeds
+    ``timeout`` or the awaiting task is cancelled, the download is signalled
+    to stop and its partial result is discarded.
+
     Args:
         url (str): The video URL
         output_dir (str): Directory to save the downloaded video
-        
+        timeout (Optional[float]): Seconds before giving up (None = no limit)
+        semaphore (Optional[asyncio.Semaphore]): Platform slot to hold while downloading
+
     Returns:
         Dict[str, Any]: Download result with status and file info
     """
     platform = detect_platform(url)
-    
-    if platform == "tiktok":
-        success, file_path, error = download_tiktok_video(url, output_dir)
-    elif platform == "instagram":
-        success, file_path, error = download_instagram_video(url, output_dir)
-    elif platform == "twitter":
-        success, file_path, error = download_twitter_video(url, output_dir)
-    elif platform == "youtube":
-        success, file_path, error = download_youtube_video(url, output_dir)
-    else:
+    downloader = _DOWNLOADERS.get(platform)
+
+    if downloader is None:
         return {
             "url": url,
             "success": False,
             "error": "Unsupported platform",
             "platform": platform
         }
-    
+
+    cancel_event = threading.Event()
+    loop = asyncio.get_running_loop()
+
+    async def _run():
+        return await loop.run_in_executor(
+            _get_executor(), downloader, url, output_dir, cancel_event)
+
+    try:
+        if semaphore is not None:
+            async with semaphore:
+                success, file_path, error = await asyncio.wait_for(_run(), timeout)
+        else:
+            success, file_path, error = await asyncio.wait_for(_run(), timeout)
+    except asyncio.TimeoutError:
+        cancel_event.set()
+        return {
+            "url": url,
+            "success": False,
+            "file_path": None,
+            "error": f"Timed out after {timeout:g}s",
+            "platform": platform,
+            "timed_out": True
+        }
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+
     return {
         "url": url,
         "success": success,
@@ -50,34 +128,95 @@ async def download_single_video(url: str, output_dir: str = "./storage/raw/") ->
         "platform": platform
     }
 
-async def download_batch(urls: List[str], output_dir: str = "./storage/raw/") -> List[Dict[str, Any]]:
+
+async def iter_batch(urls: List[str], output_dir: str = "./storage/raw/",
+                     timeout: Optional[float] = DEFAULT_TIMEOUT) -> AsyncIterator[Dict[str, Any]]:
     """
-    Download multiple videos concurrently.
-    
+    Download multiple videos concurrently, yielding each result as it completes.
+
+    Every result carries ``index`` (its position in ``urls``). Closing the
+    iterator early cancels the downloads still in flight.
+
     Args:
         urls (List[str]): List of video URLs
         output_dir (str): Directory to save the downloaded videos
-        
-    Returns:
-        List[Dict[str, Any]]: List of download results
+        timeout (Optional[float]): Per-URL timeout in seconds
+
+    Yields:
+        Dict[str, Any]: Download results in completion order
     """
-    # Create tasks for concurrent downloads
-    tasks = [download_single_video(url, output_dir) for url in urls]
-    
-    # Execute all downloads concurrently
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-    
-    # Process results, handling any exceptions
-    processed_results = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            processed_results.append({
-                "url": urls[i],
+    semaphores = _platform_semaphores()
+
+    async def _one(index: int, url: str) -> Dict[str, Any]:
+        try:
+            result = await download_single_video(
+                url, output_dir, timeout, semaphores.get(detect_platform(url)))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result = {
+                "url": url,
                 "success": False,
-                "error": str(result),
+                "error": str(e),
                 "platform": "unknown"
-            })
-        else:
-            processed_results.append(result)
-    
-    return processed_results
\ No newline at end of file
+            }
+        result["index"] = index
+        return result
+
+    tasks = [asyncio.ensure_future(_one(i, url)) for i, url in enumerate(urls)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def download_batch(urls: List[str], output_dir: str = "./storage/raw/",
+                         timeout: Optional[float] = DEFAULT_TIMEOUT) -> List[Dict[str, Any]]:
+    """
+    Download multiple videos concurrently.
+
+    Args:
+        urls (List[str]): List of video URLs
+        output_dir (str): Directory to save the downloaded videos
+        timeout (Optional[float]): Per-URL timeout in seconds
+
+    Returns:
+        List[Dict[str, Any]]: List of download results, in the order of ``urls``
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(urls)
+    async for result in iter_batch(urls, output_dir, timeout):
+        results[result.pop("index")] = result
+    return results
+
+
+def stream_batch(urls: List[str], output_dir: str = "./storage/raw/",
+                 timeout: Optional[float] = DEFAULT_TIMEOUT) -> Iterator[Dict[str, Any]]:
+    """
+    Synchronous wrapper around ``iter_batch`` for streaming HTTP responses.
+
+    Drives a private event loop, so it can be consumed from a plain Flask
+    response generator.
+
+    Args:
+        urls (List[str]): List of video URLs
+        output_dir (str): Directory to save the downloaded videos
+        timeout (Optional[float]): Per-URL timeout in seconds
+
+    Yields:
+        Dict[str, Any]: Download results in completion order
+    """
+    loop = asyncio.new_event_loop()
+    agen = iter_batch(urls, output_dir, timeout)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
@@ -0,0 +1,33 @@
+"""
+Cancellation Module
+
+Lets a caller stop an in-flight yt-dlp download from another thread.
+"""
+
+import threading
+from typing import Callable, Dict, Any
+
+try:
+    from yt_dlp.utils import DownloadCancelled
+except ImportError:  # older yt-dlp
+    class DownloadCancelled(Exception):
+        """Raised from a progress hook to abort a download."""
+
+
+def cancel_hook(cancel_event: threading.Event) -> Callable[[Dict[str, Any]], None]:
+    """
+    Build a yt-dlp progress hook that aborts the download once cancel_event is set.
+
+    yt-dlp calls progress hooks on every chunk, so a cancelled download stops
+    within one chunk. Metadata extraction has no hook and runs to completion.
+
+    Args:
+        cancel_event (threading.Event): Set to request cancellation
+
+    Returns:
+        Callable[[Dict[str, Any]], None]: Hook for ``ydl_opts['progress_hooks']``
+    """
+    def _hook(status: Dict[str, Any]) -> None:
+        if cancel_event.is_set():
+            raise DownloadCancelled("Download cancelled")
+    return _hook
@@ -5,16 +5,20 @@ Handles downloading videos from Instagram.
 """
 
 import os
+import threading
 from typing import Optional, Tuple
 from yt_dlp import YoutubeDL
+from .cancellation import cancel_hook
 
-def download_instagram_video(url: str, output_dir: str = "./storage/raw/") -> Tuple[bool, Optional[str], Optional[str]]:
+def download_instagram_video(url: str, output_dir: str = "./storage/raw/",
+                             cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Optional[str], Optional[str]]:
     """
     Download an Instagram video.
     
     Args:
         url (str): The Instagram video URL
         output_dir (str): Directory to save the downloaded video
+        cancel_event (Optional[threading.Event]): Set to abort the download
         
     Returns:
         Tuple[bool, Optional[str], Optional[str]]: (success, file_path, error_message)
@@ -42,6 +46,8 @@ def download_instagram_video(url: str, output_dir: str = "./storage/raw/") -> Tu
                 'Upgrade-Insecure-Requests': '1',
             }
         }
+        if cancel_event is not None:
+            ydl_opts['progress_hooks'] = [cancel_hook(cancel_event)]
         
         with YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
@@ -5,16 +5,20 @@ Handles downloading videos from YouTube.
 """
 
 import os
+import threading
 from typing import Optional, Tuple
 from yt_dlp import YoutubeDL
+from .cancellation import cancel_hook
 
-def download_youtube_video(url: str, output_dir: str = "./storage/raw/") -> Tuple[bool, Optional[str], Optional[str]]:
+def download_youtube_video(url: str, output_dir: str = "./storage/raw/",
+                           cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Optional[str], Optional[str]]:
     """
     Download a YouTube video.
     
     Args:
         url (str): The YouTube video URL
         output_dir (str): Directory to save the downloaded video
+        cancel_event (Optional[threading.Event]): Set to abort the download
         
     Returns:
         Tuple[bool, Optional[str], Optional[str]]: (success, file_path, error_message)
@@ -32,6 +36,8 @@ def download_youtube_video(url: str, output_dir: str = "./storage/raw/") -> Tupl
             'fragment_retries': 3,
             'socket_timeout': 30,
         }
+        if cancel_event is not None:
+            ydl_opts['progress_hooks'] = [cancel_hook(cancel_event)]
         
         with YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(url, download=True)
@@ -0,0 +1,224 @@
+"""
+Memory-budget admission control for FFmpeg work.
+
+Memory, not CPU, is what kills the worker: the 512MB Render instance is
+OOM-killed long before the CPU is saturated. Every FFmpeg child (normalize,
+brand render, render segment, audio mux, watermark conversion) is started under
+a ticket from ``admit()``:
+
+  * the ticket predicts the child's peak RSS from a learned profile keyed by
+    (operation, profile key) — the key encodes resolution and filter graph
+  * admission is FIFO and blocks until the predicted total of everything
+    already running plus this ticket fits under MEMORY_BUDGET_MB; work waits
+    in the queue instead of being OOM-killed
+  * while the child runs the caller samples its RSS from /proc; the observed
+    peak is folded back into the profile (EWMA), so predictions track reality
+
+A ticket is always admitted when nothing else is running, so one job whose
+prediction exceeds the budget can never deadlock the queue.
+
+Stdlib only, no project imports — safe to import from video_processor and app.
+Single Gunicorn worker (WEB_CONCURRENCY=1): state is in-process.
+"""
+import os
+import re
+import time
+import threading
+import itertools
+from contextlib import contextmanager
+
+MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', '400'))
+
+# Prediction = learned peak × headroom. EWMA weight of the newest observation.
+PROFILE_HEADROOM = 1.15
+PROFILE_ALPHA = 0.3
+
+# Cold-start priors (MB) per operation until a profile has been observed.
+DEFAULT_PROFILE_MB = {
+    'normalize': 220,
+    'render':    260,
+    'segment':   200,
+    'mux':       60,
+    'convert':   180,
+    'still':     120,
+    'render_multi': 420,   # one decode, one encoder per output format
+}
+FALLBACK_PROFILE_MB = 200
+
+_cond = threading.Condition()
+_running = {}     # ticket id -> current charge (MB): max(prediction, observed RSS)
+_waiting = []     # ticket ids in FIFO order
+_profiles = {}    # (operation, key) -> {'peak_mb', 'max_mb', 'samples'}
+_ticket_ids = itertools.count(1)
+_stats = {'admitted': 0, 'queued': 0, 'wait_seconds': 0.0, 'cancelled': 0}
+
+
+class AdmissionCancelled(Exception):
+    """The caller's cancel_event was set while the ticket was still queued."""
+
+
+# ── Profile keys ──────────────────────────────────────────────────────────────
+
+def resolution_class(width, height):
+    """Bucket a frame size so nearby resolutions share one profile."""
+    try:
+        pixels = int(width) * int(height)
+    except (TypeError, ValueError):
+        return 'unknown'
+    if pixels <= 1280 * 720:
+        return '720p'
+    if pixels <= 1920 * 1080:
+        return '1080p'
+    if pixels <= 2560 * 1440:
+        return '1440p'
+    return '2160p+'
+
+
+_FILTER_NAME_RE = re.compile(r"(?:^|[;,\]])\s*([a-z][a-z0-9_]*)(?==|\[|,|;|$)")
+
+
+def graph_signature(filter_complex):
+    """Stable summary of a filter graph's shape: sorted unique filter names.
+    Paths, positions and text differ per brand but barely move memory; the
+    set of filters (geq, rotate, drawtext, movie, ...) does."""
+    if not filter_complex:
+        return 'none'
+    names = sorted(set(_FILTER_NAME_RE.findall(filter_complex)))
+    return '+'.join(names) or 'none'
+
+
+# ── Prediction and learning ──────────────────────────────────────────────────
+
+def predict_mb(operation, key=None):
+    """Predicted peak RSS (MB) for one FFmpeg child of this kind."""
+    with _cond:
+        prof = _profiles.get((operation, key)) or _profiles.get((operation, None))
+        if prof:
+            return prof['peak_mb'] * PROFILE_HEADROOM
+    return float(DEFAULT_PROFILE_MB.get(operation, FALLBACK_PROFILE_MB))
+
+
+def _record(operation, key, peak_mb):
+    """Fold an observed peak into the keyed profile and the operation-wide one."""
+    for prof_key in ((operation, key), (operation, None)):
+        prof = _profiles.get(prof_key)
+        if prof is None:
+            _profiles[prof_key] = {'peak_mb': peak_mb, 'max_mb': peak_mb, 'samples': 1}
+        else:
+            prof['peak_mb'] = (1 - PROFILE_ALPHA) * prof['peak_mb'] + PROFILE_ALPHA * peak_mb
+            prof['max_mb'] = max(prof['max_mb'], peak_mb)
+            prof['samples'] += 1
+        if key is None:
+            break
+
+
+def read_rss_mb(pid):
+    """Resident set size of a process from /proc (MB), or None when unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+# ── Tickets ──────────────────────────────────────────────────────────────────
+
+class Ticket:
+    """One admitted FFmpeg child. Call sample(pid) periodically while it runs."""
+
+    def __init__(self, operation, key, predicted_mb):
+        self.id = next(_ticket_ids)
+        self.operation = operation
+        self.key = key
+        self.predicted_mb = predicted_mb
+        self.peak_mb = 0.0
+
+    def sample(self, pid):
+        rss = read_rss_mb(pid)
+        if rss is None:
+            return None
+        if rss > self.peak_mb:
+            self.peak_mb = rss
+            with _cond:
+                # Charge the budget with what the child really uses once it
+                # outgrows its prediction, so later admissions see the truth.
+                if self.id in _running and rss > _running[self.id]:
+                    _running[self.id] = rss
+        return rss
+
+
+def _fits(ticket):
+    if not _running:
+        return True
+    return sum(_running.values()) + ticket.predicted_mb <= MEMORY_BUDGET_MB
+
+
+@contextmanager
+def admit(operation, key=None, cancel_event=None, label=''):
+    """
+    Block until this FFmpeg child fits the memory budget, then yield a Ticket.
+
+    Raises AdmissionCancelled if cancel_event (threading.Event) is set while
+    waiting. On exit the observed peak RSS (if any) updates the profile.
+    """
+    ticket = Ticket(operation, key, predict_mb(operation, key))
+    waited_from = time.time()
+    announced = False
+    with _cond:
+        _waiting.append(ticket.id)
+        try:
+            while not (_waiting[0] == ticket.id and _fits(ticket)):
+                if cancel_event is not None and cancel_event.is_set():
+                    _stats['cancelled'] += 1
+                    raise AdmissionCancelled(f'{operation} cancelled while queued')
+                if not announced:
+                    announced = True
+                    _stats['queued'] += 1
+                    print(f"[ADMISSION] Queued {operation}{(' ' + label) if label else ''} "
+                          f"predicted={ticket.predicted_mb:.0f}MB "
+                          f"in_use={sum(_running.values()):.0f}/{MEMORY_BUDGET_MB:.0f}MB "
+                          f"ahead={_waiting.index(ticket.id)}")
+                _cond.wait(timeout=0.5)
+        finally:
+            _waiting.remove(ticket.id)
+            _cond.notify_all()
+        _running[ticket.id] = ticket.predicted_mb
+        _stats['admitted'] += 1
+        waited = time.time() - waited_from
+        _stats['wait_seconds'] += waited
+    if announced:
+        print(f"[ADMISSION] Admitted {operation}{(' ' + label) if label else ''} after {waited:.1f}s")
+
+    try:
+        yield ticket
+    finally:
+        with _cond:
+            _running.pop(ticket.id, None)
+            if ticket.peak_mb > 0:
+                _record(operation, key, ticket.peak_mb)
+            _cond.notify_all()
+
+
+def snapshot():
+    """Admin/diagnostic view of the controller state."""
+    with _cond:
+        return {
+            'budget_mb': MEMORY_BUDGET_MB,
+            'in_use_mb': round(sum(_running.values()), 1),
+            'running': len(_running),
+            'waiting': len(_waiting),
+            'stats': dict(_stats, wait_seconds=round(_stats['wait_seconds'], 1)),
+            'profiles': [
+                {
+                    'operation': op,
+                    'key': key,
+                    'peak_mb': round(p['peak_mb'], 1),
+                    'max_mb': round(p['max_mb'], 1),
+                    'samples': p['samples'],
+                }
+                for (op, key), p in sorted(_profiles.items(), key=lambda kv: (kv[0][0], kv[0][1] or ''))
+            ],
+        }
@@ -17,9 +17,10 @@ import tempfile
 import threading
 from yt_dlp import YoutubeDL
 import hashlib
+import math
 import sqlite3
 from datetime import datetime
-from functools import wraps
+from functools import wraps, lru_cache
 import shutil
 import re
 
@@ -51,6 +52,12 @@ if HAS_FFMPEG and not shutil.which('ffmpeg'):
 # yt-dlp format string: use merge (best quality) when ffmpeg is available,
 # otherwise fall back to best single pre-muxed format.
 YTDLP_FORMAT = 'bv*+ba/b' if HAS_FFMPEG else 'b/best'
+# Prefer the rendition closest to our 720p render target (res = shorter side,
+# so 720x1280 verticals qualify) — anything bigger is downscaled in
+# normalize_video anyway, so fetching 1080p/4K only wastes bytes and decode time.
+YTDLP_FORMAT_SORT = ['res:720', 'ext:mp4:m4a']
+# Concurrent metadata-only extractions per fetch batch (planning phase)
+FETCH_PLAN_WORKERS = int(os.environ.get('FETCH_PLAN_WORKERS', '4'))
 print(f"[INIT] ffmpeg={'found' if HAS_FFMPEG else 'MISSING'}, yt-dlp format='{YTDLP_FORMAT}'")
 
 def _strip_ansi(text):
@@ -58,6 +65,96 @@ def _strip_ansi(text):
     return re.sub(r'\x1b\[[0-9;]*m', '', text)
 
 
+# Canonical (platform, media_id) parsed from a share URL — the raw media store
+# key, known before any network request. Query strings / share params vary per
+# share; the media id does not.
+_MEDIA_URL_PATTERNS = [
+    ('tiktok',    re.compile(r'tiktok\.com/@[^/]+/video/(\d+)')),
+    ('instagram', re.compile(r'instagram\.com/(?:[^/]+/)?(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')),
+    ('youtube',   re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})')),
+    ('twitter',   re.compile(r'(?:twitter\.com|x\.com)/[^/]+/status/(\d+)')),
+]
+
+
+def _canonical_media_key(url):
+    """Return (platform, media_id) for a supported share URL, else None."""
+    for platform, pattern in _MEDIA_URL_PATTERNS:
+        m = pattern.search(url or '')
+        if m:
+            return platform, m.group(1)
+    return None
+
+
+def _estimate_download_bytes(info):
+    """Bytes yt-dlp will fetch for the selected rendition (video + audio parts).
+    Uses exact/approx filesize, else bitrate × duration. None when unknown."""
+    duration = info.get('duration') or 0
+    total = 0
+    for fmt in info.get('requested_formats') or [info]:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size and fmt.get('tbr') and duration:
+            size = fmt['tbr'] * 1000 / 8 * duration
+        total += size or 0
+    return int(total) or None
+
+
+def _source_ceiling_error(limits, duration, size_bytes):
+    """The user-facing rejection when a source exceeds the tier's fetch
+    ceilings (max_source_seconds / max_source_mb), else None."""
+    max_secs = limits.get('max_source_seconds', -1)
+    max_mb = limits.get('max_source_mb', -1)
+    if max_secs != -1 and duration and duration > max_secs:
+        return (f"This video is {int(duration // 60)}m{int(duration % 60):02d}s — your plan "
+                f"fetches clips up to {max_secs // 60} minutes.")
+    if max_mb != -1 and size_bytes and size_bytes > max_mb * 1024 * 1024:
+        return (f"This video is about {size_bytes / (1024 * 1024):.0f}MB — your plan "
+                f"fetches files up to {max_mb}MB.")
+    return None
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _store_raw_media(path, media_key, title=None, source_url=None, duration=None):
+    """Move a fresh download into the raw media store and register it.
+
+    Stored as RAW_DIR/{platform}_{media_id}.mp4. If identical bytes are already
+    stored under another media id, the new copy is dropped and the existing
+    file is shared. Returns the path callers should use (the input path if the
+    store could not take it)."""
+    if not media_key or not media_key[0] or not media_key[1]:
+        return path
+    platform, media_id = media_key
+    safe_id = re.sub(r'[^A-Za-z0-9_-]', '_', str(media_id))[:64]
+    current = path
+    try:
+        content_hash = _file_sha256(current)
+        twin = find_raw_media_by_hash(content_hash)
+        if (twin and os.path.isfile(twin['file_path'])
+                and os.path.realpath(twin['file_path']) != os.path.realpath(current)):
+            os.remove(current)
+            current = twin['file_path']
+            print(f"[RAW STORE] {platform}:{media_id} identical to {twin['platform']}:{twin['media_id']} — sharing bytes")
+        else:
+            store_path = os.path.join(RAW_DIR, f'{platform}_{safe_id}.mp4')
+            if os.path.realpath(current) != os.path.realpath(store_path):
+                os.replace(current, store_path)
+                current = store_path
+        current = os.path.realpath(current)
+        register_raw_media(platform, str(media_id), content_hash, current,
+                           os.path.getsize(current), title=title, source_url=source_url,
+                           duration=duration)
+        print(f"[RAW STORE] Registered {platform}:{media_id} -> {os.path.basename(current)}")
+    except Exception as e:
+        print(f"[RAW STORE] Could not register {platform}:{media_id} (file kept unshared): {e}")
+    return current
+
+
 def ensure_video_stream(path):
     import subprocess, json, os
 
@@ -76,7 +173,16 @@ def ensure_video_stream(path):
         return False
 
 # Import video processing utilities
-from .video_processor import VideoProcessor, normalize_video
+from .video_processor import (VideoProcessor, normalize_video, RenderCancelled, _edit_trim, _probe_source,
+                              branded_output_path, ENCODER_PROFILE)
+from . import admission
+from . import ydl_pool
+from . import render_plans
+from . import render_matrix
+from . import render_cache
+from . import metrics
+from . import tracing
+from .logger import get_logger
 from .brand_loader import get_available_brands
 
 # Import configuration
@@ -87,24 +193,31 @@ from .config import (
     get_payment_link, get_badge_info, get_next_visible_tier,
     get_tier_features, TIER_FEATURES,
     ADMIN_EMAILS, SPECIAL_STATUSES, VISIBLE_TIERS,
-    calculate_output_contract,
+    calculate_output_contract, estimate_source_cost,
 )
 from .database import (
     log_event, get_daily_usage, increment_branding_jobs, increment_downloads,
     get_credit_balance, spend_credits, set_subscription_credits,
     add_earned_credits, add_purchased_credits,
     log_render_event, get_render_stats, get_user_render_stats,
+    save_render_spans, get_render_trace, get_recent_render_traces, get_render_stage_stats,
     get_user_special_status, set_user_special_status,
     create_waitlist_entry, get_waitlist_entry_by_email,
     get_pending_waitlist_entries, get_all_waitlist_entries, get_waitlist_counts,
     approve_waitlist_entry, claim_waitlist_entry, set_waitlist_entry_status,
-    user_can_download_filename, save_branded_output, get_connection,
+    user_can_download_filename, save_branded_output, delete_branded_outputs, get_connection,
+    is_branded_output_referenced,
     init_invite_codes, create_invite_code, get_invite_code, redeem_invite_code,
     create_referral_code, get_referral_code, credit_referral_reward,
     get_all_invite_codes, get_all_referral_codes,
     init_source_edits, get_source_edit, upsert_source_edit, SOURCE_EDIT_DEFAULTS,
+    get_raw_media, find_raw_media_by_hash, register_raw_media, touch_raw_media,
 )
 
+# Structured loggers for the hot paths (see logger.py for LOG_LEVEL / LOG_LEVELS)
+fetch_log = get_logger('fetch')
+render_log = get_logger('render')
+
 
 # Authentication functions
 
@@ -1419,16 +1532,16 @@ def debug_health():
         'db_integrity': integrity,
     })
 
-# Global conversion lock - only one FFmpeg process at a time (Render free tier 512MB RAM)
-conversion_lock = threading.Lock()
-conversion_in_progress = {'active': False, 'start_time': None}
+# FFmpeg concurrency is governed by memory, not a global lock: every FFmpeg
+# child (normalize, render, watermark conversion) is admitted by admission.py
+# against MEMORY_BUDGET_MB (Render free tier 512MB RAM) and queues when full.
 
 # Job status dictionary for async watermark conversions
 watermark_jobs = {}
 
 # Job status dictionary for async brand render jobs (Phase 18)
 # Keyed by job_id (uuid). Each entry:
-#   status:       'queued'|'processing'|'completed'|'failed'
+#   status:       'queued'|'processing'|'completed'|'failed'|'cancelled'
 #   user_id:      int   — ownership check on poll
 #   brand_name:   str   — label for the frontend pill
 #   created_at:   float
@@ -1436,6 +1549,7 @@ watermark_jobs = {}
 #   completed_at: float|None
 #   outputs:      list|None — same shape as old synchronous response['outputs']
 #   error:        str|None
+#   cancel_event: threading.Event — set by the cancel endpoint; kills in-flight FFmpeg
 brand_render_jobs = {}
 
 # ============================================================================
@@ -2271,6 +2385,76 @@ def health_check():
     return jsonify(info), status_code
 
 
+# ── Prometheus metrics ──────────────────────────────────────────────────────
+# Counters/histograms are recorded where the work happens (see metrics.py);
+# the collectors below read state that already lives elsewhere at scrape time.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+
+@metrics.register_collector
+def _collect_render_jobs():
+    counts = {}
+    for job in list(brand_render_jobs.values()):
+        status = job.get('status', 'unknown')
+        counts[status] = counts.get(status, 0) + 1
+    return [('brandr_render_jobs_in_memory', 'gauge',
+             'Brand render jobs held in memory, by status.',
+             [({'status': s}, n) for s, n in sorted(counts.items())])]
+
+
+@metrics.register_collector
+def _collect_admission():
+    snap = admission.snapshot()
+    return [
+        ('brandr_admission_budget_mb', 'gauge', 'FFmpeg memory budget (MB).',
+         [({}, snap['budget_mb'])]),
+        ('brandr_admission_in_use_mb', 'gauge', 'FFmpeg memory currently admitted (MB).',
+         [({}, snap['in_use_mb'])]),
+        ('brandr_ffmpeg_running', 'gauge', 'FFmpeg children currently admitted.',
+         [({}, snap['running'])]),
+        ('brandr_ffmpeg_waiting', 'gauge', 'FFmpeg children queued for admission.',
+         [({}, snap['waiting'])]),
+    ]
+
+
+@metrics.register_collector
+def _collect_cookie_pool():
+    from . import cookie_pool
+    cookies = cookie_pool.health_snapshot()
+    return [
+        ('brandr_cookie_score', 'gauge', 'Ranking score per Instagram cookie (higher is better).',
+         [({'cookie': c['name']}, c['score']) for c in cookies]),
+        ('brandr_cookie_success_rate', 'gauge', 'Decayed success rate per Instagram cookie.',
+         [({'cookie': c['name']}, c['success_rate']) for c in cookies
+          if c['success_rate'] is not None]),
+        ('brandr_cookie_cooling_down', 'gauge', '1 while a cookie is in cooldown.',
+         [({'cookie': c['name']}, int(c['cooling_down'])) for c in cookies]),
+        ('brandr_cookie_breaker_open', 'gauge', '1 while the pool-wide circuit breaker is open.',
+         [({}, int(cookie_pool.breaker_open()))]),
+    ]
+
+
+@metrics.register_collector
+def _collect_disk():
+    from .config import STORAGE_ROOT
+    usage = shutil.disk_usage(STORAGE_ROOT)
+    return [('brandr_storage_bytes', 'gauge', 'Disk usage of the storage volume.',
+             [({'kind': 'total'}, usage.total), ({'kind': 'used'}, usage.used),
+              ({'kind': 'free'}, usage.free)])]
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (text exposition format 0.0.4).
+    Set METRICS_TOKEN to require ``Authorization: Bearer <token>``."""
+    if METRICS_TOKEN:
+        import hmac
+        auth = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth, f'Bearer {METRICS_TOKEN}'):
+            return Response('unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/api/upgrade-link/<tier_name>')
 @login_required
 def upgrade_link(tier_name):
@@ -2405,12 +2589,36 @@ def admin_render_stats():
         cost = 20.0
 
     stats = get_render_stats(days=days, cost_per_month_gbp=cost)
-    payload = {'success': True, 'stats': stats}
+    payload = {'success': True, 'stats': stats, 'admission': admission.snapshot(),
+               'ydl_pool': ydl_pool.snapshot(), 'render_plans': render_plans.snapshot(),
+               'render_cache': render_cache.snapshot(),
+               'stages': get_render_stage_stats(days=days)}
     if request.args.get('users'):
         payload['heaviest_users'] = get_user_render_stats(days=days)
     return jsonify(payload)
 
 
+@app.route('/api/admin/render-traces', methods=['GET'])
+@admin_required
+def admin_render_traces():
+    """Recent traced render jobs (newest first) for the admin waterfall picker."""
+    try:
+        limit = max(1, min(200, int(request.args.get('limit', 25))))
+    except (TypeError, ValueError):
+        limit = 25
+    return jsonify({'success': True, 'traces': get_recent_render_traces(limit=limit)})
+
+
+@app.route('/api/admin/render-trace/<job_id>', methods=['GET'])
+@admin_required
+def admin_render_trace(job_id):
+    """Stage spans of one render job (see tracing.py), in start order."""
+    spans = get_render_trace(job_id)
+    if not spans:
+        return jsonify({'success': False, 'error': 'No trace recorded for this job'}), 404
+    return jsonify({'success': True, 'job_id': job_id, 'spans': spans})
+
+
 # ── Source reframe/crop edits (Studio content edit, per source+format) ──────────
 SOURCE_EDIT_FORMATS = {'vertical_9_16', 'square_1_1'}
 SOURCE_EDIT_CROP_MODES = {'fit', 'fill'}
@@ -2424,6 +2632,52 @@ def _clamp(value, lo, hi, default):
         return default
 
 
+# Shortest kept range a trim may leave (seconds)
+SOURCE_EDIT_MIN_TRIM = 0.5
+
+
+def _trim_range(trim_start, trim_end, duration=None):
+    """Validated (trim_start, trim_end) in source seconds, None meaning unbounded
+    (a start of 0 is unbounded too). With the source duration, the start must
+    also leave a kept range before the end of the source.
+    Raises ValueError for negative, non-numeric or too-short ranges."""
+    start = float(trim_start) if trim_start not in (None, '') else None
+    end = float(trim_end) if trim_end not in (None, '') else None
+    if any(v is not None and not math.isfinite(v) for v in (start, end)):
+        raise ValueError('trim must be a finite number of seconds')
+    if start is not None and start < 0:
+        raise ValueError('trim_start must not be negative')
+    if start == 0:
+        start = None
+    if end is not None and end <= 0:
+        raise ValueError('trim_end must be positive')
+    if end is not None and end - (start or 0.0) < SOURCE_EDIT_MIN_TRIM:
+        raise ValueError(f'trim must keep at least {SOURCE_EDIT_MIN_TRIM:g}s')
+    if start is not None and duration and duration - start < SOURCE_EDIT_MIN_TRIM:
+        raise ValueError(f'trim_start must be at least {SOURCE_EDIT_MIN_TRIM:g}s before the end '
+                         f'of the {duration:g}s source')
+    return start, end
+
+
+@lru_cache(maxsize=64)
+def _probed_duration(path, mtime_ns, size):
+    try:
+        return float(_probe_source(path).get('format', {}).get('duration') or 0) or None
+    except Exception as e:
+        print(f"[SOURCE-EDIT] Duration probe failed for {os.path.basename(path)}: {e}")
+        return None
+
+
+def _source_duration(path):
+    """Probed duration of a source file in seconds, or None. Cached per file
+    revision — trims are checked on every save, render and preview still."""
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return _probed_duration(path, st.st_mtime_ns, st.st_size)
+
+
 def _validate_source_edit_request(user_id, source_filename, output_format):
     """Shared validation for source-edit GET/POST.
     Returns (error_response, status_code) on failure, or (None, None) when OK."""
@@ -2439,10 +2693,13 @@ def _validate_source_edit_request(user_id, source_filename, output_format):
     return None, None
 
 
-def _resolve_render_source_edit(user_id, source_filename, output_format, payload_edit):
+def _resolve_render_source_edit(user_id, source_filename, output_format, payload_edit,
+                                source_path=None):
     """Return a clamped source-edit dict for render, or None.
-    Crop/reframe apply to vertical_9_16 only; flip_h applies to ALL formats, so
-    non-vertical returns a flip-only edit (or None when not flipped)."""
+    Crop/reframe apply to vertical_9_16 only; flip_h and trim apply to ALL
+    formats, so non-vertical returns a flip/trim-only edit (or None when
+    neither is set). With source_path, a trim starting past the end of the
+    source is dropped like any other invalid trim."""
     edit = payload_edit if isinstance(payload_edit, dict) else None
     if edit is None and source_filename:
         try:
@@ -2456,10 +2713,19 @@ def _resolve_render_source_edit(user_id, source_filename, output_format, payload
         edit = SOURCE_EDIT_DEFAULTS.copy()
 
     flip_h = 1 if edit.get('flip_h') else 0
+    try:
+        duration = _source_duration(source_path) if source_path and edit.get('trim_start') else None
+        trim_start, trim_end = _trim_range(edit.get('trim_start'), edit.get('trim_end'), duration)
+    except (TypeError, ValueError) as e:
+        print(f"[SOURCE-EDIT] Invalid trim ignored: {e}")
+        trim_start, trim_end = None, None
+    trim = {k: v for k, v in (('trim_start', trim_start), ('trim_end', trim_end)) if v is not None}
 
     if output_format != 'vertical_9_16':
-        # Non-vertical: no crop/reframe yet, but flip still applies.
-        return {'flip_h': flip_h} if flip_h else None
+        # Non-vertical: no crop/reframe yet, but flip and trim still apply.
+        if not flip_h and not trim:
+            return None
+        return dict({'flip_h': flip_h}, **trim)
 
     crop_mode = edit.get('crop_mode', SOURCE_EDIT_DEFAULTS.get('crop_mode', 'fit'))
     if crop_mode not in SOURCE_EDIT_CROP_MODES:
@@ -2473,6 +2739,7 @@ def _resolve_render_source_edit(user_id, source_filename, output_format, payload
         'crop_mode': crop_mode,
         'flip_h': flip_h,
     }
+    resolved.update(trim)
     print(f"[SOURCE-EDIT] Render edit resolved: {resolved}")
     return resolved
 
@@ -2495,6 +2762,8 @@ def _is_default_source_edit(edit):
         and edit.get('crop_mode', 'fill') == 'fill'
         # A flip is a real transform — never skip the pipeline when it's set.
         and not edit.get('flip_h')
+        and edit.get('trim_start') is None
+        and edit.get('trim_end') is None
     )
 
 
@@ -2517,7 +2786,8 @@ def get_source_edit_api():
 @app.route('/api/source-edits', methods=['POST'])
 @login_required
 def save_source_edit_api():
-    """Insert/update the reframe/crop for (current user, source, format)."""
+    """Insert/update the reframe/crop/trim for (current user, source, format).
+    trim_start / trim_end are source seconds; null or omitted = unbounded."""
     user_id = session['user_id']
     data = request.get_json(silent=True) or {}
     source_filename = (data.get('source_filename') or '').strip()
@@ -2537,15 +2807,25 @@ def save_source_edit_api():
     # zoom < 1 shrinks further; zoom > 1 crops. Floor of 0.25 keeps it usable.
     zoom = _clamp(data.get('zoom', 1.0), 0.25, 4.0, 1.0)
     flip_h = 1 if data.get('flip_h') else 0
+    try:
+        duration = None
+        if data.get('trim_start'):
+            source_path, _ = _find_preview_video(source_filename, user_id)
+            duration = _source_duration(source_path) if source_path else None
+        trim_start, trim_end = _trim_range(data.get('trim_start'), data.get('trim_end'), duration)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'error': f'Invalid trim: {e}'}), 400
 
     if not upsert_source_edit(user_id, source_filename, output_format,
-                              crop_x, crop_y, zoom, crop_mode, flip_h):
+                              crop_x, crop_y, zoom, crop_mode, flip_h,
+                              trim_start, trim_end):
         return jsonify({'success': False, 'error': 'Could not save reframe'}), 500
 
     return jsonify({
         'success': True,
         'edit': {'crop_x': crop_x, 'crop_y': crop_y, 'zoom': zoom,
-                 'crop_mode': crop_mode, 'flip_h': flip_h}
+                 'crop_mode': crop_mode, 'flip_h': flip_h,
+                 'trim_start': trim_start, 'trim_end': trim_end}
     })
 
 
@@ -2596,31 +2876,118 @@ def downloader_dashboard():
 # API: VIDEO PROCESSING
 # ============================================================================
 
+def _output_format_dims(output_format):
+    """(width, height, aspect_ratio) of a normalized output format, or Nones."""
+    if output_format == 'vertical_9_16':
+        return 720, 1280, 0.5625
+    if output_format == 'square_1_1':
+        return 720, 720, 1.0
+    return None, None, None
+
+
+def _remove_unreferenced_outputs(paths):
+    """Delete discarded output files, keeping any another ownership row still
+    points at (render-cache hits share files between rows)."""
+    for op in paths:
+        try:
+            if is_branded_output_referenced(op):
+                continue
+            if os.path.exists(op):
+                os.remove(op)
+        except OSError as _e:
+            render_log.info("[RENDER-ASYNC] Could not remove output %s: %s", op, _e)
+        except Exception as _e:
+            render_log.warning("[RENDER-ASYNC] Output reference check failed for %s: %s", op, _e)
+
+
 def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
                      data, user_id, output_format, sec_logo_resolved_path, video_id,
-                     source_edit=None):
+                     source_edit=None, output_formats=None, source_edits=None):
     """Background thread: run FFmpeg render for one or more brands.
     Updates brand_render_jobs[job_id] in place. No Flask request context.
+    With several output_formats each brand is rendered in all of them from one
+    decode of the raw source (VideoProcessor.process_brand_formats) — no
+    separate normalize pass; source_edits maps format -> resolved edit.
     Phase 18 — called from process_branded_videos() after all validation passes.
     """
-    from .config import STORAGE_ROOT
     job = brand_render_jobs[job_id]
+    cancel_event = job.get('cancel_event') or threading.Event()
     job['status']     = 'processing'
     job['started_at'] = time.time()
 
+    # Stage spans for this job (tracing.py); video_processor and DB writes on
+    # this thread attach to it while it is active.
+    trace = job.get('trace') or tracing.Trace(job_id)
+    trace.job_id = job_id
+    tracing.activate(trace)
+    trace.record('queued', job['created_at'], job['started_at'])
+
+    # Tracked outside the try so a cancel can release everything produced so far
+    normalized_video_path = None
+    output_paths = []
+    _bo_row_ids = []
+
     try:
-        # Normalize video (fixes corrupted timestamps, enforces output dimensions)
-        print(f"[RENDER-ASYNC] {job_id[:8]} normalizing video: {video_filepath}")
-        normalized_video_path = normalize_video(
-            video_filepath,
-            output_format=output_format,
-            source_edit=source_edit,
-            job_id=job_id,
-        )
-        print(f"[RENDER-ASYNC] {job_id[:8]} using normalized: {normalized_video_path}")
+        if cancel_event.is_set():
+            raise RenderCancelled('Render cancelled before start')
+
+        multi_formats = output_formats if output_formats and len(output_formats) > 1 else None
+
+        # Render-output cache keys (render_cache.py), single-format renders only
+        cache_keys = {}
+        if not multi_formats:
+            try:
+                _src_hash = render_cache.source_hash(video_filepath)
+                for db_brand in resolved_brands:
+                    _cfg = render_plans.brand_render_config(db_brand, output_format, data, sec_logo_resolved_path)
+                    cache_keys[db_brand.get('id')] = render_cache.render_key(
+                        _src_hash, render_plans.render_plan_hash(_cfg, output_format, source_edit),
+                        ENCODER_PROFILE)
+            except Exception as _ce:
+                render_log.warning("[RENDER-CACHE] %s keying skipped: %s", job_id[:8], _ce)
+                cache_keys = {}
+
+        processor   = None
+        render_trim = None
+
+        def _get_processor():
+            # Normalization is deferred to the first brand that actually has to
+            # encode, so a job served entirely from the render cache never runs it
+            nonlocal normalized_video_path, processor, render_trim
+            if processor is not None:
+                return processor
+            if multi_formats:
+                # Each format's normalize graph runs inside the single-decode render
+                normalized_video_path = video_filepath
+                render_log.info("[RENDER-ASYNC] %s multi-format %s: rendering from source",
+                                job_id[:8], multi_formats)
+            else:
+                # Normalize video (fixes corrupted timestamps, enforces output dimensions)
+                render_log.info("[RENDER-ASYNC] %s normalizing video: %s", job_id[:8], video_filepath)
+                _norm_t0 = time.time()
+                with trace.span('normalize', output_format=output_format, source_edit=bool(source_edit)):
+                    normalized_video_path = normalize_video(
+                        video_filepath,
+                        output_format=output_format,
+                        source_edit=source_edit,
+                        job_id=job_id,
+                        cancel_event=cancel_event,
+                    )
+                metrics.RENDER_STAGE_SECONDS.observe(time.time() - _norm_t0, stage='normalize')
+                render_log.info("[RENDER-ASYNC] %s using normalized: %s", job_id[:8], normalized_video_path)
+            processor = VideoProcessor(normalized_video_path, OUTPUT_DIR)
+            # normalize_video cuts the trim into its output; if it fell back to the
+            # original file the render has to apply it itself
+            render_trim = _edit_trim(source_edit) if normalized_video_path == video_filepath else None
+            return processor
+
+        def _render_brand(merged_config):
+            _processor = _get_processor()
+            return _processor.process_brand(merged_config, video_id=video_id,
+                                            output_format=output_format,
+                                            cancel_event=cancel_event,
+                                            trim=render_trim)
 
-        processor    = VideoProcessor(normalized_video_path, OUTPUT_DIR)
-        output_paths = []
         output_metadata = {}
         _bo_save_warnings = []
         total_brands = len(resolved_brands)
@@ -2628,121 +2995,92 @@ def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
         for i, db_brand in enumerate(resolved_brands, 1):
             brand_id   = db_brand.get('id')
             brand_name = db_brand.get('display_name') or db_brand.get('name')
-            print(f"[RENDER-ASYNC] {job_id[:8]} brand {i}/{total_brands}: #{brand_id} ({brand_name})")
-
-            # Merge overrides (identical logic to synchronous path)
-            merged_config = db_brand.copy()
-
-            # Patch 54: apply per-format position/scale overrides before any other merging
-            if merged_config.get('format_overrides') and output_format != 'vertical_9_16':
-                try:
-                    import json as _json
-                    _fov_all = _json.loads(merged_config['format_overrides'])
-                    _fov = _fov_all.get(output_format, {})
-                    for _fov_key in ('logo_x', 'logo_y', 'logo_scale', 'wm_x', 'wm_y', 'wm_scale'):
-                        if _fov_key in _fov:
-                            merged_config[_fov_key] = _fov[_fov_key]
-                    if _fov:
-                        print(f"[RENDER-ASYNC] {job_id[:8]} applied format override '{output_format}' for brand #{brand_id}")
-                except (ValueError, TypeError, KeyError):
-                    pass
-
-            # Canonical wm_* normalization
-            if merged_config.get('wm_mode') is None:
-                merged_config['wm_mode'] = merged_config.get('watermark_mode', 'positioned')
-            if merged_config.get('wm_mode') != 'positioned':
-                merged_config['wm_mode'] = 'positioned'
-            if merged_config.get('wm_scale') is None:
-                legacy_scale = merged_config.get('watermark_scale')
-                if legacy_scale is not None:
-                    merged_config['wm_scale'] = legacy_scale
-            if merged_config.get('wm_opacity') is None:
-                legacy_opacity = merged_config.get('watermark_opacity')
-                if legacy_opacity is not None:
-                    merged_config['wm_opacity'] = legacy_opacity
-
-            # Apply request overrides
-            _override_fields = [
-                ('watermark_scale',   'wm_scale'),
-                ('watermark_opacity', 'wm_opacity'),
-                ('logo_scale',        'logo_scale'),
-                ('logo_padding',      'logo_padding'),
-            ]
-            for req_key, cfg_key in _override_fields:
-                if req_key in data:
-                    merged_config[cfg_key] = data[req_key]
-            for _fld in ('logo_x', 'logo_y', 'logo_rotation', 'wm_x', 'wm_y'):
-                if _fld in data:
-                    merged_config[_fld] = float(data[_fld])
-            if 'text_enabled' in data:
-                merged_config['text_enabled'] = 1 if data['text_enabled'] else 0
-            for _fld in ('text_content', 'text_color', 'text_position'):
-                if _fld in data:
-                    merged_config[_fld] = str(data[_fld])
-            if 'text_size' in data:
-                merged_config['text_size'] = int(data['text_size'])
-            if 'text_bg_enabled' in data:
-                merged_config['text_bg_enabled'] = 1 if data['text_bg_enabled'] else 0
-            if 'text_bg_opacity' in data:
-                merged_config['text_bg_opacity'] = float(data['text_bg_opacity'])
-
-            # Secondary logo (already resolved and tier-gated before thread spawn)
-            if sec_logo_resolved_path:
-                merged_config['secondary_logo_enabled']       = True
-                merged_config['secondary_logo_resolved_path'] = sec_logo_resolved_path
-                merged_config['secondary_logo_scale']    = max(0.03, min(0.5, float(data.get('secondary_logo_scale', 0.12))))
-                merged_config['secondary_logo_opacity']  = max(0.1, min(1.0, float(data.get('secondary_logo_opacity', 0.9))))
-                merged_config['secondary_logo_x']        = max(0.0, min(1.0, float(data.get('secondary_logo_x', 0.15))))
-                merged_config['secondary_logo_y']        = max(0.0, min(1.0, float(data.get('secondary_logo_y', 0.15))))
-                merged_config['secondary_logo_rotation'] = float(data.get('secondary_logo_rotation', 0)) % 360
+            if cancel_event.is_set():
+                raise RenderCancelled(f'Render cancelled before brand {i}/{total_brands}')
+            render_log.info("[RENDER-ASYNC] %s brand %s/%s: #%s (%s)",
+                            job_id[:8], i, total_brands, brand_id, brand_name)
 
             try:
                 import time as _rt
                 _t0 = _rt.time()
-                output_path = processor.process_brand(merged_config, video_id=video_id, output_format=output_format)
-                _render_secs = _rt.time() - _t0
-                print(f"[RENDER-ASYNC] {job_id[:8]} brand '{brand_name}' done in {_render_secs:.1f}s")
-                output_paths.append(output_path)
-                output_metadata[output_path] = {'brand_id': brand_id, 'brand_name': brand_name}
-
-                # Per-render telemetry (best-effort; never affects the render).
-                # One row per brand render = the real compute unit — powers
-                # measured unit economics (renders/user, cost/user, capacity).
-                try:
-                    _out_kb = (os.path.getsize(output_path) // 1024) if os.path.exists(output_path) else None
-                    log_render_event(
-                        user_id=user_id, job_id=job_id, brand_id=brand_id,
-                        brand_name=brand_name, output_format=output_format,
-                        render_seconds=_render_secs, output_kb=_out_kb,
-                        brand_count=total_brands,
-                    )
-                except Exception as _te:
-                    print(f"[RENDER-EVENT] telemetry skipped: {_te}")
-
-                # Best-effort: persist branded output record
-                try:
-                    if output_format == 'vertical_9_16':
-                        _bw, _bh, _bar = 720, 1280, 0.5625
-                    elif output_format == 'square_1_1':
-                        _bw, _bh, _bar = 720, 720, 1.0
+                with trace.span('brand', brand_id=brand_id, index=i):
+                    _cache_outcome = None
+                    if multi_formats:
+                        # Compiled base config per format: each branch gets its own
+                        # format_overrides geometry
+                        rendered = _get_processor().process_brand_formats(
+                            {fmt: render_plans.brand_render_config(db_brand, fmt, data, sec_logo_resolved_path)
+                             for fmt in multi_formats},
+                            source_edits, video_id=video_id, cancel_event=cancel_event)
                     else:
-                        _bw, _bh, _bar = None, None, None
-                    save_branded_output(
-                        user_id=user_id,
-                        source_filename=os.path.basename(video_filepath),
-                        output_filename=os.path.basename(output_path),
-                        file_path=output_path,
-                        brand_id=brand_id,
-                        brand_name=brand_name,
-                        output_format=output_format,
-                        width=_bw, height=_bh, aspect_ratio=_bar,
-                    )
-                except Exception as _bo_e:
-                    _bo_save_warnings.append(str(_bo_e))
-                    print(f"[RENDER-ASYNC] branded_output save failed: {_bo_e}")
-
+                        # Compiled base config (cached per brand revision + format) with
+                        # this request's overrides applied as a delta
+                        merged_config = render_plans.brand_render_config(
+                            db_brand, output_format, data, sec_logo_resolved_path)
+                        if cache_keys.get(brand_id):
+                            _output, _cache_outcome = render_cache.get_or_render(
+                                cache_keys[brand_id],
+                                branded_output_path(OUTPUT_DIR, merged_config, video_id, output_format),
+                                lambda: _render_brand(merged_config), cancel_event)
+                        else:
+                            _output = _render_brand(merged_config)
+                        rendered = {output_format: _output}
+                _render_secs = _rt.time() - _t0
+                _reused = _cache_outcome in ('hit', 'joined')
+                if not _reused:
+                    metrics.RENDER_STAGE_SECONDS.observe(_render_secs, stage='brand')
+                if _reused:
+                    render_log.info("[RENDER-ASYNC] %s brand '%s' done in %.1fs (render cache %s)",
+                                    job_id[:8], brand_name, _render_secs, _cache_outcome)
+                else:
+                    render_log.info("[RENDER-ASYNC] %s brand '%s' done in %.1fs",
+                                    job_id[:8], brand_name, _render_secs)
+
+                for _fmt_key, output_path in rendered.items():
+                    output_paths.append(output_path)
+                    output_metadata[output_path] = {'brand_id': brand_id, 'brand_name': brand_name,
+                                                    'output_format': _fmt_key}
+
+                    # Per-render telemetry (best-effort; never affects the render).
+                    # One row per brand render = the real compute unit — powers
+                    # measured unit economics (renders/user, cost/user, capacity).
+                    # A multi-format pass splits its time evenly across outputs;
+                    # cache hits cost no compute and are not recorded.
+                    try:
+                        if not _reused:
+                            _out_kb = (os.path.getsize(output_path) // 1024) if os.path.exists(output_path) else None
+                            log_render_event(
+                                user_id=user_id, job_id=job_id, brand_id=brand_id,
+                                brand_name=brand_name, output_format=_fmt_key,
+                                render_seconds=_render_secs / len(rendered), output_kb=_out_kb,
+                                brand_count=total_brands,
+                            )
+                    except Exception as _te:
+                        render_log.warning("[RENDER-EVENT] telemetry skipped: %s", _te)
+
+                    # Best-effort: persist branded output record
+                    try:
+                        _bw, _bh, _bar = _output_format_dims(_fmt_key)
+                        _bo_row_ids.append(save_branded_output(
+                            user_id=user_id,
+                            source_filename=os.path.basename(video_filepath),
+                            output_filename=os.path.basename(output_path),
+                            file_path=output_path,
+                            brand_id=brand_id,
+                            brand_name=brand_name,
+                            output_format=_fmt_key,
+                            width=_bw, height=_bh, aspect_ratio=_bar,
+                            render_key=None if multi_formats else cache_keys.get(brand_id),
+                        ))
+                    except Exception as _bo_e:
+                        _bo_save_warnings.append(str(_bo_e))
+                        render_log.warning("[RENDER-ASYNC] branded_output save failed: %s", _bo_e)
+
+            except RenderCancelled:
+                raise
             except Exception as render_err:
-                print(f"[RENDER-ASYNC] {job_id[:8]} brand '{brand_name}' FAILED: {render_err}")
+                render_log.warning("[RENDER-ASYNC] %s brand '%s' FAILED: %s",
+                                   job_id[:8], brand_name, render_err)
                 import traceback; traceback.print_exc()
                 job['status'] = 'failed'
                 job['error']  = f'{brand_name}: {str(render_err)}'
@@ -2750,23 +3088,18 @@ def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
                 return
 
         # Build download_urls (same shape as synchronous path)
-        if output_format == 'vertical_9_16':
-            _fmt = {'width': 720, 'height': 1280, 'aspect_ratio': 0.5625}
-        elif output_format == 'square_1_1':
-            _fmt = {'width': 720, 'height': 720, 'aspect_ratio': 1.0}
-        else:
-            _fmt = {}
-
         download_urls = []
         for op in output_paths:
             fname = os.path.basename(op)
             _m    = output_metadata.get(op, {})
+            _op_format = _m.get('output_format', output_format)
+            _w, _h, _ar = _output_format_dims(_op_format)
             download_urls.append({
                 'brand':         _m.get('brand_name', 'unknown'),
                 'filename':      fname,
                 'download_url':  f'/api/videos/download/{fname}',
-                'output_format': output_format,
-                **_fmt
+                'output_format': _op_format,
+                **({'width': _w, 'height': _h, 'aspect_ratio': _ar} if _w else {})
             })
 
         # Clean up downloaded source (not local files)
@@ -2774,7 +3107,7 @@ def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
             try:
                 os.remove(video_filepath)
             except Exception as _e:
-                print(f"[RENDER-ASYNC] Could not remove source: {_e}")
+                render_log.info("[RENDER-ASYNC] Could not remove source: %s", _e)
 
         # Charge 1 credit for the successful render (charge-on-success) and keep
         # the daily_usage counter for analytics. Both best-effort — a completed
@@ -2782,7 +3115,7 @@ def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
         try:
             increment_branding_jobs(user_id)
         except Exception as _e:
-            print(f"[RENDER-ASYNC] Usage increment failed: {_e}")
+            render_log.warning("[RENDER-ASYNC] Usage increment failed: %s", _e)
         # spend_credits logs balance_before/spent/after (and 'insufficient')
         # itself, so no extra logging needed here.
         try:
@@ -2791,7 +3124,7 @@ def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
             ).get('credits_per_day', 0)
             spend_credits(user_id, 1, _allowance)
         except Exception as _e:
-            print(f"[CREDITS] credit spend failed for user={user_id}: {_e}")
+            render_log.warning("[CREDITS] credit spend failed for user=%s: %s", user_id, _e)
 
         try:
             log_event('info', None, f'Async branding job {job_id[:8]} completed: {len(output_paths)} output(s) user={user_id}')
@@ -2803,24 +3136,370 @@ def _do_brand_render(job_id, video_filepath, url_was_remote, resolved_brands,
         job['completed_at'] = time.time()
         if _bo_save_warnings:
             job['warnings'] = _bo_save_warnings
-        print(f"[RENDER-ASYNC] {job_id[:8]} ALL DONE — {len(download_urls)} output(s)")
+        render_log.info("[RENDER-ASYNC] %s ALL DONE — %s output(s)", job_id[:8], len(download_urls))
+
+    except RenderCancelled as e:
+        # Cancelled: FFmpeg is already dead. Release every byte this job produced
+        # and never charge a credit — the user got nothing.
+        render_log.info("[RENDER-ASYNC] %s CANCELLED: %s — discarding %s output(s)",
+                        job_id[:8], e, len(output_paths))
+        try:
+            delete_branded_outputs(_bo_row_ids)
+        except Exception as _e:
+            render_log.warning("[RENDER-ASYNC] branded_output cleanup failed: %s", _e)
+        _remove_unreferenced_outputs(output_paths)
+        if normalized_video_path and normalized_video_path != video_filepath:
+            try:
+                if os.path.exists(normalized_video_path):
+                    os.remove(normalized_video_path)
+            except OSError as _e:
+                render_log.info("[RENDER-ASYNC] Could not remove normalized temp: %s", _e)
+        if url_was_remote:
+            try:
+                if os.path.exists(video_filepath):
+                    os.remove(video_filepath)
+            except OSError as _e:
+                render_log.info("[RENDER-ASYNC] Could not remove source: %s", _e)
+        job['status']       = 'cancelled'
+        job['message']      = 'Render cancelled'
+        job['completed_at'] = time.time()
+        try:
+            log_event('info', None, f'Async branding job {job_id[:8]} cancelled by user={user_id}')
+        except Exception:
+            pass
 
     except Exception as e:
         import traceback; traceback.print_exc()
         job['status']       = 'failed'
         job['error']        = str(e)
         job['completed_at'] = time.time()
-        print(f"[RENDER-ASYNC] {job_id[:8]} EXCEPTION: {e}")
+        render_log.info("[RENDER-ASYNC] %s EXCEPTION: %s", job_id[:8], e)
         try:
             log_event('error', None, f'Async branding job {job_id[:8]} exception: {str(e)}')
         except Exception:
             pass
+    finally:
+        metrics.RENDER_JOBS.inc(status=job.get('status', 'unknown'))
+        tracing.activate(None)
+        trace.finish(status=job.get('status'), brands=len(resolved_brands),
+                     output_format='+'.join(output_formats) if output_formats else output_format)
+        save_render_spans(job_id, user_id, trace.to_rows())
+        job.pop('trace', None)
+
+
+def _download_render_source(url_input):
+    """Fetch a remote render source into RAW_DIR with yt-dlp.
+    Returns {filename, filepath, size_mb, success} or {error, success: False}."""
+    try:
+        # Configure yt_dlp with platform-specific options
+        is_instagram = 'instagram.com' in url_input.lower()
+        
+        ydl_opts = {
+            'outtmpl': os.path.join(RAW_DIR, '%(id)s.%(ext)s'),
+            'merge_output_format': 'mp4',
+            'format': YTDLP_FORMAT,
+            'prefer_ffmpeg': HAS_FFMPEG,
+            'retries': 5,
+            'fragment_retries': 5,
+            'socket_timeout': 300,
+        }
+        if HAS_FFMPEG and FFMPEG_DIR:
+            ydl_opts['ffmpeg_location'] = FFMPEG_DIR
+        
+        # Apply Instagram-specific headers only for Instagram URLs
+        if is_instagram:
+            ydl_opts['http_headers'] = {
+                'User-Agent': 'Instagram 271.1.0.21.84 Android',
+                'X-IG-App-ID': '567067343352427',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+            }
+            _ig_proxy = os.environ.get('IG_PROXY', '').strip()
+            if _ig_proxy:
+                ydl_opts['proxy'] = _ig_proxy
+
+        # Apply TikTok impersonation for TikTok URLs
+        # Note: impersonation requires curl_cffi and specific target format
+        # Temporarily disabled until proper integration is tested
+        # if is_tiktok:
+        #     ydl_opts['impersonate'] = ('chrome', '110', 'windows')
+        
+        # Only add cookiefile if the file exists and is readable
+        from .config import COOKIE_FILE as cookie_file
+        try:
+            if os.path.exists(cookie_file) and os.path.isfile(cookie_file):
+                # Test if file is readable and has valid content
+                with open(cookie_file, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+                    # Check if file has actual cookie data (not just comments)
+                    # File is valid if it has content and either:
+                    # 1. Doesn't start with the header (unlikely but possible), OR
+                    # 2. Has more than one line (indicating actual cookie data beyond header)
+                    # Additional check: look for actual cookie data patterns
+                    has_cookie_data = False
+                    if content:
+                        lines = content.split('\n')
+                        # Check if we have more than just header lines
+                        # Look for lines that contain actual cookie data (domain, flag, path, etc.)
+                        for line in lines:
+                            line = line.strip()
+                            # Skip empty lines and comments
+                            if line and not line.startswith('#'):
+                                # Check if this looks like a cookie line (has tab-separated values)
+                                if '\t' in line:
+                                    has_cookie_data = True
+                                    break
+                
+                if has_cookie_data:
+                    ydl_opts['cookiefile'] = cookie_file
+                    print(f"[PROCESS BRANDS] Using cookie file: {cookie_file}")
+                else:
+                    print(f"[PROCESS BRANDS] Cookie file exists but appears to be empty or only contains header: {cookie_file}")
+            else:
+                print(f"[PROCESS BRANDS] Cookie file not found or not readable: {cookie_file}")
+        except Exception as cookie_error:
+            print(f"[PROCESS BRANDS] Warning: Could not use cookie file {cookie_file}: {cookie_error}")
+            # Continue without cookies
+        
+        # Warm instance from the fetch route's pool; a failed checkout is
+        # discarded by the pool rather than reused
+        try:
+            with ydl_pool.checkout('instagram' if is_instagram else 'other', ydl_opts) as ydl:
+                print(f"[PROCESS BRANDS] Downloading: {url_input[:50]}...")
+                info = ydl.extract_info(url_input, download=True)
+                filename = ydl.prepare_filename(info)
+        except Exception as download_error:
+            print(f"[PROCESS BRANDS ERROR] Download failed for {url_input}: {str(download_error)}")
+            import traceback
+            traceback.print_exc()
+            return {
+                'error': _strip_ansi(str(download_error)),
+                'success': False
+            }
+        
+        # Ensure .mp4 extension
+        if not filename.endswith('.mp4'):
+            base, _ = os.path.splitext(filename)
+            filename = base + '.mp4'
+        
+        name = os.path.basename(filename)
+        file_exists = os.path.exists(filename)
+        file_size_mb = os.path.getsize(filename) / (1024 * 1024) if file_exists else 0
+        
+        if not file_exists or file_size_mb == 0:
+            print(f"[PROCESS BRANDS WARNING] File may not have downloaded properly: {filename} (exists: {file_exists}, size: {file_size_mb:.2f}MB)")
+            # Check if we have error information in the info dict
+            if info and 'error' in info:
+                print(f"[PROCESS BRANDS ERROR DETAIL] yt-dlp error: {info['error']}")
+            # Also check for other error fields
+            elif info and 'errors' in info:
+                print(f"[PROCESS BRANDS ERROR DETAIL] yt-dlp errors: {info['errors']}")
+        
+        print(f"[PROCESS BRANDS] Success: {name} ({file_size_mb:.2f}MB)")
+        return {
+            'filename': name,
+            'filepath': filename,
+            'size_mb': round(file_size_mb, 2),
+            'success': file_exists and file_size_mb > 0
+        }
+    except Exception as e:
+        print(f"[PROCESS BRANDS ERROR] {url_input}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        # Try to get more detailed error information
+        error_details = str(e)
+        if hasattr(e, 'msg'):
+            error_details += f"; msg: {e.msg}"
+        if hasattr(e, 'reason'):
+            error_details += f"; reason: {e.reason}"
+        return {
+            'error': error_details,
+            'success': False
+        }
+
+
+def _resolve_local_render_source(user_id, requested_filename):
+    """Owned source file in RAW_DIR (or legacy OUTPUT_DIR) for a render.
+    Returns (real_path, None) or (None, (error_message, http_status))."""
+    if os.path.basename(requested_filename) != requested_filename:
+        return None, ('Invalid source filename', 400)
+
+    if not user_can_download_filename(user_id, requested_filename):
+        print(f"[PROCESS BRANDS] Ownership denied for source: user={user_id} file={requested_filename}")
+        return None, ('Source video not found or access denied', 404)
+
+    # First check if it's in RAW_DIR
+    video_filepath = os.path.join(RAW_DIR, requested_filename)
+
+    # If not in the new location, check the old OUTPUT_DIR
+    if not os.path.exists(video_filepath):
+        video_filepath = os.path.join(OUTPUT_DIR, requested_filename)
+
+    allowed_roots = (os.path.realpath(RAW_DIR), os.path.realpath(OUTPUT_DIR))
+    real_video_filepath = os.path.realpath(video_filepath)
+    try:
+        is_allowed_source = any(os.path.commonpath([real_video_filepath, root]) == root for root in allowed_roots)
+    except ValueError:
+        is_allowed_source = False
+    if not is_allowed_source:
+        return None, ('Invalid source path', 400)
+
+    # Check if file exists
+    if not os.path.exists(real_video_filepath):
+        return None, ('Source video file is no longer available', 404)
+    return real_video_filepath, None
+
+
+def _brand_validation_errors(resolved_brands):
+    """Readiness problems of brands about to be rendered, one dict per failing
+    brand ({brand_id, brand, error, fix, fix_url}); empty when all can render."""
+    from .config import STORAGE_ROOT
+    # Validate brand readiness with HARD FAIL (no defaults)
+    # resolved_brands are already fetched from DB with ownership verified
+    validation_errors = []
+    
+    print(f"[PROCESS BRANDS] Validating {len(resolved_brands)} brands")
+    
+    for db_brand in resolved_brands:
+        brand_id = db_brand.get('id')
+        brand_name = db_brand.get('display_name') or db_brand.get('name')
+        print(f"[PROCESS BRANDS] Validating Brand #{brand_id} ({brand_name})")
+        
+        # Check is_ready flag first
+        if not db_brand.get('is_ready'):
+            validation_errors.append({
+                'brand_id': brand_id,
+                'brand': brand_name,
+                'error': 'Brand is incomplete',
+                'fix': 'Upload logo or watermark in Manage Brands',
+                'fix_url': '/portal/brands'
+            })
+            continue
+        
+        # Watermark is OPTIONAL - only validate if present
+        wm_path = db_brand.get('watermark_path') or db_brand.get('watermark_vertical')
+        has_watermark = wm_path is not None and wm_path != ''
+        
+        if has_watermark:
+            # Validate watermark file exists on disk (only if path is set)
+            wm_full_path = os.path.join(STORAGE_ROOT, wm_path)
+            if not os.path.exists(wm_full_path):
+                validation_errors.append({
+                    'brand_id': brand_id,
+                    'brand': brand_name,
+                    'error': f'Watermark file not found on disk: {wm_path}',
+                    'fix': 'Re-upload watermark in Manage Brands',
+                    'fix_url': '/portal/brands'
+                })
+                continue
+            
+            # Validate watermark config values (only if watermark exists)
+            wm_scale = db_brand.get('wm_scale')
+            wm_opacity = db_brand.get('wm_opacity')
+            
+            if wm_scale is None or wm_scale <= 0:
+                validation_errors.append({
+                    'brand_id': brand_id,
+                    'brand': brand_name,
+                    'error': 'Invalid watermark scale (must be > 0)',
+                    'fix': 'Edit brand settings in Manage Brands',
+                    'fix_url': '/portal/brands'
+                })
+                continue
+            
+            if wm_opacity is None or wm_opacity < 0 or wm_opacity > 1:
+                validation_errors.append({
+                    'brand_id': brand_id,
+                    'brand': brand_name,
+                    'error': 'Invalid watermark opacity (must be 0-1)',
+                    'fix': 'Edit brand settings in Manage Brands',
+                    'fix_url': '/portal/brands'
+                })
+                continue
+        
+        # Logo validation
+        logo_path = db_brand.get('logo_path')
+        logo_scale = db_brand.get('logo_scale', 0)
+        
+        # Require at least one asset: logo OR watermark (not both required)
+        if not has_watermark and (logo_scale == 0 or not logo_path):
+            validation_errors.append({
+                'brand_id': brand_id,
+                'brand': brand_name,
+                'error': 'Brand must have at least a logo or watermark',
+                'fix': 'Upload logo or watermark in Manage Brands',
+                'fix_url': '/portal/brands'
+            })
+            continue
+        
+        # Validate logo if configured (non-zero scale) but path missing → fail
+        if logo_scale > 0 and not logo_path:
+            validation_errors.append({
+                'brand_id': brand_id,
+                'brand': brand_name,
+                'error': 'Logo overlay enabled but logo file missing',
+                'fix': 'Upload logo in Manage Brands or set logo scale to 0',
+                'fix_url': '/portal/brands'
+            })
+            continue
+        
+        # If logo path exists, validate file on disk
+        if logo_path:
+            logo_full_path = os.path.join(STORAGE_ROOT, logo_path)
+            if not os.path.exists(logo_full_path):
+                validation_errors.append({
+                    'brand_id': brand_id,
+                    'brand': brand_name,
+                    'error': f'Logo file not found on disk: {logo_path}',
+                    'fix': 'Re-upload logo in Manage Brands',
+                    'fix_url': '/portal/brands'
+                })
+                continue
+        
+        print(f"[PROCESS BRANDS] ✓ Brand #{brand_id} ({brand_name}) validation passed")
+    return validation_errors
+
+
+def _resolve_secondary_logo(data, tier, user_id):
+    """Full path of the secondary logo for dual-logo composition (Platinum+),
+    or None when not requested, not available for the tier, or missing."""
+    from .database import get_brand
+    from .config import STORAGE_ROOT
+    sec_logo_resolved_path = None
+    if data.get('secondary_logo_enabled'):
+        from .config import get_tier_features
+        tier_features = get_tier_features(tier)
+        if tier_features.get('dual_logo_composition_enabled'):
+            sec_brand_id = data.get('secondary_logo_brand_id')
+            if sec_brand_id:
+                try:
+                    sec_brand_id = int(sec_brand_id)
+                    sec_brand = get_brand(brand_id=sec_brand_id, user_id=user_id)
+                    if sec_brand and sec_brand.get('logo_path'):
+                        sec_logo_full = os.path.join(STORAGE_ROOT, sec_brand['logo_path'])
+                        if os.path.exists(sec_logo_full):
+                            sec_logo_resolved_path = sec_logo_full
+                            print(f"[PROCESS BRANDS] Secondary logo resolved: brand #{sec_brand_id} -> {sec_logo_full}")
+                        else:
+                            print(f"[PROCESS BRANDS] Secondary logo file not found on disk: {sec_logo_full}")
+                    else:
+                        print(f"[PROCESS BRANDS] Secondary brand #{sec_brand_id} not found or has no logo (user_id={user_id})")
+                except (ValueError, TypeError):
+                    print(f"[PROCESS BRANDS] Invalid secondary_logo_brand_id: {data.get('secondary_logo_brand_id')}")
+        else:
+            print(f"[PROCESS BRANDS] Dual-logo composition not available for tier: {tier}")
+    return sec_logo_resolved_path
 
 
 @app.route('/api/videos/process_brands', methods=['POST'])
 @login_required
 def process_branded_videos():
     """Process video with selected brand overlays (brand_id-first)"""
+    # Request-side stages; handed to the render thread via the job entry
+    trace = tracing.Trace()
     try:
         # --- Tier enforcement: daily branding jobs limit ---
         user_id = session.get('user_id')
@@ -2855,14 +3534,22 @@ def process_branded_videos():
         data = request.get_json(force=True) or {}
 
         SUPPORTED_OUTPUT_FORMATS = {'vertical_9_16', 'square_1_1'}
-        output_format = data.get('output_format', 'vertical_9_16')
-        if output_format not in SUPPORTED_OUTPUT_FORMATS:
-            return jsonify({
-                'success': False,
-                'error': 'OUTPUT_FORMAT_UNSUPPORTED',
-                'message': f'Output format "{output_format}" is not yet supported. Supported: Vertical 9:16, Square 1:1.',
-                'supported_formats': ['vertical_9_16', 'square_1_1']
-            }), 400
+        # output_formats (list) renders every format in one job from one decode;
+        # output_format (single) is the original contract
+        output_formats = data.get('output_formats')
+        if isinstance(output_formats, list) and output_formats:
+            output_formats = list(dict.fromkeys(str(f) for f in output_formats))
+        else:
+            output_formats = [data.get('output_format', 'vertical_9_16')]
+        output_format = output_formats[0]
+        for _requested_format in output_formats:
+            if _requested_format not in SUPPORTED_OUTPUT_FORMATS:
+                return jsonify({
+                    'success': False,
+                    'error': 'OUTPUT_FORMAT_UNSUPPORTED',
+                    'message': f'Output format "{_requested_format}" is not yet supported. Supported: Vertical 9:16, Square 1:1.',
+                    'supported_formats': ['vertical_9_16', 'square_1_1']
+                }), 400
 
         url = data.get('url')
         
@@ -2893,9 +3580,9 @@ def process_branded_videos():
             }), 403
 
         # --- Tier enforcement: max outputs per job (OUTPUT CONTRACT) ---
-        # Beta-v1: source_count=1, variant_count=1, so outputs = brands
+        # outputs = 1 source × brands × output formats
         source_count = 1  # Beta-v1: single source only
-        variant_count = 1  # Beta-v1: no multi-variant rendering yet
+        variant_count = len(output_formats)
         contract = calculate_output_contract(source_count, num_brands, variant_count, limits)
         
         if contract['blocking']:
@@ -2922,7 +3609,7 @@ def process_branded_videos():
         print(f"[PROCESS BRANDS] URL: {url}")
         print(f"[PROCESS BRANDS] Brand IDs: {brand_ids}")
         print(f"[PROCESS BRANDS] Brand Names (deprecated): {selected_brands}")
-        print(f"[PROCESS BRANDS] Output format: {output_format}")
+        print(f"[PROCESS BRANDS] Output format(s): {', '.join(output_formats)}")
         print(f"[PROCESS BRANDS] ========================================")
 
         if not url:
@@ -2932,137 +3619,11 @@ def process_branded_videos():
         # Check if url is actually a local file path (doesn't start with http)
         if url.startswith('http'):
             # 1. Download the video from URL
-            def download_video(url_input):
-                try:
-                    # Configure yt_dlp with platform-specific options
-                    is_instagram = 'instagram.com' in url_input.lower()
-                    is_tiktok = 'tiktok.com' in url_input.lower()
-                    
-                    ydl_opts = {
-                        'outtmpl': os.path.join(RAW_DIR, '%(id)s.%(ext)s'),
-                        'merge_output_format': 'mp4',
-                        'format': YTDLP_FORMAT,
-                        'prefer_ffmpeg': HAS_FFMPEG,
-                        'retries': 5,
-                        'fragment_retries': 5,
-                        'socket_timeout': 300,
-                    }
-                    if HAS_FFMPEG and FFMPEG_DIR:
-                        ydl_opts['ffmpeg_location'] = FFMPEG_DIR
-                    
-                    # Apply Instagram-specific headers only for Instagram URLs
-                    if is_instagram:
-                        ydl_opts['http_headers'] = {
-                            'User-Agent': 'Instagram 271.1.0.21.84 Android',
-                            'X-IG-App-ID': '567067343352427',
-                            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                            'Accept-Language': 'en-US,en;q=0.5',
-                            'Accept-Encoding': 'gzip, deflate',
-                            'Connection': 'keep-alive',
-                            'Upgrade-Insecure-Requests': '1',
-                        }
-                        _ig_proxy = os.environ.get('IG_PROXY', '').strip()
-                        if _ig_proxy:
-                            ydl_opts['proxy'] = _ig_proxy
-
-                    # Apply TikTok impersonation for TikTok URLs
-                    # Note: impersonation requires curl_cffi and specific target format
-                    # Temporarily disabled until proper integration is tested
-                    # if is_tiktok:
-                    #     ydl_opts['impersonate'] = ('chrome', '110', 'windows')
-                    
-                    # Only add cookiefile if the file exists and is readable
-                    from .config import COOKIE_FILE as cookie_file
-                    try:
-                        if os.path.exists(cookie_file) and os.path.isfile(cookie_file):
-                            # Test if file is readable and has valid content
-                            with open(cookie_file, 'r', encoding='utf-8') as f:
-                                content = f.read().strip()
-                                # Check if file has actual cookie data (not just comments)
-                                # File is valid if it has content and either:
-                                # 1. Doesn't start with the header (unlikely but possible), OR
-                                # 2. Has more than one line (indicating actual cookie data beyond header)
-                                # Additional check: look for actual cookie data patterns
-                                has_cookie_data = False
-                                if content:
-                                    lines = content.split('\n')
-                                    # Check if we have more than just header lines
-                                    # Look for lines that contain actual cookie data (domain, flag, path, etc.)
-                                    for line in lines:
-                                        line = line.strip()
-                                        # Skip empty lines and comments
-                                        if line and not line.startswith('#'):
-                                            # Check if this looks like a cookie line (has tab-separated values)
-                                            if '\t' in line:
-                                                has_cookie_data = True
-                                                break
-                            
-                            if has_cookie_data:
-                                ydl_opts['cookiefile'] = cookie_file
-                                print(f"[PROCESS BRANDS] Using cookie file: {cookie_file}")
-                            else:
-                                print(f"[PROCESS BRANDS] Cookie file exists but appears to be empty or only contains header: {cookie_file}")
-                        else:
-                            print(f"[PROCESS BRANDS] Cookie file not found or not readable: {cookie_file}")
-                    except Exception as cookie_error:
-                        print(f"[PROCESS BRANDS] Warning: Could not use cookie file {cookie_file}: {cookie_error}")
-                        # Continue without cookies
-                    
-                    with YoutubeDL(ydl_opts) as ydl:
-                        print(f"[PROCESS BRANDS] Downloading: {url_input[:50]}...")
-                        try:
-                            info = ydl.extract_info(url_input, download=True)
-                            filename = ydl.prepare_filename(info)
-                        except Exception as download_error:
-                            print(f"[PROCESS BRANDS ERROR] Download failed for {url_input}: {str(download_error)}")
-                            import traceback
-                            traceback.print_exc()
-                            return {
-                                'error': _strip_ansi(str(download_error)),
-                                'success': False
-                            }
-                    
-                    # Ensure .mp4 extension
-                    if not filename.endswith('.mp4'):
-                        base, _ = os.path.splitext(filename)
-                        filename = base + '.mp4'
-                    
-                    name = os.path.basename(filename)
-                    file_exists = os.path.exists(filename)
-                    file_size_mb = os.path.getsize(filename) / (1024 * 1024) if file_exists else 0
-                    
-                    if not file_exists or file_size_mb == 0:
-                        print(f"[PROCESS BRANDS WARNING] File may not have downloaded properly: {filename} (exists: {file_exists}, size: {file_size_mb:.2f}MB)")
-                        # Check if we have error information in the info dict
-                        if info and 'error' in info:
-                            print(f"[PROCESS BRANDS ERROR DETAIL] yt-dlp error: {info['error']}")
-                        # Also check for other error fields
-                        elif info and 'errors' in info:
-                            print(f"[PROCESS BRANDS ERROR DETAIL] yt-dlp errors: {info['errors']}")
-                    
-                    print(f"[PROCESS BRANDS] Success: {name} ({file_size_mb:.2f}MB)")
-                    return {
-                        'filename': name,
-                        'filepath': filename,
-                        'size_mb': round(file_size_mb, 2),
-                        'success': file_exists and file_size_mb > 0
-                    }
-                except Exception as e:
-                    print(f"[PROCESS BRANDS ERROR] {url_input}: {str(e)}")
-                    import traceback
-                    traceback.print_exc()
-                    # Try to get more detailed error information
-                    error_details = str(e)
-                    if hasattr(e, 'msg'):
-                        error_details += f"; msg: {e.msg}"
-                    if hasattr(e, 'reason'):
-                        error_details += f"; reason: {e.reason}"
-                    return {
-                        'error': error_details,
-                        'success': False
-                    }
             # Download the video
-            download_result = download_video(url)
+            with trace.span('download') as _dl_span:
+                download_result = _download_render_source(url)
+                if _dl_span is not None:
+                    _dl_span.attrs['size_mb'] = download_result.get('size_mb')
             if not download_result.get('success'):
                 return jsonify({
                     'success': False,
@@ -3075,55 +3636,15 @@ def process_branded_videos():
         else:
             # URL is actually a local file path
             print(f"[PROCESS BRANDS] Processing local file: {url}")
-
-            requested_filename = os.path.basename(url)
-            if requested_filename != url:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid source filename'
-                }), 400
-
-            if not user_can_download_filename(user_id, requested_filename):
-                print(f"[PROCESS BRANDS] Ownership denied for source: user={user_id} file={requested_filename}")
-                return jsonify({
-                    'success': False,
-                    'error': 'Source video not found or access denied'
-                }), 404
-
-            # First check if it's in RAW_DIR
-            video_filepath = os.path.join(RAW_DIR, requested_filename)
-
-            # If not in the new location, check the old OUTPUT_DIR
-            if not os.path.exists(video_filepath):
-                video_filepath = os.path.join(OUTPUT_DIR, requested_filename)
-
-            allowed_roots = (os.path.realpath(RAW_DIR), os.path.realpath(OUTPUT_DIR))
-            real_video_filepath = os.path.realpath(video_filepath)
-            try:
-                is_allowed_source = any(os.path.commonpath([real_video_filepath, root]) == root for root in allowed_roots)
-            except ValueError:
-                is_allowed_source = False
-            if not is_allowed_source:
-                return jsonify({
-                    'success': False,
-                    'error': 'Invalid source path'
-                }), 400
-
-            video_id = os.path.splitext(requested_filename)[0]
-
-            # Check if file exists
-            if not os.path.exists(real_video_filepath):
-                return jsonify({
-                    'success': False,
-                    'error': 'Source video file is no longer available'
-                }), 404
-
-            video_filepath = real_video_filepath
+            video_filepath, source_error = _resolve_local_render_source(user_id, url)
+            if source_error:
+                return jsonify({'success': False, 'error': source_error[0]}), source_error[1]
+            video_id = os.path.splitext(url)[0]
             print(f"[PROCESS BRANDS] Found local file: {video_filepath}")
         
         # 2. Load and validate brands (brand_id-first with backward compat)
+        _resolve_started = time.time()
         from .database import get_brand, get_all_brands
-        from .config import STORAGE_ROOT
         user_id = session.get('user_id')
         
         # Resolve brands: prioritize brand_ids, fallback to names
@@ -3167,109 +3688,7 @@ def process_branded_videos():
                         'fix_url': '/portal/brands'
                     }), 404
         
-        # Validate brand readiness with HARD FAIL (no defaults)
-        # resolved_brands are already fetched from DB with ownership verified
-        validation_errors = []
-        
-        print(f"[PROCESS BRANDS] Validating {len(resolved_brands)} brands")
-        
-        for db_brand in resolved_brands:
-            brand_id = db_brand.get('id')
-            brand_name = db_brand.get('display_name') or db_brand.get('name')
-            print(f"[PROCESS BRANDS] Validating Brand #{brand_id} ({brand_name})")
-            
-            # Check is_ready flag first
-            if not db_brand.get('is_ready'):
-                validation_errors.append({
-                    'brand_id': brand_id,
-                    'brand': brand_name,
-                    'error': 'Brand is incomplete',
-                    'fix': 'Upload logo or watermark in Manage Brands',
-                    'fix_url': '/portal/brands'
-                })
-                continue
-            
-            # Watermark is OPTIONAL - only validate if present
-            wm_path = db_brand.get('watermark_path') or db_brand.get('watermark_vertical')
-            has_watermark = wm_path is not None and wm_path != ''
-            
-            if has_watermark:
-                # Validate watermark file exists on disk (only if path is set)
-                wm_full_path = os.path.join(STORAGE_ROOT, wm_path)
-                if not os.path.exists(wm_full_path):
-                    validation_errors.append({
-                        'brand_id': brand_id,
-                        'brand': brand_name,
-                        'error': f'Watermark file not found on disk: {wm_path}',
-                        'fix': 'Re-upload watermark in Manage Brands',
-                        'fix_url': '/portal/brands'
-                    })
-                    continue
-                
-                # Validate watermark config values (only if watermark exists)
-                wm_scale = db_brand.get('wm_scale')
-                wm_opacity = db_brand.get('wm_opacity')
-                
-                if wm_scale is None or wm_scale <= 0:
-                    validation_errors.append({
-                        'brand_id': brand_id,
-                        'brand': brand_name,
-                        'error': 'Invalid watermark scale (must be > 0)',
-                        'fix': 'Edit brand settings in Manage Brands',
-                        'fix_url': '/portal/brands'
-                    })
-                    continue
-                
-                if wm_opacity is None or wm_opacity < 0 or wm_opacity > 1:
-                    validation_errors.append({
-                        'brand_id': brand_id,
-                        'brand': brand_name,
-                        'error': 'Invalid watermark opacity (must be 0-1)',
-                        'fix': 'Edit brand settings in Manage Brands',
-                        'fix_url': '/portal/brands'
-                    })
-                    continue
-            
-            # Logo validation
-            logo_path = db_brand.get('logo_path')
-            logo_scale = db_brand.get('logo_scale', 0)
-            
-            # Require at least one asset: logo OR watermark (not both required)
-            if not has_watermark and (logo_scale == 0 or not logo_path):
-                validation_errors.append({
-                    'brand_id': brand_id,
-                    'brand': brand_name,
-                    'error': 'Brand must have at least a logo or watermark',
-                    'fix': 'Upload logo or watermark in Manage Brands',
-                    'fix_url': '/portal/brands'
-                })
-                continue
-            
-            # Validate logo if configured (non-zero scale) but path missing → fail
-            if logo_scale > 0 and not logo_path:
-                validation_errors.append({
-                    'brand_id': brand_id,
-                    'brand': brand_name,
-                    'error': 'Logo overlay enabled but logo file missing',
-                    'fix': 'Upload logo in Manage Brands or set logo scale to 0',
-                    'fix_url': '/portal/brands'
-                })
-                continue
-            
-            # If logo path exists, validate file on disk
-            if logo_path:
-                logo_full_path = os.path.join(STORAGE_ROOT, logo_path)
-                if not os.path.exists(logo_full_path):
-                    validation_errors.append({
-                        'brand_id': brand_id,
-                        'brand': brand_name,
-                        'error': f'Logo file not found on disk: {logo_path}',
-                        'fix': 'Re-upload logo in Manage Brands',
-                        'fix_url': '/portal/brands'
-                    })
-                    continue
-            
-            print(f"[PROCESS BRANDS] ✓ Brand #{brand_id} ({brand_name}) validation passed")
+        validation_errors = _brand_validation_errors(resolved_brands)
         
         # Hard fail if any validation errors
         if validation_errors:
@@ -3287,31 +3706,10 @@ def process_branded_videos():
             }), 400
         
         print(f"[PROCESS BRANDS] Validation passed — {len(resolved_brands)} brand(s) queued for async render")
+        trace.record('resolve_brands', _resolve_started, brands=len(resolved_brands))
 
         # --- Dual-Logo Composition: resolve secondary logo (Platinum+ only) ---
-        sec_logo_resolved_path = None
-        if data.get('secondary_logo_enabled'):
-            from .config import get_tier_features
-            tier_features = get_tier_features(tier)
-            if tier_features.get('dual_logo_composition_enabled'):
-                sec_brand_id = data.get('secondary_logo_brand_id')
-                if sec_brand_id:
-                    try:
-                        sec_brand_id = int(sec_brand_id)
-                        sec_brand = get_brand(brand_id=sec_brand_id, user_id=user_id)
-                        if sec_brand and sec_brand.get('logo_path'):
-                            sec_logo_full = os.path.join(STORAGE_ROOT, sec_brand['logo_path'])
-                            if os.path.exists(sec_logo_full):
-                                sec_logo_resolved_path = sec_logo_full
-                                print(f"[PROCESS BRANDS] Secondary logo resolved: brand #{sec_brand_id} -> {sec_logo_full}")
-                            else:
-                                print(f"[PROCESS BRANDS] Secondary logo file not found on disk: {sec_logo_full}")
-                        else:
-                            print(f"[PROCESS BRANDS] Secondary brand #{sec_brand_id} not found or has no logo (user_id={user_id})")
-                    except (ValueError, TypeError):
-                        print(f"[PROCESS BRANDS] Invalid secondary_logo_brand_id: {data.get('secondary_logo_brand_id')}")
-            else:
-                print(f"[PROCESS BRANDS] Dual-logo composition not available for tier: {tier}")
+        sec_logo_resolved_path = _resolve_secondary_logo(data, tier, user_id)
         
         # Phase 18: validation complete — spawn background render thread, return job_id immediately.
         # The browser connection is released; the render continues on the server regardless of
@@ -3323,10 +3721,16 @@ def process_branded_videos():
             source_filename_for_edit,
             output_format,
             data.get('source_edit'),
+            source_path=video_filepath,
         )
         if _is_default_source_edit(source_edit):
             print("[SOURCE-EDIT] Default edit detected; using legacy normalize path")
             source_edit = None
+        source_edits = {output_format: source_edit}
+        for _extra_format in output_formats[1:]:
+            _edit = _resolve_render_source_edit(user_id, source_filename_for_edit, _extra_format,
+                                                data.get('source_edit'), source_path=video_filepath)
+            source_edits[_extra_format] = None if _is_default_source_edit(_edit) else _edit
         job_id = str(uuid.uuid4())
         brand_render_jobs[job_id] = {
             'status':       'queued',
@@ -3338,6 +3742,8 @@ def process_branded_videos():
             'completed_at': None,
             'outputs':      None,
             'error':        None,
+            'cancel_event': threading.Event(),
+            'trace':        trace,
         }
 
         threading.Thread(
@@ -3354,6 +3760,7 @@ def process_branded_videos():
                 video_id,
                 source_edit,
             ),
+            kwargs={'output_formats': output_formats, 'source_edits': source_edits},
             daemon=True
         ).start()
 
@@ -3377,6 +3784,291 @@ def process_branded_videos():
             pass
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _matrix_runners(job_id, user_id, brands_by_id, data, sec_logo_resolved_path, local_sources):
+    """Node runners for a render_matrix job (see render_matrix.start)."""
+
+    def cancel_event():
+        return render_matrix.get_cancel_event(job_id) or threading.Event()
+
+    def download(node, inputs):
+        source = node.params['source']
+        if source in local_sources:
+            return {'path': local_sources[source], 'video_id': os.path.splitext(source)[0], 'remote': False}
+        if cancel_event().is_set():
+            raise RenderCancelled('Render cancelled before download')
+        result = _download_render_source(source)
+        if not result.get('success'):
+            raise RuntimeError(f"Failed to download video: {result.get('error')}")
+        return {'path': result['filepath'], 'video_id': os.path.splitext(result['filename'])[0], 'remote': True}
+
+    def normalize(node, inputs):
+        src = inputs[0]
+        fmt = node.params['format']
+        edit = _resolve_render_source_edit(user_id, os.path.basename(src['path']), fmt, None,
+                                           source_path=src['path'])
+        if _is_default_source_edit(edit):
+            edit = None
+        path = normalize_video(src['path'], output_format=fmt, source_edit=edit,
+                               job_id=job_id, cancel_event=cancel_event())
+        return {'path': path, 'source_path': src['path'], 'video_id': src['video_id'], 'edit': edit}
+
+    def render(node, inputs):
+        norm = inputs[0]
+        fmt = node.params['format']
+        db_brand = brands_by_id[node.params['brand_id']]
+        brand_name = db_brand.get('display_name') or db_brand.get('name')
+        config = render_plans.brand_render_config(db_brand, fmt, data, sec_logo_resolved_path)
+        trim = _edit_trim(norm['edit']) if norm['path'] == norm['source_path'] else None
+        key = None
+        try:
+            key = render_cache.render_key(render_cache.source_hash(norm['source_path']),
+                                          render_plans.render_plan_hash(config, fmt, norm['edit']),
+                                          ENCODER_PROFILE)
+        except Exception as _ce:
+            render_log.warning("[RENDER-CACHE] keying skipped: %s", _ce)
+
+        def encode():
+            return VideoProcessor(norm['path'], OUTPUT_DIR).process_brand(
+                config, video_id=norm['video_id'], output_format=fmt,
+                cancel_event=cancel_event(), trim=trim)
+
+        started = time.time()
+        outcome = None
+        if key:
+            output_path, outcome = render_cache.get_or_render(
+                key, branded_output_path(OUTPUT_DIR, config, norm['video_id'], fmt), encode, cancel_event())
+        else:
+            output_path = encode()
+        render_secs = time.time() - started
+
+        row_id = None
+        if outcome not in ('hit', 'joined'):
+            metrics.RENDER_STAGE_SECONDS.observe(render_secs, stage='brand')
+            try:
+                _out_kb = (os.path.getsize(output_path) // 1024) if os.path.exists(output_path) else None
+                log_render_event(
+                    user_id=user_id, job_id=job_id, brand_id=db_brand['id'],
+                    brand_name=brand_name, output_format=fmt,
+                    render_seconds=render_secs, output_kb=_out_kb,
+                    brand_count=len(brands_by_id),
+                )
+            except Exception as _te:
+                render_log.warning("[RENDER-EVENT] telemetry skipped: %s", _te)
+        _w, _h, _ar = _output_format_dims(fmt)
+        try:
+            row_id = save_branded_output(
+                user_id=user_id,
+                source_filename=os.path.basename(norm['source_path']),
+                output_filename=os.path.basename(output_path),
+                file_path=output_path,
+                brand_id=db_brand['id'],
+                brand_name=brand_name,
+                output_format=fmt,
+                width=_w, height=_h, aspect_ratio=_ar,
+                render_key=key,
+            )
+        except Exception as _bo_e:
+            render_log.warning("[MATRIX] branded_output save failed: %s", _bo_e)
+
+        fname = os.path.basename(output_path)
+        render_matrix.add_output(job_id, {
+            'source':        node.params['source'],
+            'brand':         brand_name,
+            'brand_id':      db_brand['id'],
+            'filename':      fname,
+            'download_url':  f'/api/videos/download/{fname}',
+            'output_format': fmt,
+            **({'width': _w, 'height': _h, 'aspect_ratio': _ar} if _w else {})
+        })
+        return {'path': output_path, 'row_id': row_id}
+
+    def release(node):
+        result = node.result or {}
+        if node.kind == 'normalize' and result.get('path') != result.get('source_path'):
+            path = result.get('path')
+        elif node.kind == 'download' and result.get('remote'):
+            path = result.get('path')
+        else:
+            return
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    return {'download': download, 'normalize': normalize, 'render': render, 'release': release}
+
+
+def _finish_render_matrix(job_id, nodes, cancelled, user_id, credits_allowance):
+    """Settle a finished matrix job: one consolidated credit charge — one
+    credit per source with at least one successful render, the price of the
+    equivalent process_brands calls — or, when cancelled, discard every
+    output and charge nothing."""
+    renders = [n for n in nodes.values() if n.kind == 'render' and n.status == 'done']
+    if cancelled:
+        try:
+            delete_branded_outputs([n.result.get('row_id') for n in renders])
+        except Exception as _e:
+            render_log.warning("[MATRIX] branded_output cleanup failed: %s", _e)
+        _remove_unreferenced_outputs([n.result['path'] for n in renders])
+        return
+
+    charged_sources = len({n.params['source'] for n in renders})
+    if not charged_sources:
+        return
+    try:
+        increment_branding_jobs(user_id, charged_sources)
+    except Exception as _e:
+        render_log.warning("[MATRIX] Usage increment failed: %s", _e)
+    try:
+        spend_credits(user_id, charged_sources, credits_allowance)
+    except Exception as _e:
+        render_log.warning("[CREDITS] credit spend failed for user=%s: %s", user_id, _e)
+    try:
+        log_event('info', None, f'Matrix render {job_id[:8]} finished: {len(renders)} output(s), '
+                                f'{charged_sources} credit(s) user={user_id}')
+    except Exception:
+        pass
+
+
+@app.route('/api/videos/render-matrix', methods=['POST'])
+@login_required
+def render_matrix_api():
+    """Render N sources × M brands × formats as one job.
+
+    Body: ``sources`` (URLs and/or owned filenames), ``brand_ids``,
+    ``output_formats`` (default ['vertical_9_16']) plus the same per-render
+    overrides process_brands accepts. Tier, credit and brand checks run once
+    for the whole matrix; the work is planned as a DAG (render_matrix.plan)
+    so each source is fetched once and normalized once per format, whatever
+    the brand count. Poll /api/videos/render-matrix/<job_id>.
+    """
+    user_id = session.get('user_id')
+    data = request.get_json(force=True) or {}
+
+    sources = [str(s).strip() for s in (data.get('sources') or []) if str(s).strip()]
+    brand_ids = data.get('brand_ids') or []
+    output_formats = data.get('output_formats') or ['vertical_9_16']
+    if not sources or not isinstance(brand_ids, list) or not brand_ids or not isinstance(output_formats, list):
+        return jsonify({'success': False, 'error': 'sources, brand_ids and output_formats are required'}), 400
+    sources = list(dict.fromkeys(sources))
+    output_formats = list(dict.fromkeys(str(f) for f in output_formats))
+    try:
+        brand_ids = list(dict.fromkeys(int(b) for b in brand_ids))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'brand_ids must be integers'}), 400
+
+    SUPPORTED_OUTPUT_FORMATS = {'vertical_9_16', 'square_1_1'}
+    for _requested_format in output_formats:
+        if _requested_format not in SUPPORTED_OUTPUT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': 'OUTPUT_FORMAT_UNSUPPORTED',
+                'message': f'Output format "{_requested_format}" is not yet supported. Supported: Vertical 9:16, Square 1:1.',
+                'supported_formats': ['vertical_9_16', 'square_1_1']
+            }), 400
+
+    # --- Tier enforcement, once for the whole matrix ---
+    tier = get_user_tier(user_id)
+    limits = get_effective_limits(tier, get_user_special_status(user_id))
+    credits_allowance = limits.get('credits_per_day', 0)
+    balance = get_credit_balance(user_id, credits_allowance)
+    if not balance.get('ok', True):
+        return jsonify({
+            'success': False,
+            'error': 'SERVICE_UNAVAILABLE',
+            'message': "We couldn't check your credits right now. Please try again in a moment.",
+        }), 503
+    # One credit per source, charged once on completion
+    if balance['total'] < len(sources):
+        return jsonify({
+            'success': False,
+            'error': 'OUT_OF_CREDITS',
+            'message': f'This matrix needs {len(sources)} credits (one per source); you have {balance["total"]}.',
+            'tier': tier,
+            'credits_per_day': credits_allowance,
+            'credits_remaining': balance['total'],
+        }), 403
+    max_per_job = limits['max_brands_per_job']
+    if len(brand_ids) > max_per_job:
+        return jsonify({
+            'success': False,
+            'error': 'BRANDS_PER_JOB_LIMIT',
+            'message': f'{tier} plan allows {max_per_job} brands per job. You selected {len(brand_ids)}.',
+            'tier': tier,
+            'limit': max_per_job,
+            'selected': len(brand_ids),
+        }), 403
+    contract = calculate_output_contract(len(sources), len(brand_ids), len(output_formats), limits)
+    if contract['blocking']:
+        return jsonify({
+            'success': False,
+            'error': 'OUTPUTS_PER_JOB_LIMIT',
+            'message': f'{tier} plan allows {contract["max_outputs_per_job"]} outputs per job. Your selection would generate {contract["computed_outputs"]} outputs ({len(sources)} sources × {len(brand_ids)} brands × {len(output_formats)} variants).',
+            'tier': tier,
+            'limit': contract['max_outputs_per_job'],
+            'computed_outputs': contract['computed_outputs'],
+            'contract': contract,
+        }), 403
+
+    # --- Sources: local files are checked now, URLs become download nodes ---
+    local_sources = {}
+    for source in sources:
+        if source.startswith('http'):
+            continue
+        path, source_error = _resolve_local_render_source(user_id, source)
+        if source_error:
+            return jsonify({'success': False, 'error': source_error[0], 'source': source}), source_error[1]
+        local_sources[source] = path
+
+    # --- Brands: resolved and validated once ---
+    from .database import get_brand
+    brands_by_id = {}
+    for brand_id in brand_ids:
+        db_brand = get_brand(brand_id=brand_id, user_id=user_id)
+        if not db_brand:
+            return jsonify({
+                'success': False,
+                'code': 'BRAND_VALIDATION_FAILED',
+                'error': f'Brand #{brand_id} not found or access denied',
+                'brand_id': brand_id,
+                'fix': 'Brand may have been deleted. Refresh brand list.',
+                'fix_url': '/portal/brands'
+            }), 404
+        brands_by_id[brand_id] = db_brand
+    validation_errors = _brand_validation_errors(list(brands_by_id.values()))
+    if validation_errors:
+        first_error = validation_errors[0]
+        return jsonify({
+            'success': False,
+            'error': f"{first_error['brand']}: {first_error['error']}",
+            'code': 'BRAND_VALIDATION_FAILED',
+            'brand': first_error['brand'],
+            'brand_id': first_error.get('brand_id'),
+            'fix': first_error['fix'],
+            'fix_url': first_error.get('fix_url'),
+            'all_errors': validation_errors
+        }), 400
+    sec_logo_resolved_path = _resolve_secondary_logo(data, tier, user_id)
+
+    nodes = render_matrix.plan(sources, brand_ids, output_formats)
+    job_id = str(uuid.uuid4())
+    runners = _matrix_runners(job_id, user_id, brands_by_id, data, sec_logo_resolved_path, local_sources)
+    render_matrix.start(
+        job_id, nodes, runners, user_id,
+        on_finish=lambda _job_id, _nodes, _cancelled: _finish_render_matrix(
+            _job_id, _nodes, _cancelled, user_id, credits_allowance),
+        sources=len(sources), brands=len(brand_ids), formats=output_formats,
+    )
+    render_log.info("[MATRIX] %s queued: %s source(s) × %s brand(s) × %s format(s) = %s node(s) user=%s",
+                    job_id[:8], len(sources), len(brand_ids), len(output_formats), len(nodes), user_id)
+    return jsonify({
+        'success': True,
+        'job_id':  job_id,
+        'status':  'queued',
+        'outputs_planned': sum(1 for n in nodes.values() if n.kind == 'render'),
+        'nodes':   len(nodes),
+        'message': f'Matrix render queued. Poll /api/videos/render-matrix/{job_id} for status.',
+    })
+
+
 @app.route('/api/videos/fetch', methods=['POST'])
 @login_required
 def fetch_videos_from_urls():
@@ -3385,29 +4077,29 @@ def fetch_videos_from_urls():
     try:
         # --- Tier enforcement: daily fetch limit ---
         user_id = session.get('user_id')
-        print(f"[FETCH] POST received user_id={user_id}", flush=True)
+        fetch_log.info("[FETCH] POST received user_id=%s", user_id)
 
-        print("[FETCH] tier lookup start", flush=True)
+        fetch_log.debug("[FETCH] tier lookup start")
         tier = get_user_tier(user_id)
-        print(f"[FETCH] tier lookup done: {tier}", flush=True)
+        fetch_log.debug("[FETCH] tier lookup done: %s", tier)
 
-        print("[FETCH] special_status lookup start", flush=True)
+        fetch_log.debug("[FETCH] special_status lookup start")
         try:
             special_status = get_user_special_status(user_id)
         except Exception as _ss_err:
-            print(f"[FETCH] special_status lookup error (using None): {_ss_err}", flush=True)
+            fetch_log.warning("[FETCH] special_status lookup error (using None): %s", _ss_err)
             special_status = None
-        print(f"[FETCH] special_status lookup done: {special_status}", flush=True)
+        fetch_log.debug("[FETCH] special_status lookup done: %s", special_status)
 
         limits = get_effective_limits(tier, special_status)
 
-        print("[FETCH] daily usage lookup start", flush=True)
+        fetch_log.debug("[FETCH] daily usage lookup start")
         try:
             usage = get_daily_usage(user_id)
         except Exception as _du_err:
-            print(f"[FETCH] daily usage lookup error (using zeros): {_du_err}", flush=True)
+            fetch_log.warning("[FETCH] daily usage lookup error (using zeros): %s", _du_err)
             usage = {'branding_jobs': 0, 'downloads': 0}
-        print(f"[FETCH] daily usage lookup done: {usage}", flush=True)
+        fetch_log.debug("[FETCH] daily usage lookup done: %s", usage)
         
         if not YoutubeDL:
             return jsonify({'success': False, 'error': 'yt-dlp not installed'}), 500
@@ -3440,10 +4132,16 @@ def fetch_videos_from_urls():
         if len(urls) > remaining_fetches:
             urls = urls[:remaining_fetches]
         
-        print(f"[FETCH] Downloading {len(urls)} videos from URLs")
+        fetch_log.info("[FETCH] Downloading %s videos from URLs", len(urls))
         log_event('info', None, f'Fetching {len(urls)} URLs')
         
-        def download_one(url_input):
+        def plan_one(url_input):
+            """Metadata-only pass for one URL — no media bytes move.
+
+            Resolves cookies (with the usual rotation), lets yt-dlp pick the
+            rendition nearest our 720p target, and checks the tier's source
+            ceilings. plan['result'] is set when the URL is already settled
+            (store hit, rejection or error) and must not be downloaded."""
             try:
                 # Configure yt_dlp with platform-specific options
                 is_instagram = 'instagram.com' in url_input.lower()
@@ -3454,11 +4152,67 @@ def fetch_videos_from_urls():
                 is_threads = 'threads.net' in url_input.lower() or 'threads.com' in url_input.lower()
                 is_meta = is_instagram or is_threads
                 is_youtube = 'youtube.com' in url_input.lower() or 'youtu.be' in url_input.lower()
+                platform = ('instagram' if is_instagram else 'threads' if is_threads
+                            else 'youtube' if is_youtube else 'tiktok' if is_tiktok else 'other')
+
+                # Raw media store: a URL already fetched (by anyone) is served from
+                # disk — no network, no cookie/Instagram request spend. The
+                # client's save-download call then adds only an ownership row.
+                media_key = _canonical_media_key(url_input)
+                if media_key:
+                    try:
+                        stored = get_raw_media(*media_key)
+                    except Exception as _rm_err:
+                        stored = None
+                        fetch_log.warning("[RAW STORE] lookup failed for %s: %s", media_key, _rm_err)
+                    if (stored and os.path.isfile(stored['file_path'])
+                            and os.path.getsize(stored['file_path']) > 0):
+                        _stored_path = stored['file_path']
+                        try:
+                            touch_raw_media(stored['id'])
+                            os.utime(_stored_path, None)
+                        except Exception as _touch_err:
+                            fetch_log.warning("[RAW STORE] touch failed: %s", _touch_err)
+                        _stored_name = os.path.basename(_stored_path)
+                        _stored_bytes = os.path.getsize(_stored_path)
+                        _stored_mb = _stored_bytes / (1024 * 1024)
+                        # Stored by anyone, possibly a higher tier: the same ceilings
+                        # as a fresh fetch apply. Rows from before durations were
+                        # stored are probed locally.
+                        _stored_secs = stored.get('duration')
+                        if _stored_secs is None:
+                            try:
+                                _stored_secs = float(_probe_source(_stored_path)
+                                                     .get('format', {}).get('duration') or 0) or None
+                            except Exception as _pr_err:
+                                fetch_log.warning("[RAW STORE] duration probe failed for %s: %s",
+                                                  _stored_name, _pr_err)
+                        reject = _source_ceiling_error(limits, _stored_secs, _stored_bytes)
+                        if reject:
+                            fetch_log.info("[RAW STORE] Hit %s:%s REJECTED: %s",
+                                           media_key[0], media_key[1], reject)
+                            return {'url': url_input, 'result': {
+                                'url': url_input, 'error': reject, 'success': False, 'rejected': True,
+                                'plan': {'title': stored.get('title'), 'duration': _stored_secs,
+                                         **estimate_source_cost(_stored_secs, _stored_bytes)}}}
+                        fetch_log.info("[RAW STORE] Hit %s:%s -> %s (%.2fMB) — skipping network",
+                                       media_key[0], media_key[1], _stored_name, _stored_mb)
+                        return {'url': url_input, 'result': {
+                            'url': url_input,
+                            'filename': _stored_name,
+                            'display_name': stored.get('title') or _stored_name.rsplit('.', 1)[0],
+                            'local_path': _stored_path,
+                            'download_url': f'/api/videos/download/{_stored_name}',
+                            'size_mb': round(_stored_mb, 2),
+                            'success': True,
+                            'cached': True,
+                        }}
 
                 ydl_opts = {
                     'outtmpl': os.path.join(RAW_DIR, '%(id)s.%(ext)s'),
                     'merge_output_format': 'mp4',
                     'format': YTDLP_FORMAT,
+                    'format_sort': YTDLP_FORMAT_SORT,
                     'prefer_ffmpeg': HAS_FFMPEG,
                     'retries': 5,
                     'fragment_retries': 5,
@@ -3485,7 +4239,7 @@ def fetch_videos_from_urls():
                     _ig_proxy = os.environ.get('IG_PROXY', '').strip()
                     if _ig_proxy:
                         ydl_opts['proxy'] = _ig_proxy
-                        print("[FETCH] Instagram routed via IG_PROXY (residential)")
+                        fetch_log.info("[FETCH] Instagram routed via IG_PROXY (residential)")
 
                 # Threads (experimental): route through the same Meta proxy if set,
                 # but do NOT apply the Instagram-app headers — with no dedicated
@@ -3495,7 +4249,7 @@ def fetch_videos_from_urls():
                     _ig_proxy = os.environ.get('IG_PROXY', '').strip()
                     if _ig_proxy:
                         ydl_opts['proxy'] = _ig_proxy
-                        print("[FETCH] Threads (experimental) routed via IG_PROXY")
+                        fetch_log.info("[FETCH] Threads (experimental) routed via IG_PROXY")
 
                 # YouTube bot-gates datacenter IPs (Render) with "Sign in to confirm
                 # you're not a bot" on the default web client. Try alternate player
@@ -3510,7 +4264,7 @@ def fetch_videos_from_urls():
                     _ig_proxy = os.environ.get('IG_PROXY', '').strip()
                     if _ig_proxy:
                         ydl_opts['proxy'] = _ig_proxy
-                    print(f"[FETCH] YouTube via player_client={_yt_clients}")
+                    fetch_log.info("[FETCH] YouTube via player_client=%s", _yt_clients)
 
                 # Apply TikTok impersonation for TikTok URLs
                 # Note: impersonation requires curl_cffi and specific target format
@@ -3520,7 +4274,7 @@ def fetch_videos_from_urls():
 
                 # --- Cookie selection + rotation ----------------------------
                 # Instagram needs session cookies and they expire; we hold a pool
-                # (INSTAGRAM_COOKIES + _1.._10) and rotate least-recently-used,
+                # (INSTAGRAM_COOKIES + _1.._10) and rotate best-scoring first,
                 # failing over on auth errors. Non-Instagram sources fall back to
                 # the single legacy cookies.txt (behaviour unchanged).
                 from .config import COOKIE_FILE as _legacy_cookie_file
@@ -3536,12 +4290,12 @@ def fetch_videos_from_urls():
                                     if line and not line.startswith('#') and '\t' in line:
                                         return _legacy_cookie_file
                     except Exception as _ck_err:
-                        print(f"[FETCH] legacy cookie check failed: {_ck_err}")
+                        fetch_log.warning("[FETCH] legacy cookie check failed: %s", _ck_err)
                     return None
 
                 if is_meta and cookie_pool.pool_size() > 0:
                     using_pool = True
-                    cookie_candidates = cookie_pool.candidates_lru()
+                    cookie_candidates = cookie_pool.candidates_ranked()
                 else:
                     using_pool = False
                     _legacy = _legacy_cookie_candidate()
@@ -3552,18 +4306,18 @@ def fetch_videos_from_urls():
                 # digging the block deeper. Returns the friendly error instantly.
                 if using_pool and cookie_pool.breaker_open():
                     _mins = max(1, cookie_pool.breaker_remaining() // 60)
-                    print(f"[COOKIE POOL] breaker open — skipping Instagram fetch for "
-                          f"{url_input[:50]} (~{_mins}min left)", flush=True)
-                    return {
+                    fetch_log.info("[COOKIE POOL] breaker open — skipping Instagram fetch for "
+                                   "%s (~%smin left)", url_input[:50], _mins)
+                    return {'url': url_input, 'result': {
                         'url': url_input,
                         'error': ("Instagram downloads are paused for a few minutes while a "
                                   "temporary block clears. Please try again shortly, or use a "
                                   "TikTok / X link in the meantime."),
                         'success': False,
-                    }
+                    }}
 
                 info = None
-                filename = None
+                used_opts = None
                 tried_bad = []          # cookies that auth-failed on this URL
                 content_error = None    # non-auth error → don't rotate, surface it
 
@@ -3572,20 +4326,27 @@ def fetch_videos_from_urls():
                     if _cookie:
                         opts['cookiefile'] = _cookie
                         _label = os.path.basename(_cookie)
-                        print(f"[FETCH] Using cookie: {_label}"
-                              + (f" (pool {_idx + 1}/{len(cookie_candidates)})" if using_pool else ""))
+                        if using_pool:
+                            fetch_log.info("[FETCH] Using cookie: %s (pool %s/%s)",
+                                           _label, _idx + 1, len(cookie_candidates))
+                        else:
+                            fetch_log.info("[FETCH] Using cookie: %s", _label)
                         if using_pool:
                             cookie_pool.mark_used(_cookie)
                     else:
-                        print("[FETCH] No cookie file in use")
+                        fetch_log.info("[FETCH] No cookie file in use")
 
+                    _attempt_started = time.time()
                     try:
-                        with YoutubeDL(opts) as ydl:
-                            print(f"[FETCH] Downloading: {url_input[:50]}...")
-                            info = ydl.extract_info(url_input, download=True)
-                            filename = ydl.prepare_filename(info)
+                        with ydl_pool.checkout(platform, opts) as ydl:
+                            fetch_log.info("[FETCH-PLAN] Extracting metadata: %s...", url_input[:50])
+                            info = ydl.extract_info(url_input, download=False)
+                        metrics.FETCH_SECONDS.observe(time.time() - _attempt_started,
+                                                      platform=platform, phase='plan')
+                        used_opts = opts
                         if using_pool and _cookie:
-                            cookie_pool.mark_success(_cookie)
+                            cookie_pool.mark_success(
+                                _cookie, latency_ms=(time.time() - _attempt_started) * 1000)
                             cookie_pool.reset_breaker()  # Instagram is responding again
                             # A later cookie worked, so the earlier failures were
                             # genuinely dead cookies — cool them down.
@@ -3594,12 +4355,19 @@ def fetch_videos_from_urls():
                         break
                     except Exception as download_error:
                         err_text = _strip_ansi(str(download_error))
-                        print(f"[FETCH ERROR] Download failed for {url_input}: {err_text}")
+                        fetch_log.error("[FETCH ERROR] Metadata extraction failed for %s: %s",
+                                        url_input, err_text)
                         info = None
+                        # Every failed cookie attempt is recorded (content failures
+                        # are counted but leave the score alone); only auth failures
+                        # rotate below
+                        if using_pool and _cookie:
+                            cookie_pool.mark_failure(
+                                _cookie, err_text, latency_ms=(time.time() - _attempt_started) * 1000)
                         if (using_pool and cookie_pool.is_auth_failure(err_text)
                                 and _idx < len(cookie_candidates) - 1):
-                            print(f"[FETCH] auth failure on {os.path.basename(_cookie)} "
-                                  f"— rotating to next cookie")
+                            fetch_log.info("[FETCH] auth failure on %s "
+                                           "— rotating to next cookie", os.path.basename(_cookie))
                             tried_bad.append(_cookie)
                             continue
                         if using_pool and cookie_pool.is_auth_failure(err_text):
@@ -3612,24 +4380,81 @@ def fetch_videos_from_urls():
                         break
 
                 if content_error is not None:
-                    return {'url': url_input, 'error': content_error, 'success': False}
+                    return {'url': url_input, 'result': {'url': url_input, 'error': content_error, 'success': False}}
 
                 if info is None:
                     # Every available cookie auth-failed for this URL. Ambiguous
                     # (private post OR whole pool stale), so we do NOT cool every
                     # cookie down — but alert loudly and show one friendly error.
                     if using_pool:
-                        print(f"[COOKIE ALERT] all {cookie_pool.pool_size()} pooled "
-                              f"cookie(s) failed auth for {url_input} — refresh the "
-                              f"pool if this persists")
+                        fetch_log.warning("[COOKIE ALERT] all %s pooled "
+                                          "cookie(s) failed auth for %s — refresh the "
+                                          "pool if this persists", cookie_pool.pool_size(), url_input)
                         cookie_pool.trip_breaker()  # stop hammering IG for a while
-                    return {
+                    return {'url': url_input, 'result': {
                         'url': url_input,
                         'error': ("Instagram couldn't be reached for this link right now. "
                                   "It may be private or removed, or Instagram is temporarily "
                                   "blocking downloads. Please try again shortly or try another link."),
                         'success': False,
-                    }
+                    }}
+
+                # Up-front cost + tier ceilings, from metadata alone
+                duration = info.get('duration')
+                est_bytes = _estimate_download_bytes(info)
+                _parts = info.get('requested_formats') or [info]
+                _heights = [f.get('height') for f in _parts if f.get('height')]
+                _widths = [f.get('width') for f in _parts if f.get('width')]
+                summary = {
+                    'title': info.get('title'),
+                    'duration': duration,
+                    'format_id': info.get('format_id'),
+                    'width': max(_widths) if _widths else None,
+                    'height': max(_heights) if _heights else None,
+                    **estimate_source_cost(duration, est_bytes),
+                }
+                reject = _source_ceiling_error(limits, duration, est_bytes)
+                if reject:
+                    fetch_log.info("[FETCH-PLAN] %s duration=%ss format=%s height=%s est=%sMB REJECTED: %s",
+                                   url_input[:50], duration, summary['format_id'], summary['height'],
+                                   summary['est_mb'], reject)
+                else:
+                    fetch_log.info("[FETCH-PLAN] %s duration=%ss format=%s height=%s est=%sMB",
+                                   url_input[:50], duration, summary['format_id'], summary['height'],
+                                   summary['est_mb'])
+                plan = {'url': url_input, 'info': info, 'opts': used_opts, 'platform': platform,
+                        'media_key': media_key, 'summary': summary}
+                if reject:
+                    plan['result'] = {'url': url_input, 'error': reject, 'success': False,
+                                      'rejected': True, 'plan': summary}
+                return plan
+            except Exception as e:
+                fetch_log.error("[FETCH-PLAN ERROR] %s: %s", url_input, str(e))
+                import traceback
+                traceback.print_exc()
+                return {'url': url_input, 'result': {'url': url_input, 'error': str(e), 'success': False}}
+
+        def download_planned(plan):
+            """Download the rendition chosen in plan_one, reusing its metadata —
+            no second extraction request is sent."""
+            url_input = plan['url']
+            media_key = plan['media_key']
+            try:
+                _dl_started = time.time()
+                try:
+                    with ydl_pool.checkout(plan['platform'], plan['opts']) as ydl:
+                        fetch_log.info("[FETCH] Downloading: %s...", url_input[:50])
+                        info = ydl.process_ie_result(plan['info'], download=True)
+                        filename = ydl.prepare_filename(info)
+                    metrics.FETCH_SECONDS.observe(time.time() - _dl_started,
+                                                  platform=plan['platform'], phase='download')
+                except Exception as download_error:
+                    metrics.FETCH_RESULTS.inc(platform=plan['platform'], outcome='download_error')
+                    err_text = _strip_ansi(str(download_error))
+                    fetch_log.error("[FETCH ERROR] Download failed for %s: %s", url_input, err_text)
+                    import traceback
+                    traceback.print_exc()
+                    return {'url': url_input, 'error': err_text, 'success': False}
 
                 # Ensure .mp4 extension
                 if not filename.endswith('.mp4'):
@@ -3638,7 +4463,8 @@ def fetch_videos_from_urls():
                 
                 # Check if downloaded file has valid video stream, if not try fallback
                 if not ensure_video_stream(filename):
-                    print(f"[FETCH] No valid video stream found in {filename}, attempting fallback extraction...")
+                    fetch_log.info("[FETCH] No valid video stream found in %s, attempting fallback extraction...",
+                                   filename)
                     # fallback extraction using yt-dlp (bundled)
                     fixed_path = filename.replace(".mp4", "_fixed.mp4")
                     ytdlp_cmd = [
@@ -3650,38 +4476,57 @@ def fetch_videos_from_urls():
                     subprocess.run(ytdlp_cmd)
                     if os.path.exists(fixed_path):
                         filename = fixed_path
-                        print(f"[FETCH] Fallback extraction successful: {filename}")
+                        fetch_log.info("[FETCH] Fallback extraction successful: %s", filename)
                     else:
-                        print(f"[FETCH] Fallback extraction failed for {url_input}")
+                        fetch_log.warning("[FETCH] Fallback extraction failed for %s", url_input)
                 
                 name = os.path.basename(filename)
                 file_exists = os.path.exists(filename)
                 file_size_mb = os.path.getsize(filename) / (1024 * 1024) if file_exists else 0                
                 if not file_exists or file_size_mb == 0:
-                    print(f"[FETCH WARNING] File may not have downloaded properly: {filename} (exists: {file_exists}, size: {file_size_mb:.2f}MB)")
+                    fetch_log.warning("[FETCH WARNING] File may not have downloaded properly: %s (exists: %s, size: %.2fMB)",
+                                      filename, file_exists, file_size_mb)
                     # Check if we have error information in the info dict
                     if info and 'error' in info:
-                        print(f"[FETCH ERROR DETAIL] yt-dlp error: {info['error']}")
+                        fetch_log.error("[FETCH ERROR DETAIL] yt-dlp error: %s", info['error'])
                     # Also check for other error fields
                     elif info and 'errors' in info:
-                        print(f"[FETCH ERROR DETAIL] yt-dlp errors: {info['errors']}")
+                        fetch_log.error("[FETCH ERROR DETAIL] yt-dlp errors: %s", info['errors'])
                 
-                print(f"[FETCH] Success: {name} ({file_size_mb:.2f}MB)")
                 # Derive display name from yt-dlp title or filename
                 video_title = info.get('title', '') if info else ''
+
+                if file_exists and file_size_mb > 0:
+                    # URL-derived key first so the next fetch of this URL hits;
+                    # fall back to the extractor's own (platform, id).
+                    _store_key = media_key or (
+                        ((info or {}).get('extractor_key') or '').lower(), (info or {}).get('id'))
+                    filename = _store_raw_media(filename, _store_key,
+                                                title=video_title or None, source_url=url_input,
+                                                duration=(info or {}).get('duration')
+                                                or plan['summary'].get('duration'))
+                    name = os.path.basename(filename)
+
+                fetch_log.info("[FETCH] Success: %s (%.2fMB)", name, file_size_mb)
                 default_display_name = video_title if video_title else name.rsplit('.', 1)[0]
                 
-                return {
+                result = {
                     'url': url_input,
                     'filename': name,
                     'display_name': default_display_name,
                     'local_path': filename,  # Return full path
                     'download_url': f'/api/videos/download/{name}',
                     'size_mb': round(file_size_mb, 2),
-                    'success': file_exists and file_size_mb > 0
+                    'success': file_exists and file_size_mb > 0,
+                    'plan': plan['summary'],
                 }
+                if file_exists:
+                    metrics.FETCH_BYTES.inc(os.path.getsize(filename), platform=plan['platform'])
+                metrics.FETCH_RESULTS.inc(platform=plan['platform'],
+                                          outcome='ok' if result['success'] else 'empty')
+                return result
             except Exception as e:
-                print(f"[FETCH ERROR] {url_input}: {str(e)}")
+                fetch_log.error("[FETCH ERROR] %s: %s", url_input, str(e))
                 import traceback
                 traceback.print_exc()
                 # Try to get more detailed error information
@@ -3696,38 +4541,65 @@ def fetch_videos_from_urls():
                     'success': False
                 }
         
+        # Plan the whole batch concurrently — metadata only, no media bytes move.
+        # Oversized/overlong sources are rejected here instead of after a full
+        # download + decode.
+        fetch_log.info("[FETCH] planning start: %s URL(s)", len(urls))
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, min(FETCH_PLAN_WORKERS, len(urls)))) as _plan_pool:
+            plans = list(_plan_pool.map(plan_one, urls))
+        _to_fetch = [p for p in plans if not p.get('result')]
+        estimate = {
+            'downloads': len(_to_fetch),
+            'est_bytes': sum(p['summary'].get('est_bytes') or 0 for p in _to_fetch),
+            'est_render_seconds': round(sum(p['summary'].get('est_render_seconds') or 0 for p in _to_fetch), 1),
+            'rejected': sum(1 for p in plans if (p.get('result') or {}).get('rejected')),
+        }
+        fetch_log.info("[FETCH] planning done: %s", estimate)
+
+        if data.get('plan_only'):
+            return jsonify({
+                'success': True,
+                'plan_only': True,
+                'total': len(urls),
+                'estimate': estimate,
+                'plans': [p.get('result') or {'url': p['url'], 'success': True, 'plan': p['summary']}
+                          for p in plans],
+            })
+
         # Download sequentially to keep memory low
-        print(f"[FETCH] download loop start: {len(urls)} URL(s)", flush=True)
+        fetch_log.info("[FETCH] download loop start: %s of %s URL(s)", len(_to_fetch), len(urls))
         results = []
-        for url in urls:
-            results.append(download_one(url))
+        for plan in plans:
+            results.append(plan['result'] if plan.get('result') else download_planned(plan))
 
         success_count = sum(1 for r in results if r.get('success'))
-        print(f"[FETCH] download loop done: {success_count}/{len(urls)} succeeded", flush=True)
+        fetch_log.info("[FETCH] download loop done: %s/%s succeeded", success_count, len(urls))
 
         try:
             log_event('info', None, f'Fetch complete: {success_count}/{len(urls)} successful')
         except Exception as _log_err:
-            print(f"[FETCH] log_event warning: {_log_err}", flush=True)
+            fetch_log.warning("[FETCH] log_event warning: %s", _log_err)
 
         # Increment daily download counter for successful downloads (non-critical)
         if success_count > 0:
             try:
                 increment_downloads(user_id, success_count)
             except Exception as _inc_err:
-                print(f"[FETCH] increment_downloads warning (non-critical): {_inc_err}", flush=True)
+                fetch_log.warning("[FETCH] increment_downloads warning (non-critical): %s", _inc_err)
 
-        print("[FETCH] returning success response", flush=True)
+        fetch_log.info("[FETCH] returning success response")
         return jsonify({
             'success': True,
             'total': len(urls),
             'successful': success_count,
+            'estimate': estimate,
             'results': results
         })
 
     except Exception as e:
         import traceback
-        print(f"[FETCH EXCEPTION]:", flush=True)
+        fetch_log.error("[FETCH EXCEPTION]:")
         traceback.print_exc()
         log_event('error', None, f'Fetch failed: {str(e)}')
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -3944,6 +4816,38 @@ def download_zip():
 # API: PREVIEW - Frame extraction and asset serving for canvas preview
 # ============================================================================
 
+def _find_preview_video(filename, user_id):
+    """Locate a user's source video by bare filename for previews.
+    Returns (path or None, the directories searched)."""
+    # Find the video file — search all known locations in priority order
+    from .config import UPLOAD_DIR
+    from .database import get_connection
+    search_paths = [
+        os.path.join(RAW_DIR, filename),
+        os.path.join(OUTPUT_DIR, filename),
+        os.path.join(UPLOAD_DIR, filename),
+    ]
+    video_path = next((p for p in search_paths if os.path.exists(p)), None)
+
+    # Last resort: authoritative file_path from the downloads DB record
+    # P1 fix: filter by user_id so users cannot extract frames from other users' files
+    if video_path is None:
+        try:
+            with get_connection() as conn:
+                c = conn.cursor()
+                c.execute(
+                    'SELECT file_path FROM downloads WHERE filename = ? AND user_id = ? ORDER BY created_at DESC LIMIT 1',
+                    (filename, user_id)
+                )
+                row = c.fetchone()
+                if row and row['file_path'] and os.path.exists(row['file_path']):
+                    video_path = row['file_path']
+                    print(f'[EXTRACT-FRAME] Found via DB file_path: {video_path}')
+        except Exception as db_err:
+            print(f'[EXTRACT-FRAME] DB lookup failed for {filename}: {db_err}')
+    return video_path, search_paths
+
+
 @app.route('/api/preview/extract-frame', methods=['POST'])
 @login_required
 def extract_frame():
@@ -3961,33 +4865,7 @@ def extract_frame():
         # Sanitize filename to prevent path traversal
         filename = os.path.basename(filename)
 
-        # Find the video file — search all known locations in priority order
-        from .config import UPLOAD_DIR
-        from .database import get_connection
-        search_paths = [
-            os.path.join(RAW_DIR, filename),
-            os.path.join(OUTPUT_DIR, filename),
-            os.path.join(UPLOAD_DIR, filename),
-        ]
-        video_path = next((p for p in search_paths if os.path.exists(p)), None)
-
-        # Last resort: authoritative file_path from the downloads DB record
-        # P1 fix: filter by user_id so users cannot extract frames from other users' files
-        if video_path is None:
-            try:
-                req_user_id = session.get('user_id')
-                with get_connection() as conn:
-                    c = conn.cursor()
-                    c.execute(
-                        'SELECT file_path FROM downloads WHERE filename = ? AND user_id = ? ORDER BY created_at DESC LIMIT 1',
-                        (filename, req_user_id)
-                    )
-                    row = c.fetchone()
-                    if row and row['file_path'] and os.path.exists(row['file_path']):
-                        video_path = row['file_path']
-                        print(f'[EXTRACT-FRAME] Found via DB file_path: {video_path}')
-            except Exception as db_err:
-                print(f'[EXTRACT-FRAME] DB lookup failed for {filename}: {db_err}')
+        video_path, search_paths = _find_preview_video(filename, session.get('user_id'))
 
         if video_path is None:
             print(f'[EXTRACT-FRAME] File not found in any location: {filename}')
@@ -4059,6 +4937,80 @@ def extract_frame():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/preview/still', methods=['GET', 'POST'])
+@login_required
+def render_still_preview():
+    """
+    Pixel-exact still of a brand on one source frame.
+
+    Runs the frame at ``t`` through the same normalize graph and compiled brand
+    graph a render uses (video_processor.render_still) and returns the image
+    itself — JPEG, or WebP with ``image=webp`` / an Accept header that allows
+    it. Accepts the render request's override fields (logo_x, wm_scale, ...)
+    and an optional ``source_edit``. Results are cached by (source identity,
+    t, effective config, output format, image format) in render_plans, so
+    scrubbing back to a frame or re-opening the editor costs no FFmpeg run.
+    """
+    from .database import get_brand
+    from .video_processor import render_still, STILL_CODECS
+
+    data = request.get_json(silent=True) if request.method == 'POST' else None
+    data = data or request.args.to_dict()
+    user_id = session.get('user_id')
+
+    filename = os.path.basename(str(data.get('filename') or ''))
+    if not filename:
+        return jsonify({'success': False, 'error': 'No filename provided'}), 400
+    try:
+        brand_id = int(data.get('brand_id'))
+        t = max(0.0, float(data.get('t') or 0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'brand_id and t must be numbers'}), 400
+    output_format = data.get('output_format') or 'vertical_9_16'
+    if output_format not in SOURCE_EDIT_FORMATS:
+        return jsonify({'success': False, 'error': 'Invalid output_format'}), 400
+    image_format = data.get('image')
+    if image_format not in STILL_CODECS:
+        image_format = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+
+    video_path, _ = _find_preview_video(filename, user_id)
+    if video_path is None:
+        return jsonify({'success': False, 'error': f'File not found: {filename}'}), 404
+    brand = get_brand(brand_id=brand_id, user_id=user_id)
+    if not brand:
+        return jsonify({'success': False, 'error': 'Brand not found or access denied'}), 404
+
+    try:
+        config = render_plans.brand_render_config(brand, output_format, data)
+        source_edit = _resolve_render_source_edit(user_id, filename, output_format, data.get('source_edit'),
+                                                  source_path=video_path)
+        key = render_plans.still_key(video_path, t, config, output_format, image_format, source_edit)
+        if key in request.if_none_match:
+            response = Response(status=304)
+            cache_state = 'hit'
+        else:
+            image = render_plans.get_still(key)
+            cache_state = 'hit' if image is not None else 'miss'
+            if image is None:
+                started = time.time()
+                image = render_still(video_path, config, output_format, t, source_edit, image_format)
+                metrics.RENDER_STAGE_SECONDS.observe(time.time() - started, stage='still')
+                render_plans.put_still(key, image)
+                print(f"[STILL] brand #{brand_id} {filename} t={t:.2f} {output_format} {image_format} "
+                      f"{len(image)} bytes in {time.time() - started:.2f}s")
+            response = Response(image, mimetype=f'image/{image_format}')
+        response.set_etag(key)
+        response.headers['Cache-Control'] = 'private, max-age=300'
+        response.headers['Vary'] = 'Accept'
+        response.headers['X-Still-Cache'] = cache_state
+        return response
+    except RenderCancelled:
+        return jsonify({'success': False, 'error': 'Preview cancelled'}), 503
+    except Exception as e:
+        print(f"[STILL ERROR] brand #{brand_id} {filename}: {e}")
+        return jsonify({'success': False, 'error': 'Failed to render preview'}), 500
+
+
 @app.route('/api/preview/watermark/<brand_name>')
 @login_required
 def get_watermark_preview(brand_name):
@@ -4084,7 +5036,8 @@ def get_watermark_preview(brand_name):
     for pattern in patterns:
         path = os.path.join(watermark_dir, pattern)
         if os.path.exists(path):
-            return send_from_directory(os.path.dirname(path), os.path.basename(path))
+            # Bundled master asset: changes only on deploy — cache a day, revalidate by ETag
+            return send_from_directory(os.path.dirname(path), os.path.basename(path), max_age=86400)
     
     return jsonify({'error': 'Watermark not found', 'brand': brand_name}), 404
 
@@ -4099,11 +5052,36 @@ def get_logo_preview(brand_name):
     logo_path = os.path.join(VideoProcessor.LOGOS_DIR, logo_filename)
     
     if os.path.exists(logo_path):
-        return send_from_directory(os.path.dirname(logo_path), logo_filename)
+        return send_from_directory(os.path.dirname(logo_path), logo_filename, max_age=86400)
     
     return jsonify({'error': 'Logo not found', 'brand': brand_name}), 404
 
 
+@app.route('/assets/brand/<name>')
+@login_required
+def serve_brand_asset(name):
+    """
+    Serve a content-addressed brand asset (see asset_pipeline).
+    The name is the SHA-256 of the bytes, so the response never changes:
+    cached for a year as immutable, ETag = hash, and no SQLite lookup — the
+    unguessable name is the capability, as with download tokens.
+    """
+    from . import asset_pipeline
+    from .config import STORAGE_ROOT
+
+    if not asset_pipeline.ASSET_NAME_RE.match(name):
+        return jsonify({'error': 'Invalid asset name'}), 404
+    digest = name.split('.', 1)[0]
+    if digest in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = send_from_directory(os.path.join(STORAGE_ROOT, asset_pipeline.ASSET_STORE), name,
+                                       etag=False, conditional=False)
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+
 @app.route('/api/preview/brand-asset/<int:brand_id>/<asset_type>')
 @login_required
 def get_brand_asset_preview(brand_id, asset_type):
@@ -4155,6 +5133,31 @@ def get_brand_asset_preview(brand_id, asset_type):
         
         if not asset_path:
             return jsonify({'error': f'{asset_type.capitalize()} not found'}), 404
+
+        # ?size=thumb|preview serves a pre-sized derivative from the asset
+        # pipeline (WebP preview when the browser accepts it); the master is
+        # the fallback for brands uploaded before derivatives existed.
+        size = request.args.get('size')
+        if size in ('thumb', 'preview'):
+            try:
+                variants = json.loads(brand.get(f'{asset_type}_derivatives') or '{}').get('variants') or {}
+            except (ValueError, TypeError, AttributeError):
+                variants = {}
+            if size == 'preview' and 'image/webp' in request.headers.get('Accept', '') \
+                    and 'preview_webp' in variants:
+                size = 'preview_webp'
+            if size in variants:
+                asset_path = variants[size]['path']
+
+        # Content-addressed assets live at an immutable URL; send the browser
+        # there so the bytes are fetched once and then come from its cache.
+        from . import asset_pipeline
+        immutable_url = asset_pipeline.asset_url(asset_path)
+        if immutable_url:
+            response = redirect(immutable_url)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['Vary'] = 'Accept'
+            return response
         
         # Construct full path from storage root
         full_path = os.path.join(STORAGE_ROOT, asset_path)
@@ -4167,11 +5170,12 @@ def get_brand_asset_preview(brand_id, asset_type):
         if not os.path.exists(full_path):
             return jsonify({'error': f'{asset_type.capitalize()} file not found on disk'}), 404
 
-        # Serve the file — no-cache so browsers always revalidate after re-upload
-        # (logo_normalized.png is overwritten in-place; same URL but new content)
+        # Legacy per-brand file — no-cache so browsers always revalidate after re-upload
+        # (logo_normalized.png was overwritten in-place; same URL but new content)
         response = send_from_directory(os.path.dirname(full_path), os.path.basename(full_path))
         response.headers['Cache-Control'] = 'no-cache, must-revalidate'
         response.headers['Pragma'] = 'no-cache'
+        response.headers['Vary'] = 'Accept'
         return response
         
     except Exception as e:
@@ -4192,6 +5196,8 @@ def list_brands():
         
         user_id = session.get('user_id')
         
+        from . import asset_pipeline
+
         # Get only user-owned brands (exclude system brands)
         brands = get_all_brands(user_id=user_id, include_system=False)
         
@@ -4205,6 +5211,8 @@ def list_brands():
             'is_ready': brand.get('is_ready', False),
             'is_system': brand.get('is_system', False),
             'updated_at': brand.get('updated_at'),  # cache-bust token for logo/watermark URLs
+            # Immutable content-addressed URLs (None for pre-pipeline uploads)
+            **asset_pipeline.brand_asset_urls(brand),
             
             # Asset Paths
             'logo_path': brand.get('logo_path'),
@@ -4336,6 +5344,9 @@ def get_all_brands_api():
         
         # Get user's brands (exclude system brands by default)
         brands = get_all_brands(user_id=user_id, include_system=include_system)
+        from . import asset_pipeline
+        for brand in brands:
+            brand.update(asset_pipeline.brand_asset_urls(brand))
         
         # Include tier info so frontend can update button state dynamically
         tier = get_user_tier(user_id)
@@ -4367,7 +5378,9 @@ def get_single_brand_api(brand_id):
         
         if not brand:
             return jsonify({'success': False, 'error': 'Brand not found'}), 404
-        
+
+        from . import asset_pipeline
+        brand.update(asset_pipeline.brand_asset_urls(brand))
         return jsonify({
             'success': True,
             'brand': brand
@@ -4619,7 +5632,7 @@ def delete_brand_api(brand_id):
 def upload_brand_logo(brand_id):
     """Upload logo for a brand"""
     try:
-        from .database import get_brand, update_brand
+        from .database import get_brand
         from .config import BRANDS_DIR, STORAGE_ROOT
         from werkzeug.utils import secure_filename
         
@@ -4653,58 +5666,23 @@ def upload_brand_logo(brand_id):
         original_path = os.path.join(brand_dir, original_filename)
         file.save(original_path)
         
-        # Normalize image: convert to PNG, resize, clean alpha
-        from .image_utils import normalize_logo
-        normalized_filename = 'logo_normalized.png'
-        normalized_path = os.path.join(brand_dir, normalized_filename)
-        
         # Get background removal preferences from request
         remove_bg = request.form.get('remove_bg')  # 'dark', 'light', or None
         bg_strength = int(request.form.get('bg_strength', 50))  # 0-150
-        
-        norm_result = normalize_logo(
-            original_path,
-            normalized_path,
-            max_dimension=1024,
-            remove_bg=remove_bg,
-            bg_strength=bg_strength
-        )
-
-        fallback_used = False
-        if not norm_result['success']:
-            # BG removal produced a bad/transparent result — fall back to safe mode (resize+convert only)
-            print(f"[BRANDS] normalize_logo failed for brand {brand_id} (remove_bg={remove_bg}): {norm_result.get('error')}")
-            print(f"[BRANDS] Falling back to safe normalization (no BG removal) for brand {brand_id}")
-            norm_result = normalize_logo(
-                original_path,
-                normalized_path,
-                max_dimension=1024,
-                remove_bg=None,
-                bg_strength=0
-            )
-            fallback_used = True
-            if not norm_result['success']:
-                return jsonify({
-                    'success': False,
-                    'error': f'Failed to normalize image even in safe mode: {norm_result.get("error")}'
-                }), 500
-
-        # Store relative path of NORMALIZED version (this is what VideoProcessor will use)
-        relative_path = os.path.relpath(normalized_path, STORAGE_ROOT)
-
-        # Update database
-        update_brand(brand_id, logo_path=relative_path)
 
-        print(f"[BRANDS] Uploaded & normalized logo for brand {brand_id}: {relative_path} (fallback={fallback_used})")
-        print(f"[BRANDS] Original: {norm_result.get('original_format')} {norm_result.get('original_size')}")
-        print(f"[BRANDS] Normalized: PNG {norm_result.get('normalized_size')}")
+        # Normalization + derivative pyramid run on the asset pipeline worker;
+        # the brand row is updated when it finishes (poll status_url).
+        from . import asset_pipeline
+        job_id = asset_pipeline.submit('logo', brand_id, user_id, brand_dir, original_path,
+                                       STORAGE_ROOT, remove_bg=remove_bg, bg_strength=bg_strength)
+        print(f"[BRANDS] Queued logo processing for brand {brand_id}: job {job_id[:8]}")
 
         return jsonify({
             'success': True,
-            'logo_path': relative_path,
-            'message': 'Logo uploaded and normalized successfully' + (' (BG removal skipped — result was transparent, using original)' if fallback_used else ''),
-            'fallback_used': fallback_used,
-            'metadata': norm_result
+            'status': 'processing',
+            'asset_job_id': job_id,
+            'status_url': f'/api/brands/asset-jobs/{job_id}',
+            'message': 'Logo uploaded — processing'
         })
     except Exception as e:
         import traceback
@@ -4716,7 +5694,7 @@ def upload_brand_logo(brand_id):
 def upload_brand_watermark(brand_id):
     """Upload watermark for a brand"""
     try:
-        from .database import get_brand, update_brand
+        from .database import get_brand
         from .config import BRANDS_DIR, STORAGE_ROOT
         from werkzeug.utils import secure_filename
         
@@ -4750,50 +5728,60 @@ def upload_brand_watermark(brand_id):
         original_path = os.path.join(brand_dir, original_filename)
         file.save(original_path)
         
-        # Normalize image: convert to PNG, resize, clean alpha
-        from .image_utils import normalize_logo
-        normalized_filename = 'watermark_normalized.png'
-        normalized_path = os.path.join(brand_dir, normalized_filename)
-        
         # Get background removal preferences from request
         remove_bg = request.form.get('remove_bg')  # 'dark', 'light', or None
         bg_strength = int(request.form.get('bg_strength', 50))  # 0-150
-        
-        norm_result = normalize_logo(
-            original_path, 
-            normalized_path,
-            max_dimension=2048,  # Watermarks can be larger
-            remove_bg=remove_bg,
-            bg_strength=bg_strength
-        )
-        
-        if not norm_result['success']:
-            return jsonify({
-                'success': False, 
-                'error': f'Failed to normalize image: {norm_result.get("error")}'
-            }), 500
-        
-        # Store relative path of NORMALIZED version
-        relative_path = os.path.relpath(normalized_path, STORAGE_ROOT)
-        
-        # Update database
-        update_brand(brand_id, watermark_path=relative_path)
-        
-        print(f"[BRANDS] Uploaded & normalized watermark for brand {brand_id}: {relative_path}")
-        print(f"[BRANDS] Original: {norm_result.get('original_format')} {norm_result.get('original_size')}")
-        print(f"[BRANDS] Normalized: PNG {norm_result.get('normalized_size')}")
-        
+
+        # Normalization + derivative pyramid run on the asset pipeline worker;
+        # the brand row is updated when it finishes (poll status_url).
+        from . import asset_pipeline
+        job_id = asset_pipeline.submit('watermark', brand_id, user_id, brand_dir, original_path,
+                                       STORAGE_ROOT, remove_bg=remove_bg, bg_strength=bg_strength)
+        print(f"[BRANDS] Queued watermark processing for brand {brand_id}: job {job_id[:8]}")
+
         return jsonify({
             'success': True,
-            'watermark_path': relative_path,
-            'message': 'Watermark uploaded and normalized successfully',
-            'metadata': norm_result
+            'status': 'processing',
+            'asset_job_id': job_id,
+            'status_url': f'/api/brands/asset-jobs/{job_id}',
+            'message': 'Watermark uploaded — processing'
         })
     except Exception as e:
         import traceback
         print(f"[BRANDS ERROR] Upload watermark: {traceback.format_exc()}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+@app.route('/api/brands/asset-jobs/<job_id>')
+@login_required
+def get_brand_asset_job(job_id):
+    """Status of a logo/watermark processing job (owner only).
+
+    When done, carries the same fields the synchronous upload used to return
+    (``logo_path`` / ``watermark_path``, ``fallback_used``, ``metadata``)."""
+    from . import asset_pipeline
+    job = asset_pipeline.get_job(job_id)
+    if not job or job.get('user_id') != session.get('user_id'):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    payload = {
+        'success': job['status'] != 'failed',
+        'status': job['status'],
+        'brand_id': job['brand_id'],
+        'kind': job['kind'],
+    }
+    if job['status'] == 'done':
+        payload[f"{job['kind']}_path"] = job['path']
+        payload['fallback_used'] = job.get('fallback_used', False)
+        payload['metadata'] = job.get('metadata')
+        payload['derivatives'] = job.get('derivatives')
+        payload.update(job.get('urls') or {})
+        payload['message'] = f"{job['kind'].capitalize()} uploaded and normalized successfully" + (
+            ' (BG removal skipped — result was transparent, using original)' if job.get('fallback_used') else '')
+    elif job['status'] == 'failed':
+        payload['error'] = job.get('error')
+    return jsonify(payload)
+
 # ============================================================================
 # API: WATERMARK CONVERSION (WebM to MP4)
 # ============================================================================
@@ -4913,13 +5901,11 @@ def _watermark_conversion_worker(job_id, temp_webm, output_path, mp4_filename):
             output_path
         ]
         
-        # Run FFmpeg conversion (background thread won't block Gunicorn worker)
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=300  # 5 minute timeout
-        )
+        # Run FFmpeg conversion (background thread won't block Gunicorn worker).
+        # Admitted against the memory budget — waits in the queue rather than
+        # starting while a render already fills memory.
+        from .video_processor import _run_ffmpeg
+        result = _run_ffmpeg(cmd, 300, operation='convert')  # 5 minute timeout
         
         # Clean up temp WebM
         try:
@@ -4928,7 +5914,7 @@ def _watermark_conversion_worker(job_id, temp_webm, output_path, mp4_filename):
             pass
         
         if result.returncode != 0:
-            stderr_output = result.stderr.decode('utf-8', errors='ignore')
+            stderr_output = result.stderr or ''
             error_preview = stderr_output[:500] if len(stderr_output) > 500 else stderr_output
             print(f"[CONVERT] Job {job_id[:8]} FAILED (exit {result.returncode}): {error_preview}")
             
@@ -5043,7 +6029,7 @@ def get_brand_job_status(job_id):
 
     response = {
         'job_id':     job_id,
-        'status':     job['status'],           # queued|processing|completed|failed
+        'status':     job['status'],           # queued|processing|completed|failed|cancelled
         'brand_name': job.get('brand_name', ''),
         'message':    job.get('message', ''),
     }
@@ -5056,10 +6042,102 @@ def get_brand_job_status(job_id):
     elif job['status'] == 'failed':
         response['success'] = False
         response['error']   = job.get('error', 'Unknown error')
+    elif job['status'] == 'cancelled':
+        response['success'] = False
+        response['error']   = 'Render cancelled'
 
     return jsonify(response)
 
 
+@app.route('/api/videos/brand-job/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_brand_job(job_id):
+    """Cancel a queued or running brand render job.
+    Kills the in-flight FFmpeg process; the worker thread skips remaining brands,
+    deletes partial outputs and normalized temps, and does not charge a credit.
+    """
+    if job_id not in brand_render_jobs:
+        return jsonify({
+            'error':   'Job not found',
+            'job_id':  job_id,
+            'message': 'Invalid job ID or job expired.',
+        }), 404
+
+    job = brand_render_jobs[job_id]
+
+    # Ownership check — users can only cancel their own jobs
+    if job.get('user_id') != session.get('user_id'):
+        return jsonify({'error': 'Access denied'}), 403
+
+    if job['status'] not in ('queued', 'processing'):
+        return jsonify({
+            'success': False,
+            'job_id':  job_id,
+            'status':  job['status'],
+            'error':   f"Job already {job['status']}",
+        }), 409
+
+    cancel_event = job.get('cancel_event')
+    if cancel_event is None:
+        return jsonify({'success': False, 'error': 'Job cannot be cancelled'}), 409
+    cancel_event.set()
+    job['message'] = 'Cancelling…'
+    print(f"[RENDER-ASYNC] {job_id[:8]} cancel requested by user={session.get('user_id')}")
+
+    return jsonify({
+        'success': True,
+        'job_id':  job_id,
+        'status':  job['status'],
+        'message': f'Cancel requested. Poll /api/videos/brand-job/{job_id} for final status.',
+    })
+
+
+@app.route('/api/videos/render-matrix/<job_id>', methods=['GET'])
+@login_required
+def get_render_matrix_status(job_id):
+    """Aggregated progress of a matrix render: node counts by state, a
+    weighted percentage, the outputs finished so far and any failures."""
+    job = render_matrix.get_job(job_id)
+    if job is None:
+        return jsonify({
+            'error':   'Job not found',
+            'job_id':  job_id,
+            'message': 'Invalid job ID or job expired.',
+        }), 404
+    if job.get('user_id') != session.get('user_id'):
+        return jsonify({'error': 'Access denied'}), 403
+    job.pop('user_id', None)
+    job['job_id'] = job_id
+    if job['finished_at']:
+        job['success'] = job['status'] in ('completed', 'partial')
+    return jsonify(job)
+
+
+@app.route('/api/videos/render-matrix/<job_id>/cancel', methods=['POST'])
+@login_required
+def cancel_render_matrix(job_id):
+    """Cancel a matrix render: pending nodes are dropped, in-flight FFmpeg is
+    killed, finished outputs are discarded and no credit is charged."""
+    job = render_matrix.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'job_id': job_id}), 404
+    if job.get('user_id') != session.get('user_id'):
+        return jsonify({'error': 'Access denied'}), 403
+    if not render_matrix.cancel(job_id):
+        return jsonify({
+            'success': False,
+            'job_id':  job_id,
+            'status':  job['status'],
+            'error':   f"Job already {job['status']}",
+        }), 409
+    print(f"[MATRIX] {job_id[:8]} cancel requested by user={session.get('user_id')}")
+    return jsonify({
+        'success': True,
+        'job_id':  job_id,
+        'message': f'Cancel requested. Poll /api/videos/render-matrix/{job_id} for final status.',
+    })
+
+
 # Stub endpoints removed - focus on core watermarking functionality
 
 
@@ -5627,6 +6705,8 @@ def schedule_cleanup():
     import threading
     from .database import (cleanup_old_downloads, cleanup_old_branded_outputs,
                            sweep_normalized_temp_files)
+    from .config import STORAGE_ROOT
+    from .asset_pipeline import sweep_unreferenced
 
     SWEEP_INTERVAL = 30 * 60     # 30 min — normalized temp sweep cadence
     FULL_CLEANUP_EVERY = 12      # full age-based cleanup every 12 sweeps (~6h)
@@ -5646,6 +6726,10 @@ def schedule_cleanup():
                     dl_count = cleanup_old_downloads(24)
                     render_count = cleanup_old_branded_outputs(24)
                     print(f"[CLEANUP] Deleted {dl_count} old downloads and {render_count} expired renders")
+                    # Replaced brand assets whose in-process GC timer died with a restart
+                    asset_count = sweep_unreferenced(STORAGE_ROOT)
+                    if asset_count:
+                        print(f"[CLEANUP] Swept {asset_count} unreferenced brand asset files")
 
                 tick += 1
                 time.sleep(SWEEP_INTERVAL)
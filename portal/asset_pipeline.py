@@ -0,0 +1,256 @@
+"""
+Background processing for uploaded brand assets (logo / watermark).
+
+Uploads used to normalize inside the request: LANCZOS resize, background
+removal and a PNG ``optimize=True`` pass, all before the response — and the
+result was a single 1024/2048px master that every render then rescaled per
+frame. Now the upload handler only saves the original and calls ``submit``;
+one worker thread:
+
+  1. normalizes the original (logo: retry without background removal if it
+     produced an empty image)
+  2. stores the master and its derivative pyramid
+     (``image_utils.build_derivatives``) content-addressed in
+     ``brands/assets/{sha256[:32]}.{ext}``
+  3. points the brand row at the master and its manifest
+     (``{kind}_path`` / ``{kind}_derivatives``)
+  4. after ``ASSET_GC_GRACE_SECONDS`` deletes the files the previous revision
+     used, unless some brand row still references them (duplicated brands
+     share blobs; in-flight renders still read the old ones). Those timers
+     die with the process, so ``sweep_unreferenced`` also runs at startup and
+     with the periodic cleanup
+
+A content-addressed file never changes, so its URL (``asset_url``) is served
+with ``immutable`` year-long caching and the hash as ETag, by a route that
+touches neither SQLite nor anything but the one file. The brand list hands
+these URLs to the browser directly; a repeat view of the brands page is then
+served entirely from the browser cache.
+
+Job state lives in ``asset_jobs`` (polled via /api/brands/asset-jobs/<id>).
+Single Gunicorn worker (WEB_CONCURRENCY=1): state is in-process.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# One worker: image work is CPU-bound and uploads are rare — serialising
+# them keeps an upload burst from competing with renders for cores.
+ASSET_PIPELINE_WORKERS = int(os.environ.get('ASSET_PIPELINE_WORKERS', '1'))
+
+# Finished jobs are kept this long for status polls
+JOB_TTL_SECONDS = 3600
+
+# Replaced assets are deleted this long after the brand row moves off them
+ASSET_GC_GRACE_SECONDS = int(os.environ.get('ASSET_GC_GRACE_SECONDS', '600'))
+
+MAX_DIMENSION = {'logo': 1024, 'watermark': 2048}
+
+# Content-addressed store, relative to STORAGE_ROOT, and its public URL prefix
+ASSET_STORE = os.path.join('brands', 'assets')
+ASSET_URL_PREFIX = '/assets/brand/'
+ASSET_NAME_RE = re.compile(r'^[0-9a-f]{32}\.(png|webp)$')
+
+asset_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def asset_url(rel_path):
+    """Immutable URL for a content-addressed asset path, or None for legacy
+    (mutable, per-brand) paths."""
+    if not rel_path:
+        return None
+    directory, name = os.path.split(rel_path)
+    if os.path.normpath(directory) != ASSET_STORE or not ASSET_NAME_RE.match(name):
+        return None
+    return ASSET_URL_PREFIX + name
+
+
+def brand_asset_urls(brand):
+    """``{kind}_url`` / ``{kind}_thumb_url`` / ``{kind}_preview_url`` for a brand
+    row — immutable URLs where the asset is content-addressed, else None."""
+    urls = {}
+    for kind in ('logo', 'watermark'):
+        try:
+            variants = json.loads(brand.get(f'{kind}_derivatives') or '{}').get('variants') or {}
+        except (ValueError, TypeError, AttributeError):
+            variants = {}
+        urls[f'{kind}_url'] = asset_url(brand.get(f'{kind}_path'))
+        for size in ('thumb', 'preview', 'preview_webp'):
+            urls[f'{kind}_{size}_url'] = asset_url((variants.get(size) or {}).get('path')) or urls[f'{kind}_url']
+    return urls
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ASSET_PIPELINE_WORKERS,
+                                           thread_name_prefix='asset-pipeline')
+        return _executor
+
+
+def _prune(now):
+    for job_id in [j for j, job in asset_jobs.items()
+                   if job.get('finished_at') and now - job['finished_at'] > JOB_TTL_SECONDS]:
+        del asset_jobs[job_id]
+
+
+def _update(job_id, **fields):
+    with _jobs_lock:
+        job = asset_jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+
+def get_job(job_id):
+    """Snapshot of one job, or None."""
+    with _jobs_lock:
+        job = asset_jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def submit(kind, brand_id, user_id, brand_dir, original_path, storage_root,
+           remove_bg=None, bg_strength=50):
+    """Queue processing of an uploaded original; returns the job id."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _jobs_lock:
+        _prune(now)
+        asset_jobs[job_id] = {
+            'status': 'queued',
+            'kind': kind,
+            'brand_id': brand_id,
+            'user_id': user_id,
+            'created_at': now,
+        }
+    _get_executor().submit(_process, job_id, kind, brand_id, brand_dir, original_path,
+                           storage_root, remove_bg, bg_strength)
+    return job_id
+
+
+def _revision_paths(brand, kind):
+    """Relative paths of the master and every derivative one brand revision uses."""
+    paths = {brand.get(f'{kind}_path')} - {None, ''}
+    try:
+        manifest = json.loads(brand.get(f'{kind}_derivatives') or '{}')
+        paths.update(v['path'] for v in (manifest.get('variants') or {}).values())
+    except (ValueError, TypeError, KeyError, AttributeError):
+        pass
+    return paths
+
+
+def _collect(rel_paths, storage_root):
+    """Delete replaced asset files that no brand row references any more.
+    Returns the number removed."""
+    from .database import is_brand_asset_referenced
+
+    removed = 0
+    for rel_path in rel_paths:
+        try:
+            if is_brand_asset_referenced(rel_path):
+                continue
+            os.remove(os.path.join(storage_root, rel_path))
+            removed += 1
+        except OSError:
+            pass
+        except Exception as e:
+            print(f"[ASSETS] GC check failed for {rel_path}: {e}")
+    if removed:
+        print(f"[ASSETS] GC removed {removed} replaced asset file(s)")
+    return removed
+
+
+def sweep_unreferenced(storage_root, min_age_seconds=ASSET_GC_GRACE_SECONDS):
+    """Delete files in the asset store that no brand row references and that
+    are older than the GC grace period.
+
+    Backstop for ``_schedule_collect``: its timers live in-process, so a restart
+    inside the grace window leaves the replaced files behind. Run at startup
+    and from the periodic cleanup. Returns the number of files removed."""
+    store = os.path.join(storage_root, ASSET_STORE)
+    try:
+        names = os.listdir(store)
+    except OSError:
+        return 0
+    cutoff = time.time() - min_age_seconds
+    stale = []
+    for name in names:
+        if not (ASSET_NAME_RE.match(name) or name.endswith('.tmp')):
+            continue
+        try:
+            if os.path.getmtime(os.path.join(store, name)) < cutoff:
+                stale.append(os.path.join(ASSET_STORE, name))
+        except OSError:
+            pass
+    return _collect(stale, storage_root)
+
+
+def _schedule_collect(rel_paths, storage_root):
+    if not rel_paths:
+        return
+    timer = threading.Timer(ASSET_GC_GRACE_SECONDS, _collect, args=(sorted(rel_paths), storage_root))
+    timer.daemon = True
+    timer.start()
+
+
+def _process(job_id, kind, brand_id, brand_dir, original_path, storage_root,
+             remove_bg, bg_strength):
+    from .image_utils import normalize_logo, build_derivatives, write_content_addressed
+    from .database import get_brand, update_brand
+
+    started = time.time()
+    _update(job_id, status='processing', started_at=started)
+    store_dir = os.path.join(storage_root, ASSET_STORE)
+    tmp_path = os.path.join(brand_dir, f'.{kind}_normalized.{job_id[:8]}.png')
+    try:
+        max_dimension = MAX_DIMENSION[kind]
+        norm_result = normalize_logo(original_path, tmp_path, max_dimension=max_dimension,
+                                     remove_bg=remove_bg, bg_strength=bg_strength)
+        fallback_used = False
+        if not norm_result['success'] and kind == 'logo':
+            # BG removal produced a bad/transparent result — fall back to safe mode (resize+convert only)
+            print(f"[ASSETS] normalize_logo failed for brand {brand_id} (remove_bg={remove_bg}): {norm_result.get('error')}")
+            print(f"[ASSETS] Falling back to safe normalization (no BG removal) for brand {brand_id}")
+            norm_result = normalize_logo(original_path, tmp_path, max_dimension=max_dimension,
+                                         remove_bg=None, bg_strength=0)
+            fallback_used = True
+        if not norm_result['success']:
+            raise ValueError(f"Failed to normalize image: {norm_result.get('error')}")
+
+        os.makedirs(store_dir, exist_ok=True)
+        with open(tmp_path, 'rb') as f:
+            master_path, _ = write_content_addressed(f.read(), store_dir, 'png')
+        os.remove(tmp_path)
+        manifest = build_derivatives(master_path, store_dir, kind, rel_root=storage_root)
+        relative_path = os.path.relpath(master_path, storage_root)
+
+        current = {f'{kind}_path': relative_path, f'{kind}_derivatives': json.dumps(manifest)}
+        previous = get_brand(brand_id=brand_id) or {}
+        update_brand(brand_id, **current)
+        _schedule_collect(_revision_paths(previous, kind) - _revision_paths(current, kind),
+                          storage_root)
+
+        elapsed = time.time() - started
+        print(f"[ASSETS] {kind} for brand {brand_id}: {relative_path} "
+              f"{norm_result.get('original_format')} {norm_result.get('original_size')} -> "
+              f"{norm_result.get('normalized_size')}, {len(manifest['variants'])} derivatives "
+              f"in {elapsed:.2f}s (fallback={fallback_used})")
+        urls = brand_asset_urls(current)
+        _update(job_id, status='done', finished_at=time.time(),
+                path=relative_path, fallback_used=fallback_used,
+                metadata=norm_result, derivatives=sorted(manifest['variants']),
+                urls={k: v for k, v in urls.items() if k.startswith(kind + '_')})
+    except Exception as e:
+        import traceback
+        print(f"[ASSETS ERROR] {kind} for brand {brand_id}: {traceback.format_exc()}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        _update(job_id, status='failed', finished_at=time.time(), error=str(e))
@@ -0,0 +1,297 @@
+"""
+Static brand layers (images and text) flattened into one overlay image.
+
+A visual-preset render used to chain one ``movie → scale → format →
+colorchannelmixer → overlay`` per brand element (watermark, logo, secondary
+logo), so every frame paid one full overlay blend per element. None of those
+layers change during the clip. ``flatten`` draws them once with Pillow, in the
+same order and with the same geometry the per-layer chain used, onto a
+transparent canvas at output W×H, crops it to the bounding box of its visible
+pixels and writes that atlas as a PNG. The render graph then overlays just
+that one image — per-frame cost no longer grows with the number of elements.
+
+Geometry mirrors the FFmpeg filters it replaces:
+
+  * ``scale=w:-1``      → height rounded from the aspect ratio, bicubic
+  * ``rotate=a:ow=hypot(iw,ih):oh=ow`` → clockwise, centred on a square canvas
+  * circle ``geq``      → alpha cleared outside the inscribed circle
+  * ``colorchannelmixer=aa=o`` → alpha × o
+  * ``overlay=cx-w/2:cy-h/2`` → position truncated and aligned down to an
+    even pixel, as overlay does for a yuv420 main input
+
+Text layers replace ``drawtext``, which laid out and rasterized the string on
+every frame and needed ``'``/``:`` escaping of user text. The string is
+rendered once to RGBA (``render_text``) with the same box and placement
+semantics — ``x``/``y`` truncated to whole pixels, ``boxborderw`` around the
+text bounds. Fonts come from a registry: a family name resolves to a file once
+(fontconfig's ``fc-match`` when present — the lookup drawtext itself relied
+on — else a scan of the system font directories, else a bundled-with-the-OS
+fallback), and loaded faces are kept per (file, size). Shaping is Pillow's
+layout engine (raqm when it is built in). Rendered text bitmaps are cached by
+(content, font, size, colour, box style).
+
+Layers are composited with straight-alpha "over", which blends the stack onto
+the video exactly as the chained overlays did. Atlases are cached on disk by a
+key over the layer specs and their source files (size, mtime), so a re-render
+of the same brand revision reuses the file without touching Pillow.
+"""
+import os
+import glob
+import json
+import math
+import hashlib
+import shutil
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+import numpy as np
+
+LAYER_CACHE_DIR = os.environ.get('LAYER_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'brandr_layers')
+MAX_LAYER_FILES = int(os.environ.get('MAX_LAYER_FILES', '256'))
+
+_KEY_LEN = 32
+
+FONT_DIRS = tuple(d for d in (
+    os.environ.get('FONT_DIR'),
+    '/usr/share/fonts',
+    '/usr/local/share/fonts',
+    os.path.expanduser('~/.fonts'),
+    '/Library/Fonts',
+    '/System/Library/Fonts',
+    os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts'),
+) if d)
+# Used when the requested family is not installed — the faces fontconfig
+# typically resolves "Sans" to, i.e. what drawtext drew without a fontfile
+FALLBACK_FONTS = ('DejaVuSans.ttf', 'LiberationSans-Regular.ttf', 'Arial.ttf', 'arial.ttf',
+                  'FreeSans.ttf', 'Helvetica.ttc')
+
+# FreeType faces are not safe to rasterize from two threads at once
+_font_lock = threading.Lock()
+
+
+# ── Font registry ────────────────────────────────────────────────────────────
+
+def _font_key(name):
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+
+@lru_cache(maxsize=1)
+def _font_index():
+    """Normalised file stem -> path, for every font file under FONT_DIRS."""
+    index = {}
+    for root_dir in FONT_DIRS:
+        for dirpath, _dirs, files in os.walk(root_dir):
+            for name in files:
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in ('.ttf', '.otf', '.ttc'):
+                    index.setdefault(_font_key(stem), os.path.join(dirpath, name))
+                    index.setdefault(name.lower(), os.path.join(dirpath, name))
+    return index
+
+
+def _fc_match(name):
+    if not shutil.which('fc-match'):
+        return None
+    try:
+        result = subprocess.run(['fc-match', '-f', '%{file}', name],
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    path = result.stdout.strip()
+    return path if result.returncode == 0 and os.path.isfile(path) else None
+
+
+@lru_cache(maxsize=64)
+def resolve_font_path(name):
+    """Font file for a family name (or a path), resolved once per process."""
+    name = (name or '').strip() or 'Sans'
+    if os.path.isfile(name):
+        return name
+    path = _fc_match(name)
+    if path:
+        return path
+    index = _font_index()
+    key = _font_key(name)
+    for candidate in (key, key + 'regular', key + 'mt'):
+        if candidate in index:
+            return index[candidate]
+    for fallback in FALLBACK_FONTS:
+        if fallback.lower() in index:
+            return index[fallback.lower()]
+    raise FileNotFoundError(f"no font file found for '{name}'")
+
+
+@lru_cache(maxsize=64)
+def get_font(path, size):
+    """Loaded face per (file, size)."""
+    return ImageFont.truetype(path, int(size))
+
+
+@lru_cache(maxsize=128)
+def render_text(content, font, size, color, box_color=None, box_opacity=0.0, box_border=0):
+    """The string rendered once to RGBA, drawtext-style.
+
+    The text's ink bounds sit ``box_border`` px inside the image edges (the
+    box, when box_color is set, fills the whole image). Returns
+    ``(image, text_w, text_h)``; the image is shared — do not modify it.
+    """
+    face = get_font(resolve_font_path(font), size)
+    with _font_lock:
+        left, top, right, bottom = face.getbbox(content)
+        text_w, text_h = max(1, right - left), max(1, bottom - top)
+        mask = Image.new('L', (text_w, text_h), 0)
+        ImageDraw.Draw(mask).text((-left, -top), content, font=face, fill=255)
+
+    size_wh = (text_w + 2 * box_border, text_h + 2 * box_border)
+    if box_color:
+        r, g, b = ImageColor.getrgb(box_color)[:3]
+        image = Image.new('RGBA', size_wh, (r, g, b, int(round(255 * box_opacity))))
+    else:
+        image = Image.new('RGBA', size_wh, (0, 0, 0, 0))
+    # Ink as its own straight-alpha layer so glyph edges don't pick up the
+    # transparent canvas's black
+    ink = Image.new('RGBA', (text_w, text_h), ImageColor.getrgb(color)[:3] + (0,))
+    ink.putalpha(mask)
+    image.alpha_composite(ink, dest=(box_border, box_border))
+    return image, text_w, text_h
+
+
+def _overlay_xy(value):
+    # overlay: (int)x & ~1 for a chroma-subsampled main input
+    return int(value) & ~1
+
+
+def _scale_to_width(img, width):
+    width = int(width) if width > 0 else img.width   # scale=0:-1 keeps the input width
+    height = max(1, (width * img.height + img.width // 2) // img.width)
+    return img.resize((width, height), Image.BICUBIC)
+
+
+def _rotate(img, degrees):
+    side = int(math.hypot(img.width, img.height))
+    rotated = img.rotate(-degrees, resample=Image.BICUBIC, expand=True)
+    canvas = Image.new('RGBA', (side, side), (0, 0, 0, 0))
+    canvas.paste(rotated, ((side - rotated.width) // 2, (side - rotated.height) // 2))
+    return canvas
+
+
+def _apply_alpha(img, opacity, circle):
+    pixels = np.array(img)
+    alpha = pixels[..., 3].astype(np.float32)
+    if circle:
+        h, w = alpha.shape
+        ys, xs = np.ogrid[:h, :w]
+        radius = min(w, h) / 2.0
+        outside = (xs - w / 2.0) ** 2 + (ys - h / 2.0) ** 2 > radius * radius
+        alpha[outside] = 0
+    if opacity < 1.0:
+        alpha *= max(0.0, float(opacity))
+    pixels[..., 3] = np.clip(alpha + 0.5, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, 'RGBA')
+
+
+def _render_text_layer(layer):
+    image, text_w, text_h = render_text(
+        layer['text'], layer.get('font') or 'Sans', layer['size'], layer['color'],
+        layer.get('box_color'), layer.get('box_opacity', 0.0), layer.get('box_border', 0))
+    border = layer.get('box_border', 0)
+    # drawtext: x/y are the text's top-left, truncated to whole pixels
+    x = int(layer['x'] - layer.get('ax', 0.0) * text_w) - border
+    y = int(layer['y'] - layer.get('ay', 0.0) * text_h) - border
+    return image, x, y
+
+
+def _render_layer(layer):
+    with Image.open(layer['path']) as src:
+        img = _scale_to_width(src.convert('RGBA'), layer['width'])
+    if layer.get('rotation'):
+        img = _rotate(img, layer['rotation'])
+    return _apply_alpha(img, layer.get('opacity', 1.0), layer.get('circle', False))
+
+
+def _composite_at(canvas, img, x, y):
+    """alpha_composite img onto canvas at (x, y), clipping at every edge."""
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + img.width, canvas.width)
+    bottom = min(y + img.height, canvas.height)
+    if right <= left or bottom <= top:
+        return
+    part = img.crop((left - x, top - y, right - x, bottom - y))
+    canvas.alpha_composite(part, dest=(left, top))
+
+
+def layer_key(layers, frame_w, frame_h):
+    """Cache key: frame size, every layer spec and its source file's identity."""
+    sources = []
+    for layer in layers:
+        if 'text' in layer:
+            sources.append(resolve_font_path(layer.get('font') or 'Sans'))
+            continue
+        st = os.stat(layer['path'])
+        sources.append([st.st_size, st.st_mtime_ns])
+    payload = json.dumps([frame_w, frame_h, layers, sources], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:_KEY_LEN]
+
+
+def _prune(cache_dir):
+    try:
+        entries = [e for e in os.scandir(cache_dir) if e.name.endswith('.png')]
+    except OSError:
+        return
+    if len(entries) <= MAX_LAYER_FILES:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:len(entries) - MAX_LAYER_FILES]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def flatten(layers, frame_w, frame_h, cache_dir=None):
+    """Composite static layers (bottom first) into one cropped RGBA atlas.
+
+    An image layer is a dict: ``path``, ``width`` (scaled width, px),
+    ``cx``/``cy`` (centre, px), ``opacity``, ``rotation`` (degrees, clockwise)
+    and ``circle``. A text layer has ``text``, ``font``, ``size``, ``color``,
+    ``box_color``/``box_opacity``/``box_border`` and an anchor: the text's
+    top-left is ``(x - ax*text_w, y - ay*text_h)``. Returns ``(png_path, x, y)`` — the atlas and the even-aligned
+    offset to overlay it at — or None when nothing visible lands in the frame.
+    """
+    cache_dir = cache_dir or LAYER_CACHE_DIR
+    key = layer_key(layers, frame_w, frame_h)
+    # Offset travels in the file name so a hit needs no image decode
+    for path in glob.glob(os.path.join(cache_dir, key + '_*.png')):
+        x, y = os.path.basename(path)[len(key) + 1:-4].split('_')
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path, int(x), int(y)
+
+    canvas = Image.new('RGBA', (frame_w, frame_h), (0, 0, 0, 0))
+    for layer in layers:
+        if 'text' in layer:
+            _composite_at(canvas, *_render_text_layer(layer))
+            continue
+        img = _render_layer(layer)
+        _composite_at(canvas, img,
+                      _overlay_xy(layer['cx'] - img.width / 2),
+                      _overlay_xy(layer['cy'] - img.height / 2))
+
+    bbox = canvas.getchannel('A').getbbox()
+    if bbox is None:
+        return None
+    left, top = bbox[0] & ~1, bbox[1] & ~1
+    atlas = canvas.crop((left, top, bbox[2], bbox[3]))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{key}_{left}_{top}.png')
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    atlas.save(tmp, 'PNG', compress_level=1)
+    os.replace(tmp, path)
+    _prune(cache_dir)
+    return path, left, top
@@ -65,6 +65,8 @@ TIER_CONFIG = {
         'max_brand_configs': 1,
         'concurrent_jobs': 1,
         'max_render_bookmarks': 5,   # renders saved from 24h expiry
+        'max_source_seconds': 180,  # fetch planner rejects longer sources up front
+        'max_source_mb': 150,
     },
     'Creator': {
         'label': 'Creator',
@@ -83,6 +85,8 @@ TIER_CONFIG = {
         'max_brand_configs': 5,
         'concurrent_jobs': 3,
         'max_render_bookmarks': 25,
+        'max_source_seconds': 600,
+        'max_source_mb': 400,
     },
     'Studio': {
         'label': 'Studio',
@@ -102,6 +106,8 @@ TIER_CONFIG = {
         'concurrent_jobs': 5,
         'priority_processing': True,
         'max_render_bookmarks': 50,
+        'max_source_seconds': 900,
+        'max_source_mb': 600,
     },
     # Platinum: professional tier — power features, dual-logo composition, priority
     'Platinum': {
@@ -122,6 +128,8 @@ TIER_CONFIG = {
         'concurrent_jobs': 10,
         'priority_processing': True,
         'max_render_bookmarks': -1,  # unlimited
+        'max_source_seconds': 1800,
+        'max_source_mb': 1000,
     },
     # Elite: invitation-only gold tier — hidden from all public surfaces
     'Elite': {
@@ -141,6 +149,8 @@ TIER_CONFIG = {
         'priority_processing': True,
         'hidden': True,           # NOT shown in upgrade modal
         'max_render_bookmarks': -1,  # unlimited
+        'max_source_seconds': -1,  # unlimited
+        'max_source_mb': -1,
     },
 }
 
@@ -354,6 +364,25 @@ def calculate_output_contract(source_count, brand_count, variant_count, limits):
     }
 
 
+# Render seconds per second of source (normalize + one brand pass on the
+# 512MB Render instance). Tune from /api/admin/render-stats.
+RENDER_SECONDS_PER_SOURCE_SECOND = float(os.environ.get('RENDER_SECONDS_PER_SOURCE_SECOND', '0.8'))
+
+
+def estimate_source_cost(duration, est_bytes):
+    """
+    Up-front cost of fetching + rendering one source, from metadata alone.
+
+    Returns dict with est_bytes, est_mb and est_render_seconds (None when the
+    input is unknown).
+    """
+    return {
+        'est_bytes': est_bytes,
+        'est_mb': round(est_bytes / (1024 * 1024), 1) if est_bytes else None,
+        'est_render_seconds': round(duration * RENDER_SECONDS_PER_SOURCE_SECOND, 1) if duration else None,
+    }
+
+
 def get_next_visible_tier(current_tier):
     """Return the next visible tier above the current one, or None if at top."""
     try:
@@ -1,6 +1,6 @@
 """
-Instagram cookie pool — discovery, validation, least-recently-used rotation,
-and per-cookie health tracking with cooldown on auth failure.
+Instagram cookie pool — discovery, validation, score-ranked rotation, and
+persistent per-cookie health tracking with cooldown on auth failure.
 
 Replaces the never-wired ``cookie_utils.py``. Instagram requires session cookies
 to download; a single cookie is a single point of failure (when its ``sessionid``
@@ -15,7 +15,8 @@ If only ``INSTAGRAM_COOKIES`` is set, the pool has one member and behaviour is
 identical to before (one cookie, no rotation).
 
 Rotation contract (enforced by the caller in app.py):
-  * pick the least-recently-used cookie that isn't cooling down
+  * pick the best-scoring cookie that isn't cooling down (EWMA success rate,
+    minus a latency penalty, plus a small bonus for resting; ties → LRU)
   * on an auth failure (403 / "empty media response" / login-required), try the
     next cookie
   * a cookie is only cooled down when it fails AND a different cookie then
@@ -23,11 +24,18 @@ Rotation contract (enforced by the caller in app.py):
     fails) never knocks the whole pool offline
   * if every cookie fails, the caller shows one friendly error
 
-Safe on a single Gunicorn worker (WEB_CONCURRENCY=1). A lock still guards the
-in-memory health map for the case where one fetch downloads several URLs.
+Health is persisted in SQLite (``cookie_health`` / ``cookie_pool_state``):
+every change writes through, and the in-memory map is re-read from the DB at
+most every HEALTH_SYNC_SECONDS. Restarts and deploys keep cooldowns, scores and
+an open breaker, and several processes share one view. Persistence is
+best-effort — if the DB is unavailable the pool keeps working from memory.
+A slot's row is reset when its cookie content (sessionid) changes.
+
+A lock guards the in-memory map: fetch planning runs several URLs concurrently.
 """
 import os
 import time
+import hashlib
 import threading
 
 MAX_POOL = 10
@@ -40,11 +48,98 @@ COOLDOWN_SECONDS = 30 * 60   # a cookie proven dead rests this long before retry
 # zero and returns the friendly error instantly until the window elapses.
 POOL_BREAKER_SECONDS = int(os.environ.get('IG_POOL_BREAKER_SECONDS', 5 * 60))
 
+# Scoring: EWMA weight of the newest attempt, prior for an untried cookie,
+# and how much latency / rest move the score.
+SCORE_ALPHA = 0.3
+SCORE_PRIOR = 0.75
+LATENCY_PENALTY_PER_10S = 0.1
+MAX_LATENCY_PENALTY = 0.3
+REST_BONUS_SECONDS = 10 * 60
+MAX_REST_BONUS = 0.1
+
+# How stale the in-memory copy may get before re-reading the shared DB state.
+HEALTH_SYNC_SECONDS = float(os.environ.get('COOKIE_HEALTH_SYNC_SECONDS', '5'))
+
 _lock = threading.Lock()
 _pool = []      # ordered list of cookie file paths on disk
-# path -> {'last_used': float, 'cooldown_until': float, 'fails': int}
+# path -> {'fingerprint', 'last_used', 'cooldown_until', 'fails', 'success_rate',
+#          'latency_ms', 'attempts', 'successes', 'failure_counts',
+#          'last_failure_class'}
 _health = {}
 _pool_blocked_until = 0.0   # epoch; > now means the breaker is open
+_synced_at = 0.0
+
+
+def _fingerprint(text):
+    """Short hash of the cookie's sessionid line (whole text if not found), so
+    a refreshed cookie in the same slot starts with clean health."""
+    for line in text.splitlines():
+        if '\tsessionid\t' in line:
+            text = line
+            break
+    return hashlib.sha256(text.encode('utf-8', 'replace')).hexdigest()[:16]
+
+
+def _new_health(fingerprint):
+    return {'fingerprint': fingerprint, 'last_used': 0.0, 'cooldown_until': 0.0,
+            'fails': 0, 'success_rate': None, 'latency_ms': None, 'attempts': 0,
+            'successes': 0, 'failure_counts': {}, 'last_failure_class': None}
+
+
+# ── Persistence (best-effort) ────────────────────────────────────────────────
+# database is imported lazily: config imports this module at import time, and
+# database imports config. Loaded standalone (scripts/simulate_cookie_rotation.py)
+# there is no package, so persistence is silently skipped.
+
+def _sync(force=False):
+    """Refresh the in-memory health map and breaker from the DB if stale."""
+    global _synced_at, _pool_blocked_until
+    now = time.time()
+    if not force and now - _synced_at < HEALTH_SYNC_SECONDS:
+        return
+    _synced_at = now
+    try:
+        from . import database
+        rows = database.get_cookie_health_rows()
+        breaker_until = database.get_cookie_pool_state('breaker_until', 0.0)
+    except ImportError:
+        return
+    except Exception as e:
+        print(f"[COOKIE POOL] health sync skipped: {e}")
+        return
+    with _lock:
+        for path in _pool:
+            row = rows.get(os.path.basename(path))
+            h = _health[path]
+            if row and row.get('fingerprint') == h['fingerprint']:
+                for k in h:
+                    if k in row and row[k] is not None:
+                        h[k] = row[k]
+        _pool_blocked_until = breaker_until
+
+
+def _persist(path):
+    with _lock:
+        h = dict(_health.get(path) or {})
+    if not h:
+        return
+    try:
+        from . import database
+        database.save_cookie_health(os.path.basename(path), h)
+    except ImportError:
+        return
+    except Exception as e:
+        print(f"[COOKIE POOL] could not persist health for {os.path.basename(path)}: {e}")
+
+
+def _persist_breaker(value):
+    try:
+        from . import database
+        database.set_cookie_pool_state('breaker_until', value)
+    except ImportError:
+        return
+    except Exception as e:
+        print(f"[COOKIE POOL] could not persist breaker: {e}")
 
 
 def _looks_valid(text):
@@ -96,12 +191,14 @@ def bootstrap_pool(pool_dir):
             print(f"[COOKIE POOL] could not write {path}: {e}")
             continue
         pool.append(path)
-        health[path] = {'last_used': 0.0, 'cooldown_until': 0.0, 'fails': 0}
+        health[path] = _new_health(_fingerprint(raw))
         print(f"[COOKIE POOL] loaded {env_name} -> {os.path.basename(path)}")
 
+    global _synced_at
     with _lock:
         _pool = pool
         _health = health
+        _synced_at = 0.0   # hydrate from the DB on first use
     print(f"[COOKIE POOL] {len(pool)} cookie(s) in pool")
     return pool
 
@@ -111,13 +208,26 @@ def pool_size():
         return len(_pool)
 
 
-def candidates_lru():
-    """Snapshot of usable cookie paths (cooldown elapsed), least-recently-used
-    first. Empty list means the pool is empty or every cookie is cooling down."""
+def _score(h, now):
+    """Higher is better. Untried cookies sit at SCORE_PRIOR."""
+    rate = h['success_rate'] if h['success_rate'] is not None else SCORE_PRIOR
+    penalty = min(MAX_LATENCY_PENALTY,
+                  (h['latency_ms'] or 0) / 10000.0 * LATENCY_PENALTY_PER_10S)
+    idle = now - h['last_used'] if h['last_used'] else REST_BONUS_SECONDS
+    bonus = MAX_REST_BONUS * min(1.0, idle / REST_BONUS_SECONDS)
+    return rate - penalty + bonus
+
+
+def candidates_ranked():
+    """Snapshot of usable cookie paths (cooldown elapsed), best score first,
+    least-recently-used among equals. Empty list means the pool is empty or
+    every cookie is cooling down."""
+    _sync()
     now = time.time()
     with _lock:
         usable = [p for p in _pool if _health[p]['cooldown_until'] <= now]
-        return sorted(usable, key=lambda p: _health[p]['last_used'])
+        return sorted(usable, key=lambda p: (-round(_score(_health[p], now), 3),
+                                             _health[p]['last_used']))
 
 
 def mark_used(path):
@@ -125,15 +235,48 @@ def mark_used(path):
         h = _health.get(path)
         if h:
             h['last_used'] = time.time()
+    _persist(path)
+
+
+def _record_attempt(h, ok, latency_ms):
+    sample = 1.0 if ok else 0.0
+    h['attempts'] += 1
+    h['successes'] += 1 if ok else 0
+    h['success_rate'] = (sample if h['success_rate'] is None else
+                         (1 - SCORE_ALPHA) * h['success_rate'] + SCORE_ALPHA * sample)
+    if latency_ms is not None:
+        h['latency_ms'] = (latency_ms if h['latency_ms'] is None else
+                           (1 - SCORE_ALPHA) * h['latency_ms'] + SCORE_ALPHA * latency_ms)
 
 
-def mark_success(path):
-    """A cookie worked — clear its failure state."""
+def mark_success(path, latency_ms=None):
+    """A cookie worked — clear its failure state and raise its score."""
     with _lock:
         h = _health.get(path)
         if h:
             h['fails'] = 0
             h['cooldown_until'] = 0.0
+            _record_attempt(h, True, latency_ms)
+    _persist(path)
+
+
+def mark_failure(path, error_text, latency_ms=None):
+    """A request with this cookie failed — count the failure class and, unless
+    it is a content failure (private/removed post: no cookie would have done
+    better), lower its score. Does NOT cool it down (see mark_bad). Returns
+    the class."""
+    failure_class = classify_failure(error_text)
+    with _lock:
+        h = _health.get(path)
+        if h:
+            if failure_class != 'content':
+                _record_attempt(h, False, latency_ms)
+            counts = dict(h['failure_counts'] or {})
+            counts[failure_class] = counts.get(failure_class, 0) + 1
+            h['failure_counts'] = counts
+            h['last_failure_class'] = failure_class
+    _persist(path)
+    return failure_class
 
 
 def mark_bad(path):
@@ -146,6 +289,7 @@ def mark_bad(path):
             h['cooldown_until'] = time.time() + COOLDOWN_SECONDS
             fails = h['fails']
     if h:
+        _persist(path)
         print(f"[COOKIE ALERT] {os.path.basename(path)} failed auth "
               f"({fails} total) — cooling down {COOLDOWN_SECONDS // 60}min")
 
@@ -156,6 +300,8 @@ def trip_breaker():
     global _pool_blocked_until
     with _lock:
         _pool_blocked_until = time.time() + POOL_BREAKER_SECONDS
+        until = _pool_blocked_until
+    _persist_breaker(until)
     print(f"[COOKIE POOL] circuit breaker OPEN for {POOL_BREAKER_SECONDS // 60}min "
           f"— all cookies failed (likely an Instagram IP block); skipping fetches to "
           f"avoid digging deeper", flush=True)
@@ -169,11 +315,13 @@ def reset_breaker():
         was_open = _pool_blocked_until > time.time()
         _pool_blocked_until = 0.0
     if was_open:
+        _persist_breaker(0.0)
         print("[COOKIE POOL] circuit breaker CLOSED — Instagram fetch succeeded", flush=True)
 
 
 def breaker_open():
     """True while the breaker is open (skip Instagram fetches)."""
+    _sync()
     with _lock:
         return _pool_blocked_until > time.time()
 
@@ -210,13 +358,40 @@ def is_auth_failure(error_text):
     return any(sig in low for sig in _AUTH_SIGNATURES)
 
 
+def classify_failure(error_text):
+    """Bucket a yt-dlp error for health tracking: rate_limit, checkpoint,
+    auth, network or content."""
+    low = (error_text or '').lower()
+    if any(sig in low for sig in ('rate limit', 'rate-limit', 'please wait a few minutes',
+                                  'http error 429', 'too many requests')):
+        return 'rate_limit'
+    if 'checkpoint_required' in low or 'challenge_required' in low:
+        return 'checkpoint'
+    if is_auth_failure(low):
+        return 'auth'
+    if any(sig in low for sig in ('timed out', 'timeout', 'connection', 'network',
+                                  'temporary failure', 'ssl')):
+        return 'network'
+    return 'content'
+
+
 def health_snapshot():
     """Observability: per-cookie state for an admin/debug view."""
+    _sync()
     now = time.time()
     with _lock:
         return [
             {
                 'name': os.path.basename(p),
+                'score': round(_score(_health[p], now), 3),
+                'success_rate': (round(_health[p]['success_rate'], 3)
+                                 if _health[p]['success_rate'] is not None else None),
+                'latency_ms': (int(_health[p]['latency_ms'])
+                               if _health[p]['latency_ms'] is not None else None),
+                'attempts': _health[p]['attempts'],
+                'successes': _health[p]['successes'],
+                'failure_counts': dict(_health[p]['failure_counts'] or {}),
+                'last_failure_class': _health[p]['last_failure_class'],
                 'fails': _health[p]['fails'],
                 'cooling_down': _health[p]['cooldown_until'] > now,
                 'cooldown_remaining_s': max(0, int(_health[p]['cooldown_until'] - now)),
@@ -6,9 +6,15 @@ import sys
 import sqlite3
 import json
 import time
+import queue
+import atexit
+import threading
+from concurrent.futures import Future
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 from .config import DB_PATH
+from . import metrics
+from . import tracing
 
 
 @contextmanager
@@ -23,52 +29,192 @@ def get_connection():
         conn.close()
 
 
+# ── Single-writer queue ─────────────────────────────────────────────────────
+# Every write that used to fight for SQLite's writer lock from its own
+# connection (request threads, the render thread, the cleanup thread) is handed
+# to ONE writer thread that owns ONE connection. Writes queued together are
+# group-committed: one BEGIN IMMEDIATE ... COMMIT for the batch, each write in
+# its own SAVEPOINT so a failing write is rolled back alone. No lock retries,
+# no sleep ladder; the only wait is the queue itself (plus busy_timeout if a
+# direct get_connection() writer elsewhere holds the lock).
+WRITE_BATCH_MAX = int(os.environ.get('DB_WRITE_BATCH_MAX', '32'))
+
+
+class _QueuedConnection:
+    """What a queued write fn receives as ``conn``: the writer's connection,
+    with commit/rollback owned by the queue. commit() is a no-op (the batch
+    commits); rollback() undoes this fn's savepoint only."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self._conn.execute('ROLLBACK TO write_fn')
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _WriteQueue:
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._conn = None
+        self._conn_path = None
+        self._proxy = None
+
+    def submit(self, fn):
+        """Queue fn(conn); returns a concurrent.futures.Future for its result."""
+        if threading.current_thread() is self._thread:
+            # Nested write from inside a queued fn: run it in the current batch.
+            future = Future()
+            future.set_result(fn(self._proxy))
+            return future
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future, time.time()))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far is committed (used at exit)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self.submit(lambda conn: None).result(timeout=timeout)
+        except Exception:
+            pass
+
+    def _connect(self):
+        conn = sqlite3.connect(DB_PATH, timeout=30.0, isolation_level=None,
+                               check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA busy_timeout=30000')
+        self._conn = conn
+        self._conn_path = DB_PATH
+        self._proxy = _QueuedConnection(conn)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit_batch(batch)
+            except Exception as e:  # never let the writer thread die
+                print(f"[DATABASE] Writer batch failed: {e}")
+                for _fn, future, _queued in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _commit_batch(self, batch):
+        started = time.time()
+        metrics.DB_WRITE_BATCH_SIZE.observe(len(batch))
+        for _fn, _future, queued_at in batch:
+            metrics.DB_WRITE_QUEUE_SECONDS.observe(started - queued_at)
+        if self._conn is not None and self._conn_path != DB_PATH:
+            # DB_PATH repointed (test harnesses): reopen on the new file
+            self._conn.close()
+            self._conn = None
+        if self._conn is None:
+            self._connect()
+        conn = self._conn
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, future, _queued in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT write_fn')
+                try:
+                    result = fn(self._proxy)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_fn')
+                    conn.execute('RELEASE write_fn')
+                    metrics.DB_WRITES.inc(outcome='error')
+                    future.set_exception(e)
+                    continue
+                conn.execute('RELEASE write_fn')
+                results.append((future, result))
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            # BEGIN/COMMIT (or a savepoint rollback) failed: nothing in the batch
+            # is durable. Disk I/O errors also drop the connection.
+            err_lower = str(e).lower()
+            outcome = ('disk_io_error' if 'disk i/o' in err_lower
+                       else 'locked' if 'locked' in err_lower else 'error')
+            print(f"[DATABASE] Write batch of {len(batch)} failed ({outcome}): {e}")
+            try:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            if outcome == 'disk_io_error':
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                self._conn = None
+            for _fn, future, _queued in batch:
+                if not future.done():
+                    metrics.DB_WRITES.inc(outcome=outcome)
+                    future.set_exception(e)
+            return
+        for future, result in results:
+            metrics.DB_WRITES.inc(outcome='ok')
+            future.set_result(result)
+
+
+_writer = _WriteQueue()
+
+
+def _report_write_failure(tag, what):
+    """Done-callback for fire-and-forget writes: log a failure, never raise."""
+    def _callback(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[{tag}] {what} failed: {future.exception()}", flush=True)
+    return _callback
+
+
+def submit_write(fn):
+    """Queue a write without waiting. fn receives a connection and performs the
+    write (its conn.commit() is a no-op — the writer group-commits).
+    Returns a Future; call .result() only if you need the value (e.g. a row id)."""
+    return _writer.submit(fn)
+
+
 def _retry_write(fn, max_retries=7):
-    """Execute a write function with retry on database lock.
+    """Execute a write function on the single-writer queue and wait for it.
     fn receives a connection and should perform the write + commit.
-    Returns whatever fn returns.
-
-    Retriable conditions:
-      - 'database is locked'  — another writer holds EXCLUSIVE/RESERVED lock
-      - 'database is locked (database is locked)' — WAL checkpoint contention
+    Returns whatever fn returns; re-raises whatever fn (or the commit) raised.
 
-    Non-retriable conditions (re-raised immediately):
-      - disk I/O error        — disk full or corrupted; retrying will not help
-      - any other error       — surface immediately for diagnosis
+    Historically this retried 'database is locked' with a sleep ladder of up to
+    23 s. Writes are now serialized by the writer thread, so there is nothing to
+    retry; max_retries is accepted for compatibility and ignored.
 
     The caller is responsible for catching OperationalError if the write
     is non-critical (e.g. usage counters after a successful render).
     """
-    # Total soft-wait: 0.3+0.6+1.2+2.4+4.8+6.0+8.0 = 23.3 s across all retries.
-    # Each attempt also benefits from the connection-level timeout=30 s.
-    backoff_times = [0.3, 0.6, 1.2, 2.4, 4.8, 6.0, 8.0]
-    last_exc = None
-    for attempt in range(max_retries):
-        try:
-            with get_connection() as conn:
-                result = fn(conn)
-                return result
-        except sqlite3.OperationalError as e:
-            err_lower = str(e).lower()
-            # Disk I/O errors are not lock-related; retrying will not help.
-            if 'disk i/o' in err_lower or 'disk i/o error' in err_lower:
-                print(f"[DATABASE] Disk I/O error (not retrying): {e}")
-                raise
-            if 'locked' in err_lower and attempt < max_retries - 1:
-                wait_time = backoff_times[attempt]
-                print(
-                    f"[DATABASE] Locked on attempt {attempt + 1}/{max_retries}, "
-                    f"retrying in {wait_time}s… ({e})"
-                )
-                last_exc = e
-                time.sleep(wait_time)
-                continue
-            else:
-                # Last attempt or non-lock error — raise
-                if attempt == max_retries - 1 and last_exc is not None:
-                    print(f"[DATABASE] All {max_retries} write attempts exhausted. Last error: {e}")
-                raise
-    return None
+    # Traced as a db_write span (queue wait + commit) when a render trace is active.
+    op = getattr(fn, '__qualname__', 'write').split('.<locals>')[0]
+    with tracing.span('db_write', op=op):
+        return submit_write(fn).result()
+
 
 def init_db():
     """Initialize database with required tables"""
@@ -223,6 +369,54 @@ def init_db():
             )
         ''')
 
+        # Raw media store - one file per canonical (platform, media_id), shared by
+        # every downloads row that references it (downloads.raw_media_id).
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS raw_media (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                platform TEXT NOT NULL,
+                media_id TEXT NOT NULL,
+                content_hash TEXT,
+                file_path TEXT NOT NULL,
+                size_bytes INTEGER,
+                duration REAL,
+                title TEXT,
+                source_url TEXT,
+                created_at TEXT NOT NULL,
+                last_used_at TEXT NOT NULL,
+                UNIQUE(platform, media_id)
+            )
+        ''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_raw_media_hash ON raw_media(content_hash)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_raw_media_path ON raw_media(file_path)')
+
+        # Instagram cookie pool health - persisted so cooldowns, success
+        # scores and the pool breaker survive restarts and are shared by every
+        # process. Keyed by pool slot file name; fingerprint resets the row
+        # when the cookie behind a slot is replaced.
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS cookie_health (
+                name TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                last_used REAL NOT NULL DEFAULT 0,
+                cooldown_until REAL NOT NULL DEFAULT 0,
+                fails INTEGER NOT NULL DEFAULT 0,
+                success_rate REAL,
+                latency_ms REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                successes INTEGER NOT NULL DEFAULT 0,
+                failure_counts TEXT,
+                last_failure_class TEXT,
+                updated_at REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS cookie_pool_state (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            )
+        ''')
+
         # Branded outputs table - track rendered/branded output files per user
         c.execute('''
             CREATE TABLE IF NOT EXISTS branded_outputs (
@@ -304,6 +498,27 @@ def init_db():
         c.execute('CREATE INDEX IF NOT EXISTS idx_render_events_user ON render_events(user_id)')
         c.execute('CREATE INDEX IF NOT EXISTS idx_render_events_date ON render_events(created_on)')
 
+        # Per-job trace spans (portal/tracing.py). One row per span; the
+        # top-level 'job' span covers the whole job. Written in one batch when
+        # the job ends — best-effort like render_events.
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS render_spans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                user_id INTEGER,
+                seq INTEGER,
+                parent_seq INTEGER,
+                name TEXT,
+                start_ms REAL,
+                duration_ms REAL,
+                attrs TEXT,
+                created_on TEXT,
+                created_at TEXT
+            )
+        ''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_render_spans_job ON render_spans(job_id)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_render_spans_date ON render_spans(created_on)')
+
         # Beta access / waitlist table
         c.execute('''
             CREATE TABLE IF NOT EXISTS beta_access (
@@ -517,6 +732,16 @@ def _run_migrations():
             c.execute("ALTER TABLE brands ADD COLUMN format_overrides TEXT DEFAULT NULL")
             conn.commit()
             print("[DATABASE] Migration completed: format_overrides added")
+
+        # Migration: derivative manifests for uploaded brand assets (asset_pipeline.py)
+        for _col in ('logo_derivatives', 'watermark_derivatives'):
+            try:
+                c.execute(f"SELECT {_col} FROM brands LIMIT 1")
+            except sqlite3.OperationalError:
+                print(f"[DATABASE] Running migration: Adding {_col} column")
+                c.execute(f"ALTER TABLE brands ADD COLUMN {_col} TEXT DEFAULT NULL")
+                conn.commit()
+                print(f"[DATABASE] Migration completed: {_col} added")
         
         # Migration: Add display_name to downloads table
         try:
@@ -641,6 +866,36 @@ def _run_migrations():
             conn.commit()
             print("[DATABASE] Migration completed: purged_at column added")
         
+        # Migration: link downloads rows to the shared raw media store
+        try:
+            c.execute("SELECT raw_media_id FROM downloads LIMIT 1")
+        except sqlite3.OperationalError:
+            print("[DATABASE] Running migration: Adding raw_media_id to downloads")
+            c.execute("ALTER TABLE downloads ADD COLUMN raw_media_id INTEGER DEFAULT NULL")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_downloads_raw_media ON downloads(raw_media_id)")
+            conn.commit()
+            print("[DATABASE] Migration completed: raw_media_id added")
+
+        # Migration: source duration on the raw media store (tier ceilings on a hit)
+        try:
+            c.execute("SELECT duration FROM raw_media LIMIT 1")
+        except sqlite3.OperationalError:
+            print("[DATABASE] Running migration: Adding duration to raw_media")
+            c.execute("ALTER TABLE raw_media ADD COLUMN duration REAL DEFAULT NULL")
+            conn.commit()
+            print("[DATABASE] Migration completed: duration added")
+
+        # Migration: render-output cache key on branded_outputs (render_cache.py)
+        try:
+            c.execute("SELECT render_key FROM branded_outputs LIMIT 1")
+        except sqlite3.OperationalError:
+            print("[DATABASE] Running migration: Adding render_key to branded_outputs")
+            c.execute("ALTER TABLE branded_outputs ADD COLUMN render_key TEXT DEFAULT NULL")
+            conn.commit()
+            print("[DATABASE] Migration completed: render_key added")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_branded_outputs_render_key ON branded_outputs(render_key)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_branded_outputs_path ON branded_outputs(file_path)")
+
         # Platinum is a valid internal supertier — no migration needed.
         # Do NOT auto-convert Platinum users. Platinum is assigned manually by admins.
 
@@ -1144,7 +1399,7 @@ def get_all_referral_codes():
 
 
 # ========== SOURCE EDITS (REFRAME/CROP) ==========
-# Per (user, source video, output format) reframe/crop settings for Studio.
+# Per (user, source video, output format) reframe/crop/trim settings for Studio.
 # Content edit — NOT a brand edit. One row per user+source+format.
 
 def init_source_edits():
@@ -1175,6 +1430,12 @@ def init_source_edits():
                 print("[DATABASE] Migration: added flip_h column to source_edits")
             except sqlite3.OperationalError:
                 pass  # column already exists
+            for column in ('trim_start', 'trim_end'):
+                try:
+                    conn.execute(f"ALTER TABLE source_edits ADD COLUMN {column} REAL DEFAULT NULL")
+                    print(f"[DATABASE] Migration: added {column} column to source_edits")
+                except sqlite3.OperationalError:
+                    pass  # column already exists
             conn.commit()
     except Exception as e:
         print(f'[DATABASE] init_source_edits error: {e}')
@@ -1187,6 +1448,8 @@ SOURCE_EDIT_DEFAULTS = {
     'zoom': 1.0,
     'crop_mode': 'fit',
     'flip_h': 0,
+    'trim_start': None,   # seconds into the source; None = from the start
+    'trim_end': None,     # seconds into the source; None = to the end
 }
 
 
@@ -1196,7 +1459,7 @@ def get_source_edit(user_id, source_filename, output_format):
     try:
         with get_connection() as conn:
             row = conn.execute(
-                '''SELECT crop_x, crop_y, zoom, crop_mode, flip_h
+                '''SELECT crop_x, crop_y, zoom, crop_mode, flip_h, trim_start, trim_end
                    FROM source_edits
                    WHERE user_id = ? AND source_filename = ? AND output_format = ?''',
                 (user_id, source_filename, output_format)
@@ -1208,6 +1471,8 @@ def get_source_edit(user_id, source_filename, output_format):
                 'zoom':      row['zoom'],
                 'crop_mode': row['crop_mode'],
                 'flip_h':    row['flip_h'] or 0,
+                'trim_start': row['trim_start'],
+                'trim_end':  row['trim_end'],
             }
     except Exception as e:
         print(f'[DATABASE] get_source_edit error: {e}')
@@ -1215,8 +1480,9 @@ def get_source_edit(user_id, source_filename, output_format):
 
 
 def upsert_source_edit(user_id, source_filename, output_format,
-                       crop_x, crop_y, zoom, crop_mode, flip_h=0):
-    """Insert or update the reframe/crop edit for (user, source, format).
+                       crop_x, crop_y, zoom, crop_mode, flip_h=0,
+                       trim_start=None, trim_end=None):
+    """Insert or update the reframe/crop/trim edit for (user, source, format).
     Caller is responsible for validating ownership and clamping values.
     Returns True on success, False on error."""
     now = datetime.utcnow().isoformat()
@@ -1226,17 +1492,20 @@ def upsert_source_edit(user_id, source_filename, output_format,
             conn.execute(
                 '''INSERT INTO source_edits
                        (user_id, source_filename, output_format,
-                        crop_x, crop_y, zoom, crop_mode, flip_h, created_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        crop_x, crop_y, zoom, crop_mode, flip_h, trim_start, trim_end,
+                        created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                    ON CONFLICT(user_id, source_filename, output_format) DO UPDATE SET
                         crop_x     = excluded.crop_x,
                         crop_y     = excluded.crop_y,
                         zoom       = excluded.zoom,
                         crop_mode  = excluded.crop_mode,
                         flip_h     = excluded.flip_h,
+                        trim_start = excluded.trim_start,
+                        trim_end   = excluded.trim_end,
                         updated_at = excluded.updated_at''',
                 (user_id, source_filename, output_format,
-                 crop_x, crop_y, zoom, crop_mode, flip_h, now, now)
+                 crop_x, crop_y, zoom, crop_mode, flip_h, trim_start, trim_end, now, now)
             )
             conn.commit()
         return True
@@ -1329,15 +1598,17 @@ def get_recent_jobs(limit=20):
         return [dict(row) for row in rows]
 
 def log_event(level, job_id, message, details=None):
-    """Log an event. Fire-and-forget — never crashes the caller."""
+    """Log an event. Fire-and-forget (queued write) — never crashes the caller."""
     try:
-        with get_connection() as conn:
-            c = conn.cursor()
-            c.execute('''
+        row = (datetime.utcnow().isoformat(), level, job_id, message, json.dumps(details) if details else None)
+        def _do(conn):
+            conn.execute('''
                 INSERT INTO logs (timestamp, level, job_id, message, details)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (datetime.utcnow().isoformat(), level, job_id, message, json.dumps(details) if details else None))
+            ''', row)
             conn.commit()
+        submit_write(_do).add_done_callback(
+            _report_write_failure('LOG_EVENT', f'log ({level}): {message}'))
     except Exception as e:
         print(f"[LOG_EVENT] Failed to log ({level}): {message} — {e}")
 
@@ -1597,12 +1868,11 @@ def find_inactive_brand(name, user_id):
 def create_brand(name, display_name, user_id=None, is_system=False, is_locked=False,
                  watermark_vertical=None, watermark_square=None, watermark_landscape=None,
                  logo_path=None, **config):
-    """Create a new brand with retry on database lock"""
+    """Create a new brand (serialized through the write queue)"""
     now = datetime.utcnow().isoformat()
     
     def _do_create(conn):
         c = conn.cursor()
-        c.execute('BEGIN IMMEDIATE')
         c.execute('''
             INSERT INTO brands (
                 name, display_name, user_id, is_system, is_locked, is_active,
@@ -1656,7 +1926,7 @@ def create_brand(name, display_name, user_id=None, is_system=False, is_locked=Fa
     return _retry_write(_do_create)
 
 def update_brand(brand_id, **updates):
-    """Update a brand's properties with retry on database lock"""
+    """Update a brand's properties (serialized through the write queue)"""
     now = datetime.utcnow().isoformat()
     
     # Build dynamic update query
@@ -1671,7 +1941,9 @@ def update_brand(brand_id, **updates):
         'wm_mode', 'wm_x', 'wm_y', 'wm_scale', 'wm_opacity',
         'text_x_percent', 'text_y_percent',
         # Patch 54: per-format position overrides (JSON blob)
-        'format_overrides'
+        'format_overrides',
+        # Derivative pyramids written by asset_pipeline (JSON manifests)
+        'logo_derivatives', 'watermark_derivatives',
     ]
     
     set_clauses = []
@@ -1697,13 +1969,26 @@ def update_brand(brand_id, **updates):
     
     def _do_update(conn):
         c = conn.cursor()
-        c.execute('BEGIN IMMEDIATE')
         c.execute(query, params)
         conn.commit()
         return True
     
     return _retry_write(_do_update)
 
+def is_brand_asset_referenced(rel_path):
+    """True if any brand row (active or not) still points at this asset file —
+    as its logo/watermark master or inside a derivative manifest."""
+    like = f'%"{rel_path}"%'
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT 1 FROM brands
+            WHERE logo_path = ? OR watermark_path = ?
+               OR logo_derivatives LIKE ? OR watermark_derivatives LIKE ?
+            LIMIT 1
+        ''', (rel_path, rel_path, like, like))
+        return c.fetchone() is not None
+
 def delete_brand(brand_id):
     """Soft delete a brand (set is_active = 0)"""
     def _do_delete(conn):
@@ -1816,10 +2101,14 @@ def save_download(user_id, source_url, filename, file_path, display_name=None):
     
     def _do_save(conn):
         c = conn.cursor()
+        # Ownership row for a shared raw_media file → counts as one reference
+        c.execute('SELECT id FROM raw_media WHERE file_path = ?', (file_path,))
+        row = c.fetchone()
+        raw_media_id = row['id'] if row else None
         c.execute('''
-            INSERT INTO downloads (user_id, source_url, filename, display_name, file_path, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (user_id, source_url, filename, display_name, file_path, datetime.utcnow().isoformat()))
+            INSERT INTO downloads (user_id, source_url, filename, display_name, file_path, raw_media_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, source_url, filename, display_name, file_path, raw_media_id, datetime.utcnow().isoformat()))
         
         download_id = c.lastrowid
         conn.commit()
@@ -1830,24 +2119,71 @@ def save_download(user_id, source_url, filename, file_path, display_name=None):
 def save_branded_output(user_id, source_filename, output_filename, file_path,
                         brand_id=None, brand_name=None, output_format='vertical_9_16',
                         width=None, height=None, aspect_ratio=None,
-                        source_download_id=None):
-    """Persist a branded output record. Returns the new row id."""
+                        source_download_id=None, render_key=None):
+    """Persist a branded output record. Returns the new row id.
+    render_key identifies the bytes for the render-output cache (render_cache.py)."""
     def _do_save(conn):
         c = conn.cursor()
         c.execute('''
             INSERT INTO branded_outputs
               (user_id, source_filename, source_download_id, output_filename,
                file_path, brand_id, brand_name, output_format,
-               width, height, aspect_ratio, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               width, height, aspect_ratio, render_key, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (user_id, source_filename, source_download_id, output_filename,
               file_path, brand_id, brand_name, output_format,
-              width, height, aspect_ratio, datetime.utcnow().isoformat()))
+              width, height, aspect_ratio, render_key, datetime.utcnow().isoformat()))
         conn.commit()
         return c.lastrowid
     return _retry_write(_do_save)
 
 
+def delete_branded_outputs(output_ids):
+    """Delete branded_outputs rows by id (files are the caller's responsibility).
+    Used when a render job is cancelled after some brands already completed."""
+    ids = [i for i in (output_ids or []) if i is not None]
+    if not ids:
+        return 0
+
+    def _do_delete(conn):
+        c = conn.cursor()
+        placeholders = ','.join('?' * len(ids))
+        c.execute(f'DELETE FROM branded_outputs WHERE id IN ({placeholders})', ids)
+        conn.commit()
+        return c.rowcount
+    return _retry_write(_do_delete)
+
+
+def find_render_output(render_key):
+    """File path of a cached render for render_key, or None.
+
+    Output names are deterministic per (source, brand, format), so a later
+    render with different settings replaces the file under that name. The newest
+    row for a path describes its current bytes: the hit only counts when
+    that row carries this render_key."""
+    if not render_key:
+        return None
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            SELECT bo.file_path FROM branded_outputs bo
+            WHERE bo.render_key = ?
+              AND bo.id = (SELECT MAX(id) FROM branded_outputs WHERE file_path = bo.file_path)
+            ORDER BY bo.id DESC LIMIT 1
+        ''', (render_key,))
+        row = c.fetchone()
+        return row['file_path'] if row else None
+
+
+def is_branded_output_referenced(file_path):
+    """True if any branded_outputs row still points at this file — cached
+    renders share one file between ownership rows."""
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute('SELECT 1 FROM branded_outputs WHERE file_path = ? LIMIT 1', (file_path,))
+        return c.fetchone() is not None
+
+
 def get_branded_outputs_for_user(user_id, limit=50):
     """Return branded output records for a user, newest first.
     Patch 41: LEFT JOIN downloads to surface display_name as source_display_name.
@@ -1972,7 +2308,8 @@ def get_user_render_bookmark_count(user_id):
 
 def cleanup_old_branded_outputs(max_age_hours=24):
     """Delete branded_outputs rows older than max_age_hours where bookmarked=0,
-    and remove the corresponding files from disk."""
+    and remove the corresponding files from disk unless a newer row (a cached
+    re-render) still points at them."""
     from datetime import datetime, timedelta
     import os
 
@@ -1988,11 +2325,13 @@ def cleanup_old_branded_outputs(max_age_hours=24):
         )
         rows = c.fetchall()
         ids = [r['id'] for r in rows]
-        paths = [r['file_path'] for r in rows if r['file_path']]
+        paths = {r['file_path'] for r in rows if r['file_path']}
         if ids:
             placeholders = ','.join('?' * len(ids))
             c.execute(f'DELETE FROM branded_outputs WHERE id IN ({placeholders})', ids)
             conn.commit()
+        paths = [p for p in paths
+                 if c.execute('SELECT 1 FROM branded_outputs WHERE file_path = ? LIMIT 1', (p,)).fetchone() is None]
         return paths, len(ids)
 
     try:
@@ -2024,7 +2363,7 @@ def get_download(download_id, user_id):
 
 def cleanup_old_downloads(max_age_hours=24):
     """Delete downloads older than max_age_hours.
-    Uses _retry_write so the background cleanup thread doesn't hold a
+    Runs on the write queue so the background cleanup thread doesn't hold a
     long-lived write connection that could block post-render accounting."""
     from datetime import datetime, timedelta
     import os
@@ -2047,6 +2386,9 @@ def cleanup_old_downloads(max_age_hours=24):
         print(f"[CLEANUP] DB locked during download cleanup (will retry next cycle): {e}")
         deleted_count = 0
 
+    # Shared raw media: bytes go only when the last downloads reference has expired
+    cleanup_orphan_raw_media(max_age_hours)
+
     # Also clean up old files from the storage directory (always best-effort)
     cleanup_old_files(max_age_hours)
 
@@ -2087,6 +2429,9 @@ def cleanup_old_files(max_age_hours=24):
 
     try:
         protected_paths = get_bookmarked_realpaths()
+        # Raw media store files have their own refcounted lifecycle
+        # (cleanup_orphan_raw_media) — mtime says nothing about live references.
+        protected_paths |= get_raw_media_realpaths()
     except Exception as e:
         # Conservative: if protected saved paths cannot be loaded, skip generic cleanup.
         print(f"[CLEANUP] Could not load bookmarked file paths; skipping generic file cleanup: {e}")
@@ -2112,6 +2457,200 @@ def cleanup_old_files(max_age_hours=24):
     return deleted_count
 
 
+# ── Raw media store ──────────────────────────────────────────────────────────
+# One file per canonical (platform, media_id). A repeat fetch of the same URL —
+# by any user — reuses the stored bytes and only adds a downloads row. Identical
+# bytes under different media ids (reposts) collapse onto one file via
+# content_hash. Reference count = downloads rows with raw_media_id = id.
+
+def get_raw_media(platform, media_id):
+    """Return the raw_media row for a canonical (platform, media_id), or None."""
+    with get_connection() as conn:
+        row = conn.execute(
+            'SELECT * FROM raw_media WHERE platform = ? AND media_id = ?',
+            (platform, media_id)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def find_raw_media_by_hash(content_hash):
+    """Return the newest raw_media row with this content hash, or None."""
+    if not content_hash:
+        return None
+    with get_connection() as conn:
+        row = conn.execute(
+            'SELECT * FROM raw_media WHERE content_hash = ? ORDER BY id DESC LIMIT 1',
+            (content_hash,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def register_raw_media(platform, media_id, content_hash, file_path, size_bytes,
+                       title=None, source_url=None, duration=None):
+    """Insert or refresh the store entry for (platform, media_id). Returns its id.
+    duration (seconds) lets a store hit be checked against tier source ceilings."""
+    now = datetime.utcnow().isoformat()
+
+    def _do_register(conn):
+        c = conn.cursor()
+        c.execute('''
+            INSERT INTO raw_media
+              (platform, media_id, content_hash, file_path, size_bytes, duration, title,
+               source_url, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(platform, media_id) DO UPDATE SET
+              content_hash = excluded.content_hash,
+              file_path    = excluded.file_path,
+              size_bytes   = excluded.size_bytes,
+              duration     = COALESCE(excluded.duration, raw_media.duration),
+              title        = COALESCE(excluded.title, raw_media.title),
+              last_used_at = excluded.last_used_at
+        ''', (platform, media_id, content_hash, file_path, size_bytes, duration, title,
+              source_url, now, now))
+        c.execute('SELECT id FROM raw_media WHERE platform = ? AND media_id = ?',
+                  (platform, media_id))
+        raw_media_id = c.fetchone()['id']
+        conn.commit()
+        return raw_media_id
+    return _retry_write(_do_register)
+
+
+def touch_raw_media(raw_media_id):
+    """Mark a store entry as just reused (keeps an unreferenced entry alive)."""
+    def _do_touch(conn):
+        conn.execute('UPDATE raw_media SET last_used_at = ? WHERE id = ?',
+                     (datetime.utcnow().isoformat(), raw_media_id))
+        conn.commit()
+        return True
+    return _retry_write(_do_touch)
+
+
+def get_raw_media_refcount(raw_media_id):
+    """Number of downloads rows currently referencing a store entry."""
+    with get_connection() as conn:
+        return conn.execute(
+            'SELECT COUNT(*) FROM downloads WHERE raw_media_id = ?', (raw_media_id,)
+        ).fetchone()[0]
+
+
+def get_raw_media_realpaths():
+    """Realpaths of every file owned by the raw media store."""
+    import os
+    with get_connection() as conn:
+        rows = conn.execute('SELECT file_path FROM raw_media').fetchall()
+    return {os.path.realpath(r['file_path']) for r in rows if r['file_path']}
+
+
+def cleanup_orphan_raw_media(max_age_hours=24):
+    """Delete store entries (row + file) with no downloads references that have
+    not been reused within max_age_hours. Files still bookmarked are never
+    removed. Returns the number of entries deleted."""
+    import os
+    from datetime import timedelta
+
+    cutoff_iso = (datetime.utcnow() - timedelta(hours=max_age_hours)).isoformat()
+
+    def _do_cleanup(conn):
+        c = conn.cursor()
+        c.execute('''
+            SELECT r.id, r.file_path FROM raw_media r
+            WHERE r.last_used_at < ?
+              AND NOT EXISTS (SELECT 1 FROM downloads d WHERE d.raw_media_id = r.id)
+        ''', (cutoff_iso,))
+        rows = c.fetchall()
+        ids = [r['id'] for r in rows]
+        if ids:
+            placeholders = ','.join('?' * len(ids))
+            c.execute(f'DELETE FROM raw_media WHERE id IN ({placeholders})', ids)
+            conn.commit()
+        return [r['file_path'] for r in rows if r['file_path']]
+
+    try:
+        protected_paths = get_bookmarked_realpaths()
+        file_paths = _retry_write(_do_cleanup) or []
+    except Exception as e:
+        print(f"[CLEANUP] Raw media cleanup skipped (will retry next cycle): {e}")
+        return 0
+
+    # Hash dedup can leave two rows on one file — keep bytes any survivor still owns
+    remaining = get_raw_media_realpaths()
+    for fp in file_paths:
+        real = os.path.realpath(fp)
+        if real in protected_paths or real in remaining:
+            continue
+        try:
+            if os.path.exists(fp):
+                os.remove(fp)
+        except OSError as e:
+            print(f"[CLEANUP] Could not delete raw media file {fp}: {e}")
+    if file_paths:
+        print(f"[CLEANUP] Released {len(file_paths)} unreferenced raw media entries")
+    return len(file_paths)
+
+
+# ── Cookie pool health ───────────────────────────────────────────────────────
+# Backing store for cookie_pool. cookie_pool keeps an in-memory copy and writes
+# through on every change, so these are small single-row statements.
+
+_COOKIE_HEALTH_FIELDS = ('fingerprint', 'last_used', 'cooldown_until', 'fails',
+                         'success_rate', 'latency_ms', 'attempts', 'successes',
+                         'failure_counts', 'last_failure_class')
+
+
+def get_cookie_health_rows():
+    """All persisted cookie health rows as {name: dict}."""
+    with get_connection() as conn:
+        rows = conn.execute('SELECT * FROM cookie_health').fetchall()
+    out = {}
+    for r in rows:
+        d = dict(r)
+        try:
+            d['failure_counts'] = json.loads(d['failure_counts'] or '{}')
+        except (TypeError, ValueError):
+            d['failure_counts'] = {}
+        out[d['name']] = d
+    return out
+
+
+def save_cookie_health(name, health):
+    """Upsert one cookie's health row from cookie_pool's in-memory dict."""
+    values = [health.get(f) for f in _COOKIE_HEALTH_FIELDS]
+    values[_COOKIE_HEALTH_FIELDS.index('failure_counts')] = json.dumps(
+        health.get('failure_counts') or {})
+    cols = ', '.join(_COOKIE_HEALTH_FIELDS)
+    updates = ', '.join(f'{f} = excluded.{f}' for f in _COOKIE_HEALTH_FIELDS)
+
+    def _do_save(conn):
+        conn.execute(f'''
+            INSERT INTO cookie_health (name, {cols}, updated_at)
+            VALUES (?, {', '.join('?' for _ in _COOKIE_HEALTH_FIELDS)}, ?)
+            ON CONFLICT(name) DO UPDATE SET {updates}, updated_at = excluded.updated_at
+        ''', (name, *values, time.time()))
+        conn.commit()
+        return True
+    return _retry_write(_do_save)
+
+
+def get_cookie_pool_state(key, default=0.0):
+    """Read a numeric pool-wide value (e.g. 'breaker_until')."""
+    with get_connection() as conn:
+        row = conn.execute('SELECT value FROM cookie_pool_state WHERE key = ?',
+                           (key,)).fetchone()
+    return row['value'] if row else default
+
+
+def set_cookie_pool_state(key, value):
+    """Write a numeric pool-wide value."""
+    def _do_set(conn):
+        conn.execute('''
+            INSERT INTO cookie_pool_state (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        ''', (key, float(value)))
+        conn.commit()
+        return True
+    return _retry_write(_do_set)
+
+
 def sweep_normalized_temp_files(max_age_minutes=30):
     """Delete stale normalized temp files (``*_normalized_*.mp4``) in RAW_DIR.
 
@@ -2359,7 +2898,8 @@ def set_subscription_credits(user_id, amount):
 def log_render_event(user_id, job_id, brand_id, brand_name, output_format,
                      render_seconds, output_kb, brand_count):
     """Record one completed brand render. Never raises — telemetry must not
-    break a render that already succeeded."""
+    break a render that already succeeded. Queued without waiting; returns the
+    write's Future (None if it could not be queued)."""
     def _do(conn):
         now = datetime.utcnow()
         conn.execute(
@@ -2375,11 +2915,14 @@ def log_render_event(user_id, job_id, brand_id, brand_name, output_format,
         conn.commit()
         return True
     try:
-        return _retry_write(_do)
+        future = submit_write(_do)
+        future.add_done_callback(_report_write_failure(
+            'RENDER-EVENT', f'log (render unaffected) user={user_id} job={job_id}'))
+        return future
     except Exception as e:
         print(f"[RENDER-EVENT] log failed (render unaffected) user={user_id} job={job_id}: {e}",
               flush=True)
-        return False
+        return None
 
 
 def _median(values):
@@ -2473,6 +3016,123 @@ def get_user_render_stats(days=30, limit=50):
         return []
 
 
+# ── Render traces ───────────────────────────────────────────────────────────
+# Stage spans per job (see tracing.py): where a slow job actually spent its
+# time. Same best-effort contract as render_events.
+
+def save_render_spans(job_id, user_id, spans):
+    """Persist one job's spans (tracing.Trace.to_rows()). Never raises.
+    Queued without waiting; returns the write's Future (None if nothing queued)."""
+    if not spans:
+        return None
+    def _do(conn):
+        now = datetime.utcnow()
+        created_on, created_at = now.strftime('%Y-%m-%d'), now.isoformat(timespec='seconds')
+        conn.executemany(
+            'INSERT INTO render_spans '
+            '(job_id, user_id, seq, parent_seq, name, start_ms, duration_ms, attrs, created_on, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(job_id, user_id, s['seq'], s['parent_seq'], s['name'], s['start_ms'], s['duration_ms'],
+              json.dumps(s['attrs'], default=str) if s['attrs'] else None, created_on, created_at)
+             for s in spans]
+        )
+        conn.commit()
+        return True
+    try:
+        future = submit_write(_do)
+        future.add_done_callback(_report_write_failure(
+            'RENDER-TRACE', f'save (render unaffected) job={job_id}'))
+        return future
+    except Exception as e:
+        print(f"[RENDER-TRACE] save failed (render unaffected) job={job_id}: {e}", flush=True)
+        return None
+
+
+def get_render_trace(job_id):
+    """All spans of one job in start order (waterfall view). Never raises."""
+    try:
+        with get_connection() as conn:
+            rows = conn.execute(
+                'SELECT seq, parent_seq, name, start_ms, duration_ms, attrs, user_id, created_at '
+                'FROM render_spans WHERE job_id = ? ORDER BY start_ms, seq', (job_id,)
+            ).fetchall()
+        spans = []
+        for r in rows:
+            span = dict(r)
+            try:
+                span['attrs'] = json.loads(r['attrs']) if r['attrs'] else {}
+            except (TypeError, ValueError):
+                span['attrs'] = {}
+            spans.append(span)
+        return spans
+    except Exception as e:
+        print(f"[RENDER-TRACE] get_render_trace error job={job_id}: {e}", flush=True)
+        return []
+
+
+def get_recent_render_traces(limit=25):
+    """Most recent traced jobs (their top-level 'job' span). Never raises."""
+    try:
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT job_id, user_id, duration_ms, attrs, created_at FROM render_spans "
+                "WHERE name = 'job' ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        traces = []
+        for r in rows:
+            try:
+                attrs = json.loads(r['attrs']) if r['attrs'] else {}
+            except (TypeError, ValueError):
+                attrs = {}
+            traces.append({
+                'job_id': r['job_id'],
+                'user_id': r['user_id'],
+                'total_seconds': round((r['duration_ms'] or 0) / 1000.0, 2),
+                'status': attrs.get('status'),
+                'created_at': r['created_at'],
+            })
+        return traces
+    except Exception as e:
+        print(f"[RENDER-TRACE] get_recent_render_traces error: {e}", flush=True)
+        return []
+
+
+def get_render_stage_stats(days=30):
+    """Per-stage span aggregates over the last `days`, largest total first:
+    count, total/mean/p95 time and each stage's share of total job time.
+    Nested stages overlap their parents, so shares do not sum to 100. Never raises."""
+    try:
+        cutoff = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+        with get_connection() as conn:
+            rows = conn.execute(
+                'SELECT name, duration_ms FROM render_spans '
+                'WHERE created_on >= ? AND duration_ms IS NOT NULL', (cutoff,)
+            ).fetchall()
+        by_stage = {}
+        for r in rows:
+            by_stage.setdefault(r['name'], []).append(r['duration_ms'])
+        job_total = sum(by_stage.get('job', [])) or None
+        stages = []
+        for name, durations in by_stage.items():
+            if name == 'job':
+                continue
+            ds = sorted(durations)
+            total = sum(ds)
+            stages.append({
+                'stage': name,
+                'count': len(ds),
+                'total_seconds': round(total / 1000.0, 1),
+                'mean_ms': round(total / len(ds), 1),
+                'p95_ms': round(ds[min(len(ds) - 1, int(len(ds) * 0.95))], 1),
+                'pct_of_job_time': round(100.0 * total / job_total, 1) if job_total else None,
+            })
+        stages.sort(key=lambda s: s['mean_ms'] * s['count'], reverse=True)
+        return stages
+    except Exception as e:
+        print(f"[RENDER-TRACE] get_render_stage_stats error: {e}", flush=True)
+        return []
+
+
 def get_user_special_status(user_id):
     """Get user's special_status from the database. Returns None if no status or on DB error."""
     try:
@@ -4,8 +4,42 @@ Handles format conversion, background removal, and asset optimization
 """
 from PIL import Image, ImageOps
 import os
+import io
+import hashlib
 import numpy as np
 
+# Derivative pyramid per asset kind (see build_derivatives).
+# render_<w>: widths a 720-wide frame actually scales to — the logo is drawn at
+# logo_scale × 720 (≈ 30–360 px), the watermark at up to ~1.5 × 720.
+RENDER_WIDTHS = {
+    'logo': (64, 128, 256, 512),
+    'watermark': (180, 360, 720, 1080),
+}
+PREVIEW_MAX = {'logo': 512, 'watermark': 1024}   # editor canvas
+THUMB_MAX = 128                                   # brand cards / pickers
+
+# Content-addressed file names: first 32 hex chars (128 bits) of the SHA-256
+# of the file's bytes. Long enough to be unguessable — the name is the URL.
+CONTENT_HASH_LEN = 32
+
+
+def write_content_addressed(data, out_dir, ext):
+    """Write bytes to ``out_dir/{sha256[:32]}.{ext}`` (atomically, once).
+
+    Returns (path, full sha256 hex digest)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(out_dir, f'{digest[:CONTENT_HASH_LEN]}.{ext}')
+    if not os.path.exists(path):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    else:
+        # Reused blob: refresh its mtime so the unreferenced-asset sweep's age
+        # check doesn't take it before the brand row points at it
+        os.utime(path)
+    return path, digest
+
 
 def normalize_logo(input_path, output_path, max_dimension=1024, remove_bg=None, bg_strength=50):
     """
@@ -22,8 +56,9 @@ def normalize_logo(input_path, output_path, max_dimension=1024, remove_bg=None,
         dict with success status and metadata
     """
     try:
-        # Open image
+        # Open image once; format/size are read before any transform
         img = Image.open(input_path)
+        original_format, original_size = img.format, img.size
         
         # Convert to RGBA (handles JPG, PNG, WebP, etc.)
         if img.mode != 'RGBA':
@@ -43,10 +78,8 @@ def normalize_logo(input_path, output_path, max_dimension=1024, remove_bg=None,
             img = remove_background(img, mode=remove_bg, strength=bg_strength)
 
             # After BG removal: validate output is not fully/mostly transparent
-            data = np.array(img)
-            total_pixels = data.shape[0] * data.shape[1]
-            visible_pixels = int(np.sum(data[:, :, 3] > 10))  # alpha > 10 = not transparent
-            visible_ratio = visible_pixels / total_pixels if total_pixels > 0 else 0
+            alpha = np.asarray(img.getchannel('A'))
+            visible_ratio = float(np.count_nonzero(alpha > 10)) / alpha.size if alpha.size else 0  # alpha > 10 = not transparent
             bbox_after = img.getbbox()
             if bbox_after is None or visible_ratio < 0.01:
                 return {
@@ -67,13 +100,14 @@ def normalize_logo(input_path, output_path, max_dimension=1024, remove_bg=None,
             img = img.crop((left, top, right, bottom))
         # else: no auto-trim — preserve the logo exactly as uploaded (alpha intact)
 
-        # Save as clean PNG
-        img.save(output_path, 'PNG', optimize=True)
+        # Save as clean PNG. No optimize=True: its extra compression passes cost
+        # far more CPU than the bytes saved on a master that is never served raw.
+        img.save(output_path, 'PNG', compress_level=6)
         
         return {
             'success': True,
-            'original_format': Image.open(input_path).format,
-            'original_size': Image.open(input_path).size,
+            'original_format': original_format,
+            'original_size': original_size,
             'normalized_size': img.size,
             'has_transparency': img.mode == 'RGBA'
         }
@@ -114,29 +148,18 @@ def remove_background(img, mode='light', strength=30):
     h, w = data.shape[0], data.shape[1]
     patch_size = min(10, h // 4, w // 4)  # Adaptive: max 10x10, scales down for small images
     
-    # Collect all corner patch pixels into one array
-    corner_patch_pixels = []
-    
-    # Top-left patch (offset by 2px from edge to avoid compression artifacts)
-    tl_patch = data[2:2+patch_size, 2:2+patch_size]
-    corner_patch_pixels.extend(tl_patch.reshape(-1, 4))
-    
-    # Top-right patch
-    tr_patch = data[2:2+patch_size, -(2+patch_size):-2]
-    corner_patch_pixels.extend(tr_patch.reshape(-1, 4))
-    
-    # Bottom-left patch
-    bl_patch = data[-(2+patch_size):-2, 2:2+patch_size]
-    corner_patch_pixels.extend(bl_patch.reshape(-1, 4))
-    
-    # Bottom-right patch
-    br_patch = data[-(2+patch_size):-2, -(2+patch_size):-2]
-    corner_patch_pixels.extend(br_patch.reshape(-1, 4))
+    # Corner patches (offset by 2px from edge to avoid compression artifacts):
+    # top-left, top-right, bottom-left, bottom-right — stacked as one RGB array
+    corners = np.concatenate([
+        data[2:2+patch_size, 2:2+patch_size, :3].reshape(-1, 3),
+        data[2:2+patch_size, -(2+patch_size):-2, :3].reshape(-1, 3),
+        data[-(2+patch_size):-2, 2:2+patch_size, :3].reshape(-1, 3),
+        data[-(2+patch_size):-2, -(2+patch_size):-2, :3].reshape(-1, 3),
+    ])
     
     # Calculate median RGB from all corner patch pixels (robust to outliers)
     # Median is better than mean when there might be logo elements in corners
-    bg_color = np.median([p[:3] for p in corner_patch_pixels], axis=0)
-    bg_brightness = np.mean(bg_color)
+    bg_color = np.median(corners, axis=0).astype(np.float32)
     
     # Calculate effective tolerance based on strength
     # Non-linear curve: 0-100 is linear, 100+ adds exponential boost
@@ -152,27 +175,29 @@ def remove_background(img, mode='light', strength=30):
     # Clamp to reasonable range (never go below 10 or above 380)
     effective_tolerance = max(10, min(effective_tolerance, 380))
     
-    # Extract RGB channels (ignore existing alpha)
-    rgb = data[:, :, :3]
+    # Extract RGB channels (ignore existing alpha); float32 halves the
+    # temporaries versus the float64 NumPy would otherwise promote to
+    rgb = data[:, :, :3].astype(np.float32)
     
-    # Calculate Euclidean distance from background color
-    # This measures "how similar" each pixel is to the corners
-    distance = np.linalg.norm(rgb - bg_color, axis=2)
+    # Squared Euclidean distance from background color (no sqrt needed to
+    # compare against a threshold). Measures "how similar" each pixel is to the corners
+    diff = rgb - bg_color
+    dist_sq = np.einsum('ijk,ijk->ij', diff, diff)
+    within = dist_sq < effective_tolerance * effective_tolerance
     
     # Create mask: pixels close enough to background color get removed
     # For light mode: also check that pixel is actually bright
     # For dark mode: also check that pixel is actually dark
+    # (mean brightness > 128  <=>  channel sum > 384)
     if mode == 'light':
         # Remove bright pixels similar to corners
-        brightness = np.mean(rgb, axis=2)
-        mask = (distance < effective_tolerance) & (brightness > 128)
+        mask = within & (rgb.sum(axis=2) > 384)
     elif mode == 'dark':
         # Remove dark pixels similar to corners
-        brightness = np.mean(rgb, axis=2)
-        mask = (distance < effective_tolerance) & (brightness < 128)
+        mask = within & (rgb.sum(axis=2) < 384)
     else:
         # Unknown mode - just use distance
-        mask = distance < effective_tolerance
+        mask = within
     
     # Apply transparency to matched pixels
     data[mask, 3] = 0
@@ -180,6 +205,83 @@ def remove_background(img, mode='light', strength=30):
     return Image.fromarray(data)
 
 
+def _resize_to_width(img, width):
+    """Downscale to `width` keeping aspect (never upscales)."""
+    if img.width <= width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _fit_within(img, max_dimension):
+    if max(img.size) <= max_dimension:
+        return img
+    out = img.copy()
+    out.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+    return out
+
+
+def build_derivatives(master_path, out_dir, kind, rel_root=None):
+    """
+    Emit the derivative pyramid for a normalized master PNG.
+
+    Every file is named by the SHA-256 of its own bytes
+    (``{hash}.{ext}``, see write_content_addressed), so a URL or render plan
+    that references one never sees its content change underneath it.
+
+    Variants:
+        render_<w>   PNG at each RENDER_WIDTHS[kind] width (only those narrower
+                     than the master) — renders pick the closest one ≥ target
+        preview      PNG within PREVIEW_MAX[kind] (editor canvas)
+        preview_webp the same pixels as WebP (smaller on the wire)
+        thumb        PNG within THUMB_MAX (brand cards)
+
+    Args:
+        master_path: Normalized master PNG (normalize_logo output)
+        out_dir: Directory for the derivative files (created if missing)
+        kind: 'logo' or 'watermark'
+        rel_root: If given, paths in the manifest are relative to it
+
+    Returns:
+        dict manifest: {'hash', 'width', 'height', 'variants': {name: {...}}}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with open(master_path, 'rb') as f:
+        master_bytes = f.read()
+    img = Image.open(io.BytesIO(master_bytes))
+    img.load()
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+
+    def _rel(path):
+        return os.path.relpath(path, rel_root) if rel_root else path
+
+    def _write(image, fmt, ext, **save_args):
+        buf = io.BytesIO()
+        image.save(buf, fmt, **save_args)
+        data = buf.getvalue()
+        path, digest = write_content_addressed(data, out_dir, ext)
+        return {'path': _rel(path), 'width': image.width, 'height': image.height,
+                'bytes': len(data), 'hash': digest}
+
+    variants = {}
+    for width in RENDER_WIDTHS.get(kind, ()):
+        if width < img.width:
+            variants[f'render_{width}'] = _write(_resize_to_width(img, width),
+                                                 'PNG', 'png', compress_level=6)
+    preview = _fit_within(img, PREVIEW_MAX.get(kind, 512))
+    variants['preview'] = _write(preview, 'PNG', 'png', compress_level=6)
+    variants['preview_webp'] = _write(preview, 'WEBP', 'webp', quality=85, method=4)
+    variants['thumb'] = _write(_fit_within(img, THUMB_MAX), 'PNG', 'png', compress_level=6)
+
+    return {
+        'hash': hashlib.sha256(master_bytes).hexdigest(),
+        'width': img.width,
+        'height': img.height,
+        'variants': variants,
+    }
+
+
 def detect_solid_background(img_path):
     """
     Detect if image has a solid background (no transparency)
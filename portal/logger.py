@@ -0,0 +1,183 @@
+"""
+Structured, level-gated logging for the render and fetch hot paths.
+
+The render/fetch code used to ``print`` everything — full ffprobe JSON, filter
+graph banners, a flushed line per fetch step — synchronously to stdout under
+the single Gunicorn worker. This module routes those lines through stdlib
+``logging`` instead:
+
+  * per-subsystem levels — ``LOG_LEVEL`` (default INFO) for everything, and
+    ``LOG_LEVELS="render=DEBUG,fetch=WARNING"`` to override one subsystem
+  * lazy formatting — use %-style args (``log.debug("x=%s", x)``) or wrap
+    expensive values in ``Lazy(fn, *args)``; nothing is formatted for a
+    disabled level, and enabled records are formatted on the listener thread
+    (below), so pass values the caller will not mutate afterwards
+  * sampling — below WARNING, at most ``LOG_SAMPLE_BURST`` lines per message
+    template per ``LOG_SAMPLE_WINDOW`` seconds; the next line that gets through
+    reports how many were dropped. WARNING and above are never sampled
+  * output — ``LOG_FORMAT=text`` (default) prints the message exactly as the
+    old print() did, so existing ``[TAG]`` greps keep working; ``json`` emits
+    one object per line with ts, level, subsystem, msg and any ``fields``
+    passed via ``extra={'fields': {...}}``
+  * async — records are enqueued unformatted (``DeferredQueueHandler``); a
+    QueueListener thread does the formatting and the stdout write, so the hot
+    loop neither formats nor blocks on I/O
+
+Stdlib only, no project imports — safe to import from video_processor and app.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+ROOT_LOGGER = 'brandr'
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+LOG_SAMPLE_WINDOW = float(os.environ.get('LOG_SAMPLE_WINDOW', '10'))
+LOG_SAMPLE_BURST = int(os.environ.get('LOG_SAMPLE_BURST', '20'))
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+class Lazy:
+    """Defer an expensive value until a handler actually formats the record.
+
+    ``log.debug("info: %s", Lazy(json.dumps, info, indent=2))`` — arguments
+    are bound now, so a loop variable rebound before the listener gets to
+    the record still formats as it was at the call."""
+    __slots__ = ('_fn', '_args', '_kwargs')
+
+    def __init__(self, fn, *args, **kwargs):
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+
+    def __str__(self):
+        return str(self._fn(*self._args, **self._kwargs))
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that enqueues the record as-is. The stock prepare() calls
+    self.format(record) on the logging thread; here msg % args (and any
+    Lazy) is left for the listener's formatter."""
+
+    def prepare(self, record):
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Rate-limit repetitive sub-WARNING lines per (logger, message template)."""
+
+    def __init__(self, window=LOG_SAMPLE_WINDOW, burst=LOG_SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._buckets = {}   # key -> [window_start, emitted, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else repr(record.msg)[:200])
+        now = time.time()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window:
+                suppressed = bucket[2] if bucket else 0
+                self._buckets[key] = [now, 1, 0]
+                if len(self._buckets) > 4096:
+                    self._buckets = {key: self._buckets[key]}
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if bucket[1] < self.burst:
+                bucket[1] += 1
+                return True
+            bucket[2] += 1
+            return False
+
+
+class TextFormatter(logging.Formatter):
+    """The message as print() wrote it, plus ``key=value`` fields if any."""
+
+    def format(self, record):
+        text = record.getMessage()
+        fields = getattr(record, 'fields', None)
+        if fields:
+            text += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        if getattr(record, 'suppressed', 0):
+            text += f' (+{record.suppressed} similar suppressed)'
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'subsystem': record.name[len(ROOT_LOGGER) + 1:] or record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            payload.update(fields)
+        if getattr(record, 'suppressed', 0):
+            payload['suppressed'] = record.suppressed
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def _parse_levels(spec):
+    levels = {}
+    for part in spec.split(','):
+        if '=' in part:
+            name, level = part.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup():
+    """Install the queue handler on the ``brandr`` logger (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+
+        # SimpleQueue: unbounded and lock-free for producers.
+        q = queue.SimpleQueue()
+        handler = DeferredQueueHandler(q)
+        # Sample before enqueueing so dropped lines cost nothing downstream.
+        handler.addFilter(SamplingFilter())
+        root.addHandler(handler)
+
+        _listener = QueueListener(q, stream)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        for name, level in _parse_levels(LOG_LEVELS).items():
+            logging.getLogger(f'{ROOT_LOGGER}.{name}').setLevel(getattr(logging, level, logging.INFO))
+
+
+def get_logger(subsystem):
+    """Logger for one subsystem (``render``, ``fetch``, ...)."""
+    setup()
+    return logging.getLogger(f'{ROOT_LOGGER}.{subsystem}')
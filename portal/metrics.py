@@ -0,0 +1,182 @@
+"""
+In-process metrics registry with Prometheus text exposition.
+
+Counters, gauges and histograms with labels, all guarded by one lock and
+rendered by ``/metrics`` in the Prometheus text format (0.0.4). Instrumented
+code records at the point of work (``RENDER_STAGE_SECONDS.observe(...)``);
+state that already lives elsewhere (render job dict, cookie pool, admission
+controller, disk) is read at scrape time through ``register_collector``
+callbacks, so it costs nothing between scrapes.
+
+Metric names carry the ``brandr_`` prefix. Stdlib only, no project imports —
+safe to import from database, video_processor and app.
+Single Gunicorn worker (WEB_CONCURRENCY=1): one registry per process.
+"""
+import math
+import threading
+
+_lock = threading.Lock()
+_metrics = []      # registration order = exposition order
+_collectors = []   # callables returning [(name, type, help, [(labels, value), ...]), ...]
+
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 900)
+
+
+def _fmt_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+def _fmt_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra.items()) if extra else [])
+    if not pairs:
+        return ''
+    inner = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')
+                                      .replace('\n', '\\n')) for k, v in pairs)
+    return '{' + inner + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        with _lock:
+            _metrics.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f'{self.name}: expected labels {self.labels}, got {tuple(labels)}')
+        return tuple(str(labels[k]) for k in self.labels)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _lines(self):
+        return [f'{self.name}{_fmt_labels(self.labels, k)} {_fmt_value(v)}'
+                for k, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    _lines = Counter._lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _lines(self):
+        lines = []
+        for key, (counts, total, n) in sorted(self._values.items()):
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket'
+                             f'{_fmt_labels(self.labels, key, {"le": _fmt_value(float(bound))})} {count}')
+            lines.append(f'{self.name}_sum{_fmt_labels(self.labels, key)} {_fmt_value(total)}')
+            lines.append(f'{self.name}_count{_fmt_labels(self.labels, key)} {n}')
+        return lines
+
+
+def register_collector(fn):
+    """Register a scrape-time callback. It returns a list of
+    ``(name, type, help, [(labels_dict, value), ...])`` families; a collector
+    that raises is skipped for that scrape."""
+    with _lock:
+        _collectors.append(fn)
+    return fn
+
+
+def render():
+    """Every metric in Prometheus text exposition format."""
+    out = []
+    with _lock:
+        for metric in _metrics:
+            out.append(f'# HELP {metric.name} {metric.help}')
+            out.append(f'# TYPE {metric.name} {metric.kind}')
+            out.extend(metric._lines())
+        collectors = list(_collectors)
+    for fn in collectors:
+        try:
+            families = fn()
+        except Exception as e:
+            out.append(f'# collector {getattr(fn, "__name__", fn)} failed: {e}')
+            continue
+        for name, kind, help_text, samples in families:
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                out.append(f'{name}{_fmt_labels(labels.keys(), labels.values())} {_fmt_value(float(value))}')
+    return '\n'.join(out) + '\n'
+
+
+# ── Metrics recorded at the point of work ────────────────────────────────────
+
+RENDER_STAGE_SECONDS = Histogram(
+    'brandr_render_stage_seconds', 'Wall time of one render stage.', ('stage',))
+RENDER_JOBS = Counter(
+    'brandr_render_jobs_total', 'Finished brand render jobs by final status.', ('status',))
+FFMPEG_EXITS = Counter(
+    'brandr_ffmpeg_exits_total', 'FFmpeg child exits by operation and exit code.', ('operation', 'code'))
+AUDIO_TIER = Counter(
+    'brandr_render_audio_tier_total', 'Audio fallback tier that produced the final output.', ('tier',))
+NORMALIZE_PLANS = Counter(
+    'brandr_normalize_plans_total', 'Normalization plans chosen for render sources (skip / remux / encode).',
+    ('action',))
+RENDER_CACHE = Counter(
+    'brandr_render_cache_total', 'Render-output cache lookups by outcome (hit / joined / miss).', ('outcome',))
+DB_WRITES = Counter(
+    'brandr_db_writes_total', 'Writes run through the single-writer queue, by outcome.', ('outcome',))
+DB_WRITE_QUEUE_SECONDS = Histogram(
+    'brandr_db_write_queue_seconds', 'Time a write waited in the writer queue before its batch began.',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+DB_WRITE_BATCH_SIZE = Histogram(
+    'brandr_db_write_batch_size', 'Writes group-committed per transaction.',
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+FETCH_SECONDS = Histogram(
+    'brandr_fetch_seconds', 'Fetch latency per platform and phase (plan = metadata, download = bytes).',
+    ('platform', 'phase'))
+FETCH_BYTES = Counter(
+    'brandr_fetch_bytes_total', 'Bytes fetched from source platforms.', ('platform',))
+FETCH_RESULTS = Counter(
+    'brandr_fetch_results_total', 'Fetch outcomes per platform.', ('platform', 'outcome'))
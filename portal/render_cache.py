@@ -0,0 +1,177 @@
+"""
+Render-output cache: finished brand renders reused by content identity.
+
+A page refresh or a double click re-submitted the same source × brand ×
+format, and ``process_brand`` re-encoded it from scratch into the same file
+name. A render's bytes are fully determined by
+
+  * the source's content (``source_hash`` — sha256, memoised per path/size/mtime)
+  * the canonical render plan (``render_plans.render_plan_hash`` — brand
+    revision, assets, overrides, format, source edit)
+  * the encoder settings (``video_processor.ENCODER_PROFILE``)
+
+so ``render_key`` over those three is the cache key. The cache is
+``branded_outputs`` itself: every render row stores its key, and
+``database.find_render_output`` returns a file whose current bytes were
+produced under it. A hit costs two SELECTs and a link — the caller then
+writes its own ownership row, exactly as for a fresh render.
+
+``get_or_render`` is the entry point:
+
+  1. hit  → ``claim`` the file: hardlinked to the name this render would have
+     written (or that same file when the names match), mtime refreshed so
+     age-based cleanup counts from now
+  2. miss → single flight: the first request for a key renders, identical
+     requests arriving meanwhile wait for it and claim its output instead of
+     starting a second encode. A leader that fails or is cancelled releases
+     its waiters to try again themselves; a waiter honours its own cancel.
+
+Outputs may now be shared between ownership rows, so files are only deleted
+once no branded_outputs row references them
+(``database.is_branded_output_referenced``).
+
+Single Gunicorn worker (WEB_CONCURRENCY=1): in-flight state is in-process.
+"""
+import os
+import uuid
+import hashlib
+import threading
+
+try:
+    from . import metrics
+    from .video_processor import RenderCancelled
+except ImportError:
+    import metrics  # standalone (portal/ on sys.path)
+    from video_processor import RenderCancelled
+
+MAX_SOURCE_HASHES = 1024
+
+_lock = threading.Lock()
+_source_hashes = {}   # (realpath, size, mtime_ns) -> sha256 hex
+_flights = {}         # render key -> _Flight
+_stats = {'hits': 0, 'misses': 0, 'joined': 0, 'stale': 0}
+
+
+class _Flight:
+    __slots__ = ('done', 'path', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path = None
+        self.error = None
+
+
+def source_hash(path, chunk_size=1024 * 1024):
+    """sha256 of a source file's bytes, hashed once per (path, size, mtime)."""
+    real = os.path.realpath(path)
+    st = os.stat(real)
+    ident = (real, st.st_size, st.st_mtime_ns)
+    with _lock:
+        digest = _source_hashes.get(ident)
+    if digest is not None:
+        return digest
+    h = hashlib.sha256()
+    with open(real, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _lock:
+        if len(_source_hashes) >= MAX_SOURCE_HASHES:
+            _source_hashes.clear()
+        _source_hashes[ident] = digest
+    return digest
+
+
+def render_key(content_hash, plan_hash, encoder_profile):
+    """Cache key of one render: (source content, render plan, encoder)."""
+    return hashlib.sha256(f'{content_hash}:{plan_hash}:{encoder_profile}'.encode('utf-8')).hexdigest()
+
+
+def lookup(key):
+    """Path of an existing render for key, or None."""
+    try:
+        from .database import find_render_output
+    except ImportError:
+        from database import find_render_output
+    path = find_render_output(key)
+    if path and not os.path.isfile(path):
+        with _lock:
+            _stats['stale'] += 1
+        return None
+    return path
+
+
+def claim(path, desired_path):
+    """The cached file made available under desired_path (the name this render
+    would have written). Hardlinked when the names differ: both names share one
+    inode, which is safe because renders never write into an existing output —
+    process_brand renames a finished file over the name, so a later re-render
+    of either name gets a new inode and leaves the other's bytes alone.
+    Deleting one name leaves the other. Falls back to sharing path itself when
+    the filesystem refuses the link."""
+    if os.path.abspath(path) != os.path.abspath(desired_path):
+        tmp = f'{desired_path}.{uuid.uuid4().hex[:8]}.link'
+        try:
+            os.link(path, tmp)
+            os.replace(tmp, desired_path)
+            path = desired_path
+        except OSError as e:
+            print(f"[RENDER-CACHE] hardlink to {os.path.basename(desired_path)} failed, sharing file: {e}")
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def get_or_render(key, desired_path, render_fn, cancel_event=None):
+    """``(path, outcome)`` for one render — outcome is 'hit', 'joined' or
+    'rendered'. render_fn() performs the render and returns its output path."""
+    while True:
+        path = lookup(key)
+        if path:
+            with _lock:
+                _stats['hits'] += 1
+            metrics.RENDER_CACHE.inc(outcome='hit')
+            return claim(path, desired_path), 'hit'
+
+        with _lock:
+            flight = _flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _flights[key] = _Flight()
+                _stats['misses'] += 1
+            else:
+                _stats['joined'] += 1
+
+        if leader:
+            metrics.RENDER_CACHE.inc(outcome='miss')
+            try:
+                flight.path = render_fn()
+                return flight.path, 'rendered'
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with _lock:
+                    _flights.pop(key, None)
+                flight.done.set()
+
+        print(f"[RENDER-CACHE] joining in-flight render {key[:12]}")
+        while not flight.done.wait(0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                raise RenderCancelled('Render cancelled while waiting for an identical render')
+        if flight.error is None and flight.path and os.path.isfile(flight.path):
+            metrics.RENDER_CACHE.inc(outcome='joined')
+            return claim(flight.path, desired_path), 'joined'
+        # Leader failed or was cancelled — try again (hit, join or lead)
+
+
+def snapshot():
+    """Admin/diagnostic view of the cache."""
+    with _lock:
+        return {'in_flight': len(_flights), 'source_hashes': len(_source_hashes), 'stats': dict(_stats)}
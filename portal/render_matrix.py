@@ -0,0 +1,301 @@
+"""
+Matrix renders: N sources × M brands × F formats as one job.
+
+Agencies render every fetched clip against every brand. One
+/api/videos/process_brands call per source repeated the tier checks, brand
+validation and — worse — normalization of the same source once per call.
+``plan`` turns the whole matrix into a DAG of three node kinds:
+
+  * ``download``  one per distinct source (URL fetch, or a no-op for a file
+    already on disk)
+  * ``normalize`` one per (source, format) — the shared intermediate every
+    brand rendered in that format reads
+  * ``render``    one per distinct (source, brand, format) output
+
+Duplicate sources, brands and formats in the request collapse at plan time,
+so each download, normalize and render happens at most once.
+
+``start`` runs the DAG on a shared worker pool: a node is submitted as soon
+as its dependencies are done, so one source can render while the next is
+still downloading. A failed node skips everything downstream of it and
+nothing else. Once everything downstream of a node has finished (not just
+its direct dependents: a normalize that skips hands the fetched file itself
+to the renders), its intermediate is handed to the ``release`` runner, so
+normalized temps and fetched sources are deleted as soon as possible rather
+than at the end of the job. FFmpeg memory is still metered by admission.py;
+the pool only bounds how many nodes run at once.
+
+The work itself is supplied by the caller as ``runners`` — callables per node
+kind, ``fn(node, inputs)`` where ``inputs`` are the dependencies' results —
+so this module carries no Flask, FFmpeg or database imports.
+
+Job state lives in ``matrix_jobs`` (polled via /api/videos/render-matrix/<id>).
+Single Gunicorn worker (WEB_CONCURRENCY=1): state is in-process.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+RENDER_MATRIX_WORKERS = int(os.environ.get('RENDER_MATRIX_WORKERS', '2'))
+
+# Finished jobs are kept this long for status polls
+JOB_TTL_SECONDS = 3600
+
+# Relative cost per node kind, for the job's progress percentage
+NODE_WEIGHTS = {'download': 1, 'normalize': 2, 'render': 4}
+
+TERMINAL = ('done', 'failed', 'skipped', 'cancelled')
+
+matrix_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Node:
+    """One unit of work in a matrix job."""
+    __slots__ = ('id', 'kind', 'params', 'deps', 'dependents', 'status',
+                 'result', 'error', 'started_at', 'finished_at')
+
+    def __init__(self, node_id, kind, params, deps=()):
+        self.id = node_id
+        self.kind = kind
+        self.params = params
+        self.deps = list(deps)
+        self.dependents = []
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RENDER_MATRIX_WORKERS,
+                                           thread_name_prefix='render-matrix')
+        return _executor
+
+
+def _dedupe(values):
+    return list(dict.fromkeys(values))
+
+
+def plan(sources, brand_ids, formats):
+    """The matrix as an ordered dict of node id -> Node.
+
+    ``sources`` are opaque strings (URL or filename), ``brand_ids`` and
+    ``formats`` plain values; duplicates in any of them are dropped.
+    Nodes come out in a valid execution order.
+    """
+    nodes = {}
+
+    def add(node):
+        nodes[node.id] = node
+        for dep in node.deps:
+            nodes[dep].dependents.append(node.id)
+
+    for s, source in enumerate(_dedupe(sources)):
+        download_id = f'download:{s}'
+        add(Node(download_id, 'download', {'source': source}))
+        for fmt in _dedupe(formats):
+            normalize_id = f'normalize:{s}:{fmt}'
+            add(Node(normalize_id, 'normalize', {'source': source, 'format': fmt}, [download_id]))
+            for brand_id in _dedupe(brand_ids):
+                add(Node(f'render:{s}:{brand_id}:{fmt}', 'render',
+                         {'source': source, 'brand_id': brand_id, 'format': fmt}, [normalize_id]))
+    return nodes
+
+
+def _prune(now):
+    for job_id in [j for j, job in matrix_jobs.items()
+                   if job.get('finished_at') and now - job['finished_at'] > JOB_TTL_SECONDS]:
+        del matrix_jobs[job_id]
+
+
+def _progress(nodes):
+    counts = {}
+    total = finished = 0
+    for node in nodes.values():
+        counts[node.status] = counts.get(node.status, 0) + 1
+        weight = NODE_WEIGHTS.get(node.kind, 1)
+        total += weight
+        if node.status in TERMINAL:
+            finished += weight
+    counts['total'] = len(nodes)
+    counts['percent'] = round(100.0 * finished / total, 1) if total else 100.0
+    return counts
+
+
+def get_job(job_id):
+    """Snapshot of one job (node objects and the cancel event left out), or None."""
+    with _jobs_lock:
+        job = matrix_jobs.get(job_id)
+        if job is None:
+            return None
+        snap = {k: v for k, v in job.items() if k not in ('nodes', 'cancel_event', 'runners')}
+        snap['progress'] = _progress(job['nodes'])
+        snap['outputs'] = list(job['outputs'])
+        snap['failures'] = [{'node': n.id, 'kind': n.kind, 'error': n.error, **n.params}
+                            for n in job['nodes'].values() if n.status == 'failed']
+        return snap
+
+
+def cancel(job_id):
+    """Request cancellation; returns False when the job is unknown or finished."""
+    with _jobs_lock:
+        job = matrix_jobs.get(job_id)
+        if job is None or job['status'] not in ('queued', 'processing'):
+            return False
+        job['cancel_event'].set()
+        job['message'] = 'Cancelling…'
+        return True
+
+
+def start(job_id, nodes, runners, user_id, on_finish=None, **fields):
+    """Register a job for a planned DAG and start running it.
+
+    ``runners`` maps node kind -> ``fn(node, inputs)`` (raise to fail the
+    node) plus an optional ``release`` -> ``fn(node)`` for intermediates.
+    ``on_finish(job_id, nodes, cancelled)`` runs once after every node is
+    terminal — settle credits and clean-up there. Extra ``fields`` are stored
+    on the job for status polls.
+    """
+    now = time.time()
+    with _jobs_lock:
+        _prune(now)
+        matrix_jobs[job_id] = {
+            'status': 'queued',
+            'user_id': user_id,
+            'created_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'message': '',
+            'outputs': [],
+            'nodes': nodes,
+            'runners': runners,
+            'cancel_event': threading.Event(),
+            **fields,
+        }
+    threading.Thread(target=_coordinate, args=(job_id, on_finish), daemon=True).start()
+
+
+def add_output(job_id, output):
+    with _jobs_lock:
+        job = matrix_jobs.get(job_id)
+        if job is not None:
+            job['outputs'].append(output)
+
+
+def get_cancel_event(job_id):
+    with _jobs_lock:
+        job = matrix_jobs.get(job_id)
+        return job['cancel_event'] if job else None
+
+
+def _skip_downstream(nodes, node, status):
+    for dep_id in node.dependents:
+        child = nodes[dep_id]
+        if child.status == 'pending':
+            child.status = status
+            child.finished_at = time.time()
+            _skip_downstream(nodes, child, status)
+
+
+def _settled(nodes, node):
+    """True once everything downstream of node is terminal — a skip-normalize
+    passes the fetched source itself on to the renders."""
+    return all(nodes[d].status in TERMINAL and _settled(nodes, nodes[d]) for d in node.dependents)
+
+
+def _coordinate(job_id, on_finish):
+    """Submit ready nodes, collect finished ones, release intermediates."""
+    with _jobs_lock:
+        job = matrix_jobs[job_id]
+        job['status'] = 'processing'
+        job['started_at'] = time.time()
+    nodes, runners, cancel_ev = job['nodes'], job['runners'], job['cancel_event']
+    done = threading.Condition()
+    finished = []
+    released = set()
+
+    def run(node):
+        try:
+            inputs = [nodes[d].result for d in node.deps]
+            node.result = runners[node.kind](node, inputs)
+            outcome = 'done'
+        except Exception as e:
+            node.error = str(e)
+            outcome = 'cancelled' if cancel_ev.is_set() else 'failed'
+            print(f"[MATRIX] {job_id[:8]} {node.id} {outcome}: {e}")
+        with done:
+            finished.append((node, outcome))
+            done.notify()
+
+    def release_ready():
+        release = runners.get('release')
+        for node in nodes.values():
+            if (node.id not in released and node.dependents and node.status == 'done'
+                    and _settled(nodes, node)):
+                released.add(node.id)
+                if release:
+                    try:
+                        release(node)
+                    except Exception as e:
+                        print(f"[MATRIX] {job_id[:8]} release {node.id} failed: {e}")
+
+    executor = _get_executor()
+    running = 0
+    try:
+        while True:
+            with _jobs_lock:
+                if cancel_ev.is_set():
+                    for node in nodes.values():
+                        if node.status == 'pending':
+                            node.status = 'cancelled'
+                            node.finished_at = time.time()
+                for node in nodes.values():
+                    if node.status == 'pending' and all(nodes[d].status == 'done' for d in node.deps):
+                        node.status = 'running'
+                        node.started_at = time.time()
+                        running += 1
+                        executor.submit(run, node)
+            if not running:
+                break
+            with done:
+                while not finished:
+                    done.wait()
+                batch, finished[:] = list(finished), []
+            with _jobs_lock:
+                for node, outcome in batch:
+                    running -= 1
+                    node.status = outcome
+                    node.finished_at = time.time()
+                    if outcome != 'done':
+                        _skip_downstream(nodes, node, 'cancelled' if outcome == 'cancelled' else 'skipped')
+            release_ready()
+    finally:
+        release_ready()
+        cancelled = cancel_ev.is_set()
+        try:
+            if on_finish:
+                on_finish(job_id, nodes, cancelled)
+        except Exception as e:
+            print(f"[MATRIX] {job_id[:8]} finish hook failed: {e}")
+        with _jobs_lock:
+            renders = [n for n in nodes.values() if n.kind == 'render']
+            if cancelled:
+                job['status'] = 'cancelled'
+                job['message'] = 'Render cancelled'
+                job['outputs'] = []
+            elif renders and all(n.status == 'done' for n in renders):
+                job['status'] = 'completed'
+            elif any(n.status == 'done' for n in renders):
+                job['status'] = 'partial'
+            else:
+                job['status'] = 'failed'
+            job['finished_at'] = time.time()
+            print(f"[MATRIX] {job_id[:8]} {job['status']}: {_progress(nodes)}")
@@ -0,0 +1,254 @@
+"""
+Compiled brand render plans, cached by brand revision.
+
+A brand render used to rebuild its overlay plan from the DB row every time:
+copy the row, re-parse ``format_overrides`` JSON, re-normalise the legacy
+``watermark_*`` fields, re-apply request overrides, then (in VideoProcessor)
+re-resolve asset paths through ``os.path.exists`` chains and recompute the
+filter graph. None of that changes between renders of the same brand revision.
+
+Two caches, both keyed by the brand revision (id, ``updated_at``) so an edit
+to the brand naturally misses:
+
+  * base config — (id, updated_at, output_format) -> immutable merged config
+    with format overrides and wm_* normalisation already applied. Request
+    overrides are a cheap delta on top (``brand_render_config``).
+  * render plan — (id, updated_at, W, H, digest of the effective config) ->
+    ``RenderPlan`` (filter graph + resolved asset paths). Built by
+    VideoProcessor on a miss; a hit skips asset resolution and geometry. A hit
+    whose assets vanished from disk (ephemeral storage) is dropped and rebuilt.
+
+A third, byte-bounded cache holds encoded still previews (``render_still``)
+keyed by (source identity, timestamp, config digest, output format, image
+format) — see ``still_key``.
+
+``render_plan_hash`` is the canonical identity of everything that decides a
+rendered video's pixels besides the source and the encoder — the key the
+render-output cache (render_cache.py) files finished renders under.
+
+Stdlib only. Single Gunicorn worker (WEB_CONCURRENCY=1): state is in-process.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+MAX_BASE_CONFIGS = 256
+MAX_PLANS = 512
+MAX_STILL_BYTES = int(os.environ.get('STILL_CACHE_MB', '32')) * 1024 * 1024
+
+# filter_complex: the full -filter_complex string ending in [vout]
+# asset_paths:    every movie= source the graph reads (checked on cache hit)
+RenderPlan = namedtuple('RenderPlan', ['filter_complex', 'asset_paths'])
+
+_lock = threading.Lock()
+_base_configs = OrderedDict()
+_plans = OrderedDict()
+_stills = OrderedDict()
+_still_bytes = 0
+_stats = {'base_hits': 0, 'base_misses': 0, 'plan_hits': 0, 'plan_misses': 0, 'plan_stale': 0,
+          'still_hits': 0, 'still_misses': 0}
+
+# Per-format position/scale fields that format_overrides may replace (Patch 54)
+_FORMAT_OVERRIDE_FIELDS = ('logo_x', 'logo_y', 'logo_scale', 'wm_x', 'wm_y', 'wm_scale')
+
+
+def _lru_get(cache, key):
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+
+
+def _lru_put(cache, key, value, limit):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+# ── Base config (per brand revision + output format) ─────────────────────────
+
+def _compile_base(db_brand, output_format):
+    config = dict(db_brand)
+
+    # Patch 54: apply per-format position/scale overrides before any other merging
+    if config.get('format_overrides') and output_format != 'vertical_9_16':
+        try:
+            fov = json.loads(config['format_overrides']).get(output_format, {})
+            for key in _FORMAT_OVERRIDE_FIELDS:
+                if key in fov:
+                    config[key] = fov[key]
+        except (ValueError, TypeError, KeyError, AttributeError):
+            pass
+
+    # Canonical wm_* normalization
+    if config.get('wm_mode') is None:
+        config['wm_mode'] = config.get('watermark_mode', 'positioned')
+    if config.get('wm_mode') != 'positioned':
+        config['wm_mode'] = 'positioned'
+    if config.get('wm_scale') is None and config.get('watermark_scale') is not None:
+        config['wm_scale'] = config['watermark_scale']
+    if config.get('wm_opacity') is None and config.get('watermark_opacity') is not None:
+        config['wm_opacity'] = config['watermark_opacity']
+    return MappingProxyType(config)
+
+
+def base_config(db_brand, output_format):
+    """Immutable merged brand config for one output format (cached per revision).
+
+    Rows without an id/updated_at (ad-hoc configs) are compiled uncached."""
+    brand_id, revision = db_brand.get('id'), db_brand.get('updated_at')
+    if brand_id is None or revision is None:
+        return _compile_base(db_brand, output_format)
+    key = (brand_id, revision, output_format)
+    with _lock:
+        cached = _lru_get(_base_configs, key)
+        if cached is not None:
+            _stats['base_hits'] += 1
+            return cached
+        _stats['base_misses'] += 1
+    compiled = _compile_base(db_brand, output_format)
+    with _lock:
+        _lru_put(_base_configs, key, compiled, MAX_BASE_CONFIGS)
+    return compiled
+
+
+def brand_render_config(db_brand, output_format, data, sec_logo_resolved_path=None):
+    """Render config for one brand: cached base + this request's overrides.
+
+    Returns a fresh mutable dict (process_brand may annotate it)."""
+    config = dict(base_config(db_brand, output_format))
+
+    # Apply request overrides
+    override_fields = [
+        ('watermark_scale',   'wm_scale'),
+        ('watermark_opacity', 'wm_opacity'),
+        ('logo_scale',        'logo_scale'),
+        ('logo_padding',      'logo_padding'),
+    ]
+    for req_key, cfg_key in override_fields:
+        if req_key in data:
+            config[cfg_key] = data[req_key]
+    for fld in ('logo_x', 'logo_y', 'logo_rotation', 'wm_x', 'wm_y'):
+        if fld in data:
+            config[fld] = float(data[fld])
+    if 'text_enabled' in data:
+        config['text_enabled'] = 1 if data['text_enabled'] else 0
+    for fld in ('text_content', 'text_color', 'text_position'):
+        if fld in data:
+            config[fld] = str(data[fld])
+    if 'text_size' in data:
+        config['text_size'] = int(data['text_size'])
+    if 'text_bg_enabled' in data:
+        config['text_bg_enabled'] = 1 if data['text_bg_enabled'] else 0
+    if 'text_bg_opacity' in data:
+        config['text_bg_opacity'] = float(data['text_bg_opacity'])
+
+    # Secondary logo (already resolved and tier-gated before thread spawn)
+    if sec_logo_resolved_path:
+        config['secondary_logo_enabled']       = True
+        config['secondary_logo_resolved_path'] = sec_logo_resolved_path
+        config['secondary_logo_scale']    = max(0.03, min(0.5, float(data.get('secondary_logo_scale', 0.12))))
+        config['secondary_logo_opacity']  = max(0.1, min(1.0, float(data.get('secondary_logo_opacity', 0.9))))
+        config['secondary_logo_x']        = max(0.0, min(1.0, float(data.get('secondary_logo_x', 0.15))))
+        config['secondary_logo_y']        = max(0.0, min(1.0, float(data.get('secondary_logo_y', 0.15))))
+        config['secondary_logo_rotation'] = float(data.get('secondary_logo_rotation', 0)) % 360
+    return config
+
+
+# ── Render plans (per brand revision + frame size + effective config) ────────
+
+def config_digest(brand_config):
+    """Short digest of an effective render config (revision + overrides)."""
+    return hashlib.sha1(
+        json.dumps(dict(brand_config), sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()[:16]
+
+
+def plan_key(brand_config, width, height):
+    """Cache key for a compiled plan, or None when the config has no revision."""
+    brand_id, revision = brand_config.get('id'), brand_config.get('updated_at')
+    if brand_id is None or revision is None:
+        return None
+    return (brand_id, revision, int(width), int(height), config_digest(brand_config))
+
+
+def get_plan(key):
+    """Cached RenderPlan for key, or None (miss, or an asset left the disk)."""
+    if key is None:
+        return None
+    with _lock:
+        plan = _lru_get(_plans, key)
+        if plan is None:
+            _stats['plan_misses'] += 1
+            return None
+    if not all(os.path.exists(p) for p in plan.asset_paths):
+        with _lock:
+            _plans.pop(key, None)
+            _stats['plan_stale'] += 1
+            _stats['plan_misses'] += 1
+        return None
+    with _lock:
+        _stats['plan_hits'] += 1
+    return plan
+
+
+def put_plan(key, plan):
+    if key is None:
+        return
+    with _lock:
+        _lru_put(_plans, key, plan, MAX_PLANS)
+
+
+def render_plan_hash(brand_config, output_format, source_edit=None):
+    """Canonical hash of a render's inputs besides source and encoder: the
+    effective config (brand revision, asset paths, request overrides), the
+    output format and the source edit (crop/flip/trim)."""
+    payload = json.dumps({'config': dict(brand_config), 'format': output_format,
+                          'edit': source_edit or None},
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# ── Still previews (encoded images, bounded by bytes) ────────────────────────
+
+def still_key(source_path, t, brand_config, output_format, image_format, source_edit=None):
+    """Hex key for one still. The source is identified by path, size and mtime
+    (a re-download or re-normalize changes it); t is rounded to milliseconds."""
+    st = os.stat(source_path)
+    parts = (os.path.abspath(source_path), st.st_size, st.st_mtime_ns, round(float(t), 3),
+             config_digest(brand_config), output_format, image_format,
+             json.dumps(source_edit or {}, sort_keys=True, default=str))
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def get_still(key):
+    with _lock:
+        data = _lru_get(_stills, key)
+        _stats['still_hits' if data is not None else 'still_misses'] += 1
+        return data
+
+
+def put_still(key, data):
+    global _still_bytes
+    if len(data) > MAX_STILL_BYTES:
+        return
+    with _lock:
+        old = _stills.pop(key, None)
+        if old is not None:
+            _still_bytes -= len(old)
+        _stills[key] = data
+        _still_bytes += len(data)
+        while _still_bytes > MAX_STILL_BYTES:
+            _, evicted = _stills.popitem(last=False)
+            _still_bytes -= len(evicted)
+
+
+def snapshot():
+    """Admin/diagnostic view of the caches."""
+    with _lock:
+        return {'base_configs': len(_base_configs), 'plans': len(_plans),
+                'stills': len(_stills), 'still_bytes': _still_bytes, 'stats': dict(_stats)}
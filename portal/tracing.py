@@ -0,0 +1,145 @@
+"""
+Per-job span tracing for brand renders.
+
+``render_events`` only records the total ``render_seconds`` per brand, so a slow
+job cannot tell us whether its time went on the download, normalize, probes,
+the encode, output validation or SQLite lock back-off. A ``Trace`` collects
+named, nested spans for one job:
+
+  * ``process_branded_videos`` creates the trace and records the request-side
+    stages (download, brand resolution); it travels to the render thread in
+    the ``brand_render_jobs`` entry
+  * ``_do_brand_render`` activates it on the render thread; from then on the
+    module-level ``span()`` / ``record()`` helpers used by video_processor and
+    database attach to it without any signature changes. With no active trace
+    they are no-ops, so untraced callers (admin tools, scripts) pay nothing
+  * at the end of the job the spans are written to ``render_spans`` (one batch
+    insert) and shown as a waterfall in the admin console; ``get_render_stats``
+    aggregates them per stage
+
+Stdlib only, no project imports — safe to import from database, video_processor
+and app. Spans are recorded by the thread that owns the trace; worker threads
+(segment encodes) do not see it and are covered by their caller's span.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+# Hard cap per trace so a pathological job (thousands of DB writes) can't grow
+# the row without bound; later spans are counted but not kept.
+MAX_SPANS = 400
+
+_local = threading.local()
+
+
+class Span:
+    __slots__ = ('seq', 'name', 'parent', 'start', 'end', 'attrs')
+
+    def __init__(self, seq, name, parent, start, attrs):
+        self.seq = seq
+        self.name = name
+        self.parent = parent
+        self.start = start
+        self.end = None
+        self.attrs = attrs
+
+
+class Trace:
+    """Spans for one render job. Not shared between threads at the same time."""
+
+    def __init__(self, job_id=None):
+        self.job_id = job_id
+        self.started = time.time()
+        self.spans = []
+        self.dropped = 0
+        self._stack = []   # seq of the open spans, innermost last
+
+    def _open(self, name, start, attrs):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        parent = self._stack[-1] if self._stack else None
+        span = Span(len(self.spans), name, parent, start, attrs)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the body as a child of the innermost open span."""
+        span = self._open(name, time.time(), attrs)
+        if span is None:
+            yield None
+            return
+        self._stack.append(span.seq)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            span.end = time.time()
+            self._stack.pop()
+
+    def record(self, name, start, end=None, **attrs):
+        """Add an already-finished span (for stages timed without a with-block)."""
+        span = self._open(name, start, attrs)
+        if span is not None:
+            span.end = end if end is not None else time.time()
+        return span
+
+    def finish(self, **attrs):
+        """Close the trace with a top-level ``job`` span covering all of it."""
+        self._stack.clear()
+        return self.record('job', self.started, spans=len(self.spans),
+                           dropped=self.dropped, **attrs)
+
+    def to_rows(self):
+        """Spans as dicts with millisecond offsets from the trace start."""
+        rows = []
+        for s in self.spans:
+            end = s.end if s.end is not None else time.time()
+            rows.append({
+                'seq': s.seq,
+                'parent_seq': s.parent,
+                'name': s.name,
+                'start_ms': round((s.start - self.started) * 1000.0, 1),
+                'duration_ms': round((end - s.start) * 1000.0, 1),
+                'attrs': dict(s.attrs),
+            })
+        return rows
+
+
+# ── Thread-local active trace ────────────────────────────────────────────────
+
+def activate(trace):
+    """Make trace the current one for this thread (None to clear)."""
+    _local.trace = trace
+
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Span on the current thread's trace; a no-op when none is active."""
+    trace = current()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, **attrs) as s:
+        yield s
+
+
+def record(name, start, end=None, **attrs):
+    trace = current()
+    if trace is not None:
+        return trace.record(name, start, end, **attrs)
+    return None
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span of the current trace."""
+    trace = current()
+    if trace is not None and trace._stack:
+        trace.spans[trace._stack[-1]].attrs.update(attrs)
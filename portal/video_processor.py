@@ -3,11 +3,15 @@ Video Processor - Apply template, logo, and watermark with adaptive opacity
 Handles multi-brand export with safe zones and brightness-based watermark adjustment
 """
 import os
+import re
 import subprocess
 import json
+import tempfile
+import threading
 import time
 import uuid
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 # Import configuration
 try:
@@ -18,6 +22,21 @@ except ImportError:
     FFPROBE_BIN = 'ffprobe'
     PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+try:
+    from . import admission
+    from . import render_plans
+    from . import metrics
+    from . import tracing
+    from .logger import Lazy, get_logger
+except ImportError:
+    import admission  # standalone (portal/ on sys.path)
+    import render_plans
+    import metrics
+    import tracing
+    from logger import Lazy, get_logger
+
+log = get_logger('render')
+
 
 def _normalized_output_path(input_path: str, output_format: str, job_id: Optional[str]) -> str:
     base, _ext = os.path.splitext(input_path)
@@ -25,14 +44,182 @@ def _normalized_output_path(input_path: str, output_format: str, job_id: Optiona
     return f"{base}_normalized_{output_format}_{safe_job_id}.mp4"
 
 
+def branded_output_path(output_dir: str, brand_config: Dict, video_id: str, output_format: str) -> str:
+    """Where process_brand writes a brand's render of video_id."""
+    brand_name = brand_config.get('name', 'brand')
+    return os.path.join(output_dir, f"{video_id}_{brand_name}_{output_format}.mp4")
+
+
 def _even_dimension(value: float) -> int:
     return max(2, int(round(value / 2.0) * 2))
 
 
-def _source_video_geometry(input_path: str) -> Dict:
-    cmd = [FFPROBE_BIN, '-v', 'quiet', '-print_format', 'json', '-show_streams', input_path]
+class RenderCancelled(Exception):
+    """Raised when a render's cancel_event is set; the FFmpeg child has already been killed."""
+
+
+class _SinglePassUnavailable(Exception):
+    """A multi-format render can't share one decode; render formats one by one."""
+
+
+# How often a running FFmpeg child is checked for cancellation (seconds)
+FFMPEG_POLL_INTERVAL = 0.5
+
+# Encoder settings process_brand renders with (libx264 veryfast CRF 23, AAC
+# 128k audio ladder). Part of the render-output cache key (render_cache.py):
+# change it whenever those settings change, so earlier renders stop matching.
+ENCODER_PROFILE = 'x264-veryfast-crf23+aac128k/v1'
+
+
+def _kill_process(proc: subprocess.Popen) -> None:
+    """Terminate an FFmpeg child, escalating to SIGKILL if it ignores SIGTERM."""
+    try:
+        proc.terminate()
+        proc.communicate(timeout=5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+    except Exception as e:
+        log.info("[FFMPEG] Failed to terminate pid=%s: %s", proc.pid, e)
+
+
+def _run_ffmpeg(cmd: List[str], timeout: int, cancel_event=None,
+                operation: str = 'render', profile_key: Optional[str] = None) -> subprocess.CompletedProcess:
+    """
+    Run an FFmpeg command via Popen so it can be killed mid-encode.
+
+    Same contract as subprocess.run(stdout=DEVNULL, stderr=PIPE, text=True, timeout=...):
+    returns a CompletedProcess with stderr, raises subprocess.TimeoutExpired after
+    killing the child. When cancel_event (threading.Event) is set the child is
+    terminated and RenderCancelled is raised.
+
+    The child is started only once the memory admission controller admits it
+    (see admission.py); operation/profile_key select its learned memory profile
+    and its RSS is sampled on every poll. The timeout starts after admission.
+    """
+    queued_at = time.time()
+    try:
+        with admission.admit(operation, profile_key, cancel_event) as ticket:
+            tracing.record('admission_wait', queued_at, operation=operation)
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            deadline = time.time() + timeout
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    log.info("[FFMPEG] Cancel requested — killing pid=%s", proc.pid)
+                    _kill_process(proc)
+                    metrics.FFMPEG_EXITS.inc(operation=operation, code='cancelled')
+                    raise RenderCancelled('Render cancelled')
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    _kill_process(proc)
+                    metrics.FFMPEG_EXITS.inc(operation=operation, code='timeout')
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                ticket.sample(proc.pid)
+                try:
+                    # communicate() keeps buffered stderr across TimeoutExpired retries
+                    _stdout, stderr = proc.communicate(timeout=min(FFMPEG_POLL_INTERVAL, remaining))
+                    metrics.FFMPEG_EXITS.inc(operation=operation, code=str(proc.returncode))
+                    return subprocess.CompletedProcess(cmd, proc.returncode, None, stderr)
+                except subprocess.TimeoutExpired:
+                    continue
+    except admission.AdmissionCancelled:
+        raise RenderCancelled('Render cancelled while waiting for memory')
+
+
+# ── Segment-parallel rendering ────────────────────────────────────────────────
+# Long clips are split at keyframes of the normalized source and each segment
+# runs its own single-threaded FFmpeg concurrently, so encode time scales with
+# cores instead of hitting FFMPEG_TIMEOUT. Disabled when workers <= 1.
+SEGMENT_RENDER_WORKERS = int(os.environ.get('SEGMENT_RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+SEGMENT_RENDER_MIN_SECONDS = float(os.environ.get('SEGMENT_RENDER_MIN_SECONDS', '60'))
+SEGMENT_MIN_LENGTH = 4.0  # seconds — shorter segments aren't worth a process
+
+# Expressions that read the frame clock (t / n / enable=) would restart at 0 in
+# every segment, so graphs using them are always rendered single-pass.
+_TIME_DEPENDENT_FILTER_RE = re.compile(r"enable=|[(,*+\-/:=']\s*[tn]\b")
+
+
+# movie='<path>' sources in a filter graph (asset files a cached plan depends on)
+_MOVIE_SOURCE_RE = re.compile(r"movie='([^']+)'")
+
+
+class _EitherEvent:
+    """Duck-typed Event that reports set when any wrapped Event is set."""
+
+    def __init__(self, *events):
+        self._events = [e for e in events if e is not None]
+
+    def is_set(self) -> bool:
+        return any(e.is_set() for e in self._events)
+
+
+def _keyframe_times(input_path: str) -> List[float]:
+    """Return sorted keyframe timestamps (seconds) of the first video stream.
+    Reads packet flags only — nothing is decoded."""
+    cmd = [
+        FFPROBE_BIN, '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0', input_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    times = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) >= 2 and 'K' in parts[1]:
+            try:
+                times.append(float(parts[0]))
+            except ValueError:
+                continue
+    return sorted(set(times))
+
+
+def _plan_segments(keyframes: List[float], duration: float,
+                   workers: int) -> List[Tuple[float, Optional[float]]]:
+    """
+    Pick segment boundaries on keyframes closest to equal splits of the clip.
+
+    Returns [(start, end), ...] covering the whole clip; the last end is None
+    (read to EOF) so no trailing frames are lost to rounding.
+    """
+    boundaries = []
+    last = 0.0
+    for i in range(1, workers):
+        target = duration * i / workers
+        candidates = [k for k in keyframes if k - last >= SEGMENT_MIN_LENGTH
+                      and duration - k >= SEGMENT_MIN_LENGTH]
+        if not candidates:
+            break
+        best = min(candidates, key=lambda k: abs(k - target))
+        if best <= last:
+            continue
+        boundaries.append(best)
+        last = best
+    starts = [0.0] + boundaries
+    ends = boundaries + [None]
+    return list(zip(starts, ends))
+
+
+def _probe_source(input_path: str) -> Dict:
+    """ffprobe streams + format (with side data) as parsed JSON."""
+    cmd = [FFPROBE_BIN, '-v', 'quiet', '-print_format', 'json', '-show_streams', '-show_format', input_path]
     result = subprocess.run(cmd, check=True, capture_output=True, text=True, timeout=60)
-    info = json.loads(result.stdout or '{}')
+    return json.loads(result.stdout or '{}')
+
+
+def _parse_rate(rate) -> float:
+    """'30000/1001' / '30' -> fps; 0.0 when absent or malformed."""
+    try:
+        if isinstance(rate, str) and '/' in rate:
+            num, den = rate.split('/', 1)
+            return float(num) / float(den) if float(den) else 0.0
+        return float(rate) if rate else 0.0
+    except (TypeError, ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _source_video_geometry(input_path: str, info: Optional[Dict] = None) -> Dict:
+    if info is None:
+        info = _probe_source(input_path)
     video_stream = next((s for s in info.get('streams', []) if s.get('codec_type') == 'video'), None)
     if not video_stream:
         raise ValueError('No video stream found')
@@ -42,18 +229,7 @@ def _source_video_geometry(input_path: str) -> Dict:
     if width <= 0 or height <= 0:
         raise ValueError(f'Invalid video dimensions: {width}x{height}')
 
-    fps = 30.0
-    rate = video_stream.get('avg_frame_rate') or video_stream.get('r_frame_rate') or ''
-    try:
-        if '/' in rate:
-            num, den = rate.split('/', 1)
-            den_f = float(den)
-            if den_f:
-                fps = float(num) / den_f
-        elif rate:
-            fps = float(rate)
-    except (TypeError, ValueError, ZeroDivisionError):
-        fps = 30.0
+    fps = _parse_rate(video_stream.get('avg_frame_rate') or video_stream.get('r_frame_rate') or '')
     if fps <= 0 or fps > 120:
         fps = 30.0
 
@@ -66,7 +242,7 @@ def _build_vertical_reframe_filter(input_path: str, source_edit: Optional[Dict])
 
     crop_mode = source_edit.get('crop_mode', 'fit')
     if crop_mode not in {'fit', 'fill'}:
-        print(f"[NORMALIZE-REFRAME] Unsupported crop_mode='{crop_mode}' â€” using legacy center-cover")
+        log.info("[NORMALIZE-REFRAME] Unsupported crop_mode='%s' â€” using legacy center-cover", crop_mode)
         return None
 
     geom = _source_video_geometry(input_path)
@@ -91,11 +267,10 @@ def _build_vertical_reframe_filter(input_path: str, source_edit: Optional[Dict])
     oy = int(round((target_h - sh) * crop_y))
     fps = geom['fps']
 
-    print(
+    log.info(
         "[NORMALIZE-REFRAME] vertical_9_16 "
-        f"src={vw}x{vh} target={target_w}x{target_h} "
-        f"mode={crop_mode} crop=({crop_x:.3f},{crop_y:.3f}) zoom={zoom:.3f} "
-        f"scaled={sw}x{sh} overlay=({ox},{oy}) fps={fps:.3f}"
+        "src=%sx%s target=%sx%s mode=%s crop=(%.3f,%.3f) zoom=%.3f scaled=%sx%s overlay=(%s,%s) fps=%.3f",
+        vw, vh, target_w, target_h, crop_mode, crop_x, crop_y, zoom, sw, sh, ox, oy, fps
     )
 
     # Flip mirrors the raw source BEFORE scale/overlay, so pan position is
@@ -109,8 +284,260 @@ def _build_vertical_reframe_filter(input_path: str, source_edit: Optional[Dict])
     )
 
 
+def _normalize_filter_graph(input_path: str, output_format: str,
+                            source_edit: Optional[Dict] = None) -> str:
+    """
+    The format-enforcing filter graph normalize_video applies: reads [0:v],
+    writes [out] at the product frame size. Shared with render_still so a
+    still preview goes through exactly the transform a render's source does.
+    """
+    # Horizontal flip mirrors the raw source before any scale/crop. Applies to
+    # ALL formats. For the vertical reframe path it's baked into the reframe
+    # filter; for every other path we prepend it here. "" when not flipped.
+    flip_pre = "hflip," if (source_edit and source_edit.get('flip_h')) else ""
+
+    if output_format == 'vertical_9_16':
+        log.info("[NORMALIZE] output_format=vertical_9_16 target=720x1280")
+        reframe_filter = None
+        if source_edit:
+            try:
+                reframe_filter = _build_vertical_reframe_filter(input_path, source_edit)
+            except Exception as reframe_error:
+                log.warning(
+                    "[NORMALIZE-REFRAME WARNING] Failed to build source reframe filter; "
+                    "falling back to legacy center-cover. error=%s", reframe_error
+                )
+        if reframe_filter:
+            return reframe_filter
+        if source_edit:
+            log.warning("[NORMALIZE-REFRAME WARNING] Source edit present but unused; using legacy center-cover")
+        return f"[0:v]{flip_pre}scale=720:1280:force_original_aspect_ratio=increase,crop=720:1280:(iw-720)/2:(ih-1280)/2[out]"
+
+    if output_format == 'square_1_1':
+        # Blur-pad: blurred 720×720 background + foreground scaled to fit, centered.
+        # Preserves full source frame — no cropping of faces/text.
+        log.info("[NORMALIZE] output_format=square_1_1 target=720x720 strategy=blur-pad")
+        return (
+            f"[0:v]{flip_pre}split=2[fg][bg_raw];"
+            "[bg_raw]scale=720:720:force_original_aspect_ratio=increase,"
+            "crop=720:720:(iw-720)/2:(ih-720)/2,"
+            "gblur=sigma=25[bg];"
+            "[fg]scale=720:720:force_original_aspect_ratio=decrease[fg_scaled];"
+            "[bg][fg_scaled]overlay=(W-w)/2:(H-h)/2[out]"
+        )
+
+    # Fallback: width-only normalize, preserve source aspect ratio.
+    log.info("[NORMALIZE] output_format=%s — using fallback scale=720:-2", output_format)
+    return f"[0:v]{flip_pre}scale=720:-2[out]"
+
+
+def _normalized_frame_size(input_path: str, output_format: str,
+                           info: Optional[Dict] = None) -> Tuple[int, int]:
+    """Frame size _normalize_filter_graph produces for this source."""
+    if output_format == 'vertical_9_16':
+        return 720, 1280
+    if output_format == 'square_1_1':
+        return 720, 720
+    geom = _source_video_geometry(input_path, info)
+    return 720, max(2, int(round(geom['height'] * 720 / geom['width'] / 2.0)) * 2)
+
+
+# ── Normalization planner ─────────────────────────────────────────────────────
+# Many sources (TikTok especially) already arrive as 8-bit H.264 yuv420p at
+# exactly the product frame size with AAC audio; re-encoding those costs a full
+# decode + x264 pass for nothing. plan_normalization inspects the probe and
+# picks, per stream, 'copy' / 'encode' (video, audio) or 'skip' (data,
+# subtitle, attachment streams — never carried into a render), and for the
+# file as a whole:
+#   skip   — the source is used as-is (faststart MP4, nothing to change)
+#   remux  — stream copy into a fresh faststart MP4 (audio re-encoded if needed)
+#   encode — the full normalize graph, as before
+NORMALIZE_COPY_CODECS = {'video': 'h264', 'audio': 'aac'}
+NORMALIZE_MAX_START = 0.5         # s — later first timestamps mean a broken/edited timeline
+NORMALIZE_MAX_AV_SKEW = 0.1       # s — audio vs video start
+NORMALIZE_MAX_RATE_DRIFT = 0.02   # |avg - r| / r frame rate; larger = VFR / bad timestamps
+HDR_TRANSFERS = {'smpte2084', 'arib-std-b67'}
+
+
+def _float_or_none(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _edit_trim(source_edit: Optional[Dict]) -> Optional[Tuple[float, Optional[float]]]:
+    """(start, end) source seconds from a source edit, or None when untrimmed."""
+    if not source_edit:
+        return None
+    start = _float_or_none(source_edit.get('trim_start')) or 0.0
+    end = _float_or_none(source_edit.get('trim_end'))
+    if start <= 0 and end is None:
+        return None
+    return max(0.0, start), end
+
+
+def _trim_input_args(trim: Optional[Tuple[float, Optional[float]]]) -> List[str]:
+    """Input-side seek/limit for a trim — goes BEFORE -i. Demuxing starts at
+    the keyframe preceding start; with a re-encode FFmpeg decodes from there
+    and drops frames before start (accurate seek), with stream copy the cut
+    lands on that keyframe (plan_normalization only copies when one lies
+    within half a frame at or before start, and seeks to it)."""
+    if not trim:
+        return []
+    start, end = trim
+    args = ['-ss', f'{start:.3f}'] if start > 0 else []
+    if end is not None:
+        args += ['-t', f'{max(0.0, end - start):.3f}']
+    return args
+
+
+def _video_copy_blockers(stream: Dict, frame_size: Tuple[int, int],
+                         source_edit: Optional[Dict]) -> List[str]:
+    """Why the video stream can't be stream-copied (empty list = it can)."""
+    reasons = []
+    if stream.get('codec_name') != NORMALIZE_COPY_CODECS['video']:
+        reasons.append(f"codec={stream.get('codec_name')}")
+    if stream.get('pix_fmt') != 'yuv420p':
+        reasons.append(f"pix_fmt={stream.get('pix_fmt')}")
+    bits = stream.get('bits_per_raw_sample')
+    if bits not in (None, '', '8', 8):
+        reasons.append(f"bit_depth={bits}")
+    if (stream.get('width'), stream.get('height')) != frame_size:
+        reasons.append(f"size={stream.get('width')}x{stream.get('height')}")
+    sar = stream.get('sample_aspect_ratio')
+    if sar not in (None, '', '1:1', '0:1', 'N/A'):
+        reasons.append(f"sar={sar}")
+    if stream.get('field_order') not in (None, '', 'progressive', 'unknown'):
+        reasons.append(f"field_order={stream.get('field_order')}")
+    if stream.get('color_transfer') in HDR_TRANSFERS or stream.get('color_primaries') == 'bt2020':
+        reasons.append(f"hdr={stream.get('color_transfer') or stream.get('color_primaries')}")
+    for side in stream.get('side_data_list') or []:
+        side_type = (side.get('side_data_type') or '').lower()
+        if 'dovi' in side_type or 'dolby' in side_type:
+            reasons.append('dovi')
+        elif side.get('rotation') not in (None, 0, '0'):
+            reasons.append(f"rotation={side.get('rotation')}")
+        elif 'mastering display' in side_type or 'content light' in side_type:
+            reasons.append('hdr_side_data')
+    if (stream.get('tags') or {}).get('rotate') not in (None, '0'):
+        reasons.append(f"rotation={stream['tags']['rotate']}")
+
+    avg = _parse_rate(stream.get('avg_frame_rate'))
+    real = _parse_rate(stream.get('r_frame_rate'))
+    if not (0 < avg <= 120) or not (0 < real <= 120) or abs(avg - real) / real > NORMALIZE_MAX_RATE_DRIFT:
+        reasons.append(f"frame_rate={stream.get('avg_frame_rate')}/{stream.get('r_frame_rate')}")
+    start = _float_or_none(stream.get('start_time'))
+    if start is None or not (0 <= start <= NORMALIZE_MAX_START):
+        reasons.append(f"start_time={stream.get('start_time')}")
+
+    if source_edit:
+        if source_edit.get('flip_h'):
+            reasons.append('flip_h')
+        zoom = _float_or_none(source_edit.get('zoom', 1.0))
+        if zoom is None or abs(zoom - 1.0) > 1e-6:
+            reasons.append(f"zoom={source_edit.get('zoom')}")
+    return reasons
+
+
+def _moov_before_mdat(path: str) -> bool:
+    """True when an MP4's moov box precedes mdat (already faststart)."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return False
+                size = int.from_bytes(header[:4], 'big')
+                box = header[4:8]
+                if box == b'moov':
+                    return True
+                if box == b'mdat':
+                    return False
+                if size == 1:
+                    size = int.from_bytes(f.read(8), 'big') - 8
+                if size < 8:
+                    return False
+                f.seek(size - 8, os.SEEK_CUR)
+    except (OSError, ValueError):
+        return False
+
+
+def plan_normalization(input_path: str, info: Dict, output_format: str,
+                       source_edit: Optional[Dict] = None) -> Dict:
+    """
+    Decide how much work normalize_video has to do for this source.
+
+    A trim rules out 'skip' (the file must be cut), and a trim start that is
+    not on a keyframe rules out video copy: with -ss before -i and -c:v copy
+    the cut lands on the keyframe at or before the seek point, so a keyframe
+    just after the start would still cut a GOP early. Only a keyframe within
+    half a frame at or before the start qualifies; the remux then seeks to it
+    exactly (``copy_seek``).
+
+    Returns {'action': 'skip'|'remux'|'encode', 'video': 'copy'|'encode',
+    'audio': 'copy'|'encode'|'none', 'skipped_streams': n, 'reasons': [...]}
+    plus 'copy_seek' (seconds) for a trimmed remux.
+    """
+    trim = _edit_trim(source_edit)
+    streams = info.get('streams') or []
+    videos = [s for s in streams if s.get('codec_type') == 'video'
+              and not (s.get('disposition') or {}).get('attached_pic')]
+    audios = [s for s in streams if s.get('codec_type') == 'audio']
+    skipped = len(streams) - len(videos) - len(audios)
+
+    if not videos:
+        return {'action': 'encode', 'video': 'encode', 'audio': 'encode' if audios else 'none',
+                'skipped_streams': skipped, 'reasons': ['no_video_stream']}
+    video = videos[0]
+    reasons = _video_copy_blockers(video, _normalized_frame_size(input_path, output_format, info),
+                                   source_edit)
+    if len(videos) > 1:
+        skipped += len(videos) - 1
+    copy_seek = None
+    if not reasons and trim and trim[0] > 0:
+        fps = _parse_rate(video.get('avg_frame_rate')) or 30.0
+        on_start = [k for k in _keyframe_times(input_path) if trim[0] - 0.5 / fps <= k <= trim[0]]
+        if on_start:
+            copy_seek = on_start[-1]
+        else:
+            reasons.append(f"trim_start_off_keyframe={trim[0]:.3f}")
+
+    if not audios:
+        audio = 'none'
+    elif all(a.get('codec_name') == NORMALIZE_COPY_CODECS['audio'] for a in audios):
+        audio = 'copy'
+        v_start = _float_or_none(video.get('start_time')) or 0.0
+        for a in audios:
+            a_start = _float_or_none(a.get('start_time'))
+            if a_start is None or abs(a_start - v_start) > NORMALIZE_MAX_AV_SKEW:
+                # Skewed audio is a timestamp problem, not an audio codec one:
+                # the whole file goes through the encoder to be re-timed
+                reasons.append(f"av_skew={a.get('start_time')}")
+                break
+    else:
+        audio = 'encode'
+
+    plan = {'video': 'encode' if reasons else 'copy', 'audio': audio,
+            'skipped_streams': skipped, 'reasons': reasons}
+    if reasons:
+        plan['action'] = 'encode'
+        if audio == 'copy':
+            plan['audio'] = 'encode'
+    elif (audio != 'encode' and not skipped and not trim
+          and 'mp4' in ((info.get('format') or {}).get('format_name') or '')
+          and input_path.lower().endswith('.mp4') and _moov_before_mdat(input_path)):
+        plan['action'] = 'skip'
+    else:
+        plan['action'] = 'remux'
+        if copy_seek is not None:
+            plan['copy_seek'] = copy_seek
+    return plan
+
+
 def normalize_video(input_path: str, output_format: str = 'vertical_9_16',
-                    source_edit: Optional[Dict] = None, job_id: Optional[str] = None) -> str:
+                    source_edit: Optional[Dict] = None, job_id: Optional[str] = None,
+                    cancel_event=None) -> str:
     """
     Normalize video to standard 8-bit H264 SDR format, stripping HDR/DOVI metadata,
     and enforce the target output format dimensions.
@@ -129,130 +556,213 @@ def normalize_video(input_path: str, output_format: str = 'vertical_9_16',
     Args:
         input_path: Path to the input video file
         output_format: Target output format key (default: 'vertical_9_16')
+        cancel_event: Optional threading.Event; when set, FFmpeg is killed and
+            RenderCancelled is raised (the partial file is removed)
+
+    Sources that already conform are not re-encoded (plan_normalization):
+    they are used as-is or stream-copied, and the decision is recorded on the
+    job's normalize span and in brandr_normalize_plans_total.
 
     Returns:
-        Path to normalized video file (or original if normalization fails)
+        Path to normalized video file (or original if it already conforms or
+        normalization fails)
     """
     try:
         fixed_path = _normalized_output_path(input_path, output_format, job_id)
-        print(f"[NORMALIZE] Normalizing video to clean 8-bit H264 SDR: {input_path}")
-
         NORMALIZE_TIMEOUT = 300  # 5 min — normalization is just scale+re-encode, not overlay rendering
 
-        # Horizontal flip mirrors the raw source before any scale/crop. Applies to
-        # ALL formats. For the vertical reframe path it's baked into the reframe
-        # filter; for every other path we prepend it here. "" when not flipped.
-        flip_pre = "hflip," if (source_edit and source_edit.get('flip_h')) else ""
-
-        if output_format == 'vertical_9_16':
-            print(f"[NORMALIZE] output_format=vertical_9_16 target=720x1280")
-            reframe_filter = None
-            if source_edit:
-                try:
-                    reframe_filter = _build_vertical_reframe_filter(input_path, source_edit)
-                except Exception as reframe_error:
-                    print(
-                        "[NORMALIZE-REFRAME WARNING] Failed to build source reframe filter; "
-                        f"falling back to legacy center-cover. error={reframe_error}"
-                    )
-
-            if reframe_filter:
-                cmd = [
-                    FFMPEG_BIN, "-y", "-threads", "1", "-i", input_path,
-                    "-filter_complex", reframe_filter,
-                    "-filter_threads", "1",
-                    "-map", "[out]",
-                    "-map", "0:a?",
-                    "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-                    "-threads", "1",
-                    "-pix_fmt", "yuv420p",
-                    "-c:a", "aac", "-b:a", "128k",
-                    "-movflags", "+faststart",
-                    fixed_path
-                ]
-            else:
-                if source_edit:
-                    print("[NORMALIZE-REFRAME WARNING] Source edit present but unused; using legacy center-cover")
-                cmd = [
-                    FFMPEG_BIN, "-y", "-threads", "1", "-i", input_path,
-                    "-vf", flip_pre + "scale=720:1280:force_original_aspect_ratio=increase,crop=720:1280:(iw-720)/2:(ih-1280)/2",
-                    "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-                    "-threads", "1",
-                    "-pix_fmt", "yuv420p",
-                    "-c:a", "aac", "-b:a", "128k",
-                    "-movflags", "+faststart",
-                    fixed_path
-                ]
-        elif output_format == 'square_1_1':
-            # Blur-pad: blurred 720×720 background + foreground scaled to fit, centered.
-            # Preserves full source frame — no cropping of faces/text.
-            _fc = (
-                f"[0:v]{flip_pre}split=2[fg][bg_raw];"
-                "[bg_raw]scale=720:720:force_original_aspect_ratio=increase,"
-                "crop=720:720:(iw-720)/2:(ih-720)/2,"
-                "gblur=sigma=25[bg];"
-                "[fg]scale=720:720:force_original_aspect_ratio=decrease[fg_scaled];"
-                "[bg][fg_scaled]overlay=(W-w)/2:(H-h)/2[out]"
-            )
-            print(f"[NORMALIZE] output_format=square_1_1 target=720x720 strategy=blur-pad")
-            cmd = [
-                FFMPEG_BIN, "-y", "-threads", "1", "-i", input_path,
-                "-filter_complex", _fc,
-                "-filter_threads", "1",
-                "-map", "[out]",
-                "-map", "0:a?",
-                "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-                "-threads", "1",
-                "-pix_fmt", "yuv420p",
-                "-c:a", "aac", "-b:a", "128k",
-                "-movflags", "+faststart",
-                fixed_path
-            ]
-        else:
-            # Fallback: width-only normalize, preserve source aspect ratio.
-            print(f"[NORMALIZE] output_format={output_format} — using fallback scale=720:-2")
+        try:
+            with tracing.span('probe', what='normalize_plan'):
+                info = _probe_source(input_path)
+            plan = plan_normalization(input_path, info, output_format, source_edit)
+        except Exception as probe_error:
+            info = None
+            plan = {'action': 'encode', 'video': 'encode', 'audio': 'encode',
+                    'skipped_streams': 0, 'reasons': [f'probe_failed: {probe_error}']}
+        tracing.annotate(plan=plan['action'], video=plan['video'], audio=plan['audio'],
+                         plan_reasons=','.join(plan['reasons'])[:200])
+        metrics.NORMALIZE_PLANS.inc(action=plan['action'])
+        log.info("[NORMALIZE] plan=%s video=%s audio=%s skipped_streams=%s reasons=%s",
+                 plan['action'], plan['video'], plan['audio'], plan['skipped_streams'], plan['reasons'] or '-')
+
+        if plan['action'] == 'skip':
+            return input_path
+        trim = _edit_trim(source_edit)
+        trim_args = _trim_input_args(trim)
+        if trim:
+            log.info("[NORMALIZE] trim start=%.3fs end=%s",
+                     trim[0], trim[1] if trim[1] is not None else 'EOF')
+        if plan['action'] == 'remux':
+            # Seek to the keyframe itself so the copied cut starts exactly there
+            remux_trim_args = (_trim_input_args((plan['copy_seek'], trim[1]))
+                               if trim and plan.get('copy_seek') is not None else trim_args)
             cmd = [
-                FFMPEG_BIN, "-y", "-threads", "1", "-i", input_path,
-                "-vf", flip_pre + "scale=720:-2",
-                "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-                "-threads", "1",
-                "-pix_fmt", "yuv420p",
-                "-c:a", "aac", "-b:a", "128k",
+                FFMPEG_BIN, "-y", *remux_trim_args, "-i", input_path,
+                "-map", "0:v:0", "-map", "0:a?",
+                "-c:v", "copy",
+            ] + (["-c:a", "copy"] if plan['audio'] == 'copy' else ["-c:a", "aac", "-b:a", "128k"]) + [
                 "-movflags", "+faststart",
                 fixed_path
             ]
+            result = _run_ffmpeg(cmd, NORMALIZE_TIMEOUT, cancel_event,
+                                 operation='mux', profile_key='normalize')
+            if result.returncode == 0 and os.path.exists(fixed_path):
+                log.info("[NORMALIZE] Stream-copied conforming source: %s", fixed_path)
+                return fixed_path
+            log.warning("[NORMALIZE] Remux failed (code=%s); falling back to full encode. stderr: %s",
+                        result.returncode, (result.stderr or '')[-500:])
+            tracing.annotate(plan='encode', plan_fallback='remux_failed')
+
+        log.info("[NORMALIZE] Normalizing video to clean 8-bit H264 SDR: %s", input_path)
+        graph = _normalize_filter_graph(input_path, output_format, source_edit)
+        cmd = [
+            FFMPEG_BIN, "-y", "-threads", "1", *trim_args, "-i", input_path,
+            "-filter_complex", graph,
+            "-filter_threads", "1",
+            "-map", "[out]",
+            "-map", "0:a?",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+            "-threads", "1",
+            "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart",
+            fixed_path
+        ]
 
-        print(f"[NORMALIZE] Running command (timeout={NORMALIZE_TIMEOUT}s): {' '.join(cmd)}")
-        result = subprocess.run(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=NORMALIZE_TIMEOUT
-        )
+        log.info("[NORMALIZE] Running command (timeout=%ss): %s",
+                 NORMALIZE_TIMEOUT, Lazy(' '.join, cmd))
+        # Memory profile: decode cost follows the SOURCE resolution
+        try:
+            with tracing.span('probe', what='source_geometry'):
+                _geo = _source_video_geometry(input_path, info)
+            mem_key = f"{admission.resolution_class(_geo['width'], _geo['height'])}>{output_format}"
+        except Exception:
+            mem_key = f"unknown>{output_format}"
+        result = _run_ffmpeg(cmd, NORMALIZE_TIMEOUT, cancel_event,
+                             operation='normalize', profile_key=mem_key)
 
         if result.returncode == 0 and os.path.exists(fixed_path):
             file_size = os.path.getsize(fixed_path) / (1024 * 1024)
-            print(f"[NORMALIZE] Successfully normalized video: {fixed_path} ({file_size:.2f}MB)")
+            log.info("[NORMALIZE] Successfully normalized video: %s (%.2fMB)", fixed_path, file_size)
             return fixed_path
         else:
-            print(f"[NORMALIZE] Failed to normalize video (code={result.returncode}). stderr: {(result.stderr or '')[-1000:]}")
+            log.warning("[NORMALIZE] Failed to normalize video (code=%s). stderr: %s",
+                        result.returncode, (result.stderr or '')[-1000:])
             if output_format == 'vertical_9_16' and source_edit:
-                print(
+                log.warning(
                     "[NORMALIZE-REFRAME WARNING] Source reframe normalization failed; "
                     "falling back to original input, so render may not match preview."
                 )
             if os.path.exists(fixed_path):
                 os.remove(fixed_path)  # Clean up failed output
             return input_path
+    except RenderCancelled:
+        log.info("[NORMALIZE] Cancelled — removing partial output")
+        if os.path.exists(fixed_path):
+            os.remove(fixed_path)
+        raise
     except subprocess.TimeoutExpired:
-        print(f"[NORMALIZE] Normalization timed out after {NORMALIZE_TIMEOUT}s — using original file")
+        log.info("[NORMALIZE] Normalization timed out after %ss — using original file", NORMALIZE_TIMEOUT)
         return input_path
     except Exception as e:
-        print(f"[NORMALIZE] Error during normalization: {e}")
+        log.info("[NORMALIZE] Error during normalization: %s", e)
         return input_path
 
 
+# ── Filter graph composition ──────────────────────────────────────────────────
+# Link labels ([watermark], [v1], [out] ...) — never input pads like [0:v]
+_LINK_LABEL_RE = re.compile(r"\[([A-Za-z_]\w*)\]")
+
+
+def _prefix_labels(graph: str, prefix: str) -> str:
+    """Prefix every link label in graph so two graphs can share one
+    filter_complex. Quoted option values (drawtext text, movie paths) are
+    left alone; outside quotes, \\' is an escaped quote, not a delimiter."""
+    out, start, quoted, i = [], 0, False, 0
+    while i < len(graph):
+        ch = graph[i]
+        if ch == '\\' and not quoted:
+            i += 2
+            continue
+        if ch == "'":
+            segment = graph[start:i]
+            out.append(segment if quoted else _LINK_LABEL_RE.sub(lambda m: f'[{prefix}{m.group(1)}]', segment))
+            out.append(ch)
+            quoted = not quoted
+            start = i + 1
+        i += 1
+    segment = graph[start:]
+    out.append(segment if quoted else _LINK_LABEL_RE.sub(lambda m: f'[{prefix}{m.group(1)}]', segment))
+    return ''.join(out)
+
+
+def _splice_input(graph: str, source: str, tag: str) -> str:
+    """graph with its [0:v] reads fed from the [source] link instead; a split
+    into [tag0], [tag1]... is prepended when [0:v] is read more than once."""
+    uses = graph.count('[0:v]')
+    if uses <= 1:
+        return graph.replace('[0:v]', f'[{source}]')
+    labels = [f'[{tag}{i}]' for i in range(uses)]
+    for label in labels:
+        graph = graph.replace('[0:v]', label, 1)
+    return f"[{source}]split={uses}{''.join(labels)};{graph}"
+
+
+# ── Still previews ────────────────────────────────────────────────────────────
+# One frame through the same normalize graph and brand graph a render uses, so
+# the editor can show the exact composite without a full encode.
+STILL_TIMEOUT = 30
+STILL_CODECS = {
+    'jpeg': ['-c:v', 'mjpeg', '-q:v', '3', '-pix_fmt', 'yuvj420p'],
+    'webp': ['-c:v', 'libwebp', '-quality', '82', '-pix_fmt', 'yuv420p'],
+}
+
+
+def render_still(source_path: str, brand_config: Dict, output_format: str = 'vertical_9_16',
+                 t: float = 0.0, source_edit: Optional[Dict] = None,
+                 image_format: str = 'jpeg') -> bytes:
+    """
+    Render one branded frame of source_path at t seconds and return the
+    encoded image (JPEG or WebP).
+
+    The source is input-seeked (``-ss`` before ``-i``), passed through
+    _normalize_filter_graph for output_format and then through the brand's
+    compiled filter graph — the same graph process_brand would use at that
+    frame size, including the render-plan cache. Raises RuntimeError when
+    FFmpeg produces no image.
+    """
+    width, height = _normalized_frame_size(source_path, output_format)
+    brand_graph = VideoProcessor.for_frame(width, height).build_filter_complex(dict(brand_config))
+    if not brand_graph or '[vout]' not in brand_graph:
+        raise RuntimeError('No valid filter graph for brand')
+
+    # The brand graph reads the normalized frame where a render reads [0:v]
+    graph = _normalize_filter_graph(source_path, output_format, source_edit).replace('[out]', '[still_src]')
+    graph = f"{graph};{_splice_input(brand_graph, 'still_src', 'still_src')}"
+
+    out_path = os.path.join(tempfile.gettempdir(), f'still_{uuid.uuid4().hex}.{image_format}')
+    cmd = [
+        FFMPEG_BIN, '-y', '-v', 'error',
+        '-ss', f'{max(0.0, float(t)):.3f}', '-i', source_path,
+        '-filter_complex', graph,
+        '-filter_threads', '1', '-threads', '1',
+        '-map', '[vout]', '-frames:v', '1',
+        *STILL_CODECS[image_format],
+        '-f', 'image2', out_path,
+    ]
+    try:
+        result = _run_ffmpeg(cmd, STILL_TIMEOUT, operation='still')
+        if result.returncode != 0 or not os.path.exists(out_path):
+            raise RuntimeError(f"Still render failed (code={result.returncode}): {(result.stderr or '')[-500:]}")
+        with open(out_path, 'rb') as f:
+            return f.read()
+    finally:
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+
+
 class VideoProcessor:
     """
     Process videos with brand overlays using dynamic master asset resolution.
@@ -280,6 +790,9 @@ class VideoProcessor:
     TEXT_SIZE = 48
     TEXT_COLOR = '#FFFFFF'
     TEXT_FONT = 'Arial'
+    # Face the pre-rasterized text layer uses: drawtext (also its fallback)
+    # passes no font=, so fontconfig's default Sans is what renders have shown
+    TEXT_RASTER_FONT = 'Sans'
     TEXT_BG_ENABLED = True
     TEXT_BG_COLOR = '#000000'
     TEXT_BG_OPACITY = 0.6
@@ -290,19 +803,20 @@ class VideoProcessor:
         self.output_dir = output_dir
         
         # Probe video info
+        probe_started = time.time()
         cmd = [FFPROBE_BIN, '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', video_path]
         try:
             result = subprocess.run(cmd, check=True, capture_output=True, text=True)
             self.video_info = json.loads(result.stdout)
-            print(f"[DEBUG] Video info: {json.dumps(self.video_info, indent=2)}")
+            log.debug("[DEBUG] Video info: %s", Lazy(json.dumps, self.video_info, indent=2))
             
             # Extract key information
             format_info = self.video_info.get('format', {})
             streams = self.video_info.get('streams', [])
             
-            print(f"[DEBUG] Format: {format_info.get('format_name', 'unknown')}")
-            print(f"[DEBUG] Duration: {format_info.get('duration', 'unknown')} seconds")
-            print(f"[DEBUG] Streams count: {len(streams)}")
+            log.debug("[DEBUG] Format: %s", format_info.get('format_name', 'unknown'))
+            log.debug("[DEBUG] Duration: %s seconds", format_info.get('duration', 'unknown'))
+            log.debug("[DEBUG] Streams count: %s", len(streams))
             
             # Find video stream
             video_stream = None
@@ -321,13 +835,26 @@ class VideoProcessor:
                 # Fallback if no video stream found
                 self.video_metadata = {'width': 1080, 'height': 1920, 'duration': 0}
                 
-            print(f"[DEBUG] Video dimensions: {self.video_metadata['width']}x{self.video_metadata['height']}")
+            log.debug("[DEBUG] Video dimensions: %sx%s",
+                      self.video_metadata['width'], self.video_metadata['height'])
             
         except Exception as e:
-            print(f"[ERROR] Failed to probe video: {e}")
+            log.error("[ERROR] Failed to probe video: %s", e)
             self.video_info = {}
             self.video_metadata = {'width': 1080, 'height': 1920, 'duration': 0}
+        tracing.record('probe', probe_started, what='source')
     
+    @classmethod
+    def for_frame(cls, width: int, height: int, output_dir: str = 'exports') -> 'VideoProcessor':
+        """Processor for a known frame size, without probing a file — enough to
+        build filter graphs (render_still)."""
+        self = cls.__new__(cls)
+        self.video_path = None
+        self.output_dir = output_dir
+        self.video_info = {}
+        self.video_metadata = {'width': int(width), 'height': int(height), 'duration': 0}
+        return self
+
     def has_video_stream(self) -> bool:
         """
         Check if the video file contains a valid video stream.
@@ -342,7 +869,7 @@ class VideoProcessor:
                     return True
             return False
         except Exception as e:
-            print(f"[ERROR] Failed to check video stream: {e}")
+            log.error("[ERROR] Failed to check video stream: %s", e)
             return False
 
     def _validate_output(self, output_path: str) -> bool:
@@ -362,21 +889,30 @@ class VideoProcessor:
         Returns:
             bool: True if the output is a valid, non-empty video file.
         """
+        started = time.time()
+        try:
+            return self._check_output(output_path)
+        finally:
+            metrics.RENDER_STAGE_SECONDS.observe(time.time() - started, stage='validate')
+            tracing.record('validate', started, file=os.path.basename(output_path))
+
+    def _check_output(self, output_path: str) -> bool:
+        """The probe behind _validate_output (see there)."""
         try:
             if not os.path.exists(output_path):
-                print(f"[VALIDATE] Reject: output missing — {output_path}")
+                log.info("[VALIDATE] Reject: output missing — %s", output_path)
                 return False
 
             size = os.path.getsize(output_path)
             if size == 0:
-                print(f"[VALIDATE] Reject: output is 0 bytes — {output_path}")
+                log.info("[VALIDATE] Reject: output is 0 bytes — %s", output_path)
                 return False
 
             cmd = [FFPROBE_BIN, '-v', 'quiet', '-print_format', 'json',
                    '-show_format', '-show_streams', output_path]
             result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
             if result.returncode != 0:
-                print(f"[VALIDATE] Reject: ffprobe failed (code={result.returncode}) — {output_path}")
+                log.info("[VALIDATE] Reject: ffprobe failed (code=%s) — %s", result.returncode, output_path)
                 return False
 
             info = json.loads(result.stdout or '{}')
@@ -384,7 +920,7 @@ class VideoProcessor:
 
             has_video = any(s.get('codec_type') == 'video' for s in streams)
             if not has_video:
-                print(f"[VALIDATE] Reject: no video stream — {output_path}")
+                log.info("[VALIDATE] Reject: no video stream — %s", output_path)
                 return False
 
             # Duration may sit on the container format or on the video stream,
@@ -402,18 +938,18 @@ class VideoProcessor:
                         duration = _as_float(s.get('duration'))
                         break
             if duration <= 0:
-                print(f"[VALIDATE] Reject: non-positive duration ({duration}) — {output_path}")
+                log.info("[VALIDATE] Reject: non-positive duration (%s) — %s", duration, output_path)
                 return False
 
-            print(f"[VALIDATE] OK: {size//1024}KB, duration={duration:.1f}s, "
-                  f"video stream present — {output_path}")
+            log.info("[VALIDATE] OK: %sKB, duration=%.1fs, "
+                     "video stream present — %s", size//1024, duration, output_path)
             return True
 
         except subprocess.TimeoutExpired:
-            print(f"[VALIDATE] Reject: ffprobe timed out — {output_path}")
+            log.info("[VALIDATE] Reject: ffprobe timed out — %s", output_path)
             return False
         except Exception as e:
-            print(f"[VALIDATE] Reject: validation error: {e} — {output_path}")
+            log.info("[VALIDATE] Reject: validation error: %s — %s", e, output_path)
             return False
 
     def detect_orientation(self) -> str:
@@ -435,7 +971,7 @@ class VideoProcessor:
         else:
             orientation = 'Landscape'
         
-        print(f"[DEBUG] Detected orientation: {orientation} (w:{width} x h:{height})")
+        log.debug("[DEBUG] Detected orientation: %s (w:%s x h:%s)", orientation, width, height)
         return orientation
     
     def resolve_watermark_path(self, brand_name: str, brand_config: Dict = None) -> Optional[str]:
@@ -460,9 +996,9 @@ class VideoProcessor:
                 # Path is relative to STORAGE_ROOT
                 full_path = os.path.join(STORAGE_ROOT, watermark_path)
                 if os.path.exists(full_path):
-                    print(f"[DEBUG] Using uploaded watermark: {full_path}")
+                    log.debug("[DEBUG] Using uploaded watermark: %s", full_path)
                     return full_path
-                print(f"[DEBUG] Uploaded watermark path not found: {full_path}")
+                log.debug("[DEBUG] Uploaded watermark path not found: %s", full_path)
         
         # 2. Try legacy DB-stored path based on orientation
         orientation = self.detect_orientation()
@@ -479,9 +1015,9 @@ class VideoProcessor:
                 from .config import PROJECT_ROOT
                 full_path = os.path.join(PROJECT_ROOT, db_path)
                 if os.path.exists(full_path):
-                    print(f"[DEBUG] Using DB watermark path: {full_path}")
+                    log.debug("[DEBUG] Using DB watermark path: %s", full_path)
                     return full_path
-                print(f"[DEBUG] DB watermark path not found: {full_path}")
+                log.debug("[DEBUG] DB watermark path not found: %s", full_path)
         
         # 3. Fallback to master assets filesystem resolution
         watermark_dir = os.path.join(self.WATERMARKS_DIR, orientation)
@@ -499,14 +1035,43 @@ class VideoProcessor:
         
         for pattern in patterns:
             path = os.path.join(watermark_dir, pattern)
-            print(f"[DEBUG] Trying watermark path: {path}")
+            log.debug("[DEBUG] Trying watermark path: %s", path)
             if os.path.exists(path):
-                print(f"[DEBUG] Found watermark: {path}")
+                log.debug("[DEBUG] Found watermark: %s", path)
                 return path
         
-        print(f"[WARNING] No watermark found for {brand_name} in {watermark_dir}")
+        log.warning("[WARNING] No watermark found for %s in %s", brand_name, watermark_dir)
         return None
     
+    def pick_asset_derivative(self, master_path: str, brand_config: Dict, kind: str,
+                              target_w: int) -> str:
+        """
+        Smallest pre-sized render derivative at least target_w wide.
+
+        The asset pipeline stores a manifest of render_<w> PNGs beside each
+        uploaded master (``{kind}_derivatives``); overlaying one means the
+        per-frame scale starts from ~target_w instead of a 1024/2048px master.
+        Falls back to master_path when there is no manifest, no derivative is
+        wide enough, or the file is gone.
+        """
+        from .config import STORAGE_ROOT
+
+        try:
+            variants = json.loads(brand_config.get(f'{kind}_derivatives') or '{}').get('variants') or {}
+        except (ValueError, TypeError, AttributeError):
+            return master_path
+        best = None
+        for name, variant in variants.items():
+            if name.startswith('render_') and variant.get('width', 0) >= target_w:
+                if best is None or variant['width'] < best['width']:
+                    best = variant
+        if best:
+            full_path = os.path.join(STORAGE_ROOT, best['path'])
+            if os.path.exists(full_path):
+                log.debug("[ASSETS] %s: using %spx derivative for target %spx", kind, best['width'], target_w)
+                return full_path
+        return master_path
+
     def resolve_logo_path(self, brand_name: str, brand_config: Dict = None) -> Optional[str]:
         """
         Resolve logo path - from database uploaded logo or master assets.
@@ -528,33 +1093,35 @@ class VideoProcessor:
                 # Path is relative to STORAGE_ROOT
                 full_path = os.path.join(STORAGE_ROOT, db_path)
                 if os.path.exists(full_path):
-                    print(f"[LOGO] Using uploaded logo: {full_path}")
+                    log.debug("[LOGO] Using uploaded logo: %s", full_path)
                     return full_path
                 # logo_path is set in DB but file is missing (ephemeral storage cleared after redeploy?)
                 # Do NOT fall through to Circle folder — that would silently use a stale/wrong logo.
-                print(f"[LOGO WARNING] resolve_logo_path: DB logo_path set but file missing on disk.")
-                print(f"[LOGO WARNING]   brand='{brand_name}'  logo_path='{db_path}'  expected='{full_path}'")
-                print(f"[LOGO WARNING]   Returning None — re-upload the logo to restore it.")
+                log.warning("[LOGO WARNING] resolve_logo_path: DB logo_path set but file missing on disk.")
+                log.warning("[LOGO WARNING]   brand='%s'  logo_path='%s'  expected='%s'",
+                            brand_name, db_path, full_path)
+                log.warning("[LOGO WARNING]   Returning None — re-upload the logo to restore it.")
                 return None
             # brand_config present but no logo_path in DB
             if brand_config.get('user_id'):
                 # User-owned brand: no logo uploaded yet, don't fall back to master Circle assets
-                print(f"[LOGO] resolve_logo_path: user brand '{brand_name}' has no logo_path in DB — skipping Circle fallback")
+                log.debug("[LOGO] resolve_logo_path: user brand '%s' has no logo_path in DB — skipping Circle fallback",
+                          brand_name)
                 return None
 
         # 2. Fallback to master assets Circle folder (system/legacy brands only, no user_id in config)
         logo_filename = f"{brand_name}_logo.png"
         path = os.path.join(self.LOGOS_DIR, logo_filename)
 
-        print(f"[LOGO] Looking for legacy system logo: {path}")
+        log.debug("[LOGO] Looking for legacy system logo: %s", path)
 
         if os.path.exists(path):
-            print(f"[LOGO] Found legacy system logo: {path}")
+            log.debug("[LOGO] Found legacy system logo: %s", path)
             return path
         else:
-            print(f"[LOGO ERROR] Logo not found for brand '{brand_name}'")
-            print(f"[LOGO ERROR] Expected: {logo_filename}")
-            print(f"[LOGO ERROR] All legacy logos must follow pattern: {{BrandName}}_logo.png")
+            log.error("[LOGO ERROR] Logo not found for brand '%s'", brand_name)
+            log.error("[LOGO ERROR] Expected: %s", logo_filename)
+            log.error("[LOGO ERROR] All legacy logos must follow pattern: {BrandName}_logo.png")
             return None
     
     def build_filter_complex(self, brand_config: Dict, logo_settings: Optional[Dict] = None) -> str:
@@ -570,16 +1137,33 @@ class VideoProcessor:
         3. Optional text overlay at saved position
         """
         brand_name = brand_config.get('name', 'Unknown')
+
+        # Compiled plan cache: same brand revision + frame size + effective
+        # config → identical graph, so asset resolution and geometry are skipped.
+        plan_key = None
+        if logo_settings is None:
+            plan_key = render_plans.plan_key(brand_config, self.video_metadata['width'],
+                                             self.video_metadata['height'])
+        plan = render_plans.get_plan(plan_key)
+        if plan is not None:
+            log.debug("[RENDER PLAN] Reusing compiled plan for brand %s", brand_name)
+            return plan.filter_complex
         
         # Check if brand has new visual positioning fields or secondary logo
         has_visual_fields = 'logo_x' in brand_config or 'wm_mode' in brand_config or brand_config.get('secondary_logo_enabled')
         
         if has_visual_fields:
-            print(f"[DEBUG] Brand {brand_name} has visual positioning fields, using percent-based layout")
-            return self.build_filter_complex_visual(brand_config, logo_settings)
+            log.debug("[DEBUG] Brand %s has visual positioning fields, using percent-based layout",
+                      brand_name)
+            filter_complex = self.build_filter_complex_visual(brand_config, logo_settings)
         else:
-            print(f"[DEBUG] Brand {brand_name} using legacy layout (no visual positioning)")
-            return self.build_filter_complex_legacy(brand_config, logo_settings)
+            log.debug("[DEBUG] Brand %s using legacy layout (no visual positioning)", brand_name)
+            filter_complex = self.build_filter_complex_legacy(brand_config, logo_settings)
+
+        if filter_complex and '[vout]' in filter_complex:
+            render_plans.put_plan(plan_key, render_plans.RenderPlan(
+                filter_complex, tuple(_MOVIE_SOURCE_RE.findall(filter_complex))))
+        return filter_complex
     
     def build_filter_complex_visual(self, brand_config: Dict, logo_settings: Optional[Dict] = None) -> str:
         """
@@ -593,12 +1177,13 @@ class VideoProcessor:
         W = self.video_metadata['width']
         H = self.video_metadata['height']
         
-        print(f"[VISUAL_PRESET] ========================================")
-        print(f"[VISUAL_PRESET] Building filter for brand: {brand_name}")
-        print(f"[VISUAL_PRESET] Output dimensions: {W}x{H}")
+        log.debug("[VISUAL_PRESET] ========================================")
+        log.debug("[VISUAL_PRESET] Building filter for brand: %s", brand_name)
+        log.debug("[VISUAL_PRESET] Output dimensions: %sx%s", W, H)
         
         filters = []
         current_input = '0:v'
+        static_layers = []   # image layers, bottom first — see _flatten_static_layers
         
         # Extract visual positioning fields with defaults
         logo_x_pct = brand_config.get('logo_x', 0.85)
@@ -610,7 +1195,8 @@ class VideoProcessor:
         wm_mode_raw = brand_config.get('wm_mode', 'positioned')
         # Normalize stale 'fullscreen' values — positioned is the only supported mode
         if wm_mode_raw != 'positioned':
-            print(f"[WM MODE] Normalized wm_mode from '{wm_mode_raw}' to 'positioned' for brand='{brand_name}'")
+            log.debug("[WM MODE] Normalized wm_mode from '%s' to 'positioned' for brand='%s'",
+                      wm_mode_raw, brand_name)
         wm_mode = 'positioned'
         wm_x_pct = brand_config.get('wm_x', 0.5)
         wm_y_pct = brand_config.get('wm_y', 0.5)
@@ -635,17 +1221,21 @@ class VideoProcessor:
             elif text_position == 'center':
                 text_y_pct = 0.5
             # 'top' keeps 0.2 — correct as-is
-            print(f"[VISUAL_PRESET] Text position fallback: '{text_position}' → y={text_y_pct:.2f}")
+            log.debug("[VISUAL_PRESET] Text position fallback: '%s' → y=%.2f", text_position, text_y_pct)
 
-        print(f"[VISUAL_PRESET] Logo: x={logo_x_pct:.2f}, y={logo_y_pct:.2f}, scale={logo_scale_pct:.2f}, opacity={logo_opacity:.2f}, rotation={logo_rotation}°")
-        print(f"[VISUAL_PRESET] Watermark: mode={wm_mode}, x={wm_x_pct:.2f}, y={wm_y_pct:.2f}, scale={wm_scale_pct:.2f}, opacity={wm_opacity:.2f}")
-        print(f"[WM RENDER] brand='{brand_name}' wm_mode={wm_mode} wm_x={wm_x_pct:.4f} wm_y={wm_y_pct:.4f} wm_scale={wm_scale_pct:.4f} wm_opacity={wm_opacity:.4f}")
-        print(f"[VISUAL_PRESET] Text: enabled={text_enabled}, content='{text_content[:30]}', x={text_x_pct:.2f}, y={text_y_pct:.2f}")
+        log.debug("[VISUAL_PRESET] Logo: x=%.2f, y=%.2f, scale=%.2f, opacity=%.2f, rotation=%s°",
+                  logo_x_pct, logo_y_pct, logo_scale_pct, logo_opacity, logo_rotation)
+        log.debug("[VISUAL_PRESET] Watermark: mode=%s, x=%.2f, y=%.2f, scale=%.2f, opacity=%.2f",
+                  wm_mode, wm_x_pct, wm_y_pct, wm_scale_pct, wm_opacity)
+        log.debug("[WM RENDER] brand='%s' wm_mode=%s wm_x=%.4f wm_y=%.4f wm_scale=%.4f wm_opacity=%.4f",
+                  brand_name, wm_mode, wm_x_pct, wm_y_pct, wm_scale_pct, wm_opacity)
+        log.debug("[VISUAL_PRESET] Text: enabled=%s, content='%s', x=%.2f, y=%.2f",
+                  text_enabled, text_content[:30], text_x_pct, text_y_pct)
 
         # 1. WATERMARK OVERLAY
         watermark_path = self.resolve_watermark_path(brand_name, brand_config)
         if watermark_path:
-            print(f"[VISUAL_PRESET] Adding watermark: {watermark_path}")
+            log.debug("[VISUAL_PRESET] Adding watermark: %s", watermark_path)
 
             # Always positioned — fullscreen removed as user-facing option.
             # wm_scale_pct is render-domain (UI%/100 × 1.15).
@@ -654,24 +1244,31 @@ class VideoProcessor:
             WM_UI_REF_SCALE = 1.15
             ui_scale = wm_scale_pct / WM_UI_REF_SCALE
             wm_target_w = int(ui_scale * W * 0.5)
+            if brand_config.get('watermark_path'):
+                watermark_path = self.pick_asset_derivative(watermark_path, brand_config, 'watermark', wm_target_w)
             wm_cx_px = int(wm_x_pct * W)
             wm_cy_px = int(wm_y_pct * H)
             wm_x_expr = f"{wm_cx_px}-w/2"
             wm_y_expr = f"{wm_cy_px}-h/2"
 
-            print(f"[VISUAL_PRESET] Watermark positioned: width={wm_target_w}px, center=({wm_cx_px},{wm_cy_px}), opacity={wm_opacity:.2f}")
-            print(f"[WM RENDER] computed size={wm_target_w}x(auto) overlay={wm_x_expr},{wm_y_expr}")
+            log.debug("[VISUAL_PRESET] Watermark positioned: width=%spx, center=(%s,%s), opacity=%.2f",
+                      wm_target_w, wm_cx_px, wm_cy_px, wm_opacity)
+            log.debug("[WM RENDER] computed size=%sx(auto) overlay=%s,%s", wm_target_w, wm_x_expr, wm_y_expr)
 
             filters.append(f"movie='{watermark_path}',scale={wm_target_w}:-1,format=rgba,colorchannelmixer=aa={wm_opacity}[watermark]")
             filters.append(f"[{current_input}][watermark]overlay={wm_x_expr}:{wm_y_expr}[v1]")
             current_input = 'v1'
+            static_layers.append({'path': watermark_path, 'width': wm_target_w, 'cx': wm_cx_px,
+                                  'cy': wm_cy_px, 'opacity': wm_opacity})
         else:
-            print(f"[VISUAL_PRESET] No watermark found, skipping")
+            log.debug("[VISUAL_PRESET] No watermark found, skipping")
         
         # 2. LOGO OVERLAY
         logo_path = self.resolve_logo_path(brand_name, brand_config)
         if logo_path:
             logo_target_w = int(logo_scale_pct * W)
+            if brand_config.get('logo_path'):
+                logo_path = self.pick_asset_derivative(logo_path, brand_config, 'logo', logo_target_w)
             logo_cx_px = int(logo_x_pct * W)
             logo_cy_px = int(logo_y_pct * H)
             # Use FFmpeg overlay expressions so 'h' resolves to the actual scaled logo height,
@@ -680,9 +1277,10 @@ class VideoProcessor:
             logo_y_expr = f"{logo_cy_px}-h/2"
 
             logo_shape = brand_config.get('logo_shape') or 'original'
-            print(f"[VISUAL_PRESET] Adding logo: {logo_path}")
-            print(f"[VISUAL_PRESET] Logo: width={logo_target_w}px, center=({logo_cx_px},{logo_cy_px}), opacity={logo_opacity:.2f}, rotation={logo_rotation}°")
-            print(f"[SHAPE] render brand='{brand_name}' logo_shape='{logo_shape}'")
+            log.debug("[VISUAL_PRESET] Adding logo: %s", logo_path)
+            log.debug("[VISUAL_PRESET] Logo: width=%spx, center=(%s,%s), opacity=%.2f, rotation=%s°",
+                      logo_target_w, logo_cx_px, logo_cy_px, logo_opacity, logo_rotation)
+            log.debug("[SHAPE] render brand='%s' logo_shape='%s'", brand_name, logo_shape)
 
             # Geq filter for circle crop — masks pixels outside the inscribed circle
             geq_circle = (
@@ -694,7 +1292,8 @@ class VideoProcessor:
             if logo_rotation != 0.0:
                 # Convert degrees to radians for FFmpeg rotate filter
                 rotation_rad = (logo_rotation * 3.14159265359) / 180.0
-                print(f"[VISUAL_PRESET] Applying rotation: {logo_rotation}° = {rotation_rad:.4f} radians")
+                log.debug("[VISUAL_PRESET] Applying rotation: %s° = %.4f radians",
+                          logo_rotation, rotation_rad)
 
                 # Apply scale -> rotate -> shape -> opacity in sequence
                 shape_filter = f",{geq_circle}" if logo_shape == 'circle' else ''
@@ -707,8 +1306,11 @@ class VideoProcessor:
 
             filters.append(f"[{current_input}][logo]overlay={logo_x_expr}:{logo_y_expr}[v2]")
             current_input = 'v2'
+            static_layers.append({'path': logo_path, 'width': logo_target_w, 'cx': logo_cx_px,
+                                  'cy': logo_cy_px, 'opacity': logo_opacity,
+                                  'rotation': logo_rotation, 'circle': logo_shape == 'circle'})
         else:
-            print(f"[VISUAL_PRESET] No logo found, skipping")
+            log.debug("[VISUAL_PRESET] No logo found, skipping")
         
         # 2b. SECONDARY LOGO OVERLAY (Dual-Logo Composition Mode, Platinum+)
         sec_logo_enabled = brand_config.get('secondary_logo_enabled', False)
@@ -726,8 +1328,9 @@ class VideoProcessor:
             sec_x_expr = f"{sec_cx_px}-w/2"
             sec_y_expr = f"{sec_cy_px}-h/2"
 
-            print(f"[VISUAL_PRESET] Adding secondary logo: {sec_logo_path}")
-            print(f"[VISUAL_PRESET] SecLogo: width={sec_target_w}px, center=({sec_cx_px},{sec_cy_px}), opacity={sec_opacity:.2f}, rotation={sec_rotation}°")
+            log.debug("[VISUAL_PRESET] Adding secondary logo: %s", sec_logo_path)
+            log.debug("[VISUAL_PRESET] SecLogo: width=%spx, center=(%s,%s), opacity=%.2f, rotation=%s°",
+                      sec_target_w, sec_cx_px, sec_cy_px, sec_opacity, sec_rotation)
             
             # Determine next overlay label
             if current_input.startswith('v') and current_input[1:].isdigit():
@@ -737,7 +1340,7 @@ class VideoProcessor:
             
             if sec_rotation != 0:
                 rotation_rad = (sec_rotation * 3.14159265359) / 180.0
-                print(f"[VISUAL_PRESET] SecLogo rotation: {sec_rotation}° = {rotation_rad:.4f} radians")
+                log.debug("[VISUAL_PRESET] SecLogo rotation: %s° = %.4f radians", sec_rotation, rotation_rad)
                 filters.append(f"movie='{sec_logo_path}',scale={sec_target_w}:-1,format=rgba,rotate={rotation_rad}:ow=hypot(iw,ih):oh=ow:fillcolor=0x00000000[sec_logo_r]")
                 filters.append(f"[sec_logo_r]colorchannelmixer=aa={sec_opacity}[sec_logo]")
             else:
@@ -745,17 +1348,21 @@ class VideoProcessor:
             
             filters.append(f"[{current_input}][sec_logo]overlay={sec_x_expr}:{sec_y_expr}[{next_v}]")
             current_input = next_v
-            print(f"[VISUAL_PRESET] Secondary logo overlay added -> [{next_v}]")
+            static_layers.append({'path': sec_logo_path, 'width': sec_target_w, 'cx': sec_cx_px,
+                                  'cy': sec_cy_px, 'opacity': sec_opacity, 'rotation': sec_rotation})
+            log.debug("[VISUAL_PRESET] Secondary logo overlay added -> [%s]", next_v)
         elif sec_logo_enabled:
-            print(f"[VISUAL_PRESET] Secondary logo enabled but file not found or missing, skipping")
+            log.debug("[VISUAL_PRESET] Secondary logo enabled but file not found or missing, skipping")
+
         
         # 3. TEXT OVERLAY (if enabled)
         if text_enabled and text_content:
             text_x_px = int(text_x_pct * W)
             text_y_px = int(text_y_pct * H)
             
-            print(f"[VISUAL_PRESET] Adding text: '{text_content[:30]}'")
-            print(f"[VISUAL_PRESET] Text: size={text_size}px, pos=({text_x_px},{text_y_px}), color={text_color}")
+            log.debug("[VISUAL_PRESET] Adding text: '%s'", text_content[:30])
+            log.debug("[VISUAL_PRESET] Text: size=%spx, pos=(%s,%s), color=%s",
+                      text_size, text_x_px, text_y_px, text_color)
             
             # Escape text for FFmpeg
             escaped_text = text_content.replace("'", "'\\''").replace(":", "\\:")
@@ -774,6 +1381,18 @@ class VideoProcessor:
                 next_label = 'v1'
             filters.append(f"[{current_input}]{drawtext_filter}[{next_label}]")
             current_input = next_label
+            static_layers.append({'text': text_content, 'font': self.TEXT_RASTER_FONT,
+                                  'size': text_size, 'color': text_color, 'box_color': '#000000',
+                                  'box_opacity': 0.6, 'box_border': 10,
+                                  'x': text_x_px, 'y': text_y_px, 'ax': 0.5, 'ay': 0.5})
+
+        # Text, or two or more image layers: replace the per-layer chains
+        # (drawtext included) with one pre-composited overlay
+        if len(static_layers) > 1 or (static_layers and 'text' in static_layers[-1]):
+            flattened = self._flatten_static_layers(static_layers, W, H)
+            if flattened:
+                filters = flattened
+                current_input = 'v1'
         
         # Ensure final output is [vout]
         if filters:
@@ -786,11 +1405,42 @@ class VideoProcessor:
             filters.append(f"[0:v]scale={W}:{H}[vout]")
         
         filter_complex = ';'.join(filters)
-        print(f"[VISUAL_PRESET] Final filter: {filter_complex}")
-        print(f"[VISUAL_PRESET] ========================================")
+        log.debug("[VISUAL_PRESET] Final filter: %s", filter_complex)
+        log.debug("[VISUAL_PRESET] ========================================")
         
         return filter_complex
     
+    def _flatten_static_layers(self, layers: List[Dict], W: int, H: int, base: str = '0:v',
+                               out: str = 'v1', label: str = 'layers') -> Optional[List[str]]:
+        """
+        One overlay for every static layer (brand_layers.flatten).
+
+        The chained graph blends each layer onto every frame and drawtext
+        re-renders text per frame; the flattened one blends a single
+        pre-composited atlas, cropped to the visible pixels.
+        Returns the replacement filters, [base] -> [out], or None to keep the
+        per-layer chain (Pillow unavailable, unreadable asset or font,
+        nothing visible).
+        """
+        started = time.time()
+        try:
+            try:
+                from . import brand_layers
+            except ImportError:
+                import brand_layers
+            with tracing.span('flatten_layers', layers=len(layers)):
+                result = brand_layers.flatten(layers, W, H)
+        except Exception as e:
+            log.warning("[LAYERS] Flattening %s layers failed, using per-layer overlays: %s", len(layers), e)
+            return None
+        if not result:
+            return None
+        atlas_path, x, y = result
+        log.info("[LAYERS] %s static layer(s) -> %s at (%s,%s) in %.0fms",
+                 len(layers), os.path.basename(atlas_path), x, y, (time.time() - started) * 1000)
+        return [f"movie='{atlas_path}',format=rgba[{label}]",
+                f"[{base}][{label}]overlay={x}:{y}[{out}]"]
+
     def build_filter_complex_legacy(self, brand_config: Dict, logo_settings: Optional[Dict] = None) -> str:
         """
         LEGACY: Build ffmpeg filter_complex for overlays using old hardcoded positioning.
@@ -809,14 +1459,14 @@ class VideoProcessor:
         filters = []
         current_input = '0:v'
         
-        print(f"[DEBUG] Building filter complex for brand: {brand_name}")
-        print(f"[DEBUG] Video dimensions: {width}x{height}")
-        print(f"[DEBUG] Master assets root: {self.MASTER_ASSETS_ROOT}")
+        log.debug("[DEBUG] Building filter complex for brand: %s", brand_name)
+        log.debug("[DEBUG] Video dimensions: %sx%s", width, height)
+        log.debug("[DEBUG] Master assets root: %s", self.MASTER_ASSETS_ROOT)
         
         # 1. WATERMARK as full-frame overlay (replaces old template concept)
         watermark_path = self.resolve_watermark_path(brand_name, brand_config)
         if watermark_path:
-            print(f"[DEBUG] Adding full-frame watermark: {watermark_path}")
+            log.debug("[DEBUG] Adding full-frame watermark: %s", watermark_path)
             # Scale watermark with multiplier to compensate for internal PNG padding
             # Scale multiplier controlled by WATERMARK_SCALE (default 1.15 = 15% overscale)
             # W:H only exists in overlay context, not inside movie= source chain
@@ -831,14 +1481,15 @@ class VideoProcessor:
             filters.append(f"movie='{watermark_path}',scale={scaled_width}:{scaled_height},format=rgba,geq=r='r(X,Y)':g='g(X,Y)':b='b(X,Y)':a='{opacity}*alpha(X,Y)'[watermark]")
             filters.append(f"[{current_input}][watermark]overlay={overlay_x}:{overlay_y}[v1]")
             current_input = 'v1'
-            print(f"[DEBUG] Watermark overlay added (overscaled {scaled_width}x{scaled_height} @ {int(self.WATERMARK_SCALE*100)}%, {int(opacity*100)}% opacity)")
+            log.debug("[DEBUG] Watermark overlay added (overscaled %sx%s @ %s%%, %s%% opacity)",
+                      scaled_width, scaled_height, int(self.WATERMARK_SCALE*100), int(opacity*100))
         else:
-            print(f"[WARNING] No watermark found for {brand_name}, skipping watermark overlay")
+            log.warning("[WARNING] No watermark found for %s, skipping watermark overlay", brand_name)
         
         # 2. LOGO bottom-right with padding
         logo_path = self.resolve_logo_path(brand_name, brand_config)
         if logo_path:
-            print(f"[DEBUG] Adding logo: {logo_path}")
+            log.debug("[DEBUG] Adding logo: %s", logo_path)
             # Scale logo to 15% of video width
             logo_width = int(width * self.LOGO_SCALE)
             padding = self.LOGO_PADDING
@@ -851,13 +1502,14 @@ class VideoProcessor:
             filters.append(f"movie='{logo_path}',scale={logo_width}:-1,format=rgba,colorkey=black:0.1:0.1[logo]")
             filters.append(f"[{current_input}][logo]overlay={logo_x}:{logo_y}[v2]")
             current_input = 'v2'
-            print(f"[DEBUG] Logo overlay added (bottom-right, {self.LOGO_SCALE*100:.0f}% width, {padding}px padding)")
+            log.debug("[DEBUG] Logo overlay added (bottom-right, %.0f%% width, %spx padding)",
+                      self.LOGO_SCALE*100, padding)
         else:
-            print(f"[WARNING] No logo found for {brand_name}, skipping logo overlay")
+            log.warning("[WARNING] No logo found for %s, skipping logo overlay", brand_name)
         
         # 3. TEXT LAYER (drawtext filter)
         if self.TEXT_ENABLED and self.TEXT_CONTENT:
-            print(f"[DEBUG] Adding text layer: '{self.TEXT_CONTENT}'")
+            log.debug("[DEBUG] Adding text layer: '%s'", self.TEXT_CONTENT)
             
             # Escape special characters for FFmpeg drawtext
             escaped_text = self.TEXT_CONTENT.replace("'", "'\\''").replace(":", "\\:")
@@ -893,11 +1545,25 @@ class VideoProcessor:
                 next_label = f'v{int(current_input[1:]) + 1}'
             else:
                 next_label = 'v1'
-            filters.append(f"[{current_input}]{drawtext_filter}[{next_label}]")
+            # Pre-rasterized text overlay; drawtext above stays as the fallback
+            if self.TEXT_POSITION == 'top':
+                anchor_y, ay = margin, 0.0
+            elif self.TEXT_POSITION == 'center':
+                anchor_y, ay = height / 2, 0.5
+            else:
+                anchor_y, ay = height - margin, 1.0
+            text_layer = {'text': self.TEXT_CONTENT, 'font': self.TEXT_RASTER_FONT, 'size': font_size,
+                          'color': self.TEXT_COLOR, 'x': width / 2, 'y': anchor_y, 'ax': 0.5, 'ay': ay}
+            if self.TEXT_BG_ENABLED:
+                text_layer.update(box_color=self.TEXT_BG_COLOR, box_opacity=self.TEXT_BG_OPACITY, box_border=10)
+            text_filters = self._flatten_static_layers([text_layer], width, height, base=current_input,
+                                                       out=next_label, label='text')
+            filters.extend(text_filters or [f"[{current_input}]{drawtext_filter}[{next_label}]"])
             current_input = next_label
-            print(f"[DEBUG] Text layer added (position={self.TEXT_POSITION}, size={font_size}, bg={self.TEXT_BG_ENABLED})")
+            log.debug("[DEBUG] Text layer added (position=%s, size=%s, bg=%s)",
+                      self.TEXT_POSITION, font_size, self.TEXT_BG_ENABLED)
         else:
-            print(f"[DEBUG] Text layer disabled or empty, skipping")
+            log.debug("[DEBUG] Text layer disabled or empty, skipping")
         
         # Ensure final output is labeled [vout]
         if filters:
@@ -905,27 +1571,151 @@ class VideoProcessor:
             last_filter = filters[-1]
             if '[v1]' in last_filter or '[v2]' in last_filter or '[v3]' in last_filter:
                 filters[-1] = last_filter.rsplit('[', 1)[0] + '[vout]'
-            print(f"[DEBUG] Final output labeled as [vout]")
+            log.debug("[DEBUG] Final output labeled as [vout]")
         else:
             # No overlays at all - just pass through with scale
-            print("[WARNING] No overlays applied, creating passthrough filter")
+            log.warning("[WARNING] No overlays applied, creating passthrough filter")
             filters.append(f"[0:v]scale={width}:{height}[vout]")
         
         filter_complex = ';'.join(filters)
         
         # Validate [vout] exists
         vout_count = filter_complex.count('[vout]')
-        print(f"[DEBUG] Final filter complex: {filter_complex}")
-        print(f"[DEBUG] Number of [vout] labels: {vout_count}")
+        log.debug("[DEBUG] Final filter complex: %s", filter_complex)
+        log.debug("[DEBUG] Number of [vout] labels: %s", vout_count)
         
         if vout_count != 1:
-            print(f"[ERROR] Invalid [vout] count ({vout_count}), filter may be malformed")
+            log.error("[ERROR] Invalid [vout] count (%s), filter may be malformed", vout_count)
             return None
         
         return filter_complex
     
+    def _memory_profile_key(self, filter_complex: str) -> str:
+        """Admission-control profile key: output resolution + filter graph shape."""
+        res = admission.resolution_class(self.video_metadata.get('width'), self.video_metadata.get('height'))
+        return f"{res}:{admission.graph_signature(filter_complex)}"
+
+    def _encode_video_segmented(self, filter_complex: str, video_only_path: str,
+                                brand_name: str, timeout: int, cancel_event=None) -> bool:
+        """
+        Render the video-only intermediate as keyframe-aligned segments in parallel.
+
+        Each segment seeks to its keyframe start, runs the full overlay graph and
+        encodes with identical x264 settings; the concat demuxer then joins them
+        with a stream copy. Overlays are static per frame, so positions are
+        continuous across boundaries. Audio is never split — it is muxed onto the
+        joined video afterwards — so there is no drift at segment edges.
+
+        Returns True when video_only_path was produced and probes valid, False
+        when the clip isn't eligible or any segment failed (caller falls back to
+        the single-pass encode). Raises RenderCancelled on cancel.
+        """
+        workers = SEGMENT_RENDER_WORKERS
+        duration = float(self.video_metadata.get('duration') or 0)
+        if workers <= 1 or duration < SEGMENT_RENDER_MIN_SECONDS:
+            return False
+        if _TIME_DEPENDENT_FILTER_RE.search(filter_complex):
+            log.info("[RENDER-SEGMENT] Filter graph is time-dependent — using single-pass encode")
+            return False
+
+        try:
+            keyframes = _keyframe_times(self.video_path)
+        except Exception as e:
+            log.info("[RENDER-SEGMENT] Keyframe probe failed (%s) — using single-pass encode", e)
+            return False
+        segments = _plan_segments(keyframes, duration, workers)
+        if len(segments) < 2:
+            log.info("[RENDER-SEGMENT] Not enough keyframes to split %.1fs clip — single-pass", duration)
+            return False
+
+        log.info("[RENDER-SEGMENT] brand='%s' duration=%.1fs "
+                 "segments=%s workers=%s", brand_name, duration, len(segments), workers)
+        mem_key = self._memory_profile_key(filter_complex)
+        seg_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(video_only_path) or None)
+        abort_event = threading.Event()
+        stop_event = _EitherEvent(cancel_event, abort_event)
+
+        def _render_segment(index: int, start: float, end: Optional[float]) -> str:
+            seg_path = os.path.join(seg_dir, f'seg_{index:03d}.mp4')
+            cmd = [FFMPEG_BIN, '-y', '-ss', f'{start:.6f}', '-i', self.video_path]
+            if end is not None:
+                cmd += ['-t', f'{end - start:.6f}']
+            cmd += [
+                '-filter_complex', filter_complex,
+                '-threads', '1',
+                '-filter_threads', '1',
+                '-map', '[vout]',
+                '-an',
+                '-c:v', 'libx264',
+                '-crf', '23',
+                '-preset', 'veryfast',
+                seg_path,
+            ]
+            result = _run_ffmpeg(cmd, timeout, stop_event,
+                                 operation='segment', profile_key=mem_key)
+            if not os.path.exists(seg_path) or os.path.getsize(seg_path) == 0:
+                raise Exception(f"segment {index} failed code={result.returncode}: "
+                                f"{(result.stderr or '')[-500:]}")
+            return seg_path
+
+        seg_start = time.time()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_render_segment, i, start, end)
+                           for i, (start, end) in enumerate(segments)]
+                seg_paths = []
+                failure = None
+                for fut in futures:
+                    try:
+                        seg_paths.append(fut.result())
+                    except RenderCancelled:
+                        if cancel_event is not None and cancel_event.is_set():
+                            failure = failure or 'cancelled'
+                        abort_event.set()
+                    except Exception as e:
+                        failure = failure or str(e)
+                        abort_event.set()  # kill sibling segments
+            if cancel_event is not None and cancel_event.is_set():
+                raise RenderCancelled('Render cancelled')
+            if failure:
+                log.info("[RENDER-SEGMENT] Segment render failed (%s) — falling back to single-pass", failure)
+                return False
+
+            list_path = os.path.join(seg_dir, 'concat.txt')
+            with open(list_path, 'w') as f:
+                for seg_path in seg_paths:
+                    f.write(f"file '{seg_path}'\n")
+            concat_cmd = [
+                FFMPEG_BIN, '-y', '-f', 'concat', '-safe', '0',
+                '-i', list_path, '-c', 'copy', video_only_path
+            ]
+            result = _run_ffmpeg(concat_cmd, 120, cancel_event, operation='mux')
+            if not self._validate_output(video_only_path):
+                log.info("[RENDER-SEGMENT] Concat failed code=%s: %s — falling back to single-pass",
+                         result.returncode, (result.stderr or '')[-500:])
+                if os.path.exists(video_only_path):
+                    os.remove(video_only_path)
+                return False
+            log.info("[RENDER-SEGMENT] brand='%s' %s segments rendered + joined in %.1fs",
+                     brand_name, len(seg_paths), time.time() - seg_start)
+            return True
+        except subprocess.TimeoutExpired:
+            log.info("[RENDER-SEGMENT] Segment render timed out — falling back to single-pass")
+            return False
+        finally:
+            for name in os.listdir(seg_dir):
+                try:
+                    os.remove(os.path.join(seg_dir, name))
+                except OSError:
+                    pass
+            try:
+                os.rmdir(seg_dir)
+            except OSError as e:
+                log.info("[RENDER-SEGMENT] Could not remove %s: %s", seg_dir, e)
+
     def process_brand(self, brand_config: Dict, logo_settings: Optional[Dict] = None,
-                     video_id: str = 'video', output_format: str = 'vertical_9_16') -> str:
+                     video_id: str = 'video', output_format: str = 'vertical_9_16',
+                     cancel_event=None, trim: Optional[Tuple[float, Optional[float]]] = None) -> str:
         """
         Process video with brand overlays
         
@@ -933,139 +1723,335 @@ class VideoProcessor:
             brand_config: Brand configuration from brands.yml
             logo_settings: Logo position and size settings (optional)
             video_id: Identifier for output filename
+            cancel_event: Optional threading.Event; setting it kills FFmpeg,
+                removes the partial output and raises RenderCancelled
+            trim: Optional (start, end) source seconds, applied as input-side
+                seeking on the encode and the audio mux. Only needed when the
+                input was not already cut by normalize_video
         
         Returns:
             Path to processed video
         """
         start_time = time.time()
         brand_name = brand_config.get('name', 'brand')
-        output_filename = f"{video_id}_{brand_name}_{output_format}.mp4"
-        output_path = os.path.join(self.output_dir, output_filename)
+        output_path = branded_output_path(self.output_dir, brand_config, video_id, output_format)
+        output_filename = os.path.basename(output_path)
         
-        print(f"[DEBUG] Processing brand: {brand_name}")
-        print(f"[DEBUG] Video ID: {video_id}")
-        print(f"[DEBUG] Output format: {output_format}")
-        print(f"[DEBUG] Output filename: {output_filename}")
-        print(f"[DEBUG] Output path: {output_path}")
+        log.debug("[DEBUG] Processing brand: %s", brand_name)
+        log.debug("[DEBUG] Video ID: %s", video_id)
+        log.debug("[DEBUG] Output format: %s", output_format)
+        log.debug("[DEBUG] Output filename: %s", output_filename)
+        log.debug("[DEBUG] Output path: %s", output_path)
         
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        print(f"[DEBUG] Writing branded video to: {output_path}")
+        log.debug("[DEBUG] Writing branded video to: %s", output_path)
         
         # Build filter complex
+        plan_started = time.time()
         filter_complex = self.build_filter_complex(brand_config, logo_settings)
+        tracing.record('plan', plan_started)
         
-        print(f"[DEBUG] Built filter complex result: {filter_complex}")
-        print(f"[FILTER_COMPLEX] ========================================")
-        print(f"[FILTER_COMPLEX] EXACT STRING FOR {brand_name}:")
-        print(f"[FILTER_COMPLEX] {filter_complex}")
-        print(f"[FILTER_COMPLEX] =========================================")
+        log.debug("[FILTER_COMPLEX] EXACT STRING FOR %s: %s", brand_name, filter_complex)
         
         # If filter_complex generation failed, return error
         if filter_complex is None:
             error_msg = f"[ERROR] Failed to generate valid filter_complex for brand {brand_name}"
-            print(error_msg)
+            log.error(error_msg)
             raise Exception(error_msg)
         
         # If no valid filter_complex, return error instead of copying
         if not filter_complex or '[vout]' not in filter_complex:
             error_msg = f"[ERROR] No valid filter complex with [vout] for brand {brand_name}"
-            print(error_msg)
+            log.error(error_msg)
             raise Exception(error_msg)
         
         # Check if the input video has a valid video stream before processing
         if not self.has_video_stream():
             error_msg = "[ERROR] The input file contains no valid video stream (audio-only). Instagram may have served audio-only content."
-            print(error_msg)
+            log.error(error_msg)
             raise Exception(error_msg)
         
         # Build FFmpeg command — veryfast preset keeps encoding time within request window
         # (fast preset can take 5-10+ min on shared CPU for long videos, causing gunicorn timeout)
         FFMPEG_TIMEOUT = 840  # 14 minutes — raises clean Python error before gunicorn 900s kill
-
-        # Video-only base. The brand step never touches audio (filter_complex is video-only),
-        # so audio codec/flags are appended per-attempt below.
-        base_cmd = [
+        MUX_TIMEOUT = 120     # audio passes never touch video frames — copy/AAC only
+
+        # Stage 1: encode the branded video ONCE to a video-only intermediate.
+        # The brand step never touches audio (filter_complex is video-only), so the
+        # expensive libx264 pass is decoupled from the audio fallback ladder below.
+        video_only_path = os.path.splitext(output_path)[0] + '_videoonly.mp4'
+        # The mux writes a partial file that is renamed over output_path once it
+        # probes valid — never into output_path itself, which a render-cache hit
+        # may have hardlinked to another user's output (same inode).
+        partial_path = os.path.splitext(output_path)[0] + '_partial.mp4'
+        trim_args = _trim_input_args(trim)
+        video_cmd = [
             FFMPEG_BIN, '-y',
+            *trim_args,
             '-i', self.video_path,
             '-filter_complex', filter_complex,
             '-threads', '1',
             '-filter_threads', '1',
             '-map', '[vout]',
-            '-map', '0:a?',
+            '-an',
             '-c:v', 'libx264',
             '-crf', '23',
             '-preset', 'veryfast',   # was 'fast' — ~2x faster, fits within request window
+            video_only_path,
         ]
-        tail_cmd = ['-movflags', '+faststart', output_path]
-
-        # Audio strategy tiers. The input is already normalized to clean AAC 128k upstream
-        # (see normalize_video), so a stream copy is both higher quality and avoids the AAC
-        # re-encoder failures (FFmpeg exit 69 / "Conversion failed!") that have discarded
-        # otherwise-complete renders. Fall back to a resync'd re-encode for the rare case
-        # where the audio isn't mp4-copyable, then drop audio only as a last resort so a
-        # render never fails outright.
+
+        # Audio strategy tiers, applied as cheap mux passes against the intermediate
+        # (video is stream-copied). The input is already normalized to clean AAC 128k
+        # upstream (see normalize_video), so a stream copy is both higher quality and
+        # avoids the AAC re-encoder failures (FFmpeg exit 69 / "Conversion failed!")
+        # that have discarded otherwise-complete renders. Fall back to a resync'd
+        # re-encode for the rare case where the audio isn't mp4-copyable, then drop
+        # audio only as a last resort so a render never fails outright.
         audio_attempts = [
-            ('copy',       ['-c:a', 'copy']),
-            ('reencode',   ['-c:a', 'aac', '-b:a', '128k', '-af', 'aresample=async=1:first_pts=0']),
+            ('copy',       ['-map', '1:a?', '-c:a', 'copy']),
+            ('reencode',   ['-map', '1:a?', '-c:a', 'aac', '-b:a', '128k', '-af', 'aresample=async=1:first_pts=0']),
             ('drop-audio', ['-an']),
         ]
 
-        last_error = ''
-        for attempt_idx, (label, audio_flags) in enumerate(audio_attempts, 1):
-            cmd = base_cmd + audio_flags + tail_cmd
-            print(f"[RENDER] Starting FFmpeg for brand='{brand_name}' "
-                  f"(audio={label}, attempt {attempt_idx}/{len(audio_attempts)})")
-            print(f"[RENDER] Input:   {self.video_path}")
-            print(f"[RENDER] Output:  {output_path}")
-            print(f"[RENDER] Timeout: {FFMPEG_TIMEOUT}s")
-            print(f"[RENDER] Command: {' '.join(cmd)}")
+        encode_started = time.time()
+        try:
+            # Long clips: render keyframe-aligned segments in parallel, else one pass.
+            # Segments are planned over the whole input, so a trimmed render is one pass.
+            segmented = not trim_args and self._encode_video_segmented(
+                filter_complex, video_only_path, brand_name, FFMPEG_TIMEOUT, cancel_event
+            )
+            if segmented:
+                encode_time = time.time() - encode_started
+                metrics.RENDER_STAGE_SECONDS.observe(encode_time, stage='encode')
+                tracing.record('encode', encode_started, segmented=True)
+            else:
+                # A failed segmented attempt already spent part of the budget: the
+                # single pass gets what is left, so one brand never exceeds FFMPEG_TIMEOUT.
+                encode_timeout = FFMPEG_TIMEOUT - (time.time() - encode_started)
+                if encode_timeout <= 0:
+                    raise Exception(
+                        f"FFmpeg timed out after {FFMPEG_TIMEOUT//60} minutes for brand '{brand_name}'. "
+                        f"Try a shorter clip (under 60 seconds)."
+                    )
+                log.info("[RENDER] Starting FFmpeg video encode for brand='%s'", brand_name)
+                log.info("[RENDER] Input:   %s", self.video_path)
+                log.info("[RENDER] Output:  %s", video_only_path)
+                log.info("[RENDER] Timeout: %.0fs", encode_timeout)
+                log.info("[RENDER] Command: %s", Lazy(' '.join, video_cmd))
 
-            try:
-                result = subprocess.run(
-                    cmd,
-                    stdout=subprocess.DEVNULL,  # FFmpeg has no useful stdout
-                    stderr=subprocess.PIPE,     # Capture stderr for error reporting only
-                    text=True,
-                    timeout=FFMPEG_TIMEOUT
-                )
-            except subprocess.TimeoutExpired:
+                try:
+                    result = _run_ffmpeg(video_cmd, encode_timeout, cancel_event,
+                                         operation='render',
+                                         profile_key=self._memory_profile_key(filter_complex))
+                except RenderCancelled:
+                    log.info("[RENDER] Cancelled brand='%s' during video encode", brand_name)
+                    raise
+                except subprocess.TimeoutExpired:
+                    processing_time = time.time() - start_time
+                    log.error("[RENDER ERROR] FFmpeg timed out after %.0fs for brand='%s'",
+                              processing_time, brand_name)
+                    log.error("[RENDER ERROR] Output path: %s", output_path)
+                    raise Exception(
+                        f"FFmpeg timed out after {FFMPEG_TIMEOUT//60} minutes for brand '{brand_name}'. "
+                        f"Try a shorter clip (under 60 seconds)."
+                    )
+
+                encode_time = time.time() - encode_started
+                metrics.RENDER_STAGE_SECONDS.observe(encode_time, stage='encode')
+                tracing.record('encode', encode_started, segmented=False, code=result.returncode)
+                log.info("[RENDER] Video encode returned code=%s in %.1fs", result.returncode, encode_time)
+
+                # Same acceptance rule as the final output: a file that probes clean is
+                # kept even on a non-zero exit. If the video itself is bad, no audio
+                # strategy can rescue it — fail now instead of re-encoding 3×.
+                if not self._validate_output(video_only_path):
+                    last_error = (result.stderr or '')[-1500:]
+                    log.error("[RENDER ERROR] Video encode failed for brand='%s' code=%s",
+                              brand_name, result.returncode)
+                    log.error("[RENDER ERROR] stderr tail: %s", last_error)
+                    raise Exception(f"FFmpeg error for brand '{brand_name}': {last_error}")
+
+            # Stage 2: mux audio onto the encoded video. Each attempt is a remux.
+            last_error = ''
+            for attempt_idx, (label, audio_flags) in enumerate(audio_attempts, 1):
+                cmd = [
+                    FFMPEG_BIN, '-y',
+                    '-i', video_only_path,
+                    *trim_args,
+                    '-i', self.video_path,
+                    '-map', '0:v',
+                ] + audio_flags + [
+                    '-c:v', 'copy',
+                    '-movflags', '+faststart',
+                    partial_path,
+                ]
+                log.info("[RENDER] Muxing audio for brand='%s' (audio=%s, attempt %s/%s)",
+                         brand_name, label, attempt_idx, len(audio_attempts))
+                log.info("[RENDER] Command: %s", Lazy(' '.join, cmd))
+
+                mux_started = time.time()
+                try:
+                    result = _run_ffmpeg(cmd, MUX_TIMEOUT, cancel_event,
+                                         operation='mux', profile_key=label)
+                except RenderCancelled:
+                    log.info("[RENDER] Cancelled brand='%s' — removing partial output", brand_name)
+                    raise
+                except subprocess.TimeoutExpired:
+                    last_error = f"audio mux timed out after {MUX_TIMEOUT}s"
+                    log.error("[RENDER ERROR] Attempt %s (audio=%s) %s "
+                              "for brand='%s'", attempt_idx, label, last_error, brand_name)
+                    continue
+
+                tracing.record('mux', mux_started, audio=label, code=result.returncode)
                 processing_time = time.time() - start_time
-                print(f"[RENDER ERROR] FFmpeg timed out after {processing_time:.0f}s for brand='{brand_name}'")
-                print(f"[RENDER ERROR] Output path: {output_path}")
-                raise Exception(
-                    f"FFmpeg timed out after {FFMPEG_TIMEOUT//60} minutes for brand '{brand_name}'. "
-                    f"Try a shorter clip (under 60 seconds)."
-                )
+                output_valid = self._validate_output(partial_path)
+                output_size = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+                log.info("[RENDER] FFmpeg returned code=%s in %.1fs (audio=%s)",
+                         result.returncode, processing_time, label)
+                log.info("[RENDER] Output valid=%s size=%s bytes", output_valid, output_size)
+
+                if output_valid:
+                    # Accept the render if the file probes clean, even when FFmpeg reported a
+                    # non-zero exit (e.g. an audio-muxer hiccup) — the branded video is complete.
+                    if result.returncode != 0:
+                        log.warning("[RENDER WARN] FFmpeg exit=%s but output probes valid — "
+                                    "accepting (audio=%s)", result.returncode, label)
+                    if label == 'drop-audio':
+                        log.warning("[RENDER WARN] brand='%s' rendered WITHOUT audio "
+                                    "after audio copy + re-encode both failed", brand_name)
+                    os.replace(partial_path, output_path)
+                    metrics.AUDIO_TIER.inc(tier=label)
+                    log.info("[RENDER] Completed brand='%s' in %.1fs (encode %.1fs, %sKB, audio=%s)",
+                             brand_name, processing_time, encode_time, output_size//1024, label)
+                    return output_path
+
+                last_error = (result.stderr or '')[-1500:]
+                log.error("[RENDER ERROR] Attempt %s (audio=%s) failed for brand='%s' code=%s",
+                          attempt_idx, label, brand_name, result.returncode)
+                log.error("[RENDER ERROR] stderr tail: %s", last_error)
+
+            # All audio strategies exhausted against a valid video intermediate — the
+            # failure is in the mux step itself (disk, permissions, etc.).
+            raise Exception(
+                f"FFmpeg error for brand '{brand_name}' after {len(audio_attempts)} attempts: {last_error}"
+            )
+        finally:
+            for path in (video_only_path, partial_path):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        log.warning("[RENDER WARN] Could not remove intermediate %s: %s", path, e)
+
+    def process_brand_formats(self, brand_configs: Dict[str, Dict], source_edits: Optional[Dict] = None,
+                              video_id: str = 'video', cancel_event=None) -> Dict[str, str]:
+        """
+        Render one brand in several output formats from a single decode.
 
-            processing_time = time.time() - start_time
-            output_valid = self._validate_output(output_path)
-            output_size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
-            print(f"[RENDER] FFmpeg returned code={result.returncode} in {processing_time:.1f}s (audio={label})")
-            print(f"[RENDER] Output valid={output_valid} size={output_size} bytes")
-
-            if output_valid:
-                # Accept the render if the file probes clean, even when FFmpeg reported a
-                # non-zero exit (e.g. an audio-muxer hiccup) — the branded video is complete.
-                if result.returncode != 0:
-                    print(f"[RENDER WARN] FFmpeg exit={result.returncode} but output probes valid — "
-                          f"accepting (audio={label})")
-                if label == 'drop-audio':
-                    print(f"[RENDER WARN] brand='{brand_name}' rendered WITHOUT audio "
-                          f"after audio copy + re-encode both failed")
-                print(f"[RENDER] Completed brand='{brand_name}' in {processing_time:.1f}s "
-                      f"({output_size//1024}KB, audio={label})")
-                return output_path
-
-            last_error = (result.stderr or '')[-1500:]
-            print(f"[RENDER ERROR] Attempt {attempt_idx} (audio={label}) failed for "
-                  f"brand='{brand_name}' code={result.returncode}")
-            print(f"[RENDER ERROR] stderr tail: {last_error}")
-
-        # All audio strategies exhausted and the output never probed valid — the failure
-        # is not audio-related (bad filter, missing input, disk, etc.).
-        raise Exception(
-            f"FFmpeg error for brand '{brand_name}' after {len(audio_attempts)} attempts: {last_error}"
-        )
+        self.video_path is the RAW source (not normalized). One FFmpeg process
+        decodes it once, splits the frames into one branch per format — that
+        format's normalize graph (reframe / blur-pad) followed by the brand
+        graph built at its frame size from its own config (format_overrides
+        geometry) — and encodes every branch, with AAC audio, to its own file.
+        This replaces N × (normalize encode + brand encode) with one process.
+
+        Args:
+            brand_configs: output_format -> merged brand config for that format
+            source_edits: output_format -> resolved source edit (or None)
+            cancel_event: as in process_brand
+
+        Returns:
+            output_format -> output path. Formats whose single-pass output
+            doesn't validate are re-rendered the sequential way
+            (normalize_video + process_brand).
+        """
+        source_edits = source_edits or {}
+        formats = list(brand_configs)
+        brand_name = brand_configs[formats[0]].get('name', 'brand')
+        if not self.has_video_stream():
+            raise Exception("[ERROR] The input file contains no valid video stream (audio-only).")
+
+        plan_started = time.time()
+        # One input-side trim serves every branch; formats saved with different
+        # trims can't share a decode and go the sequential way
+        trims = {_edit_trim(source_edits.get(fmt)) for fmt in formats}
+        trim = next(iter(trims))
+        parts = [f"[0:v]split={len(formats)}" + ''.join(f'[src{i}]' for i in range(len(formats)))]
+        outputs = {}
+        for i, fmt in enumerate(formats):
+            width, height = _normalized_frame_size(self.video_path, fmt, self.video_info)
+            brand_graph = VideoProcessor.for_frame(width, height, self.output_dir).build_filter_complex(
+                dict(brand_configs[fmt]))
+            if not brand_graph or '[vout]' not in brand_graph:
+                raise Exception(f"[ERROR] No valid filter complex with [vout] for brand {brand_name} ({fmt})")
+            norm = _prefix_labels(_normalize_filter_graph(self.video_path, fmt, source_edits.get(fmt)), f'f{i}_')
+            parts.append(_splice_input(norm, f'src{i}', f'f{i}_in'))
+            parts.append(_splice_input(_prefix_labels(brand_graph, f'b{i}_'), f'f{i}_out', f'b{i}_in'))
+            outputs[fmt] = branded_output_path(self.output_dir, brand_configs[fmt], video_id, fmt)
+        filter_complex = ';'.join(parts)
+        tracing.record('plan', plan_started, formats=len(formats))
+        # Encoded to partials and renamed into place, as in process_brand, so a
+        # render-cache hardlink at an output name is never written through
+        partials = {fmt: os.path.splitext(path)[0] + '_partial.mp4' for fmt, path in outputs.items()}
+
+        FFMPEG_TIMEOUT = 840
+        cmd = [FFMPEG_BIN, '-y', *_trim_input_args(trim), '-i', self.video_path,
+               '-filter_complex', filter_complex, '-filter_threads', '1']
+        for i, fmt in enumerate(formats):
+            cmd += [
+                '-map', f'[b{i}_vout]', '-map', '0:a?',
+                '-c:v', 'libx264', '-crf', '23', '-preset', 'veryfast', '-threads', '1',
+                '-pix_fmt', 'yuv420p',
+                '-c:a', 'aac', '-b:a', '128k',
+                '-movflags', '+faststart',
+                partials[fmt],
+            ]
+        os.makedirs(self.output_dir, exist_ok=True)
+        log.info("[RENDER-MULTI] brand='%s' formats=%s from one decode", brand_name, formats)
+        log.info("[RENDER-MULTI] Command: %s", Lazy(' '.join, cmd))
+
+        encode_started = time.time()
+        failed = list(formats)
+        try:
+            if len(trims) > 1:
+                raise _SinglePassUnavailable(f'formats have different trims: {sorted(map(str, trims))}')
+            res = admission.resolution_class(self.video_metadata.get('width'), self.video_metadata.get('height'))
+            result = _run_ffmpeg(cmd, FFMPEG_TIMEOUT, cancel_event, operation='render_multi',
+                                 profile_key=f"{res}>{'+'.join(formats)}")
+            failed = [fmt for fmt in formats if not self._validate_output(partials[fmt])]
+            for fmt in formats:
+                if fmt not in failed:
+                    os.replace(partials[fmt], outputs[fmt])
+            elapsed = time.time() - encode_started
+            metrics.RENDER_STAGE_SECONDS.observe(elapsed, stage='encode')
+            tracing.record('encode', encode_started, formats=len(formats), code=result.returncode,
+                           failed=len(failed))
+            log.info("[RENDER-MULTI] code=%s in %.1fs, failed=%s", result.returncode, elapsed, failed or '-')
+            if failed:
+                log.warning("[RENDER-MULTI] stderr tail: %s", (result.stderr or '')[-1000:])
+        except subprocess.TimeoutExpired:
+            log.error("[RENDER-MULTI] timed out after %ss for brand='%s'", FFMPEG_TIMEOUT, brand_name)
+        except _SinglePassUnavailable as e:
+            log.info("[RENDER-MULTI] single pass skipped: %s", e)
+        finally:
+            for path in partials.values():
+                if os.path.exists(path):
+                    os.remove(path)
+
+        # Sequential fallback for whatever the single pass didn't deliver
+        for fmt in failed:
+            log.warning("[RENDER-MULTI] %s: falling back to normalize + process_brand", fmt)
+            normalized = normalize_video(self.video_path, output_format=fmt, source_edit=source_edits.get(fmt),
+                                         job_id=f'{video_id}_{fmt}', cancel_event=cancel_event)
+            try:
+                fallback_trim = _edit_trim(source_edits.get(fmt)) if normalized == self.video_path else None
+                outputs[fmt] = VideoProcessor(normalized, self.output_dir).process_brand(
+                    brand_configs[fmt], video_id=video_id, output_format=fmt,
+                    cancel_event=cancel_event, trim=fallback_trim)
+            finally:
+                if normalized != self.video_path and os.path.exists(normalized):
+                    os.remove(normalized)
+        return outputs
     
     def process_multiple_brands(self, brands: List[Dict], logo_settings: Optional[Dict] = None,
                                video_id: str = 'video') -> List[str]:
@@ -1092,7 +2078,7 @@ class VideoProcessor:
                 print(f"    ✓ Exported to {output_path}")
             except Exception as e:
                 error_msg = f"    ✗ Failed: {e}"
-                print(error_msg)
+                log.error(error_msg)
                 # Don't raise exception, continue with other brands
                 # But we could choose to raise if we want to stop on first error
         
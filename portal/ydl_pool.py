@@ -0,0 +1,157 @@
+"""
+Warm, reusable yt-dlp instances for the fetch route and render-source downloads.
+
+Building ``YoutubeDL(opts)`` per URL and per cookie attempt re-initialises every
+extractor, re-reads the cookie file and opens fresh HTTP sessions (new TCP +
+TLS handshakes to the same CDN hosts). On a batch fetch that setup dominates
+the metadata pass. This pool keeps configured instances alive between URLs:
+
+  * instances are keyed by profile — (platform, cookie file + mtime, proxy,
+    player clients) plus a fingerprint of the remaining options, so two
+    checkouts only share an instance when they would have built identical ones;
+    a rewritten cookie file changes the key, so a stale jar is never reused
+    (the old instances just idle out)
+  * checkout is exclusive: a YoutubeDL object is not thread-safe, so each
+    concurrent fetch gets its own instance; idle ones wait in a per-key stack
+  * instances are recycled after MAX_USES checkouts or MAX_AGE_SECONDS, idle
+    ones are closed after IDLE_TTL_SECONDS, and any instance whose checkout
+    raised is discarded rather than returned (its cookie jar / session state
+    may be poisoned by the failure)
+
+Stdlib only plus a lazy yt-dlp import — safe to import from app.
+Single Gunicorn worker (WEB_CONCURRENCY=1): state is in-process.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    from yt_dlp import YoutubeDL
+except ImportError:  # pragma: no cover - yt-dlp is a hard dependency of the fetch route
+    YoutubeDL = None
+
+MAX_USES = int(os.environ.get('YDL_POOL_MAX_USES', '50'))
+MAX_AGE_SECONDS = int(os.environ.get('YDL_POOL_MAX_AGE', str(15 * 60)))
+IDLE_TTL_SECONDS = int(os.environ.get('YDL_POOL_IDLE_TTL', str(5 * 60)))
+MAX_IDLE_PER_KEY = 2
+
+_lock = threading.Lock()
+_idle = {}        # profile key -> [_Entry, ...] (most recently returned last)
+_stats = {'created': 0, 'reused': 0, 'recycled': 0, 'discarded': 0, 'checked_out': 0}
+
+
+class _Entry:
+    __slots__ = ('ydl', 'created', 'returned', 'uses')
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.created = time.time()
+        self.returned = self.created
+        self.uses = 0
+
+
+def profile_key(platform, opts):
+    """Pool key for a set of YoutubeDL options.
+
+    The named parts are what actually varies between fetches; the fingerprint
+    of everything else keeps the key honest if new options are added."""
+    cookie = opts.get('cookiefile')
+    try:
+        cookie_mtime = os.path.getmtime(cookie) if cookie else None
+    except OSError:
+        cookie_mtime = None
+    clients = tuple(((opts.get('extractor_args') or {}).get('youtube') or {})
+                    .get('player_client') or ())
+    named = {'cookiefile', 'proxy', 'extractor_args'}
+    rest = json.dumps({k: v for k, v in opts.items() if k not in named},
+                      sort_keys=True, default=str)
+    return (platform, cookie, cookie_mtime, opts.get('proxy'), clients, rest)
+
+
+def _close(entry):
+    try:
+        entry.ydl.__exit__(None, None, None)
+    except Exception as e:
+        print(f"[YDL POOL] close failed: {e}")
+
+
+def _expired(entry, now):
+    return (entry.uses >= MAX_USES
+            or now - entry.created > MAX_AGE_SECONDS
+            or now - entry.returned > IDLE_TTL_SECONDS)
+
+
+def _sweep(now):
+    """Pop expired idle entries (caller holds _lock). Returns them for closing."""
+    stale = []
+    for key in list(_idle):
+        keep = []
+        for entry in _idle[key]:
+            (stale if _expired(entry, now) else keep).append(entry)
+        if keep:
+            _idle[key] = keep
+        else:
+            del _idle[key]
+    return stale
+
+
+@contextmanager
+def checkout(platform, opts):
+    """Yield a configured YoutubeDL for ``opts``, reusing a warm one if idle.
+
+    Use exactly like ``with YoutubeDL(opts) as ydl:``. The instance is returned
+    to the pool on success and discarded if the body raises."""
+    key = profile_key(platform, opts)
+    now = time.time()
+    entry = None
+    with _lock:
+        stale = _sweep(now)
+        stack = _idle.get(key)
+        if stack:
+            entry = stack.pop()
+            if not stack:
+                del _idle[key]
+            _stats['reused'] += 1
+        _stats['checked_out'] += 1
+        _stats['recycled'] += len(stale)
+    for old in stale:
+        _close(old)
+
+    if entry is None:
+        ydl = YoutubeDL(opts)
+        ydl.__enter__()
+        entry = _Entry(ydl)
+        with _lock:
+            _stats['created'] += 1
+
+    ok = False
+    try:
+        yield entry.ydl
+        ok = True
+    finally:
+        entry.uses += 1
+        entry.returned = time.time()
+        with _lock:
+            _stats['checked_out'] -= 1
+            keep = (ok and not _expired(entry, entry.returned)
+                    and len(_idle.get(key, ())) < MAX_IDLE_PER_KEY)
+            if keep:
+                _idle.setdefault(key, []).append(entry)
+            elif ok:
+                _stats['recycled'] += 1
+            else:
+                _stats['discarded'] += 1
+        if not keep:
+            _close(entry)
+
+
+def snapshot():
+    """Admin/diagnostic view of the pool."""
+    with _lock:
+        return {
+            'idle': sum(len(s) for s in _idle.values()),
+            'profiles': len(_idle),
+            'stats': dict(_stats),
+        }
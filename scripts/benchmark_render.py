@@ -0,0 +1,335 @@
+"""
+Reproducible render benchmark (portal/video_processor.py).
+
+Offline, no network, no Flask, no DB. Generates deterministic synthetic sources
+with FFmpeg's lavfi testsrc2 + sine (several resolutions, durations, codecs,
+10-bit/HDR variants, portrait and landscape) and synthetic brand assets with
+Pillow, then times each stage of the real render path:
+
+    probe       VideoProcessor(...) ffprobe of the normalized file
+    normalize   normalize_video(...)
+    overlay     build_filter_complex(...)
+    encode      process_brand(...) minus the time spent in output validation
+    validate    _validate_output(...) calls made by process_brand
+
+across output formats and brand counts. Results are written as JSON and can be
+compared against a stored baseline; the run exits 1 when any stage regressed
+beyond the tolerance.
+
+Run:
+    python scripts/benchmark_render.py --quick
+    python scripts/benchmark_render.py --out bench.json
+    python scripts/benchmark_render.py --baseline bench.json --tolerance 0.15
+
+Needs only ffmpeg/ffprobe on PATH (or FFMPEG_PATH/FFPROBE_PATH) and Pillow.
+Variants whose encoder is missing from the local FFmpeg build (e.g. libx265)
+are skipped and listed under "skipped" in the results.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FFMPEG = os.environ.get('FFMPEG_PATH', 'ffmpeg')
+
+# (name, width, height, encoder, extra encode args)
+SOURCES = [
+    ('portrait_720x1280_h264',   720, 1280, 'libx264', ['-pix_fmt', 'yuv420p']),
+    ('portrait_1080x1920_h264', 1080, 1920, 'libx264', ['-pix_fmt', 'yuv420p']),
+    ('landscape_1920x1080_h264', 1920, 1080, 'libx264', ['-pix_fmt', 'yuv420p']),
+    ('portrait_1080x1920_h264_10bit', 1080, 1920, 'libx264', ['-pix_fmt', 'yuv420p10le']),
+    ('portrait_1080x1920_hevc10_hdr', 1080, 1920, 'libx265', [
+        '-pix_fmt', 'yuv420p10le', '-tag:v', 'hvc1',
+        '-x265-params', 'log-level=error:colorprim=bt2020:transfer=smpte2084:colormatrix=bt2020nc',
+        '-color_primaries', 'bt2020', '-color_trc', 'smpte2084', '-colorspace', 'bt2020nc',
+    ]),
+]
+QUICK_SOURCES = ('portrait_1080x1920_h264', 'landscape_1920x1080_h264')
+DURATIONS = (10, 30)
+QUICK_DURATIONS = (5,)
+FORMATS = ('vertical_9_16', 'square_1_1')
+BRAND_COUNTS = (1, 3)
+STAGES = ('probe', 'normalize', 'overlay', 'encode', 'validate', 'total')
+
+
+def _run(cmd):
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd[:4])}... failed: {result.stderr[-500:]}")
+
+
+def _available_encoders():
+    out = subprocess.run([FFMPEG, '-hide_banner', '-encoders'],
+                         capture_output=True, text=True).stdout
+    return {line.split()[1] for line in out.splitlines()
+            if len(line.split()) > 1 and line.startswith(' ')}
+
+
+def _ffmpeg_version():
+    try:
+        out = subprocess.run([FFMPEG, '-version'], capture_output=True, text=True).stdout
+        return out.splitlines()[0] if out else None
+    except OSError:
+        return None
+
+
+def generate_source(workdir, name, width, height, encoder, extra, duration):
+    """Deterministic lavfi clip; reused from workdir when already generated."""
+    path = os.path.join(workdir, 'sources', f'{name}_{duration}s.mp4')
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _run([
+        FFMPEG, '-y', '-hide_banner',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate=30:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:sample_rate=48000:duration={duration}',
+        '-map', '0:v', '-map', '1:a',
+        '-c:v', encoder, '-preset', 'veryfast', '-threads', '1', *extra,
+        '-c:a', 'aac', '-b:a', '128k',
+        '-fflags', '+bitexact', '-flags:v', '+bitexact', '-flags:a', '+bitexact',
+        '-map_metadata', '-1', '-shortest',
+        path,
+    ])
+    return path
+
+
+def generate_brand_assets(storage_root, count):
+    """Synthetic watermark + logo PNGs and brand configs in the visual layout."""
+    from PIL import Image, ImageDraw
+
+    brands = []
+    for i in range(count):
+        rel_dir = os.path.join('brands', 'bench', str(i + 1))
+        brand_dir = os.path.join(storage_root, rel_dir)
+        os.makedirs(brand_dir, exist_ok=True)
+
+        wm = Image.new('RGBA', (1024, 1024), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(wm)
+        for step in range(0, 1024, 64):
+            draw.line([(step, 0), (1024 - step, 1024)], fill=(255, 255, 255, 160), width=6)
+        wm.save(os.path.join(brand_dir, 'watermark_normalized.png'), 'PNG')
+
+        logo = Image.new('RGBA', (512, 512), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(logo)
+        draw.ellipse([16, 16, 496, 496], fill=(40 * i % 255, 120, 220, 255))
+        draw.rectangle([176, 176, 336, 336], fill=(255, 255, 255, 255))
+        logo.save(os.path.join(brand_dir, 'logo_normalized.png'), 'PNG')
+
+        brands.append({
+            'id': i + 1,
+            'name': f'bench{i + 1}',
+            'user_id': 1,
+            'watermark_path': os.path.join(rel_dir, 'watermark_normalized.png'),
+            'logo_path': os.path.join(rel_dir, 'logo_normalized.png'),
+            'logo_x': 0.85, 'logo_y': 0.85, 'logo_scale': 0.15,
+            'logo_opacity': 1.0, 'logo_rotation': 15.0 if i % 2 else 0.0,
+            'logo_shape': 'circle' if i % 2 else 'original',
+            'wm_mode': 'positioned', 'wm_x': 0.5, 'wm_y': 0.5,
+            'wm_scale': 1.0, 'wm_opacity': 0.2,
+            'text_enabled': 1, 'text_content': f'BENCH BRAND {i + 1}',
+            'text_x_percent': 0.5, 'text_y_percent': 0.2,
+            'text_size': 48, 'text_color': '#FFFFFF',
+        })
+    return brands
+
+
+def _import_video_processor(storage_root):
+    """Import portal.video_processor WITHOUT running the Flask app."""
+    os.environ['STORAGE_ROOT'] = storage_root
+    sys.path.insert(0, _ROOT)
+    pkg = types.ModuleType('portal')
+    pkg.__path__ = [os.path.join(_ROOT, 'portal')]
+    sys.modules['portal'] = pkg
+    with contextlib.redirect_stdout(io.StringIO()):
+        from portal import video_processor
+    return video_processor
+
+
+def run_case(vp, source_path, output_format, brands, out_dir, verbose=False):
+    """Time one (source, format, brand set) render. Returns per-stage seconds."""
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    stages = dict.fromkeys(STAGES, 0.0)
+    job_id = f'bench{int(time.time() * 1000)}'
+    outputs = []
+    normalized = None
+    with quiet:
+        case_start = time.perf_counter()
+        t0 = time.perf_counter()
+        normalized = vp.normalize_video(source_path, output_format=output_format, job_id=job_id)
+        stages['normalize'] = time.perf_counter() - t0
+        if normalized == source_path:
+            raise RuntimeError('normalize_video fell back to the original input')
+
+        t0 = time.perf_counter()
+        processor = vp.VideoProcessor(normalized, out_dir)
+        stages['probe'] = time.perf_counter() - t0
+
+        # Accumulate validation time spent inside process_brand
+        validate_secs = [0.0]
+        original_validate = processor._validate_output
+
+        def _timed_validate(path):
+            v0 = time.perf_counter()
+            try:
+                return original_validate(path)
+            finally:
+                validate_secs[0] += time.perf_counter() - v0
+        processor._validate_output = _timed_validate
+
+        for brand in brands:
+            t0 = time.perf_counter()
+            processor.build_filter_complex(dict(brand))
+            stages['overlay'] += time.perf_counter() - t0
+
+            validate_secs[0] = 0.0
+            t0 = time.perf_counter()
+            outputs.append(processor.process_brand(dict(brand), video_id='bench',
+                                                   output_format=output_format))
+            brand_secs = time.perf_counter() - t0
+            stages['validate'] += validate_secs[0]
+            stages['encode'] += brand_secs - validate_secs[0]
+        stages['total'] = time.perf_counter() - case_start
+
+    output_kb = sum(os.path.getsize(p) for p in outputs if os.path.exists(p)) // 1024
+    for p in outputs + [normalized]:
+        if p and p != source_path and os.path.exists(p):
+            os.remove(p)
+    return stages, output_kb
+
+
+def compare(results, baseline, tolerance, min_delta=0.05):
+    """Print a per-stage comparison. Returns the list of regressions."""
+    base_cases = {c['case_id']: c for c in baseline.get('cases', [])}
+    regressions = []
+    print(f"\n{'case':<58} {'stage':<10} {'base':>8} {'now':>8} {'ratio':>7}")
+    for case in results['cases']:
+        base = base_cases.get(case['case_id'])
+        if not base:
+            print(f"{case['case_id']:<58} (no baseline)")
+            continue
+        for stage in STAGES:
+            b = base['stages'].get(stage)
+            n = case['stages'].get(stage)
+            if not b or n is None:
+                continue
+            ratio = n / b
+            flag = ''
+            if ratio > 1 + tolerance and (n - b) > min_delta:
+                flag = '  REGRESSED'
+                regressions.append((case['case_id'], stage, b, n))
+            elif ratio < 1 - tolerance and (b - n) > min_delta:
+                flag = '  improved'
+            print(f"{case['case_id']:<58} {stage:<10} {b:>8.2f} {n:>8.2f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--quick', action='store_true', help='small matrix (2 sources, 5s, vertical, 1 brand)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the median is reported')
+    parser.add_argument('--out', help='write JSON results here')
+    parser.add_argument('--baseline', help='compare against a previous results JSON')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown ratio (0.15 = 15%%)')
+    parser.add_argument('--workdir', help='reuse generated sources across runs (default: temp dir)')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS)
+    parser.add_argument('--brand-counts', nargs='+', type=int)
+    parser.add_argument('--durations', nargs='+', type=int)
+    parser.add_argument('--verbose', action='store_true', help='show video_processor output')
+    args = parser.parse_args()
+
+    if shutil.which(FFMPEG) is None:
+        print(f"ffmpeg not found ({FFMPEG}); set FFMPEG_PATH/FFPROBE_PATH")
+        return 2
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='brandr_bench_')
+    os.makedirs(workdir, exist_ok=True)
+    storage_root = os.path.join(workdir, 'storage')
+    out_dir = os.path.join(workdir, 'outputs')
+    os.makedirs(out_dir, exist_ok=True)
+
+    vp = _import_video_processor(storage_root)
+    encoders = _available_encoders()
+
+    sources = [s for s in SOURCES if not args.quick or s[0] in QUICK_SOURCES]
+    durations = args.durations or (QUICK_DURATIONS if args.quick else DURATIONS)
+    formats = args.formats or (FORMATS[:1] if args.quick else FORMATS)
+    brand_counts = args.brand_counts or ((1,) if args.quick else BRAND_COUNTS)
+    all_brands = generate_brand_assets(storage_root, max(brand_counts))
+
+    results = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'ffmpeg': _ffmpeg_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': args.repeat,
+            'segment_workers': getattr(vp, 'SEGMENT_RENDER_WORKERS', None),
+        },
+        'cases': [],
+        'skipped': [],
+    }
+
+    try:
+        for name, width, height, encoder, extra in sources:
+            if encoder not in encoders:
+                results['skipped'].append({'source': name, 'reason': f'{encoder} not available'})
+                print(f"[BENCH] skip {name}: {encoder} not in this FFmpeg build")
+                continue
+            for duration in durations:
+                src = generate_source(workdir, name, width, height, encoder, extra, duration)
+                for output_format in formats:
+                    for count in brand_counts:
+                        case_id = f'{name}/{duration}s/{output_format}/{count}b'
+                        runs = []
+                        output_kb = None
+                        for _ in range(max(1, args.repeat)):
+                            stages, output_kb = run_case(vp, src, output_format,
+                                                         all_brands[:count], out_dir, args.verbose)
+                            runs.append(stages)
+                        median = {st: round(statistics.median(r[st] for r in runs), 3) for st in STAGES}
+                        results['cases'].append({
+                            'case_id': case_id,
+                            'source': {'name': name, 'width': width, 'height': height,
+                                       'encoder': encoder, 'duration': duration},
+                            'output_format': output_format,
+                            'brand_count': count,
+                            'stages': median,
+                            'output_kb': output_kb,
+                        })
+                        print(f"[BENCH] {case_id:<58} total={median['total']:.2f}s "
+                              f"normalize={median['normalize']:.2f}s encode={median['encode']:.2f}s")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        print()
+        if regressions:
+            print(f"RESULT: {len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+        print(f"RESULT: no stage regressed beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,7 @@
 """
 Offline test harness for the Instagram cookie pool (portal/cookie_pool.py).
 
-Deterministic, no network, no yt-dlp. It exercises discovery, validation, LRU
+Deterministic, no network, no yt-dlp. It exercises discovery, validation, ranked
 rotation, auth-failure detection, and the failover/cooldown contract by
 replaying the exact decision logic app.py uses around a fetch.
 
@@ -37,19 +37,20 @@ def _simulate_fetch(auth_fail_for):
     """Replay app.py's rotation loop. ``auth_fail_for`` is a set of cookie
     basenames that should 'auth-fail'; the first cookie not in that set
     'succeeds'. Returns (succeeded_path, tried_bad_paths, all_failed)."""
-    candidates = cookie_pool.candidates_lru()
+    candidates = cookie_pool.candidates_ranked()
     tried_bad = []
     for path in candidates:
         cookie_pool.mark_used(path)
         name = os.path.basename(path)
         if name in auth_fail_for:                    # simulate auth failure
+            cookie_pool.mark_failure(path, "Instagram sent an empty media response")
             if path is not candidates[-1]:
                 tried_bad.append(path)
                 continue
             # last candidate also failed -> all failed
             return None, tried_bad, True
         # success
-        cookie_pool.mark_success(path)
+        cookie_pool.mark_success(path, latency_ms=800)
         for b in tried_bad:
             cookie_pool.mark_bad(b)
         return path, tried_bad, False
@@ -69,14 +70,14 @@ def main():
         cookie_pool.bootstrap_pool(tmp)
         _check("pool size == 1", cookie_pool.pool_size() == 1)
         _check("candidate is cookies_base.txt",
-               [os.path.basename(p) for p in cookie_pool.candidates_lru()] == ['cookies_base.txt'])
+               [os.path.basename(p) for p in cookie_pool.candidates_ranked()] == ['cookies_base.txt'])
 
         print("\n2) Discovery of INSTAGRAM_COOKIES_1..3 + validation (bad one skipped)")
         os.environ['INSTAGRAM_COOKIES_1'] = _cookie_text('2002')
         os.environ['INSTAGRAM_COOKIES_2'] = _cookie_text('3003')
         os.environ['INSTAGRAM_COOKIES_3'] = "# Netscape HTTP Cookie File\n(missing auth cookies)\n"
         cookie_pool.bootstrap_pool(tmp)
-        names = [os.path.basename(p) for p in cookie_pool.candidates_lru()]
+        names = [os.path.basename(p) for p in cookie_pool.candidates_ranked()]
         _check("pool size == 3 (base,1,2; the malformed _3 skipped)", cookie_pool.pool_size() == 3)
         _check("cookies_3.txt excluded (invalid)", 'cookies_3.txt' not in names)
 
@@ -88,31 +89,31 @@ def main():
         _check("'video is private' -> NOT auth failure",
                not cookie_pool.is_auth_failure("The video is private"))
 
-        print("\n4) LRU rotation - least-recently-used goes first")
+        print("\n4) Rotation - among equal scores, least-recently-used goes first")
         cookie_pool.bootstrap_pool(tmp)  # reset last_used
-        first = os.path.basename(cookie_pool.candidates_lru()[0])
-        cookie_pool.mark_used(cookie_pool.candidates_lru()[0])  # touch base
-        nxt = [os.path.basename(p) for p in cookie_pool.candidates_lru()]
+        first = os.path.basename(cookie_pool.candidates_ranked()[0])
+        cookie_pool.mark_used(cookie_pool.candidates_ranked()[0])  # touch base
+        nxt = [os.path.basename(p) for p in cookie_pool.candidates_ranked()]
         _check("after using the first, it moves to the back of LRU order",
                nxt[-1] == first)
 
         print("\n5) Failover: first cookie auth-fails, next succeeds")
         cookie_pool.bootstrap_pool(tmp)
-        order = [os.path.basename(p) for p in cookie_pool.candidates_lru()]
+        order = [os.path.basename(p) for p in cookie_pool.candidates_ranked()]
         won, bad, allfail = _simulate_fetch(auth_fail_for={order[0]})
         _check("a later cookie succeeded", won is not None and not allfail)
         _check("the failed first cookie was cooled down (dropped from candidates)",
-               order[0] not in [os.path.basename(p) for p in cookie_pool.candidates_lru()])
+               order[0] not in [os.path.basename(p) for p in cookie_pool.candidates_ranked()])
         _check("the winner is still available",
-               os.path.basename(won) in [os.path.basename(p) for p in cookie_pool.candidates_lru()])
+               os.path.basename(won) in [os.path.basename(p) for p in cookie_pool.candidates_ranked()])
 
         print("\n6) All cookies fail -> pool NOT nuked (nobody cooled), friendly error path")
         cookie_pool.bootstrap_pool(tmp)
-        allnames = {os.path.basename(p) for p in cookie_pool.candidates_lru()}
+        allnames = {os.path.basename(p) for p in cookie_pool.candidates_ranked()}
         won, bad, allfail = _simulate_fetch(auth_fail_for=allnames)
         _check("all-fail reported", won is None and allfail)
         _check("every cookie still available next request (no cooldown on ambiguous all-fail)",
-               cookie_pool.pool_size() == len(cookie_pool.candidates_lru()))
+               cookie_pool.pool_size() == len(cookie_pool.candidates_ranked()))
 
         print("\n7) Circuit breaker: closed by default, opens on trip, closes on reset")
         cookie_pool.reset_breaker()
@@ -123,6 +124,33 @@ def main():
         cookie_pool.reset_breaker()
         _check("breaker closed after a successful fetch (reset)", cookie_pool.breaker_open() is False)
 
+        print("\n8) Scoring: proven cookies rank ahead of recently-failing ones")
+        cookie_pool.bootstrap_pool(tmp)
+        flaky, steady = cookie_pool.candidates_ranked()[:2]
+        for _ in range(3):
+            cookie_pool.mark_failure(flaky, "HTTP Error 429: Too Many Requests")
+            cookie_pool.mark_success(steady, latency_ms=900)
+        ranked = cookie_pool.candidates_ranked()
+        _check("steady cookie ranks first", ranked[0] == steady)
+        _check("flaky cookie ranks last", ranked[-1] == flaky)
+        _check("failure classified as rate_limit",
+               next(h for h in cookie_pool.health_snapshot()
+                    if h['name'] == os.path.basename(flaky))['failure_counts'] == {'rate_limit': 3})
+
+        print("\n9) Content failures are counted but don't move the score")
+        cookie_pool.bootstrap_pool(tmp)
+        first = cookie_pool.candidates_ranked()[0]
+        cookie_pool.mark_success(first, latency_ms=900)
+        before = next(h for h in cookie_pool.health_snapshot() if h['name'] == os.path.basename(first))
+        for _ in range(5):
+            cookie_pool.mark_failure(first, "This video is private", latency_ms=50)
+        after = next(h for h in cookie_pool.health_snapshot() if h['name'] == os.path.basename(first))
+        _check("failure classified as content",
+               after['failure_counts'].get('content') == 5)
+        _check("success rate and latency unchanged",
+               (after['success_rate'], after['latency_ms']) == (before['success_rate'], before['latency_ms']))
+        _check("still ranked first", cookie_pool.candidates_ranked()[0] == first)
+
     finally:
         os.environ.clear()
         os.environ.update(saved_env)
@@ -133,7 +161,7 @@ def main():
     if _check.failed:
         print(f"RESULT: {_check.failed} assertion(s) FAILED")
         return 1
-    print("RESULT: all assertions passed - pool discovers, validates, rotates LRU, "
+    print("RESULT: all assertions passed - pool discovers, validates, rotates by score, "
           "fails over on auth errors, and never nukes the pool on an ambiguous all-fail.")
     return 0
 
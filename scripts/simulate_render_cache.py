@@ -0,0 +1,245 @@
+"""
+Offline harness for the render-output cache (portal/render_cache.py).
+
+Deterministic, no network, no Flask. Spins up a throwaway SQLite DB and
+exercises get_or_render's single flight (identical requests render once), a
+leader that fails or is cancelled releasing its waiters to try again, a
+waiter honouring its own cancel, and hits claiming the cached file by
+hardlink. The last section runs process_brand itself (skipped when ffmpeg is
+not on PATH): a cache hit links another user's output, that user re-renders
+with new settings, and the original output's bytes must be unchanged.
+
+Run:  python scripts/simulate_render_cache.py     (exit 0 = all pass)
+"""
+import os
+import sys
+import time
+import types
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+
+# Import portal.* WITHOUT running the Flask app. Register a lightweight
+# namespace package and point DB_PATH/STORAGE_ROOT at a throwaway directory
+# BEFORE importing (database.py runs init_db() at import).
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+_pkg = types.ModuleType('portal')
+_pkg.__path__ = [os.path.join(_ROOT, 'portal')]
+sys.modules['portal'] = _pkg
+
+import sqlite3  # noqa: E402
+_TMP = tempfile.mkdtemp(prefix='brandr_render_cache_sim_')
+os.environ['DB_PATH'] = os.path.join(_TMP, 'boot.db')
+os.environ['STORAGE_ROOT'] = os.path.join(_TMP, 'storage')
+_c = sqlite3.connect(os.environ['DB_PATH'])
+_c.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY)")
+_c.commit(); _c.close()
+
+from portal import database as db  # noqa: E402
+from portal import render_cache as rc  # noqa: E402
+from portal.video_processor import RenderCancelled, VideoProcessor, branded_output_path  # noqa: E402
+
+
+def _check(label, cond):
+    print(f"  [{'PASS' if cond else 'FAIL'}] {label}")
+    if not cond:
+        _check.failed += 1
+_check.failed = 0
+
+
+def _sha(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _write_render(path, payload, delay=0.3):
+    """Stand-in for process_brand: write a partial, rename it over path."""
+    time.sleep(delay)
+    partial = path + '.partial'
+    with open(partial, 'wb') as f:
+        f.write(payload)
+    os.replace(partial, path)
+    return path
+
+
+def _save_row(user_id, path, key):
+    """What app.py does after get_or_render returns: record ownership."""
+    db.save_branded_output(user_id, 'clip.mp4', os.path.basename(path), path,
+                           brand_id=1, brand_name='simbrand', render_key=key)
+
+
+def _request(results, name, key, path, render_fn, cancel_event=None):
+    try:
+        results[name] = rc.get_or_render(key, path, render_fn, cancel_event)
+    except BaseException as e:
+        results[name] = e
+
+
+def _wait_joined(before, n, timeout=5.0):
+    deadline = time.time() + timeout
+    while rc.snapshot()['stats']['joined'] - before < n and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def _wait_in_flight(n, timeout=5.0):
+    deadline = time.time() + timeout
+    while rc.snapshot()['in_flight'] < n and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def _run_threads(targets):
+    threads = [threading.Thread(target=_request, args=t) for t in targets]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def main():
+    out = os.path.join(_TMP, 'outputs')
+    os.makedirs(out, exist_ok=True)
+    try:
+        print("\n1) Single flight: three identical requests, one render")
+        key = rc.render_key('src1', 'plan1', 'enc')
+        renders = []
+
+        def render_once(path):
+            renders.append(path)
+            return _write_render(path, b'render-1')
+
+        results = {}
+        paths = {n: os.path.join(out, f'{n}_1.mp4') for n in 'abc'}
+        threads = _run_threads([(results, n, key, paths[n], lambda p=paths[n]: render_once(p))
+                                for n in 'abc'])
+        for t in threads:
+            t.join(10)
+        outcomes = sorted(results[n][1] for n in 'abc')
+        _check("exactly one render ran", len(renders) == 1)
+        _check("one 'rendered', two 'joined'", outcomes == ['joined', 'joined', 'rendered'])
+        _check("each request got its own name with the rendered bytes",
+               all(results[n][0] == paths[n] and _sha(paths[n]) == _sha(renders[0]) for n in 'abc'))
+        _check("no flight left behind", rc.snapshot()['in_flight'] == 0)
+
+        print("\n2) Hit: a later request claims the cached file by hardlink")
+        _save_row(1, renders[0], key)
+        hit_path = os.path.join(out, 'd_1.mp4')
+        path, outcome = rc.get_or_render(key, hit_path, lambda: _check("hit must not render", False))
+        _check("outcome is 'hit'", outcome == 'hit')
+        _check("claimed under the requested name", path == hit_path)
+        _check("same inode as the cached file", os.stat(hit_path).st_ino == os.stat(renders[0]).st_ino)
+
+        print("\n3) Leader fails: its waiters are released and one of them renders")
+        key = rc.render_key('src2', 'plan1', 'enc')
+        renders = []
+        go = threading.Event()
+
+        def failing_render():
+            go.wait(5)
+            raise RuntimeError('ffmpeg exploded')
+
+        results = {}
+        before = rc.snapshot()['stats']['joined']
+        threads = _run_threads([(results, 'leader', key, os.path.join(out, 'l_2.mp4'), failing_render)])
+        _wait_in_flight(1)
+        threads += _run_threads([(results, n, key, os.path.join(out, f'{n}_2.mp4'),
+                                  lambda n=n: render_once(os.path.join(out, f'{n}_2.mp4')))
+                                 for n in 'bc'])
+        _wait_joined(before, 2)
+        go.set()
+        for t in threads:
+            t.join(10)
+        _check("the leader saw its own error", isinstance(results['leader'], RuntimeError))
+        _check("exactly one waiter re-rendered", len(renders) == 1)
+        _check("both waiters got an output",
+               all(isinstance(results[n], tuple) and os.path.isfile(results[n][0]) for n in 'bc'))
+
+        print("\n4) Leader cancelled: its waiters render instead of failing")
+        key = rc.render_key('src3', 'plan1', 'enc')
+        renders = []
+        go.clear()
+
+        def cancelled_render():
+            go.wait(5)
+            raise RenderCancelled('Render cancelled')
+
+        results = {}
+        before = rc.snapshot()['stats']['joined']
+        threads = _run_threads([(results, 'leader', key, os.path.join(out, 'l_3.mp4'), cancelled_render)])
+        _wait_in_flight(1)
+        threads += _run_threads([(results, 'b', key, os.path.join(out, 'b_3.mp4'),
+                                  lambda: render_once(os.path.join(out, 'b_3.mp4')))])
+        _wait_joined(before, 1)
+        go.set()
+        for t in threads:
+            t.join(10)
+        _check("the leader was cancelled", isinstance(results['leader'], RenderCancelled))
+        _check("the waiter rendered it itself",
+               isinstance(results['b'], tuple) and results['b'][1] == 'rendered' and len(renders) == 1)
+
+        print("\n5) A waiter honours its own cancel while the leader keeps going")
+        key = rc.render_key('src4', 'plan1', 'enc')
+        go.clear()
+        own_cancel = threading.Event()
+        results = {}
+        before = rc.snapshot()['stats']['joined']
+        threads = _run_threads([(results, 'leader', key, os.path.join(out, 'l_4.mp4'),
+                                 lambda: go.wait(5) and _write_render(os.path.join(out, 'l_4.mp4'), b'r4', 0))])
+        _wait_in_flight(1)
+        threads += _run_threads([(results, 'b', key, os.path.join(out, 'b_4.mp4'), None, own_cancel)])
+        _wait_joined(before, 1)
+        own_cancel.set()
+        threads[1].join(5)
+        _check("the waiter raised RenderCancelled", isinstance(results.get('b'), RenderCancelled))
+        go.set()
+        threads[0].join(5)
+        _check("the leader still finished", isinstance(results['leader'], tuple))
+
+        print("\n6) Hit, then re-render with new settings: the original output is untouched")
+        if not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+            print("  [SKIP] ffmpeg/ffprobe not on PATH")
+        else:
+            src = os.path.join(_TMP, 'clip.mp4')
+            subprocess.run(['ffmpeg', '-y', '-v', 'error',
+                            '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30:duration=2',
+                            '-f', 'lavfi', '-i', 'sine=duration=2',
+                            '-c:v', 'libx264', '-c:a', 'aac', '-shortest', src], check=True)
+            brand = {'name': 'simbrand'}
+            key1 = rc.render_key(rc.source_hash(src), 'full-clip', 'enc')
+            key2 = rc.render_key(rc.source_hash(src), 'trimmed', 'enc')
+            proc = VideoProcessor(src, out)
+            a_path = branded_output_path(out, brand, 'usera', 'vertical_9_16')
+            b_path = branded_output_path(out, brand, 'userb', 'vertical_9_16')
+
+            path, outcome = rc.get_or_render(key1, a_path, lambda: proc.process_brand(brand, video_id='usera'))
+            _save_row(1, path, key1)
+            a_before = _sha(a_path)
+            path, outcome = rc.get_or_render(key1, b_path, lambda: proc.process_brand(brand, video_id='userb'))
+            _save_row(2, path, key1)
+            _check("user b's request is a hit sharing user a's inode",
+                   outcome == 'hit' and os.stat(b_path).st_ino == os.stat(a_path).st_ino)
+
+            path, outcome = rc.get_or_render(key2, b_path, lambda: proc.process_brand(
+                brand, video_id='userb', trim=(0.0, 1.0)))
+            _save_row(2, path, key2)
+            _check("user b re-rendered", outcome == 'rendered')
+            _check("user b's name now has its own inode", os.stat(b_path).st_ino != os.stat(a_path).st_ino)
+            _check("user a's bytes are unchanged", _sha(a_path) == a_before)
+            _check("user b's bytes are the new render", _sha(b_path) != a_before)
+            _check("the original key still hits user a's file", rc.lookup(key1) == a_path)
+
+    finally:
+        shutil.rmtree(_TMP, ignore_errors=True)
+
+    print()
+    if _check.failed:
+        print(f"RESULT: {_check.failed} assertion(s) FAILED")
+        return 1
+    print("RESULT: all assertions passed - identical renders run once, failed or cancelled "
+          "leaders release their waiters, and hits never share bytes a re-render rewrites.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -67,7 +67,7 @@ def main():
         #   user 1: 10s/1000kb, 20s/2000kb, 60s/3000kb   (3 renders)
         #   user 2: 100s/10000kb, 400s/20000kb           (2 renders)
         # secs=[10,20,60,100,400] -> median 60, mean 118, p95 400, total 590s
-        print("\n1) Logging returns True and never raises")
+        print("\n1) Logging is queued (returns a Future resolving True) and never raises")
         events = [
             (1, 'jobA', 11, 'england',    'vertical_9_16', 10.0, 1000, 1),
             (1, 'jobB', 12, 'scotlandwtf','vertical_9_16', 20.0, 2000, 1),
@@ -80,11 +80,12 @@ def main():
                                      brand_name=e[3], output_format=e[4],
                                      render_seconds=e[5], output_kb=e[6],
                                      brand_count=e[7])
-            _check(f"log user={e[0]} {e[5]}s ok", ok is True)
+            _check(f"log user={e[0]} {e[5]}s ok", ok is not None and ok.result(timeout=10) is True)
 
         print("\n2) A NULL output size is tolerated (render still logged)")
         _check("log with output_kb=None ok",
-               db.log_render_event(1, 'jobE', 14, 'wtf', 'vertical_9_16', 5.0, None, 1) is True)
+               db.log_render_event(1, 'jobE', 14, 'wtf', 'vertical_9_16', 5.0, None, 1)
+               .result(timeout=10) is True)
 
         print("\n3) Fleet stats: counts, duration distribution")
         s = db.get_render_stats(days=30, cost_per_month_gbp=20.0)
@@ -0,0 +1,207 @@
+"""
+Offline harness for matrix renders (portal/render_matrix.py).
+
+Deterministic, no network, no FFmpeg, no Flask. Plans small matrices and runs
+them through the real coordinator with recording runners, checking: plan-time
+de-duplication and ordering, every node starting only after its dependencies
+finished, a failed node skipping exactly what is downstream of it,
+intermediates released only once everything downstream is terminal (also when
+a normalize hands the fetched file straight to the renders), and
+cancellation.
+
+Run:  python scripts/simulate_render_matrix.py     (exit 0 = all pass)
+"""
+import os
+import sys
+import time
+import uuid
+import threading
+
+# render_matrix.py imports only stdlib, so we can load it directly from portal/
+# without pulling in the Flask app.
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'portal'))
+import render_matrix  # noqa: E402
+
+
+def _check(label, cond):
+    print(f"  [{'PASS' if cond else 'FAIL'}] {label}")
+    if not cond:
+        _check.failed += 1
+_check.failed = 0
+
+
+class _Recorder:
+    """Runners that log start/end/release events in order."""
+
+    def __init__(self, fail=(), passthrough=False, delay=0.02, gate=None):
+        self.events = []
+        self.lock = threading.Lock()
+        self.fail = set(fail)
+        self.passthrough = passthrough
+        self.delay = delay
+        self.gate = gate
+        self.cancel_event = threading.Event()
+
+    def _log(self, *event):
+        with self.lock:
+            self.events.append(event)
+
+    def _run(self, node, inputs):
+        self._log('start', node.id)
+        if self.gate is not None and node.kind == 'render':
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        try:
+            if self.cancel_event.is_set():
+                raise RuntimeError('Render cancelled')   # as the app's runners do
+            if node.id in self.fail:
+                raise RuntimeError(f'{node.id} exploded')
+            if node.kind == 'normalize' and self.passthrough:
+                return inputs[0]            # skip-normalize: hand the fetched file on
+            return f'{node.id}.mp4'
+        finally:
+            self._log('end', node.id)
+
+    def release(self, node):
+        self._log('release', node.id)
+
+    def runners(self):
+        return {'download': self._run, 'normalize': self._run, 'render': self._run,
+                'release': self.release}
+
+    def index(self, kind, node_id):
+        return next((i for i, e in enumerate(self.events) if e == (kind, node_id)), None)
+
+
+def _downstream(nodes, node_id):
+    out = []
+    for d in nodes[node_id].dependents:
+        out.append(d)
+        out.extend(_downstream(nodes, d))
+    return out
+
+
+def _run_job(nodes, recorder, cancel_after=None):
+    job_id = str(uuid.uuid4())
+    finished = []
+    render_matrix.start(job_id, nodes, recorder.runners(), user_id=1,
+                        on_finish=lambda j, n, cancelled: finished.append(cancelled))
+    if cancel_after is not None:
+        time.sleep(cancel_after)
+        render_matrix.cancel(job_id)
+        recorder.cancel_event.set()
+        if recorder.gate is not None:
+            recorder.gate.set()
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = render_matrix.get_job(job_id)
+        if job['status'] not in ('queued', 'processing'):
+            return job, finished
+        time.sleep(0.01)
+    return render_matrix.get_job(job_id), finished
+
+
+def _deps_respected(nodes, recorder):
+    for node in nodes.values():
+        started = recorder.index('start', node.id)
+        if started is None:
+            continue
+        for dep in node.deps:
+            ended = recorder.index('end', dep)
+            if ended is None or ended > started:
+                return False
+    return True
+
+
+def _released_after_downstream(nodes, recorder):
+    """Every release comes after every downstream node that ran has ended."""
+    for node_id in nodes:
+        released = recorder.index('release', node_id)
+        if released is None:
+            continue
+        for d in _downstream(nodes, node_id):
+            ended = recorder.index('end', d)
+            if ended is not None and ended > released:
+                return False
+    return True
+
+
+def main():
+    print("\n1) Plan: duplicates collapse, nodes come out in execution order")
+    nodes = render_matrix.plan(['a.mp4', 'b.mp4', 'a.mp4'], [1, 2, 2], ['vertical_9_16', 'vertical_9_16'])
+    kinds = [n.kind for n in nodes.values()]
+    _check("2 downloads, 2 normalizes, 4 renders",
+           (kinds.count('download'), kinds.count('normalize'), kinds.count('render')) == (2, 2, 4))
+    seen = set()
+    ordered = True
+    for node in nodes.values():
+        ordered &= all(d in seen for d in node.deps)
+        seen.add(node.id)
+    _check("every node's dependencies precede it", ordered)
+
+    print("\n2) All nodes succeed: dependencies respected, intermediates released late")
+    nodes = render_matrix.plan(['a.mp4', 'b.mp4'], [1, 2], ['vertical_9_16', 'square_1_1'])
+    rec = _Recorder()
+    job, finished = _run_job(nodes, rec)
+    _check("job completed", job['status'] == 'completed')
+    _check("every node ran after its dependencies ended", _deps_respected(nodes, rec))
+    released = sorted(e[1] for e in rec.events if e[0] == 'release')
+    _check("every download and normalize released exactly once (renders never)",
+           released == sorted(n.id for n in nodes.values() if n.kind != 'render'))
+    _check("no release before everything downstream ended", _released_after_downstream(nodes, rec))
+    _check("on_finish ran once, not cancelled", finished == [False])
+
+    print("\n3) A failed normalize skips only its own renders")
+    nodes = render_matrix.plan(['a.mp4'], [1, 2], ['vertical_9_16', 'square_1_1'])
+    rec = _Recorder(fail={'normalize:0:square_1_1'})
+    job, _ = _run_job(nodes, rec)
+    status = {n.id: n.status for n in nodes.values()}
+    _check("job is partial", job['status'] == 'partial')
+    _check("its renders were skipped, never started",
+           all(status[f'render:0:{b}:square_1_1'] == 'skipped' and rec.index('start', f'render:0:{b}:square_1_1') is None
+               for b in (1, 2)))
+    _check("the other format rendered", all(status[f'render:0:{b}:vertical_9_16'] == 'done' for b in (1, 2)))
+    _check("the failure is reported", [f['node'] for f in job['failures']] == ['normalize:0:square_1_1'])
+    _check("the download was still released after its surviving renders",
+           rec.index('release', 'download:0') is not None and _released_after_downstream(nodes, rec))
+
+    print("\n4) Skip-normalize: the fetched file outlives every render that reads it")
+    nodes = render_matrix.plan(['a.mp4'], [1, 2, 3], ['vertical_9_16'])
+    rec = _Recorder(passthrough=True)
+    job, _ = _run_job(nodes, rec)
+    last_render_end = max(rec.index('end', n.id) for n in nodes.values() if n.kind == 'render')
+    _check("job completed", job['status'] == 'completed')
+    _check("download released after the last render ended", rec.index('release', 'download:0') > last_render_end)
+
+    print("\n5) A failed download skips everything downstream of it")
+    nodes = render_matrix.plan(['a.mp4', 'b.mp4'], [1], ['vertical_9_16'])
+    rec = _Recorder(fail={'download:0'})
+    job, _ = _run_job(nodes, rec)
+    _check("source a's normalize and render skipped",
+           all(nodes[d].status == 'skipped' for d in _downstream(nodes, 'download:0')))
+    _check("source b rendered", nodes['render:1:1:vertical_9_16'].status == 'done')
+    _check("the failed download is not released", rec.index('release', 'download:0') is None)
+
+    print("\n6) Cancel: pending nodes are cancelled and outputs discarded")
+    nodes = render_matrix.plan(['a.mp4', 'b.mp4'], [1, 2], ['vertical_9_16'])
+    rec = _Recorder(gate=threading.Event())
+    job, finished = _run_job(nodes, rec, cancel_after=0.2)
+    statuses = {n.status for n in nodes.values()}
+    _check("job cancelled", job['status'] == 'cancelled' and job['outputs'] == [])
+    _check("nothing left pending or running", not statuses & {'pending', 'running'})
+    _check("the gated renders ended as cancelled, not done or failed",
+           all(n.status == 'cancelled' for n in nodes.values() if n.kind == 'render'))
+    _check("on_finish saw the cancel", finished == [True])
+
+    print()
+    if _check.failed:
+        print(f"RESULT: {_check.failed} assertion(s) FAILED")
+        return 1
+    print("RESULT: all assertions passed - the matrix plans each unit once, runs nodes after "
+          "their dependencies, skips only downstream of a failure, and releases intermediates last.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
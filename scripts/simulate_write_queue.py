@@ -0,0 +1,174 @@
+"""
+Offline harness for the single-writer queue (portal/database.py _WriteQueue).
+
+Deterministic, no network, no Flask. Spins up a throwaway SQLite DB and
+exercises: many concurrent writers funnelled into group commits, a failing
+write rolled back alone (its SAVEPOINT) while the rest of its batch commits,
+conn.rollback() inside a write undoing only that write, and a write that
+submits another write from inside the writer thread (run inline in the same
+savepoint, not queued behind itself).
+
+Run:  python scripts/simulate_write_queue.py     (exit 0 = all pass)
+"""
+import os
+import sys
+import types
+import tempfile
+import threading
+
+# Import portal.database WITHOUT running the Flask app. Register a lightweight
+# namespace package and point DB_PATH at a throwaway DB (with a bare users
+# table) BEFORE importing — database.py runs init_db() at import.
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _ROOT)
+_pkg = types.ModuleType('portal')
+_pkg.__path__ = [os.path.join(_ROOT, 'portal')]
+sys.modules['portal'] = _pkg
+
+import sqlite3  # noqa: E402
+_TMP = tempfile.mkdtemp(prefix='brandr_write_queue_sim_')
+os.environ['DB_PATH'] = os.path.join(_TMP, 'boot.db')
+_c = sqlite3.connect(os.environ['DB_PATH'])
+_c.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY)")
+_c.commit(); _c.close()
+
+from portal import database as db  # noqa: E402
+
+
+def _check(label, cond):
+    print(f"  [{'PASS' if cond else 'FAIL'}] {label}")
+    if not cond:
+        _check.failed += 1
+_check.failed = 0
+
+
+def _insert(tag):
+    def _do(conn):
+        c = conn.cursor()
+        c.execute('INSERT INTO sim (tag) VALUES (?)', (tag,))
+        conn.commit()
+        return c.lastrowid
+    return _do
+
+
+def _tags():
+    with db.get_connection() as conn:
+        return sorted(r['tag'] for r in conn.execute('SELECT tag FROM sim'))
+
+
+def _hold_writer():
+    """Park the writer thread so the next submits queue up as one batch."""
+    entered, release = threading.Event(), threading.Event()
+
+    def _block(conn):
+        entered.set()
+        release.wait(5)
+    db.submit_write(_block)
+    entered.wait(5)
+    return release
+
+
+def main():
+    tmp = tempfile.mkdtemp(prefix='brandr_write_queue_sim_')
+    db.DB_PATH = os.path.join(tmp, 'test.db')   # the writer reopens on the new path
+    try:
+        with db.get_connection() as conn:
+            conn.execute('CREATE TABLE sim (id INTEGER PRIMARY KEY AUTOINCREMENT, tag TEXT NOT NULL UNIQUE)')
+            conn.commit()
+
+        print("\n1) 50 concurrent writers: every write lands, each caller gets its own row id")
+        ids = {}
+        errors = []
+
+        def writer(n):
+            try:
+                ids[n] = db._retry_write(_insert(f'w{n}'))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        _check("no writer raised", not errors)
+        _check("50 rows committed", len(_tags()) == 50)
+        _check("50 distinct row ids returned", len(set(ids.values())) == 50)
+
+        print("\n2) A failing write in a batch is rolled back alone")
+        release = _hold_writer()
+
+        def _fails(conn):
+            conn.execute('INSERT INTO sim (tag) VALUES (?)', ('doomed',))
+            raise ValueError('bad write')
+
+        before = db.submit_write(_insert('before'))
+        bad = db.submit_write(_fails)
+        dupe = db.submit_write(_insert('w0'))          # UNIQUE violation
+        after = db.submit_write(_insert('after'))
+        release.set()
+        _check("the good writes around it succeed", before.result(5) and after.result(5))
+        _check("the failing fn's own exception reaches its caller",
+               isinstance(bad.exception(5), ValueError))
+        _check("a constraint error reaches its caller", isinstance(dupe.exception(5), sqlite3.IntegrityError))
+        tags = _tags()
+        _check("the failed write's partial insert was rolled back", 'doomed' not in tags)
+        _check("the rest of the batch committed", 'before' in tags and 'after' in tags)
+
+        print("\n3) conn.rollback() inside a write undoes that write only")
+
+        def _rolls_back(conn):
+            conn.execute('INSERT INTO sim (tag) VALUES (?)', ('undone',))
+            conn.rollback()
+            conn.execute('INSERT INTO sim (tag) VALUES (?)', ('kept',))
+            return 'ok'
+
+        release = _hold_writer()
+        neighbour = db.submit_write(_insert('neighbour'))
+        rolled = db.submit_write(_rolls_back)
+        release.set()
+        _check("the write returned normally", rolled.result(5) == 'ok' and neighbour.result(5))
+        tags = _tags()
+        _check("its rolled-back insert is gone, its later insert kept", 'undone' not in tags and 'kept' in tags)
+        _check("the earlier write in the batch is untouched", 'neighbour' in tags)
+
+        print("\n4) A write that submits another write runs it inline")
+
+        def _outer(conn):
+            conn.execute('INSERT INTO sim (tag) VALUES (?)', ('outer',))
+            inner = db.submit_write(_insert('inner'))
+            return inner.done(), inner.result(0)
+
+        done_inline, inner_id = db.submit_write(_outer).result(5)
+        _check("the nested future is already resolved (no self-deadlock)", done_inline and inner_id)
+        _check("both rows committed", {'outer', 'inner'} <= set(_tags()))
+
+        def _outer_fails(conn):
+            db.submit_write(_insert('inner-of-failed')).result(0)
+            raise ValueError('outer failed after nesting')
+
+        failed = db.submit_write(_outer_fails)
+        _check("the outer failure reaches its caller", isinstance(failed.exception(5), ValueError))
+        _check("the nested write shares its savepoint and is rolled back with it",
+               'inner-of-failed' not in _tags())
+
+        print("\n5) The writer survives all of the above")
+        _check("a plain write still commits", db._retry_write(_insert('last')) and 'last' in _tags())
+
+    finally:
+        db._writer.flush()
+        import shutil
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(_TMP, ignore_errors=True)
+
+    print()
+    if _check.failed:
+        print(f"RESULT: {_check.failed} assertion(s) FAILED")
+        return 1
+    print("RESULT: all assertions passed - concurrent writes group-commit, a failing write "
+          "rolls back alone, and nested writes run inline in their caller's savepoint.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())